@@ -0,0 +1,30 @@
+# automovel/geocoding.py
+"""Endereço aproximado dos pontos de rastreamento (via core.geocoding)."""
+
+from core.geocoding import obter_servico
+
+ENDERECO_INDISPONIVEL = 'Endereço não disponível'
+
+
+def reverse_geocode(lat, lng):
+    """
+    Endereço aproximado de (lat, lng). Numa célula ainda não consultada
+    bloqueia pelo provedor: em request só para ações interativas; o
+    rastreamento usa o enriquecimento em background (automovel.tasks).
+    """
+    return obter_servico().endereco(lat, lng) or ENDERECO_INDISPONIVEL
+
+
+def enderecos_aproximados(coordenadas, max_chamadas=None):
+    """
+    Endereços de uma lista de (lat, lng), na mesma ordem, e quantas
+    chamadas ao provedor custaram (os demais pontos saíram do cache).
+    Falha do provedor vira ENDERECO_INDISPONIVEL; ponto de célula nova
+    além de `max_chamadas` volta None, para uma próxima execução.
+    """
+    consulta = obter_servico().consultar(coordenadas, max_chamadas=max_chamadas)
+    enderecos = [
+        None if i in consulta.adiados else endereco or ENDERECO_INDISPONIVEL
+        for i, endereco in enumerate(consulta.enderecos)
+    ]
+    return enderecos, consulta.chamadas
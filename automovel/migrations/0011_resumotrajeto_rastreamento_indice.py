@@ -0,0 +1,50 @@
+# Generated by Django 5.2.17 on 2026-10-17 23:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automovel', '0010_carro_agendamento_tracking_token'),
+        ('usuario', '0003_padroniza_nomes_grupos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoTrajeto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_pontos', models.PositiveIntegerField(default=0)),
+                ('inicio', models.DateTimeField(blank=True, null=True)),
+                ('fim', models.DateTimeField(blank=True, null=True)),
+                ('distancia_km', models.DecimalField(decimal_places=3, default=0, max_digits=10)),
+                ('velocidade_maxima', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('velocidade_media', models.DecimalField(blank=True, decimal_places=2, help_text='Média em movimento (km/h), sem o tempo parado.', max_digits=6, null=True)),
+                ('paradas', models.PositiveIntegerField(default=0)),
+                ('tempo_parado_segundos', models.PositiveIntegerField(default=0)),
+                ('polilinhas', models.JSONField(blank=True, default=dict)),
+                ('calculado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumo de Trajeto',
+                'verbose_name_plural': 'Resumos de Trajeto',
+                'db_table': 'carro_resumo_trajeto',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='carro_rastreamento',
+            index=models.Index(fields=['agendamento', 'data_hora'], name='rastreamento_agend_data_idx'),
+        ),
+        migrations.AddField(
+            model_name='resumotrajeto',
+            name='agendamento',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumo_trajeto', to='automovel.carro_agendamento'),
+        ),
+        migrations.AddField(
+            model_name='resumotrajeto',
+            name='filial',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='%(class)s_set', to='usuario.filial'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.17 on 2026-10-18 01:33
+
+from django.db import migrations, models
+
+
+def marcar_enderecos_preenchidos(apps, schema_editor):
+    """Pontos que já têm endereço saem da fila do enriquecimento."""
+    Carro_rastreamento = apps.get_model("automovel", "Carro_rastreamento")
+    Carro_rastreamento.objects.filter(endereco_aproximado__isnull=False).update(endereco_pendente=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automovel', '0011_resumotrajeto_rastreamento_indice'),
+        ('usuario', '0003_padroniza_nomes_grupos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carro_rastreamento',
+            name='endereco_pendente',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.RunPython(marcar_enderecos_preenchidos, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='carro_rastreamento',
+            index=models.Index(fields=['endereco_pendente', '-data_hora'], name='rastreamento_end_pend_idx'),
+        ),
+    ]
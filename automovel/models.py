@@ -179,25 +179,50 @@ class Carro_agendamento(BaseFilialModel):
     def __str__(self):
         return f"Agendamento #{self.id} - {self.carro.placa} para {self.funcionario}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Status lido do banco, para detectar a finalização no save()
+        instancia._status_carregado = dict(zip(field_names, values)).get("status")
+        return instancia
+
     def save(self, *args, **kwargs):
         from core.upload import sanitize_image, delete_old_file
+        from .rastreamento import invalidar_token
 
         if self.pk:
             delete_old_file(self, "foto_principal")
 
+        finalizou = (
+            self.status == "finalizado"
+            and getattr(self, "_status_carregado", None) != "finalizado"
+        )
         super().save(*args, **kwargs)
+        self._status_carregado = self.status
+
+        # Status pode ter mudado: a ingestão GPS relê na próxima request
+        invalidar_token(self.tracking_token)
+
+        if finalizou:
+            from .trajeto import agendar_resumo_trajeto
+            agendar_resumo_trajeto(self.pk)
 
         if self.foto_principal:
             sanitize_image(self.foto_principal.path)
 
     def delete(self, *args, **kwargs):
         from core.upload import safe_delete_file
+        from .rastreamento import invalidar_token
 
         safe_delete_file(self, "foto_principal")
         super().delete(*args, **kwargs)
+        invalidar_token(self.tracking_token)
 
     def rotate_tracking_token(self):
         """Gera novo token e invalida o anterior. Use se suspeitar de vazamento."""
+        from .rastreamento import invalidar_token
+
+        invalidar_token(self.tracking_token)
         self.tracking_token = uuid.uuid4()
         self.save(update_fields=["tracking_token"])
         return self.tracking_token
@@ -423,12 +448,58 @@ class Carro_rastreamento(BaseFilialModel):
     )
     data_hora = models.DateTimeField(default=timezone.now)
     endereco_aproximado = models.TextField(blank=True, null=True)
+    # Aguardando o enriquecimento em background (automovel.tasks) — o
+    # TextField do endereço não serve de índice para achar os pendentes
+    endereco_pendente = models.BooleanField(default=True, editable=False)
 
     class Meta:
         db_table = "carro_rastreamento"
         verbose_name = _("Rastreamento")
         verbose_name_plural = _("Rastreamentos")
         ordering = ["-data_hora"]
+        indexes = [
+            # Trajeto de um agendamento em ordem (mapa, resumo, paginação por cursor)
+            models.Index(fields=["agendamento", "data_hora"], name="rastreamento_agend_data_idx"),
+            # Fila do enriquecimento de endereços, mais recentes primeiro
+            models.Index(fields=["endereco_pendente", "-data_hora"], name="rastreamento_end_pend_idx"),
+        ]
+
+
+class ResumoTrajeto(BaseFilialModel):
+    """
+    Agregados e rota simplificada de um agendamento, calculados uma vez
+    quando ele é finalizado (automovel.trajeto) — o mapa e os relatórios
+    não precisam reler todos os pontos.
+    """
+
+    agendamento = models.OneToOneField(
+        Carro_agendamento, on_delete=models.CASCADE,
+        related_name="resumo_trajeto",
+    )
+    total_pontos = models.PositiveIntegerField(default=0)
+    inicio = models.DateTimeField(null=True, blank=True)
+    fim = models.DateTimeField(null=True, blank=True)
+    distancia_km = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    velocidade_maxima = models.DecimalField(
+        max_digits=6, decimal_places=2, null=True, blank=True,
+    )
+    velocidade_media = models.DecimalField(
+        max_digits=6, decimal_places=2, null=True, blank=True,
+        help_text=_("Média em movimento (km/h), sem o tempo parado."),
+    )
+    paradas = models.PositiveIntegerField(default=0)
+    tempo_parado_segundos = models.PositiveIntegerField(default=0)
+    # {"<zoom>": [[lat, lng], ...]} — uma polilinha simplificada por nível de zoom
+    polilinhas = models.JSONField(default=dict, blank=True)
+    calculado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "carro_resumo_trajeto"
+        verbose_name = _("Resumo de Trajeto")
+        verbose_name_plural = _("Resumos de Trajeto")
+
+    def __str__(self):
+        return f"Trajeto do agendamento #{self.agendamento_id} ({self.distancia_km} km)"
 
 
 # ═════════════════════════════════════════════════════════════════════════════
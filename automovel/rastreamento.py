@@ -0,0 +1,311 @@
+# automovel/rastreamento.py
+"""
+Ingestão de pontos GPS enviados pelos rastreadores físicos.
+
+A request só valida e enfileira — nada de banco nem de Nominatim no
+caminho do device:
+
+    token ──► resolver_agendamento (cache) ──► pontos_do_payload (validação)
+          ──► enfileirar_pontos ──► lista no Redis ──► worker: bulk_create
+                                                      ──► beat: geocoding reverso
+
+O buffer é uma lista no Redis (RASTREAMENTO_BUFFER_URL). O primeiro ponto
+depois de uma descarga agenda a próxima para daqui a poucos segundos, e um
+buffer cheio descarrega na hora — cada INSERT leva tudo o que chegou nesse
+intervalo, de todos os rastreadores. Sem Redis configurado (dev/testes) ou
+fora do ar, os pontos vão direto numa task do Celery.
+"""
+
+import json
+import logging
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.cache import CacheNamespace
+
+logger = logging.getLogger(__name__)
+
+cache_rastreamento = CacheNamespace('automovel_rastreamento', versao=1, timeout=300)
+
+# Token inexistente também é cacheado (por menos tempo) para não bater no banco
+TOKEN_DESCONHECIDO = 'desconhecido'
+TIMEOUT_TOKEN_DESCONHECIDO = 30
+
+MAX_PONTOS_POR_REQUISICAO = 1000
+TAMANHO_LOTE = 500
+ATRASO_DESCARGA_SEGUNDOS = 2
+
+# Pontos com data_hora no futuro além disso são rejeitados (relógio do device)
+TOLERANCIA_RELOGIO = timedelta(minutes=5)
+
+LAT_MIN, LAT_MAX = -90.0, 90.0
+LNG_MIN, LNG_MAX = -180.0, 180.0
+VEL_MIN, VEL_MAX = 0.0, 300.0  # km/h
+
+
+class PontoInvalido(ValueError):
+    """Ponto fora do formato ou dos limites plausíveis."""
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# TOKEN → AGENDAMENTO
+# ═════════════════════════════════════════════════════════════════════════════
+
+def _normalizar_token(token):
+    try:
+        return str(uuid.UUID(str(token)))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def chave_token(token):
+    return cache_rastreamento.chave('token', token)
+
+
+def resolver_agendamento(token):
+    """
+    {'id', 'filial_id', 'status'} do agendamento dono do token, ou None.
+
+    Fica em cache; Carro_agendamento.save() e rotate_tracking_token()
+    invalidam a entrada (mudança de status, token revogado).
+    """
+    from .models import Carro_agendamento
+
+    token = _normalizar_token(token)
+    if token is None:
+        return None
+
+    chave = chave_token(token)
+    dados = cache_rastreamento.get(chave)
+    if dados == TOKEN_DESCONHECIDO:
+        return None
+    if dados is not None:
+        return dados
+
+    dados = (
+        Carro_agendamento.objects.all_filiais()
+        .filter(tracking_token=token)
+        .values('id', 'filial_id', 'status')
+        .first()
+    )
+    if dados is None:
+        cache_rastreamento.set(chave, TOKEN_DESCONHECIDO, TIMEOUT_TOKEN_DESCONHECIDO)
+        return None
+
+    cache_rastreamento.set(chave, dados)
+    return dados
+
+
+def invalidar_token(token):
+    token = _normalizar_token(token)
+    if token:
+        cache_rastreamento.delete(chave_token(token))
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# VALIDAÇÃO DO PAYLOAD
+# ═════════════════════════════════════════════════════════════════════════════
+
+def _validar_ponto(dados, agora):
+    """Ponto serializável (para a fila) a partir de um item do payload."""
+    if not isinstance(dados, dict):
+        raise PontoInvalido('ponto deve ser um objeto')
+    try:
+        lat = float(dados['latitude'])
+        lng = float(dados['longitude'])
+        vel = float(dados.get('velocidade') or 0)
+    except KeyError as exc:
+        raise PontoInvalido(f'campo obrigatório ausente: {exc}')
+    except (TypeError, ValueError) as exc:
+        raise PontoInvalido(str(exc))
+
+    if not (LAT_MIN <= lat <= LAT_MAX):
+        raise PontoInvalido('latitude fora do range')
+    if not (LNG_MIN <= lng <= LNG_MAX):
+        raise PontoInvalido('longitude fora do range')
+    if not (VEL_MIN <= vel <= VEL_MAX):
+        raise PontoInvalido('velocidade implausível')
+
+    # Backlog offline: o device manda a hora da leitura; sem ela, vale a chegada
+    data_hora = agora
+    if dados.get('data_hora'):
+        data_hora = parse_datetime(str(dados['data_hora']))
+        if data_hora is None:
+            raise PontoInvalido('data_hora inválida (use ISO 8601)')
+        if timezone.is_naive(data_hora):
+            data_hora = timezone.make_aware(data_hora)
+        if data_hora > agora + TOLERANCIA_RELOGIO:
+            raise PontoInvalido('data_hora no futuro')
+
+    return {
+        'latitude': round(lat, 6),
+        'longitude': round(lng, 6),
+        'velocidade': round(vel, 2),
+        'data_hora': data_hora.isoformat(),
+    }
+
+
+def pontos_do_payload(corpo):
+    """
+    Valida o corpo da request e retorna (pontos, rejeitados).
+
+    Aceita um ponto (`{"latitude": ..}`), uma lista de pontos ou
+    `{"pontos": [..]}`. Num lote, pontos inválidos vão para `rejeitados`
+    ([{'indice', 'erro'}]) e os demais seguem; com um ponto só, ou JSON
+    malformado, levanta PontoInvalido.
+    """
+    try:
+        dados = json.loads(corpo)
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise PontoInvalido(str(exc))
+
+    agora = timezone.now()
+    if isinstance(dados, dict) and 'pontos' not in dados:
+        return [_validar_ponto(dados, agora)], []
+
+    itens = dados.get('pontos') if isinstance(dados, dict) else dados
+    if not isinstance(itens, list) or not itens:
+        raise PontoInvalido('lista de pontos vazia ou inválida')
+    if len(itens) > MAX_PONTOS_POR_REQUISICAO:
+        raise PontoInvalido(f'máximo de {MAX_PONTOS_POR_REQUISICAO} pontos por requisição')
+
+    pontos, rejeitados = [], []
+    for indice, item in enumerate(itens):
+        try:
+            pontos.append(_validar_ponto(item, agora))
+        except PontoInvalido as exc:
+            rejeitados.append({'indice': indice, 'erro': str(exc)})
+    return pontos, rejeitados
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# BUFFER E GRAVAÇÃO
+# ═════════════════════════════════════════════════════════════════════════════
+
+class BufferPontos:
+    """Lista no Redis com os pontos aguardando o bulk_create."""
+
+    CHAVE = 'automovel:rastreamento:pendentes'
+
+    def __init__(self, url):
+        self.url = url
+        self._cliente = None
+
+    @property
+    def cliente(self):
+        if self._cliente is None:
+            import redis
+            self._cliente = redis.from_url(
+                self.url, socket_connect_timeout=2, socket_timeout=2,
+            )
+        return self._cliente
+
+    def adicionar(self, pontos):
+        """Empilha os pontos; retorna o tamanho do buffer depois do push."""
+        return self.cliente.rpush(self.CHAVE, *[json.dumps(p) for p in pontos])
+
+    def retirar(self, limite):
+        """Tira até `limite` pontos do início do buffer, atomicamente."""
+        with self.cliente.pipeline(transaction=True) as pipe:
+            pipe.lrange(self.CHAVE, 0, limite - 1)
+            pipe.ltrim(self.CHAVE, limite, -1)
+            itens, _ = pipe.execute()
+        return [json.loads(item) for item in itens]
+
+    def devolver(self, pontos):
+        """Recoloca no início do buffer pontos cuja gravação falhou."""
+        if pontos:
+            self.cliente.lpush(self.CHAVE, *[json.dumps(p) for p in reversed(pontos)])
+
+    def tamanho(self):
+        return self.cliente.llen(self.CHAVE)
+
+
+_buffers = {}
+
+
+def obter_buffer():
+    """Buffer configurado em RASTREAMENTO_BUFFER_URL, ou None."""
+    url = getattr(settings, 'RASTREAMENTO_BUFFER_URL', '')
+    if not url:
+        return None
+    if url not in _buffers:
+        _buffers[url] = BufferPontos(url)
+    return _buffers[url]
+
+
+def enfileirar_pontos(agendamento, pontos):
+    """
+    Entrega os pontos para gravação sem esperar o banco.
+
+    `agendamento` é o dict de resolver_agendamento. Retorna o caminho
+    usado: 'buffer', 'fila' (task do Celery) ou 'direto' (sem broker).
+    """
+    from .tasks import descarregar_buffer_rastreamento, gravar_pontos_rastreamento
+
+    pontos = [
+        {**ponto, 'agendamento_id': agendamento['id'], 'filial_id': agendamento['filial_id']}
+        for ponto in pontos
+    ]
+
+    buffer = obter_buffer()
+    if buffer is not None:
+        try:
+            tamanho = buffer.adicionar(pontos)
+        except Exception:
+            logger.warning('Buffer de rastreamento indisponível; usando a fila do Celery', exc_info=True)
+        else:
+            try:
+                if tamanho >= TAMANHO_LOTE:
+                    descarregar_buffer_rastreamento.delay()
+                elif tamanho == len(pontos):
+                    # Buffer estava vazio: a descarga agendada leva também o que chegar até lá
+                    descarregar_buffer_rastreamento.apply_async(countdown=ATRASO_DESCARGA_SEGUNDOS)
+            except Exception:
+                # A descarga periódica do beat recolhe o que ficou
+                logger.warning('Falha ao agendar descarga do buffer de rastreamento', exc_info=True)
+            return 'buffer'
+
+    try:
+        gravar_pontos_rastreamento.delay(pontos)
+        return 'fila'
+    except Exception:
+        logger.warning('Fila do Celery indisponível; gravando rastreamento na request', exc_info=True)
+        gravar_pontos(pontos)
+        return 'direto'
+
+
+def gravar_pontos(pontos):
+    """bulk_create dos pontos enfileirados; o endereço é preenchido depois."""
+    from .models import Carro_agendamento, Carro_rastreamento
+
+    # Agendamento apagado enquanto o ponto esperava na fila: descarta o ponto
+    # (senão a FK derrubaria o lote inteiro, de novo a cada tentativa)
+    existentes = set(
+        Carro_agendamento.objects.all_filiais()
+        .filter(pk__in={ponto['agendamento_id'] for ponto in pontos})
+        .values_list('pk', flat=True)
+    )
+    descartados = sum(1 for ponto in pontos if ponto['agendamento_id'] not in existentes)
+    if descartados:
+        logger.warning('Rastreamento: %s ponto(s) de agendamento inexistente descartado(s)', descartados)
+
+    objetos = [
+        Carro_rastreamento(
+            agendamento_id=ponto['agendamento_id'],
+            filial_id=ponto['filial_id'],
+            latitude=Decimal(str(ponto['latitude'])),
+            longitude=Decimal(str(ponto['longitude'])),
+            velocidade=Decimal(str(ponto['velocidade'])),
+            data_hora=parse_datetime(ponto['data_hora']),
+        )
+        for ponto in pontos
+        if ponto['agendamento_id'] in existentes
+    ]
+    Carro_rastreamento.objects.bulk_create(objetos, batch_size=TAMANHO_LOTE)
+    return len(objetos)
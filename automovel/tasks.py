@@ -0,0 +1,136 @@
+# automovel/tasks.py
+"""
+Tasks Celery do app automovel — ingestão do rastreamento GPS.
+
+Tasks agendadas (Celery Beat):
+- descarregar_buffer_rastreamento: a cada minuto (rede de segurança; a
+  ingestão já agenda descargas conforme os pontos chegam)
+- enriquecer_enderecos_rastreamento: a cada minuto
+
+Disparada pelo model:
+- gerar_resumo_trajeto_task: ao finalizar um agendamento
+"""
+
+import logging
+
+from celery import shared_task
+
+from .rastreamento import TAMANHO_LOTE, cache_rastreamento, gravar_pontos, obter_buffer
+
+logger = logging.getLogger(__name__)
+
+# Chamadas ao provedor por execução (1/s no Nominatim); pontos em células
+# já conhecidas saem do cache e não contam
+GEOCODING_POR_EXECUCAO = 50
+# Pontos lidos por consulta e no máximo por execução
+PONTOS_POR_LOTE = 500
+PONTOS_POR_EXECUCAO = 5000
+
+
+@shared_task(name='automovel.gravar_pontos_rastreamento')
+def gravar_pontos_rastreamento(pontos):
+    """Grava um lote de pontos (caminho sem buffer Redis)."""
+    total = gravar_pontos(pontos)
+    logger.debug(f'[Rastreamento] {total} ponto(s) gravado(s) direto da fila')
+    return total
+
+
+@shared_task(name='automovel.descarregar_buffer_rastreamento')
+def descarregar_buffer_rastreamento():
+    """Esvazia o buffer em lotes de TAMANHO_LOTE, um bulk_create por lote."""
+    buffer = obter_buffer()
+    if buffer is None:
+        return 0
+
+    total = 0
+    while True:
+        pontos = buffer.retirar(TAMANHO_LOTE)
+        if not pontos:
+            break
+        try:
+            total += gravar_pontos(pontos)
+        except Exception:
+            # Devolve o lote; a próxima descarga tenta de novo
+            buffer.devolver(pontos)
+            logger.exception(f'[Rastreamento] Falha ao gravar lote de {len(pontos)} ponto(s)')
+            break
+
+    if total:
+        logger.info(f'[Rastreamento] {total} ponto(s) gravado(s) do buffer')
+    return total
+
+
+@shared_task(name='automovel.enriquecer_enderecos_rastreamento')
+def enriquecer_enderecos_rastreamento(limite=GEOCODING_POR_EXECUCAO):
+    """
+    Preenche `endereco_aproximado` dos pontos pendentes, mais recentes
+    primeiro. `limite` conta chamadas ao provedor, não pontos: pontos na
+    mesma célula da grade (veículo parado, trajeto repetido) saem do cache
+    de core.geocoding, e a execução segue lendo pendentes até gastar o
+    limite. Células novas além dele ficam para a próxima execução.
+    Uma execução por vez (trava no cache). Retorna quantos pontos preencheu.
+    """
+    from django.db.models import Q
+
+    from core.geocoding import INTERVALO_NOMINATIM_SEGUNDOS
+
+    from .geocoding import enderecos_aproximados
+    from .models import Carro_rastreamento
+
+    trava = cache_rastreamento.chave('geocoding', 'executando')
+    if not cache_rastreamento.add(trava, True, timeout=limite * INTERVALO_NOMINATIM_SEGUNDOS + 60):
+        return 0
+
+    preenchidos = lidos = chamadas = 0
+    try:
+        pendentes = (
+            Carro_rastreamento.objects.all_filiais()
+            .filter(endereco_pendente=True)
+            .order_by('-data_hora', '-pk')
+        )
+        cursor = Q()
+        while chamadas < limite and lidos < PONTOS_POR_EXECUCAO:
+            lote = list(
+                pendentes.filter(cursor)
+                .values_list('pk', 'data_hora', 'latitude', 'longitude')[:PONTOS_POR_LOTE]
+            )
+            if not lote:
+                break
+            lidos += len(lote)
+            enderecos, gastas = enderecos_aproximados(
+                [(lat, lng) for _, _, lat, lng in lote], max_chamadas=limite - chamadas,
+            )
+            chamadas += gastas
+
+            # Um UPDATE por endereço distinto; os adiados (None) seguem pendentes
+            por_endereco = {}
+            for (pk, _, _, _), endereco in zip(lote, enderecos):
+                if endereco is not None:
+                    por_endereco.setdefault(endereco, []).append(pk)
+            for endereco, pks in por_endereco.items():
+                preenchidos += Carro_rastreamento.objects.all_filiais().filter(pk__in=pks).update(
+                    endereco_aproximado=endereco, endereco_pendente=False,
+                )
+
+            pk, data_hora = lote[-1][:2]
+            cursor = Q(data_hora__lt=data_hora) | Q(data_hora=data_hora, pk__lt=pk)
+    finally:
+        cache_rastreamento.delete(trava)
+
+    logger.debug(f'[Rastreamento] {preenchidos} endereço(s) preenchido(s), {chamadas} chamada(s) ao provedor')
+    return preenchidos
+
+
+@shared_task(name='automovel.gerar_resumo_trajeto')
+def gerar_resumo_trajeto_task(agendamento_id):
+    """Agregados e rotas simplificadas de um agendamento finalizado."""
+    from .trajeto import gerar_resumo_trajeto
+
+    resumo = gerar_resumo_trajeto(agendamento_id)
+    if resumo is None:
+        return None
+    logger.info(
+        f'[Trajeto] Agendamento {agendamento_id}: {resumo.total_pontos} ponto(s), '
+        f'{resumo.distancia_km} km, {resumo.paradas} parada(s)'
+    )
+    return resumo.pk
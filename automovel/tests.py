@@ -1,3 +1,319 @@
-from django.test import TestCase
+import json
+import math
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from usuario.models import Filial
+
+from .models import Carro, Carro_agendamento, Carro_rastreamento, ResumoTrajeto
+from .rastreamento import gravar_pontos
+from .tasks import enriquecer_enderecos_rastreamento
+from .throttling import tracking_limiter
+from .trajeto import polilinha, simplificar
+
+User = get_user_model()
+
+# URLconf só com o app (a raiz importa apps que exigem as libs do WeasyPrint)
+urlpatterns = [path('automovel/', include('automovel.urls'))]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class RastreamentoAPITest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial Frota')
+        cls.usuario = User.objects.create_user(
+            username='motorista', email='motorista@example.com', password='x',
+            filial_ativa=cls.filial,
+        )
+        cls.carro = Carro.objects.create(
+            filial=cls.filial, placa='ABC1D23', modelo='Strada', marca='Fiat',
+            cor='Branco', ano=2022, renavan='12345678901',
+        )
+        agora = timezone.now()
+        cls.agendamento = Carro_agendamento.objects.create(
+            filial=cls.filial, funcionario='Motorista', usuario=cls.usuario,
+            carro=cls.carro, data_hora_agenda=agora,
+            data_hora_devolucao=agora + timedelta(hours=8), cm='CM-1',
+            descricao='Visita', km_inicial=1000, responsavel='Gestor',
+            status='em_andamento',
+        )
+
+    def setUp(self):
+        cache.clear()
+        tracking_limiter.reset(str(self.agendamento.tracking_token))
+        self.url = reverse('automovel:api_rastreamento_receber')
+
+    def _post(self, corpo, token=None):
+        token = token or self.agendamento.tracking_token
+        return self.client.post(
+            self.url, data=json.dumps(corpo), content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+
+    def test_ponto_unico_gravado_sem_endereco(self):
+        resposta = self._post({'latitude': -23.5505, 'longitude': -46.6333, 'velocidade': 45.2})
+
+        self.assertEqual(resposta.status_code, 202)
+        self.assertEqual(resposta.json()['recebidos'], 1)
+        ponto = Carro_rastreamento.objects.get()
+        self.assertEqual(ponto.agendamento_id, self.agendamento.pk)
+        self.assertEqual(ponto.filial_id, self.filial.pk)
+        # Endereço fica para o enriquecimento em segundo plano
+        self.assertIsNone(ponto.endereco_aproximado)
+
+    def test_lote_com_backlog_e_rejeitados(self):
+        leitura = timezone.now() - timedelta(hours=2)
+        resposta = self._post({'pontos': [
+            {'latitude': -23.55, 'longitude': -46.63, 'data_hora': leitura.isoformat()},
+            {'latitude': 123, 'longitude': -46.63},
+            {'latitude': -23.56, 'longitude': -46.64, 'velocidade': 30},
+            {'latitude': -23.57, 'longitude': -46.65,
+             'data_hora': (timezone.now() + timedelta(hours=1)).isoformat()},
+        ]})
+
+        self.assertEqual(resposta.status_code, 202)
+        dados = resposta.json()
+        self.assertEqual(dados['recebidos'], 2)
+        self.assertEqual([r['indice'] for r in dados['rejeitados']], [1, 3])
+        self.assertEqual(Carro_rastreamento.objects.count(), 2)
+        self.assertEqual(
+            Carro_rastreamento.objects.order_by('data_hora').first().data_hora, leitura,
+        )
+
+    def test_payload_invalido(self):
+        self.assertEqual(self._post({'latitude': 100, 'longitude': 0}).status_code, 400)
+        self.assertEqual(self._post({'pontos': [{'latitude': 'x'}]}).status_code, 400)
+        self.assertFalse(Carro_rastreamento.objects.exists())
+
+    def test_token_em_cache_invalidado_ao_mudar_status(self):
+        self.assertEqual(self._post({'latitude': 1, 'longitude': 1}).status_code, 202)
+
+        self.agendamento.status = 'finalizado'
+        self.agendamento.save()
+
+        self.assertEqual(self._post({'latitude': 1, 'longitude': 1}).status_code, 403)
+
+    def test_token_desconhecido_ou_rotacionado(self):
+        antigo = self.agendamento.tracking_token
+        self.assertEqual(self._post({'latitude': 1, 'longitude': 1}).status_code, 202)
+
+        self.agendamento.rotate_tracking_token()
+
+        self.assertEqual(self._post({'latitude': 1, 'longitude': 1}, token=antigo).status_code, 403)
+        self.assertEqual(self._post({'latitude': 1, 'longitude': 1}).status_code, 202)
+        self.assertEqual(
+            self._post({'latitude': 1, 'longitude': 1},
+                       token='00000000-0000-0000-0000-000000000000').status_code,
+            403,
+        )
+
+    def test_gravacao_descarta_agendamento_inexistente(self):
+        ponto = {
+            'latitude': -23.5, 'longitude': -46.6, 'velocidade': 0,
+            'data_hora': timezone.now().isoformat(), 'filial_id': self.filial.pk,
+        }
+        gravados = gravar_pontos([
+            {**ponto, 'agendamento_id': self.agendamento.pk},
+            {**ponto, 'agendamento_id': self.agendamento.pk + 999},
+        ])
+
+        self.assertEqual(gravados, 1)
+        self.assertEqual(Carro_rastreamento.objects.count(), 1)
+
+    @override_settings(GEOCODING_TAMANHO_LRU=64)  # serviço novo, LRU vazio
+    def test_enriquecimento_limita_chamadas_e_nao_pontos(self):
+        from core.geocoding import obter_servico
+
+        agora = timezone.now()
+        celulas = [
+            (-23.5, -46.6, 20),     # veículo parado: 20 pontos, uma célula
+            (-23.6, -46.7, 1),
+            (-23.7, -46.8, 1),      # além do limite: fica pendente
+            (-23.8, -46.9, 3),      # célula já geocodificada: não gasta chamada
+        ]
+        obter_servico().endereco(-23.8, -46.9)
+        pontos, n = [], 0
+        for lat, lng, quantidade in celulas:
+            for _ in range(quantidade):
+                n += 1
+                pontos.append(Carro_rastreamento(
+                    agendamento=self.agendamento, filial=self.filial,
+                    latitude=Decimal(str(lat)), longitude=Decimal(str(lng)),
+                    data_hora=agora - timedelta(minutes=n),
+                ))
+        Carro_rastreamento.objects.bulk_create(pontos)
+        chamadas_antes = obter_servico().provedor.chamadas
+
+        self.assertEqual(enriquecer_enderecos_rastreamento(limite=2), 24)
+
+        self.assertEqual(obter_servico().provedor.chamadas - chamadas_antes, 2)
+        pendente = Carro_rastreamento.objects.get(endereco_pendente=True)
+        self.assertEqual((pendente.latitude, pendente.endereco_aproximado), (Decimal('-23.7'), None))
+        self.assertFalse(Carro_rastreamento.objects.filter(endereco_pendente=False, endereco_aproximado=None).exists())
+
+        self.assertEqual(enriquecer_enderecos_rastreamento(limite=2), 1)
+        self.assertFalse(Carro_rastreamento.objects.filter(endereco_pendente=True).exists())
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class TrajetoTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial Trajeto')
+        cls.usuario = User.objects.create_superuser(
+            username='gestor', email='gestor@example.com', password='x',
+            filial_ativa=cls.filial,
+        )
+        cls.carro = Carro.objects.create(
+            filial=cls.filial, placa='XYZ9K87', modelo='Saveiro', marca='VW',
+            cor='Prata', ano=2021, renavan='10987654321',
+        )
+
+    def setUp(self):
+        cache.clear()
+        agora = timezone.now()
+        self.agendamento = Carro_agendamento.objects.create(
+            filial=self.filial, funcionario='Motorista', usuario=self.usuario,
+            carro=self.carro, data_hora_agenda=agora,
+            data_hora_devolucao=agora + timedelta(hours=8), cm='CM-2',
+            descricao='Entrega', km_inicial=500, responsavel='Gestor',
+            status='em_andamento',
+        )
+
+    def _viagem(self):
+        """10 min para o norte a 36 km/h, 5 min parado, 10 min para o leste."""
+        inicio = timezone.now() - timedelta(hours=1)
+        pontos, lat, lng, t = [], -23.5, -46.6, inicio
+        passo_lat = 100 / 111_195          # 100 m a cada 10 s
+        for _ in range(60):
+            pontos.append((lat, lng, t, 36))
+            lat += passo_lat
+            t += timedelta(seconds=10)
+        for _ in range(30):
+            pontos.append((lat, lng, t, 0))
+            t += timedelta(seconds=10)
+        for _ in range(60):
+            pontos.append((lat, lng, t, 36))
+            lng += passo_lat / math.cos(math.radians(lat))
+            t += timedelta(seconds=10)
+        Carro_rastreamento.objects.bulk_create([
+            Carro_rastreamento(
+                agendamento=self.agendamento, filial=self.filial,
+                latitude=Decimal(f'{lat:.6f}'), longitude=Decimal(f'{lng:.6f}'),
+                data_hora=data_hora, velocidade=velocidade,
+            )
+            for lat, lng, data_hora, velocidade in pontos
+        ])
+        return pontos
+
+    def test_simplificacao_por_zoom(self):
+        reta = [(-23.5 + i * 0.0001, -46.6) for i in range(500)]
+        self.assertEqual(simplificar(reta, tolerancia_m=1), [0, 499])
+
+        # Meia volta numa rotatória de ~500 m de raio
+        raio = 500 / 111_195
+        curva = [
+            (-23.5 + raio * math.sin(math.pi * i / 200), -46.6 + raio * math.cos(math.pi * i / 200))
+            for i in range(201)
+        ]
+        afastado, proximo = polilinha(curva, 8), polilinha(curva, 17)
+        self.assertLessEqual(len(afastado), 3)
+        self.assertGreater(len(proximo), 20)
+        self.assertEqual((afastado[0], afastado[-1]), (proximo[0], proximo[-1]))
+
+    def test_resumo_ao_finalizar(self):
+        self._viagem()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.agendamento.status = 'finalizado'
+            self.agendamento.save()
+
+        resumo = ResumoTrajeto.objects.get(agendamento=self.agendamento)
+        self.assertEqual(resumo.total_pontos, 150)
+        self.assertAlmostEqual(float(resumo.distancia_km), 11.9, delta=0.1)
+        self.assertEqual((resumo.paradas, resumo.tempo_parado_segundos), (1, 300))
+        self.assertEqual(float(resumo.velocidade_maxima), 36)
+        self.assertAlmostEqual(float(resumo.velocidade_media), 36, delta=0.5)
+        self.assertEqual(set(resumo.polilinhas), {'8', '11', '14', '17'})
+
+        # Salvar de novo não recalcula
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.agendamento.save()
+        self.assertEqual(callbacks, [])
+
+    def test_pontos_paginados_por_cursor(self):
+        self._viagem()
+        self.client.force_login(self.usuario)
+        url = reverse('automovel:api_rastreamento_pontos', args=[self.agendamento.pk])
+
+        vistos, cursor, paginas = [], '', 0
+        while True:
+            dados = self.client.get(url, {'limite': 40, 'apos': cursor}).json()
+            vistos += [p['id'] for p in dados['pontos']]
+            paginas += 1
+            cursor = dados['proximo']
+            if not cursor:
+                break
+
+        self.assertEqual(paginas, 4)
+        self.assertEqual(
+            vistos,
+            list(
+                Carro_rastreamento.objects.filter(agendamento=self.agendamento)
+                .order_by('data_hora', 'pk').values_list('pk', flat=True)
+            ),
+        )
+
+    def test_rota_ao_vivo_processa_so_os_pontos_novos(self):
+        from . import trajeto
+
+        pontos = self._viagem()
+        corte = pontos[89][2]
+        novos = list(Carro_rastreamento.objects.filter(data_hora__gt=corte).order_by('data_hora'))
+        Carro_rastreamento.objects.filter(data_hora__gt=corte).delete()
+
+        lidas = []
+        original = trajeto._linhas
+
+        def linhas(*args, **kwargs):
+            resultado = original(*args, **kwargs)
+            lidas.append(len(resultado))
+            return resultado
+
+        with patch.object(trajeto, '_linhas', side_effect=linhas):
+            trajeto.rota_para_mapa(self.agendamento, zoom=17)
+            for ponto in novos:
+                ponto.pk = None
+            Carro_rastreamento.objects.bulk_create(novos)
+            rota = trajeto.rota_para_mapa(self.agendamento, zoom=17)
+            trajeto.rota_para_mapa(self.agendamento, zoom=17)
+
+        self.assertEqual(lidas, [90, 60, 0])
+        completo = trajeto._pontos(self.agendamento.pk)
+        self.assertEqual(rota['resumo'], trajeto._resumo_json(trajeto.calcular_agregados(completo)))
+        # Mesmo traçado da viagem inteira: cantos preservados, poucos vértices
+        inteira = trajeto.polilinha(completo, 17)
+        self.assertEqual((rota['pontos'][0], rota['pontos'][-1]), (inteira[0], inteira[-1]))
+        self.assertIn(inteira[1], rota['pontos'])
+        self.assertLessEqual(len(rota['pontos']), len(inteira) + 2)
+
+    def test_rota_por_zoom(self):
+        self._viagem()
+        self.client.force_login(self.usuario)
+        url = reverse('automovel:api_rastreamento_rota', args=[self.agendamento.pk])
+
+        dados = self.client.get(url, {'zoom': 9}).json()
+
+        self.assertEqual(dados['zoom'], 11)
+        self.assertEqual(dados['resumo']['total_pontos'], 150)
+        self.assertEqual(dados['resumo']['paradas'], 1)
@@ -0,0 +1,486 @@
+# automovel/trajeto.py
+"""
+Trajeto de um agendamento: rota simplificada, agregados e pontos paginados.
+
+Uma viagem longa com rastreador a 1 Hz tem dezenas de milhares de pontos;
+desenhar todos no mapa (ou carregar todos para montar a tela) não escala.
+
+- Rota: Douglas–Peucker com tolerância proporcional ao tamanho do pixel
+  no zoom pedido — no zoom 10 um pixel tem ~150 m, então os pontos a
+  menos que isso da reta são descartados sem mudar o desenho.
+- Agendamento finalizado: os agregados (distância, velocidades, paradas)
+  e a rota de cada nível de NIVEIS_ZOOM são calculados uma vez
+  (ResumoTrajeto) e o mapa só lê esse registro.
+- Em andamento: a rota e os agregados ficam em cache e cada abertura do
+  mapa só processa os pontos chegados desde a anterior (RotaIncremental,
+  AcumuladorTrajeto); o estado é refeito do zero a cada
+  ROTA_AO_VIVO_TIMEOUT, o que inclui pontos de backlog com horário antigo.
+- Pontos brutos: páginas por cursor (data_hora, id) sobre o índice
+  (agendamento, data_hora) — o custo da página não depende do tamanho
+  da viagem.
+"""
+
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+
+from .rastreamento import VEL_MAX, cache_rastreamento
+
+logger = logging.getLogger(__name__)
+
+RAIO_TERRA_M = 6_371_000
+METROS_POR_PIXEL_ZOOM_0 = 156_543.03   # Web Mercator, no equador
+PIXELS_TOLERANCIA = 1.5
+
+NIVEIS_ZOOM = (8, 11, 14, 17)
+ZOOM_PADRAO = 14
+
+VELOCIDADE_PARADO_KMH = 3
+PARADA_MINIMA_SEGUNDOS = 180
+
+PONTOS_POR_PAGINA = 500
+MAX_PONTOS_POR_PAGINA = 2000
+
+# Espera a descarga do buffer de ingestão antes de resumir a viagem
+ATRASO_RESUMO_SEGUNDOS = 30
+
+# Rota de viagem em andamento: idade máxima do estado incremental em cache
+ROTA_AO_VIVO_TIMEOUT = 10 * 60
+# Pontos brutos na cauda da rota (depois do último vértice fixo) antes de fixá-la
+MAX_PONTOS_CAUDA = 1000
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# GEOMETRIA
+# ═════════════════════════════════════════════════════════════════════════════
+
+def distancia_m(a, b):
+    """Haversine entre (lat, lng) e (lat, lng), em metros."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * RAIO_TERRA_M * math.asin(math.sqrt(h))
+
+
+def tolerancia_para_zoom(zoom, latitude=0):
+    """Metros que cabem em PIXELS_TOLERANCIA pixels no zoom (Web Mercator)."""
+    return PIXELS_TOLERANCIA * METROS_POR_PIXEL_ZOOM_0 * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+def simplificar(pontos, tolerancia_m):
+    """
+    Douglas–Peucker: índices dos pontos que mantêm a rota a menos de
+    `tolerancia_m` do traçado original. `pontos` é uma lista de (lat, lng).
+    Iterativo (sem recursão) para viagens com muitos pontos.
+    """
+    total = len(pontos)
+    if total < 3:
+        return list(range(total))
+
+    # Projeção equiretangular local: distâncias em metros num plano
+    lat0 = math.radians(sum(p[0] for p in pontos) / total)
+    escala_x = RAIO_TERRA_M * math.cos(lat0)
+    xy = [
+        (math.radians(lng) * escala_x, math.radians(lat) * RAIO_TERRA_M)
+        for lat, lng in pontos
+    ]
+
+    manter = [False] * total
+    manter[0] = manter[-1] = True
+    pilha = [(0, total - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        (x1, y1), (x2, y2) = xy[inicio], xy[fim]
+        dx, dy = x2 - x1, y2 - y1
+        comprimento2 = dx * dx + dy * dy
+
+        maior, indice = -1.0, None
+        for i in range(inicio + 1, fim):
+            px, py = xy[i]
+            if comprimento2:
+                t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / comprimento2))
+                distancia = math.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+            else:
+                distancia = math.hypot(px - x1, py - y1)
+            if distancia > maior:
+                maior, indice = distancia, i
+
+        if indice is not None and maior > tolerancia_m:
+            manter[indice] = True
+            pilha.append((inicio, indice))
+            pilha.append((indice, fim))
+
+    return [i for i, manteve in enumerate(manter) if manteve]
+
+
+def _vertice(coordenada):
+    return [round(coordenada[0], 6), round(coordenada[1], 6)]
+
+
+def polilinha(pontos, zoom):
+    """[[lat, lng], ...] simplificada para o zoom."""
+    coordenadas = [(float(p[0]), float(p[1])) for p in pontos]
+    if not coordenadas:
+        return []
+    latitude = coordenadas[0][0]
+    return [
+        _vertice(coordenadas[i])
+        for i in simplificar(coordenadas, tolerancia_para_zoom(zoom, latitude))
+    ]
+
+
+class RotaIncremental:
+    """
+    Polilinha de uma viagem em andamento, estendida só com os pontos novos.
+
+    Os vértices que o Douglas–Peucker manteve antes do último ficam fixos;
+    a cauda (pontos brutos a partir do último vértice fixo) é simplificada
+    de novo junto com os pontos que chegam. Cada trecho continua dentro da
+    tolerância do zoom — o desenho pode ter alguns vértices a mais que o da
+    viagem inteira, nas emendas. Cabe no cache (pickle).
+    """
+
+    def __init__(self, zoom):
+        self.zoom = zoom
+        self.tolerancia = None
+        self.fixos = []
+        self.cauda = []
+
+    def adicionar(self, pontos):
+        self.cauda += [(float(p[0]), float(p[1])) for p in pontos]
+        if not self.cauda:
+            return self
+        if self.tolerancia is None:
+            self.tolerancia = tolerancia_para_zoom(self.zoom, self.cauda[0][0])
+
+        mantidos = simplificar(self.cauda, self.tolerancia)
+        if len(self.cauda) >= MAX_PONTOS_CAUDA:
+            corte = mantidos[-1]  # trecho reto longo: fixa até o ponto atual
+        else:
+            corte = mantidos[-2] if len(mantidos) > 1 else 0
+        if corte:
+            self.fixos += [_vertice(self.cauda[i]) for i in mantidos if i < corte]
+            self.cauda = self.cauda[corte:]
+        return self
+
+    def pontos(self):
+        if not self.cauda:
+            return list(self.fixos)
+        return self.fixos + [_vertice(self.cauda[i]) for i in simplificar(self.cauda, self.tolerancia)]
+
+
+def nivel_para_zoom(zoom):
+    """Menor nível pré-calculado com detalhe suficiente para `zoom`."""
+    for nivel in NIVEIS_ZOOM:
+        if nivel >= zoom:
+            return nivel
+    return NIVEIS_ZOOM[-1]
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# AGREGADOS
+# ═════════════════════════════════════════════════════════════════════════════
+
+def calcular_agregados(pontos):
+    """
+    Distância, velocidades e paradas de uma lista de
+    (lat, lng, data_hora, velocidade) em ordem cronológica.
+
+    Saltos com velocidade implícita acima de VEL_MAX (GPS perdido e
+    reencontrado longe) não entram na distância. Parada é uma sequência
+    abaixo de VELOCIDADE_PARADO_KMH — a informada pelo rastreador ou, sem
+    ela, a implícita entre pontos — por ao menos PARADA_MINIMA_SEGUNDOS.
+    """
+    return AcumuladorTrajeto().adicionar(pontos).agregados()
+
+
+class AcumuladorTrajeto:
+    """
+    Estado de `calcular_agregados` ponto a ponto: `adicionar` processa só
+    os pontos novos (em ordem cronológica, depois dos já somados) e
+    `agregados` fecha o resultado sem alterar o estado. Cabe no cache.
+    """
+
+    def __init__(self):
+        self.total_pontos = 0
+        self.inicio = None
+        self.fim = None
+        self.distancia = 0.0
+        self.velocidade_maxima = None
+        self.paradas = 0
+        self.tempo_parado = 0.0
+        self.parado_desde = None
+        self.anterior = None
+
+    def _parada(self, ate):
+        """(paradas, segundos) que a parada em aberto soma se terminar em `ate`."""
+        duracao = (ate - self.parado_desde).total_seconds()
+        return (1, duracao) if duracao >= PARADA_MINIMA_SEGUNDOS else (0, 0.0)
+
+    def adicionar(self, pontos):
+        for lat, lng, data_hora, velocidade in pontos:
+            lat, lng = float(lat), float(lng)
+            velocidade = float(velocidade) if velocidade is not None else None
+            if velocidade is not None:
+                self.velocidade_maxima = max(self.velocidade_maxima or 0.0, velocidade)
+
+            if self.anterior is None:
+                parado = velocidade is not None and velocidade < VELOCIDADE_PARADO_KMH
+            else:
+                trecho = distancia_m(self.anterior[:2], (lat, lng))
+                segundos = (data_hora - self.anterior[2]).total_seconds()
+                implicita = trecho / segundos * 3.6 if segundos > 0 else None
+                if implicita is None or implicita <= VEL_MAX:
+                    self.distancia += trecho
+                if velocidade is None:
+                    velocidade = implicita
+                parado = velocidade is not None and velocidade < VELOCIDADE_PARADO_KMH
+
+            if parado and self.parado_desde is None:
+                self.parado_desde = data_hora
+            elif not parado and self.parado_desde is not None:
+                paradas, segundos = self._parada(data_hora)
+                self.paradas += paradas
+                self.tempo_parado += segundos
+                self.parado_desde = None
+            self.anterior = (lat, lng, data_hora)
+
+            self.total_pontos += 1
+            if self.inicio is None:
+                self.inicio = data_hora
+            self.fim = data_hora
+        return self
+
+    def agregados(self):
+        resultado = {
+            'total_pontos': self.total_pontos,
+            'inicio': self.inicio,
+            'fim': self.fim,
+            'distancia_km': Decimal('0'),
+            'velocidade_maxima': None,
+            'velocidade_media': None,
+            'paradas': 0,
+            'tempo_parado_segundos': 0,
+        }
+        if not self.total_pontos:
+            return resultado
+
+        paradas, tempo_parado = self.paradas, self.tempo_parado
+        if self.parado_desde is not None:
+            em_aberto, segundos = self._parada(self.fim)
+            paradas += em_aberto
+            tempo_parado += segundos
+
+        em_movimento = (self.fim - self.inicio).total_seconds() - tempo_parado
+        resultado.update(
+            distancia_km=Decimal(self.distancia / 1000).quantize(Decimal('0.001')),
+            velocidade_maxima=(
+                Decimal(self.velocidade_maxima).quantize(Decimal('0.01'))
+                if self.velocidade_maxima is not None else None
+            ),
+            velocidade_media=(
+                Decimal(self.distancia / em_movimento * 3.6).quantize(Decimal('0.01'))
+                if em_movimento > 0 else None
+            ),
+            paradas=paradas,
+            tempo_parado_segundos=int(tempo_parado),
+        )
+        return resultado
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# LEITURA
+# ═════════════════════════════════════════════════════════════════════════════
+
+def _linhas(agendamento_id, apos=None):
+    """
+    (pk, lat, lng, data_hora, velocidade) em ordem, sem montar instâncias;
+    com `apos` = (data_hora, pk), só os posteriores (índice agendamento, data_hora).
+    """
+    from .models import Carro_rastreamento
+
+    consulta = (
+        Carro_rastreamento.objects.all_filiais()
+        .filter(agendamento_id=agendamento_id)
+        .order_by('data_hora', 'pk')
+    )
+    if apos:
+        data_hora, pk = apos
+        consulta = consulta.filter(Q(data_hora__gt=data_hora) | Q(data_hora=data_hora, pk__gt=pk))
+    return list(
+        consulta.values_list('pk', 'latitude', 'longitude', 'data_hora', 'velocidade')
+        .iterator(chunk_size=5000)
+    )
+
+
+def _pontos(agendamento_id):
+    """(lat, lng, data_hora, velocidade) em ordem."""
+    return [linha[1:] for linha in _linhas(agendamento_id)]
+
+
+def gerar_resumo_trajeto(agendamento_id):
+    """Calcula (ou recalcula) o ResumoTrajeto do agendamento."""
+    from .models import Carro_agendamento, ResumoTrajeto
+
+    filial_id = (
+        Carro_agendamento.objects.all_filiais()
+        .filter(pk=agendamento_id).values_list('filial_id', flat=True).first()
+    )
+    if filial_id is None:
+        return None
+
+    pontos = _pontos(agendamento_id)
+    agregados = calcular_agregados(pontos)
+    agregados['polilinhas'] = {str(nivel): polilinha(pontos, nivel) for nivel in NIVEIS_ZOOM}
+
+    resumo, _ = ResumoTrajeto.objects.all_filiais().update_or_create(
+        agendamento_id=agendamento_id,
+        defaults={'filial_id': filial_id, **agregados},
+    )
+    return resumo
+
+
+def agendar_resumo_trajeto(agendamento_id):
+    """Enfileira o resumo para depois do commit (e da descarga do buffer)."""
+    from .tasks import gerar_resumo_trajeto_task
+
+    def enfileirar():
+        try:
+            gerar_resumo_trajeto_task.apply_async((agendamento_id,), countdown=ATRASO_RESUMO_SEGUNDOS)
+        except Exception:
+            logger.warning(
+                f'[Trajeto] Fila indisponível; resumo do agendamento {agendamento_id} '
+                f'será calculado na primeira abertura do mapa', exc_info=True,
+            )
+
+    transaction.on_commit(enfileirar)
+
+
+def rota_para_mapa(agendamento, zoom=ZOOM_PADRAO):
+    """
+    {'zoom', 'pontos': [[lat, lng], ...], 'resumo': {...}} para o mapa.
+
+    Finalizado: lê o ResumoTrajeto (calcula na hora se ainda não existir).
+    Em andamento: estende a rota e os agregados em cache com os pontos
+    chegados desde a última leitura.
+    """
+    from .models import ResumoTrajeto
+
+    nivel = nivel_para_zoom(zoom)
+
+    if agendamento.status == 'finalizado':
+        resumo = ResumoTrajeto.objects.all_filiais().filter(agendamento_id=agendamento.pk).first()
+        if resumo is None:
+            resumo = gerar_resumo_trajeto(agendamento.pk)
+        return {
+            'zoom': nivel,
+            'pontos': resumo.polilinhas.get(str(nivel), []),
+            'resumo': _resumo_json(resumo.__dict__),
+        }
+
+    chave = cache_rastreamento.chave('rota_ao_vivo', agendamento.pk, nivel)
+    estado = cache_rastreamento.get(chave)
+    if estado is None or time.time() - estado['criado_em'] > ROTA_AO_VIVO_TIMEOUT:
+        estado = {
+            'criado_em': time.time(),
+            'apos': None,
+            'rota': RotaIncremental(nivel),
+            'agregados': AcumuladorTrajeto(),
+        }
+
+    linhas = _linhas(agendamento.pk, estado['apos'])
+    if linhas or estado['apos'] is None:
+        pontos = [linha[1:] for linha in linhas]
+        estado['rota'].adicionar(pontos)
+        estado['agregados'].adicionar(pontos)
+        if linhas:
+            estado['apos'] = (linhas[-1][3], linhas[-1][0])
+        cache_rastreamento.set(chave, estado, ROTA_AO_VIVO_TIMEOUT)
+
+    return {
+        'zoom': nivel,
+        'pontos': estado['rota'].pontos(),
+        'resumo': _resumo_json(estado['agregados'].agregados()),
+    }
+
+
+def _resumo_json(dados):
+    def texto(valor):
+        return str(valor) if valor is not None else None
+
+    return {
+        'total_pontos': dados['total_pontos'],
+        'inicio': dados['inicio'].isoformat() if dados['inicio'] else None,
+        'fim': dados['fim'].isoformat() if dados['fim'] else None,
+        'distancia_km': texto(dados['distancia_km']),
+        'velocidade_maxima': texto(dados['velocidade_maxima']),
+        'velocidade_media': texto(dados['velocidade_media']),
+        'paradas': dados['paradas'],
+        'tempo_parado_segundos': dados['tempo_parado_segundos'],
+    }
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# PONTOS BRUTOS (cursor)
+# ═════════════════════════════════════════════════════════════════════════════
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _cursor(data_hora, pk):
+    # Microssegundos inteiros: via float o cursor perderia precisão
+    return f'{(data_hora - _EPOCA) // timedelta(microseconds=1)}.{pk}'
+
+
+def _ler_cursor(cursor):
+    """(data_hora, pk) do cursor; ValueError se malformado."""
+    micros, pk = cursor.split('.')
+    return _EPOCA + timedelta(microseconds=int(micros)), int(pk)
+
+
+def pagina_de_pontos(agendamento_id, apos=None, limite=PONTOS_POR_PAGINA):
+    """
+    Página de pontos em ordem cronológica a partir do cursor `apos`.
+    Retorna (pontos, próximo cursor ou None).
+    """
+    from .models import Carro_rastreamento
+
+    limite = max(1, min(limite, MAX_PONTOS_POR_PAGINA))
+    consulta = (
+        Carro_rastreamento.objects.all_filiais()
+        .filter(agendamento_id=agendamento_id)
+        .order_by('data_hora', 'pk')
+    )
+    if apos:
+        data_hora, pk = _ler_cursor(apos)
+        consulta = consulta.filter(Q(data_hora__gt=data_hora) | Q(data_hora=data_hora, pk__gt=pk))
+
+    linhas = list(
+        consulta.values(
+            'pk', 'latitude', 'longitude', 'data_hora', 'velocidade', 'endereco_aproximado',
+        )[:limite + 1]
+    )
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = _cursor(linhas[-1]['data_hora'], linhas[-1]['pk'])
+
+    pontos = [
+        {
+            'id': linha['pk'],
+            'lat': float(linha['latitude']),
+            'lng': float(linha['longitude']),
+            'data_hora': linha['data_hora'].isoformat(),
+            'velocidade': float(linha['velocidade']) if linha['velocidade'] is not None else None,
+            'endereco': linha['endereco_aproximado'],
+        }
+        for linha in linhas
+    ]
+    return pontos, proximo
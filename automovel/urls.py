@@ -39,6 +39,8 @@ urlpatterns = [
     # Rastreamento
     path('rastreamento/create/', views.RastreamentoCreateView.as_view(), name='rastreamento_create'),
     path('agendamento/<int:pk>/mapa/', views.RastreamentoMapView.as_view(), name='rastreamento_map'),
+    path('api/agendamento/<int:pk>/rota/', views.RastreamentoRotaAPIView.as_view(), name='api_rastreamento_rota'),
+    path('api/agendamento/<int:pk>/pontos/', views.RastreamentoPontosAPIView.as_view(), name='api_rastreamento_pontos'),
     path('api/rastreamento/receber/', views.RastreamentoAPIView.as_view(), name='api_rastreamento_receber'),
     path('carro/<int:pk>/agendar-manutencao/', views.AgendarManutencaoView.as_view(), name='agendar_manutencao'),
     path('manutencoes/', views.ManutencaoListView.as_view(), name='manutencao_list'),
@@ -39,8 +39,15 @@ from .models import (
     Carro_manutencao, Carro_rastreamento,
 )
 import logging
+from .geocoding import reverse_geocode
+from .rastreamento import (
+    PontoInvalido,
+    enfileirar_pontos,
+    pontos_do_payload,
+    resolver_agendamento,
+)
 from .throttling import tracking_limiter
-from django.core.exceptions import ValidationError as DjangoValidationError
+from .trajeto import PONTOS_POR_PAGINA, ZOOM_PADRAO, pagina_de_pontos, rota_para_mapa
 
 
 logger = logging.getLogger(__name__)
@@ -226,19 +233,7 @@ class _ReverseGeocodeMixin:
     """Geocoding reverso via OpenStreetMap Nominatim."""
 
     def _reverse_geocode(self, lat, lng):
-        try:
-            import requests as http_requests
-            headers = {'User-Agent': 'ControleTarefas/1.0 (esg@cetestsp.com.br)'}
-            response = http_requests.get(
-                f'https://nominatim.openstreetmap.org/reverse'
-                f'?format=json&lat={lat}&lon={lng}&zoom=18',
-                headers=headers, timeout=5,
-            )
-            if response.status_code == 200:
-                return response.json().get('display_name', 'Endereço não identificado')
-        except Exception:
-            pass
-        return 'Endereço não disponível'
+        return reverse_geocode(lat, lng)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -800,6 +795,7 @@ class RastreamentoCreateView(AutomovelBaseMixin, _ReverseGeocodeMixin, View):
                 endereco_aproximado=self._reverse_geocode(
                     data.get('latitude'), data.get('longitude')
                 ),
+                endereco_pendente=False,
                 filial=self.get_filial_ativa(),
             )
             return JsonResponse({
@@ -821,26 +817,50 @@ class RastreamentoMapView(AutomovelBaseMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        rastreamentos = (
-            Carro_rastreamento.objects.filter(agendamento=self.object)
-            .order_by('data_hora')
-        )
-        context['pontos_rastreamento'] = [
-            {
-                'lat': float(r.latitude),
-                'lng': float(r.longitude),
-                'data_hora': r.data_hora.strftime('%d/%m/%Y %H:%M'),
-                'velocidade': r.velocidade,
-                'endereco': r.endereco_aproximado,
-            }
-            for r in rastreamentos
-        ]
+        # Rota simplificada + agregados; o detalhe vem por zoom (RastreamentoRotaAPIView)
+        rota = rota_para_mapa(self.object)
+        context['rota'] = rota
+        context['rota_json'] = json.dumps(rota)
         context['mapbox_access_token'] = getattr(settings, 'MAPBOX_ACCESS_TOKEN', '')
         return context
 
 
+class RastreamentoRotaAPIView(AutomovelBaseMixin, View):
+    """GET ?zoom=<n> → rota simplificada para o zoom + agregados do trajeto."""
+
+    def get(self, request, pk, *args, **kwargs):
+        agendamento = get_object_or_404(
+            self.apply_visibility(Carro_agendamento.objects.for_request(request)), pk=pk,
+        )
+        try:
+            zoom = int(request.GET.get('zoom', ZOOM_PADRAO))
+        except ValueError:
+            return HttpResponseBadRequest("zoom inválido")
+        return JsonResponse(rota_para_mapa(agendamento, zoom))
+
+
+class RastreamentoPontosAPIView(AutomovelBaseMixin, View):
+    """
+    GET ?apos=<cursor>&limite=<n> → pontos brutos em ordem cronológica.
+    Responde {"pontos": [...], "proximo": <cursor ou null>}.
+    """
+
+    def get(self, request, pk, *args, **kwargs):
+        agendamento = get_object_or_404(
+            self.apply_visibility(Carro_agendamento.objects.for_request(request)), pk=pk,
+        )
+        try:
+            limite = int(request.GET.get('limite', PONTOS_POR_PAGINA))
+            pontos, proximo = pagina_de_pontos(
+                agendamento.pk, apos=request.GET.get('apos') or None, limite=limite,
+            )
+        except ValueError:
+            return HttpResponseBadRequest("cursor ou limite inválido")
+        return JsonResponse({'pontos': pontos, 'proximo': proximo})
+
+
 @method_decorator(csrf_exempt, name='dispatch')
-class RastreamentoAPIView(_ReverseGeocodeMixin, View):
+class RastreamentoAPIView(View):
     """
     Endpoint para rastreadores físicos (hardware GPS).
 
@@ -857,26 +877,31 @@ class RastreamentoAPIView(_ReverseGeocodeMixin, View):
         ✓ Status do agendamento (rejeita finalizado/cancelado)
         ✓ Logs de auditoria em rejeições
 
-    📨 PAYLOAD (JSON):
+    ⚡ INGESTÃO:
+        A resposta sai sem tocar no banco: o token é resolvido em cache e os
+        pontos vão para o buffer gravado em lote pelo worker. O endereço
+        aproximado é preenchido depois (automovel.tasks) — ver
+        automovel.rastreamento.
+
+    📨 PAYLOAD (JSON) — um ponto:
         {
           "latitude":  -23.5505,
           "longitude": -46.6333,
-          "velocidade": 45.2
+          "velocidade": 45.2,
+          "data_hora": "2025-03-10T14:32:05-03:00"   (opcional)
         }
 
+       ou um lote (backlog offline, até 1000 pontos):
+        {"pontos": [{...}, {...}]}   ou   [{...}, {...}]
+
     📤 RESPOSTAS:
-        200 → {"status": "success", "id": <int>}
-        400 → payload inválido (JSON malformado, coords fora de range)
+        202 → {"status": "success", "recebidos": <int>, "rejeitados": [{"indice", "erro"}]}
+        400 → payload inválido (JSON malformado, coords fora de range, lote sem ponto válido)
         401 → header Authorization ausente ou mal formado
         403 → token desconhecido ou agendamento não-ativo
         429 → rate-limit excedido
     """
 
-    # Limites geográficos plausíveis (ajustar se operar fora do Brasil)
-    LAT_MIN, LAT_MAX = -90.0, 90.0
-    LNG_MIN, LNG_MAX = -180.0, 180.0
-    VEL_MIN, VEL_MAX = 0.0, 300.0  # km/h
-
     STATUS_PERMITIDOS = {"agendado", "em_andamento"}
 
     def post(self, request, *args, **kwargs):
@@ -900,12 +925,9 @@ class RastreamentoAPIView(_ReverseGeocodeMixin, View):
                 status=429,
             )
 
-        # ── 3. Resolver agendamento via token ───────────────────
-        try:
-            agendamento = Carro_agendamento.objects.select_related("carro", "filial").get(
-                tracking_token=token
-            )
-        except (Carro_agendamento.DoesNotExist, ValueError, DjangoValidationError):
+        # ── 3. Resolver agendamento via token (cache) ───────────
+        agendamento = resolver_agendamento(token)
+        if agendamento is None:
             logger.warning(
                 "RastreamentoAPI: token desconhecido/malformado (token=%s..., IP=%s)",
                 token[:8], self._client_ip(request),
@@ -916,54 +938,36 @@ class RastreamentoAPIView(_ReverseGeocodeMixin, View):
             )
 
         # ── 4. Verificar status do agendamento ──────────────────
-        if agendamento.status not in self.STATUS_PERMITIDOS:
+        if agendamento["status"] not in self.STATUS_PERMITIDOS:
             logger.info(
                 "RastreamentoAPI: agendamento %s rejeitado (status=%s)",
-                agendamento.id, agendamento.status,
+                agendamento["id"], agendamento["status"],
             )
             return JsonResponse(
-                {"status": "error", "message": f"Agendamento {agendamento.status}"},
+                {"status": "error", "message": f"Agendamento {agendamento['status']}"},
                 status=403,
             )
 
         # ── 5. Parse + validação do payload ─────────────────────
         try:
-            data = json.loads(request.body)
-            lat = float(data["latitude"])
-            lng = float(data["longitude"])
-            vel = float(data.get("velocidade", 0))
-        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as exc:
+            pontos, rejeitados = pontos_do_payload(request.body)
+        except PontoInvalido as exc:
             return JsonResponse(
                 {"status": "error", "message": f"Payload inválido: {exc}"},
                 status=400,
             )
-
-        if not (self.LAT_MIN <= lat <= self.LAT_MAX):
+        if not pontos:
             return JsonResponse(
-                {"status": "error", "message": "latitude fora do range"},
-                status=400,
-            )
-        if not (self.LNG_MIN <= lng <= self.LNG_MAX):
-            return JsonResponse(
-                {"status": "error", "message": "longitude fora do range"},
-                status=400,
-            )
-        if not (self.VEL_MIN <= vel <= self.VEL_MAX):
-            return JsonResponse(
-                {"status": "error", "message": "velocidade implausível"},
+                {"status": "error", "message": "Nenhum ponto válido", "rejeitados": rejeitados},
                 status=400,
             )
 
-        # ── 6. Persistir ────────────────────────────────────────
-        rastreamento = Carro_rastreamento.objects.create(
-            agendamento=agendamento,
-            latitude=lat,
-            longitude=lng,
-            velocidade=vel,
-            endereco_aproximado=self._reverse_geocode(lat, lng),
-            filial=agendamento.filial,
+        # ── 6. Enfileirar (gravação em lote no worker) ──────────
+        enfileirar_pontos(agendamento, pontos)
+        return JsonResponse(
+            {"status": "success", "recebidos": len(pontos), "rejeitados": rejeitados},
+            status=202,
         )
-        return JsonResponse({"status": "success", "id": rastreamento.id})
 
     # ── Helpers ─────────────────────────────────────────────────
 
@@ -1184,7 +1188,8 @@ class BaseExcelReportGenerator:
         ws.title = self.get_report_title()[:30]
         self._write_title(ws)
         self._write_headers(ws)
-        for obj in self.queryset:
+        # Em blocos: relatórios como o de rastreamento têm dezenas de milhares de linhas
+        for obj in self.queryset.iterator(chunk_size=2000):
             ws.append(self.get_row_data(obj))
         self._adjust_column_widths(ws)
         wb.save(response)
@@ -1289,10 +1294,20 @@ class RastreamentoReportGenerator(BaseExcelReportGenerator):
 
     @classmethod
     def get_queryset(cls, request):
-        return (
+        queryset = (
             Carro_rastreamento.objects.for_request(request)
-            .select_related('agendamento__carro').order_by('-data_hora')
+            .select_related('agendamento__carro')
+            .only(
+                'latitude', 'longitude', 'velocidade', 'data_hora', 'endereco_aproximado',
+                'agendamento__id', 'agendamento__carro__placa',
+            )
+            .order_by('-data_hora')
         )
+        # ?agendamento=<pk>: só o trajeto de uma viagem (export do mapa)
+        agendamento = request.GET.get('agendamento')
+        if agendamento and agendamento.isdigit():
+            queryset = queryset.filter(agendamento_id=agendamento)
+        return queryset
 
     def get_report_title(self):
         return "Relatório de Rastreamento"
@@ -0,0 +1,218 @@
+# chat/busca.py
+"""
+Busca textual nas mensagens do chat.
+
+Cada mensagem tem uma linha em ChatSearchIndex com o texto dobrado
+(minúsculas, sem acentos: "Ação" → "acao"), mantida por Message.save e
+preenchida para o legado pelo comando `indexar_busca_chat`.
+
+Dois motores, escolhidos pelo banco em uso:
+
+    PostgreSQL   to_tsvector('simple', search_text) com índice GIN
+    MySQL/SQLite ChatSearchToken: um token por linha, índice (token, timestamp)
+
+Em ambos todos os termos precisam aparecer (E lógico) e o último casa
+por prefixo, para a busca acompanhar a digitação. A consulta é sempre
+restrita às salas de que o usuário participa.
+
+    from chat.busca import buscar_mensagens
+    resultados = buscar_mensagens(request.user, 'relatorio obra', room_id=None)
+"""
+
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Prefetch, Q
+
+MIN_TAMANHO_TOKEN = 2
+MAX_TAMANHO_TOKEN = 40
+MAX_TOKENS_POR_MENSAGEM = 200
+MAX_TERMOS_CONSULTA = 8
+
+RESULTADOS_POR_BUSCA = 30
+MAX_RESULTADOS_POR_BUSCA = 100
+
+_PALAVRA = re.compile(r'\w+')
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# NORMALIZAÇÃO
+# ════════════════════════════════════════════════════════════════════════════
+
+def dobrar(texto):
+    """Minúsculas e sem acentos — mesma forma no índice e na consulta."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def tokenizar(texto):
+    """Tokens distintos do texto dobrado, na ordem em que aparecem."""
+    vistos = {}
+    for token in _PALAVRA.findall(dobrar(texto)):
+        if MIN_TAMANHO_TOKEN <= len(token) <= MAX_TAMANHO_TOKEN:
+            vistos.setdefault(token, None)
+            if len(vistos) >= MAX_TOKENS_POR_MENSAGEM:
+                break
+    return list(vistos)
+
+
+def usa_postgres():
+    return connection.vendor == 'postgresql'
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# INDEXAÇÃO
+# ════════════════════════════════════════════════════════════════════════════
+
+def texto_indexavel(message):
+    """Conteúdo mais nome do anexo: buscar "orcamento" acha orcamento.pdf."""
+    partes = [message.content or '', message.original_filename or '']
+    return ' '.join(p for p in partes if p).strip()
+
+
+def indexar_mensagem(message):
+    """Cria/atualiza o índice de uma mensagem (chamado por Message.save)."""
+    from .models import ChatSearchIndex, ChatSearchToken
+
+    texto = texto_indexavel(message)
+    with transaction.atomic():
+        if not texto:
+            ChatSearchIndex.objects.filter(message=message).delete()
+            ChatSearchToken.objects.filter(message=message).delete()
+            return
+
+        indice, _ = ChatSearchIndex.objects.update_or_create(
+            message=message,
+            defaults={'room_id': message.room_id, 'search_text': ' '.join(tokenizar(texto))},
+        )
+        if not usa_postgres():
+            ChatSearchToken.objects.filter(message=message).delete()
+            ChatSearchToken.objects.bulk_create(_tokens(message, indice.search_text))
+
+
+def _tokens(message, search_text):
+    from .models import ChatSearchToken
+
+    return [
+        ChatSearchToken(
+            message_id=message.pk, room_id=message.room_id, token=token, timestamp=message.timestamp,
+        )
+        for token in search_text.split()
+    ]
+
+
+def indexar_lote(mensagens):
+    """
+    Indexa mensagens ainda sem índice (backfill). Retorna quantas foram
+    indexadas.
+    """
+    from .models import ChatSearchIndex, ChatSearchToken
+
+    indices = []
+    for message in mensagens:
+        texto = texto_indexavel(message)
+        if texto:
+            indices.append(ChatSearchIndex(
+                message=message, room_id=message.room_id, search_text=' '.join(tokenizar(texto)),
+            ))
+    if not indices:
+        return 0
+
+    with transaction.atomic():
+        ChatSearchIndex.objects.bulk_create(indices, ignore_conflicts=True)
+        if not usa_postgres():
+            ChatSearchToken.objects.filter(message__in=[i.message for i in indices]).delete()
+            ChatSearchToken.objects.bulk_create(
+                [token for indice in indices for token in _tokens(indice.message, indice.search_text)],
+                batch_size=5000,
+            )
+    return len(indices)
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# CONSULTA
+# ════════════════════════════════════════════════════════════════════════════
+
+def termos_da_consulta(consulta):
+    return tokenizar(consulta)[:MAX_TERMOS_CONSULTA]
+
+
+def _ids_postgres(salas, termos, limite):
+    from django.contrib.postgres.search import SearchQuery, SearchVector
+
+    from .models import ChatSearchIndex
+
+    # Termos já dobrados e só com \w: seguros na sintaxe raw do tsquery
+    expressao = ' & '.join(termos[:-1] + [f'{termos[-1]}:*'])
+    return (
+        ChatSearchIndex.objects.filter(room__in=salas)
+        .annotate(documento=SearchVector('search_text', config='simple'))
+        .filter(documento=SearchQuery(expressao, search_type='raw', config='simple'))
+        .order_by('-message__timestamp', '-message_id')
+        .values_list('message_id', flat=True)[:limite]
+    )
+
+
+def _ids_tokens(salas, termos, limite):
+    """
+    Percorre o índice (token, timestamp) do primeiro termo do mais novo
+    para o mais antigo; os demais termos são checados por EXISTS na
+    própria mensagem. A varredura para no `limite`-ésimo acerto.
+    """
+    from .models import ChatSearchToken
+
+    def casa(termo, prefixo):
+        # Intervalo em vez de LIKE: o SQLite só usa índice em LIKE sem ESCAPE
+        return Q(token__gte=termo, token__lt=termo + '\uffff') if prefixo else Q(token=termo)
+
+    ultimo = len(termos) - 1
+    consulta = ChatSearchToken.objects.filter(casa(termos[0], ultimo == 0), room__in=salas)
+    for posicao, termo in enumerate(termos[1:], start=1):
+        consulta = consulta.filter(Exists(
+            ChatSearchToken.objects.filter(casa(termo, posicao == ultimo), message=OuterRef('message'))
+        ))
+    ids = consulta.order_by('-timestamp', '-message_id').values_list('message_id', flat=True)
+    # Prefixo pode casar mais de um token da mesma mensagem
+    return list(dict.fromkeys(ids[:limite * 2]))[:limite] if ultimo == 0 else ids[:limite]
+
+
+def buscar_mensagens(user, consulta, room_id=None, limite=RESULTADOS_POR_BUSCA):
+    """
+    Mensagens das salas do usuário que contêm todos os termos, da mais
+    recente para a mais antiga. Lista de Message com `user` e `room` —
+    cada sala lida uma vez, já com o nome da DM para o `user`.
+    """
+    from .models import ChatRoom, Message
+
+    termos = termos_da_consulta(consulta)
+    if not termos:
+        return []
+
+    salas = ChatRoom.objects.filter(participants=user)
+    if room_id:
+        salas = salas.filter(pk=room_id)
+    salas = salas.values('pk')
+
+    limite = max(1, min(limite, MAX_RESULTADOS_POR_BUSCA))
+    if usa_postgres():
+        ids = list(_ids_postgres(salas, termos, limite))
+    else:
+        ids = list(_ids_tokens(salas, termos, limite))
+
+    return list(
+        Message.objects.filter(pk__in=ids)
+        .select_related('user')
+        .prefetch_related(Prefetch('room', queryset=ChatRoom.objects.com_outro_participante(user)))
+        .order_by('-timestamp', '-id')
+    )
+
+
+def trecho(texto, termos, raio=60):
+    """Recorte do texto em torno do primeiro termo encontrado."""
+    texto = texto or ''
+    dobrado = dobrar(texto)
+    posicao = min((p for p in (dobrado.find(t) for t in termos) if p >= 0), default=0)
+    inicio = max(0, posicao - raio)
+    fim = min(len(texto), posicao + raio)
+    return ('…' if inicio else '') + texto[inicio:fim] + ('…' if fim < len(texto) else '')
@@ -13,9 +13,10 @@ import time
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
-from django.utils import timezone
 
+from core.ratelimit import RateLimiter
+
+from .historico import cursor_da_mensagem
 from .utils import sanitize_message, validate_message_content
 from .validators import validate_uploaded_file
 
@@ -37,6 +38,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         - new_message_notification     → nova mensagem em qualquer chat
         - new_chat_notification        → nova sala/conversa criada
         - notification_count_update    → atualização do badge de contagem
+        - notification_count_delta     → ajuste do badge (+1/-1)
     """
 
     async def connect(self):
@@ -107,6 +109,14 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'count': event.get('count', 0),
         }))
 
+    async def notification_count_delta(self, event):
+        """Ajuste do badge por delta (+1 nova, -1 lida); `count` quando conhecido."""
+        await self.send(text_data=json.dumps({
+            'type': 'notification_count_delta',
+            'delta': event.get('delta', 0),
+            'count': event.get('count'),
+        }))
+
     # Novos handlers
     async def new_notification(self, event):
         """Nova notificação criada (envia toast + dados completos)."""
@@ -126,12 +136,10 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def get_unread_count(self):
-        """Conta notificações não lidas do usuário."""
+        """Não lidas do usuário, pelo contador incremental (notifications.contador)."""
         try:
-            from notifications.models import Notificacao
-            return Notificacao.objects.filter(
-                usuario=self.user, lida=False,
-            ).count()
+            from notifications.contador import contar_nao_lidas
+            return contar_nao_lidas(self.user.pk)
         except Exception as e:
             logger.exception("Erro ao contar não lidas: %s", e)
             return 0
@@ -141,6 +149,10 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 # CHAT CONSUMER
 # ═══════════════════════════════════════════════════════════════
 
+# 60 msgs/min por usuário, somando todas as conexões dele
+ws_rate_limiter = RateLimiter('chat_ws', limite=60, janela=60)
+
+
 class ChatConsumer(AsyncWebsocketConsumer):
     """
     Consumer de uma sala de chat específica.
@@ -152,8 +164,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
         - mark_as_read    → marcar mensagem como lida
     """
 
-    RATE_LIMIT_MAX_MESSAGES = 60        # 60 msgs/min
-    RATE_LIMIT_WINDOW_SECONDS = 60
 
     async def connect(self):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
@@ -265,6 +275,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'username': self.user.get_full_name() or self.user.username,
             'user_id': self.user.id,
             'timestamp': message_obj.timestamp.isoformat(),
+            'cursor': cursor_da_mensagem(message_obj.timestamp, message_obj.id),
             'room_id': str(self.room_id),
         }
 
@@ -303,6 +314,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'username': self.user.get_full_name() or self.user.username,
             'user_id': self.user.id,
             'timestamp': message_obj.timestamp.isoformat(),
+            'cursor': cursor_da_mensagem(message_obj.timestamp, message_obj.id),
             'room_id': str(self.room_id),
         }
 
@@ -328,9 +340,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
         Aceita 2 modos:
         - message_id: marca uma mensagem específica
         - all: True → marca TODAS as mensagens da sala como lidas (bulk)
+
+        Ambos só avançam o cursor de leitura (RoomReadCursor) do usuário.
         """
         if data.get('all'):
-            count = await self.mark_all_room_messages_as_read()
+            count, recibo = await self.mark_all_room_messages_as_read()
             # Atualiza badge no NotificationConsumer do próprio user
             await self.channel_layer.group_send(
                 f"notifications_{self.user.id}",
@@ -341,11 +355,17 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 'room_id': str(self.room_id),
                 'marked': count,
             }))
+        elif data.get('message_id'):
+            recibo = await self.mark_message_as_read(data['message_id'])
+        else:
             return
 
-        message_id = data.get('message_id')
-        if message_id:
-            await self.mark_message_as_read(message_id)
+        # Recibo para os demais participantes: só quando o cursor avançou
+        if recibo:
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                {'type': 'read_cursor_update', 'user_id': self.user.id, **recibo},
+            )
 
     # ───── Handlers de eventos do channel layer ─────
 
@@ -359,6 +379,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
             **event_copy,
         }))
 
+    async def read_cursor_update(self, event):
+        """Recibo de leitura: outro participante leu até `message_id`."""
+        if event.get('user_id') == self.user.id:
+            return
+
+        await self.send(text_data=json.dumps({
+            'type': 'message_read',
+            'room_id': str(self.room_id),
+            'user_id': event['user_id'],
+            'message_id': event['message_id'],
+            'last_read_at': event['last_read_at'],
+        }))
+
     async def typing_indicator(self, event):
         """Envia indicador de digitação (exceto pro próprio usuário)."""
         if event.get('user_id') == self.user.id:
@@ -390,18 +423,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
     def save_message_to_db(self, message_text):
         """Salva mensagem de texto no banco."""
         try:
-            from .models import ChatRoom, Message
+            from .models import Message
 
-            room = ChatRoom.objects.get(id=self.room_id)
+            # Message.save atualiza last_message_* e updated_at da sala
             message_obj = Message.objects.create(
-                room=room,
+                room_id=self.room_id,
                 user=self.user,
                 content=message_text,
             )
 
-            room.updated_at = timezone.now()
-            room.save(update_fields=['updated_at'])
-
             logger.debug("Mensagem salva: id=%s", message_obj.id)
             return message_obj
 
@@ -413,9 +443,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
     def save_file_message_to_db(self, file_data):
         """Salva mensagem com arquivo no banco."""
         try:
-            from .models import ChatRoom, Message
-
-            room = ChatRoom.objects.get(id=self.room_id)
+            from .models import Message
 
             file_url = file_data.get('url', '')
             file_name = file_data.get('name', 'arquivo')
@@ -425,7 +453,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             is_image = file_type.startswith('image/')
 
             message_obj = Message.objects.create(
-                room=room,
+                room_id=self.room_id,
                 user=self.user,
                 content='',
                 original_filename=file_name,
@@ -443,9 +471,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
             message_obj.save()
 
-            room.updated_at = timezone.now()
-            room.save(update_fields=['updated_at'])
-
             logger.debug(
                 "Arquivo salvo: id=%s image=%s file=%s",
                 message_obj.id, message_obj.image, message_obj.file_attachment,
@@ -468,68 +493,51 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def mark_message_as_read(self, message_id):
-        """Registra leitura de mensagem."""
+        """
+        Avança o cursor de leitura até a mensagem. Retorna o recibo
+        ({message_id, last_read_at}) se avançou, senão None.
+        """
         try:
-            from .models import Message, MessageRead
-            message = Message.objects.get(id=message_id)
-            MessageRead.objects.get_or_create(
-                message=message,
-                user=self.user,
-            )
+            from .models import Message, RoomReadCursor
+            message = Message.objects.get(id=message_id, room_id=self.room_id)
+            if RoomReadCursor.marcar_lido(self.room_id, self.user, message):
+                return self._recibo(message)
         except Exception as e:
             logger.exception("Erro ao marcar como lida: %s", e)
+        return None
 
     @database_sync_to_async
     def mark_all_room_messages_as_read(self):
-        """Marca TODAS as mensagens da sala como lidas pelo usuário (bulk)."""
+        """
+        Avança o cursor de leitura até a última mensagem da sala.
+        Retorna (mensagens de outros que estavam não lidas, recibo ou None).
+        """
         try:
-            from .models import ChatRoom, Message, MessageRead
-            
-            # Pega só mensagens NÃO lidas e que NÃO são do próprio user
-            nao_lidas = Message.objects.filter(
-                room_id=self.room_id,
-            ).exclude(
-                message_reads__user=self.user,
-            ).exclude(
-                user=self.user,
-            )
-            
-            # Bulk create com ignore_conflicts (idempotente)
-            reads = [MessageRead(message=m, user=self.user) for m in nao_lidas]
-            if reads:
-                MessageRead.objects.bulk_create(reads, ignore_conflicts=True)
-            
+            from .models import ChatRoom, Message, RoomReadCursor
+
+            marcadas = ChatRoom(pk=self.room_id).get_unread_count(self.user)
+            ultima = Message.objects.filter(room_id=self.room_id).order_by('-timestamp').first()
+            avancou = ultima is not None and RoomReadCursor.marcar_lido(self.room_id, self.user, ultima)
+
             logger.info(
                 "✅ Bulk read: room=%s user=%s marcadas=%s",
-                self.room_id, self.user.username, len(reads),
+                self.room_id, self.user.username, marcadas,
             )
-            return len(reads)
+            return marcadas, (self._recibo(ultima) if avancou else None)
         except Exception as e:
             logger.exception("Erro mark_all_room_messages_as_read: %s", e)
-            return 0
+            return 0, None
 
+    @staticmethod
+    def _recibo(message):
+        return {'message_id': str(message.id), 'last_read_at': message.timestamp.isoformat()}
 
-    @database_sync_to_async
-    def check_rate_limit(self):
+
+    async def check_rate_limit(self):
         """
         Rate limit: máx N mensagens por janela de tempo, por usuário.
-        
-        Implementação atômica usando cache.add + cache.incr para evitar
-        race conditions em ambientes multi-worker.
-        """
-        cache_key = f"ws_rate_{self.user.id}"
-
-        # Tenta criar contador novo (atômico)
-        added = cache.add(cache_key, 1, timeout=self.RATE_LIMIT_WINDOW_SECONDS)
-        if added:
-            return True
 
-        # Já existia → incrementa atomicamente
-        try:
-            count = cache.incr(cache_key)
-        except ValueError:
-            # Chave expirou entre add e incr — recria
-            cache.set(cache_key, 1, timeout=self.RATE_LIMIT_WINDOW_SECONDS)
-            return True
-
-        return count <= self.RATE_LIMIT_MAX_MESSAGES
+        Janela deslizante compartilhada entre todos os processos Daphne
+        (core.ratelimit).
+        """
+        return (await ws_rate_limiter.verificar_async(self.user.id)).permitido
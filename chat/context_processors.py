@@ -8,6 +8,8 @@ import json
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 
+from core.global_context import contexto_global
+
 
 
 # Novo para o template:
@@ -77,6 +79,7 @@ def task_list(request):
             'error': str(e)
         })
 
+@contexto_global
 def chat_global_data(request):
     """Context processor para dados globais do chat."""
     
@@ -0,0 +1,140 @@
+# chat/historico.py
+"""
+Histórico de mensagens paginado por cursor (keyset).
+
+Cursor = "<microssegundos desde 1970>.<uuid>" da mensagem — ordem total
+(timestamp, id), estável mesmo com mensagens no mesmo instante e sem
+OFFSET: a página custa o mesmo no começo ou no fim de uma sala longa.
+
+    pagina_de_mensagens(room_id)                      → as mais recentes
+    pagina_de_mensagens(room_id, antes=cursor)        → anteriores (rolar para cima)
+    pagina_de_mensagens(room_id, depois=cursor)       → posteriores (sincronizar)
+
+`depois` também aceita só um instante (ISO 8601, parâmetro `since` da
+API) para o websocket que reconecta buscar apenas o intervalo perdido.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+MENSAGENS_POR_PAGINA = 50
+MAX_MENSAGENS_POR_PAGINA = 200
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# CURSOR
+# ═════════════════════════════════════════════════════════════════════════════
+
+def cursor_da_mensagem(timestamp, pk):
+    # Microssegundos inteiros: via float o cursor perderia precisão
+    return f'{(timestamp - _EPOCA) // timedelta(microseconds=1)}.{uuid.UUID(str(pk)).hex}'
+
+
+def ler_cursor(cursor):
+    """(timestamp, uuid) do cursor; ValueError se malformado."""
+    micros, pk = cursor.split('.')
+    return _EPOCA + timedelta(microseconds=int(micros)), uuid.UUID(pk)
+
+
+def ler_instante(valor):
+    """(timestamp, None) de um ISO 8601 com fuso; ValueError se inválido."""
+    instante = parse_datetime(valor)
+    if instante is None or instante.tzinfo is None:
+        raise ValueError(f'Instante inválido: {valor!r}')
+    return instante, None
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# PÁGINA
+# ═════════════════════════════════════════════════════════════════════════════
+
+def _serializar(linha):
+    """Payload compacto: só o que a interface desenha."""
+    nome = f"{linha['user__first_name']} {linha['user__last_name']}".strip()
+    mensagem = {
+        'id': str(linha['id']),
+        'cursor': cursor_da_mensagem(linha['timestamp'], linha['id']),
+        'user_id': linha['user_id'],
+        'username': nome or linha['user__username'],
+        'message': linha['content'] or '',
+        'timestamp': linha['timestamp'].isoformat(),
+        'message_type': 'text',
+    }
+    if linha['is_edited']:
+        mensagem['is_edited'] = True
+
+    anexo = linha['attachment']
+    if anexo:
+        mensagem['message_type'] = anexo['kind']
+        if anexo['kind'] == 'image':
+            mensagem['image_url'] = anexo['url']
+        else:
+            mensagem['file_data'] = {
+                'url': anexo['url'],
+                'name': anexo['name'],
+                'size': anexo['size'],
+                'type': anexo['type'],
+            }
+    return mensagem
+
+
+def pagina_de_mensagens(room_id, antes=None, depois=None, limite=MENSAGENS_POR_PAGINA):
+    """
+    Uma página de mensagens em ordem cronológica.
+
+    `antes`/`depois` são (timestamp, uuid ou None) — de ler_cursor ou
+    ler_instante. Retorna dict com:
+
+        messages        mensagens da página
+        before          cursor para a página anterior (None: início da sala)
+        after           cursor para sincronizar a partir daqui
+        has_more_after  há mais mensagens posteriores além desta página
+    """
+    from .models import Message
+
+    limite = max(1, min(limite, MAX_MENSAGENS_POR_PAGINA))
+    consulta = Message.objects.filter(room_id=room_id).values(
+        'id', 'user_id', 'user__first_name', 'user__last_name', 'user__username',
+        'content', 'timestamp', 'is_edited', 'attachment',
+    )
+
+    if depois:
+        instante, pk = depois
+        posterior = Q(timestamp__gt=instante)
+        if pk is not None:
+            posterior |= Q(timestamp=instante, id__gt=pk)
+        linhas = list(consulta.filter(posterior).order_by('timestamp', 'id')[:limite + 1])
+        has_more_after = len(linhas) > limite
+        linhas = linhas[:limite]
+        before = None  # o cliente já tem as anteriores
+    else:
+        if antes:
+            instante, pk = antes
+            anterior = Q(timestamp__lt=instante)
+            if pk is not None:
+                anterior |= Q(timestamp=instante, id__lt=pk)
+            consulta = consulta.filter(anterior)
+        linhas = list(consulta.order_by('-timestamp', '-id')[:limite + 1])
+        tem_anteriores = len(linhas) > limite
+        linhas = linhas[:limite][::-1]
+        before = cursor_da_mensagem(linhas[0]['timestamp'], linhas[0]['id']) if tem_anteriores else None
+        has_more_after = False
+
+    if linhas:
+        after = cursor_da_mensagem(linhas[-1]['timestamp'], linhas[-1]['id'])
+    elif depois and depois[1] is not None:
+        after = cursor_da_mensagem(*depois)
+    else:
+        after = None
+
+    return {
+        'messages': [_serializar(linha) for linha in linhas],
+        'before': before,
+        'after': after,
+        'has_more_after': has_more_after,
+    }
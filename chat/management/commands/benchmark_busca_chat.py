@@ -0,0 +1,134 @@
+# benchmark_busca_chat.py
+
+"""
+Mede a latência da busca do chat (chat.busca) sobre um volume sintético
+de mensagens — por padrão 1 milhão, em 50 salas.
+
+O texto segue uma distribuição de Zipf sobre um vocabulário de obra e
+escritório, com acentos e maiúsculas, para que existam termos muito
+comuns, médios e raros. Cada tipo de consulta roda várias vezes:
+
+    comum     — um termo presente em boa parte das mensagens
+    raro      — um termo da cauda do vocabulário
+    dois      — dois termos (E lógico)
+    prefixo   — termo incompleto, como durante a digitação
+
+Tudo roda numa transação desfeita ao final: nada é gravado.
+
+    python manage.py benchmark_busca_chat
+    python manage.py benchmark_busca_chat --mensagens 200000 --consultas 50
+"""
+
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from chat.busca import buscar_mensagens, dobrar, indexar_lote, usa_postgres
+from chat.models import ChatRoom, Message
+
+VOCABULARIO = (
+    'obra relatório medição contrato orçamento entrega cimento concreto equipe '
+    'segurança EPI vistoria fiscalização cronograma atraso aprovação pedido compra '
+    'fornecedor nota fiscal pagamento reunião amanhã hoje ontem semana prazo '
+    'engenheiro técnico almoxarifado ferramenta betoneira andaime guindaste '
+    'caminhão motorista rota combustível manutenção preventiva corretiva '
+    'treinamento certificado NR35 NR10 altura elétrica incêndio extintor '
+    'planilha anexo foto arquivo documento assinatura cliente proposta '
+    'revisão projeto estrutural hidráulica fundação laje pilar viga alvenaria '
+    'reboco pintura acabamento piso telhado impermeabilização drenagem '
+    'terraplenagem topografia licença ambiental alvará prefeitura vistoria '
+    'inspeção auditoria qualidade não conformidade ação corretiva bloqueio'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Mede a latência da busca do chat sobre mensagens sintéticas (nada é gravado)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mensagens', type=int, default=1_000_000,
+            help='Mensagens sintéticas (padrão: 1.000.000)',
+        )
+        parser.add_argument('--salas', type=int, default=50, help='Salas (padrão: 50)')
+        parser.add_argument(
+            '--consultas', type=int, default=30,
+            help='Repetições por tipo de consulta (padrão: 30)',
+        )
+        parser.add_argument('--lote', type=int, default=5000, help='Mensagens por lote de inserção')
+        parser.add_argument('--semente', type=int, default=42)
+
+    def _texto(self, rng, pesos):
+        return ' '.join(rng.choices(VOCABULARIO, weights=pesos, k=rng.randint(3, 14)))
+
+    def _popular(self, options, rng, pesos):
+        User = get_user_model()
+        nome = f'benchmark-{uuid.uuid4().hex[:8]}'
+        usuario = User.objects.create(username=nome, email=f'{nome}@benchmark.invalid')
+        salas = ChatRoom.objects.bulk_create([
+            ChatRoom(id=uuid.uuid4(), name=f'Benchmark {i}', room_type='GROUP', is_group_chat=True)
+            for i in range(options['salas'])
+        ])
+        usuario.chat_rooms.add(*salas)
+
+        total, lote = options['mensagens'], options['lote']
+        gravadas = 0
+        t0 = time.perf_counter()
+        while gravadas < total:
+            mensagens = [
+                Message(
+                    id=uuid.uuid4(),
+                    room=rng.choice(salas),
+                    user=usuario,
+                    content=self._texto(rng, pesos),
+                )
+                for _ in range(min(lote, total - gravadas))
+            ]
+            # bulk_create não passa por Message.save: indexa explicitamente
+            Message.objects.bulk_create(mensagens)
+            indexar_lote(mensagens)
+            gravadas += len(mensagens)
+            if gravadas % (lote * 20) == 0 or gravadas == total:
+                self.stdout.write(f'   {gravadas}/{total} mensagens ({time.perf_counter() - t0:.0f}s)')
+        return usuario
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semente'])
+        pesos = [1 / (posicao + 1) for posicao in range(len(VOCABULARIO))]  # Zipf
+
+        motor = 'PostgreSQL tsvector/GIN' if usa_postgres() else f'tokens ({connection.vendor})'
+        self.stdout.write(
+            f"🔎 Busca do chat — {options['mensagens']} mensagens em {options['salas']} salas, motor {motor}"
+        )
+
+        consultas = {
+            'comum': lambda: VOCABULARIO[rng.randrange(3)],
+            'raro': lambda: VOCABULARIO[-1 - rng.randrange(10)],
+            'dois': lambda: ' '.join(rng.sample(VOCABULARIO[:30], 2)),
+            'prefixo': lambda: dobrar(rng.choice(VOCABULARIO[:30]))[:4],
+        }
+
+        with transaction.atomic():
+            usuario = self._popular(options, rng, pesos)
+
+            self.stdout.write(f"{'Consulta':<10} {'Média res.':>10} {'p50 ms':>8} {'p95 ms':>8} {'máx ms':>8}")
+            for nome, gerar in consultas.items():
+                latencias, resultados = [], []
+                for _ in range(options['consultas']):
+                    termo = gerar()
+                    t0 = time.perf_counter()
+                    resultados.append(len(buscar_mensagens(usuario, termo)))
+                    latencias.append((time.perf_counter() - t0) * 1000)
+
+                p95 = statistics.quantiles(latencias, n=20)[-1] if len(latencias) > 1 else latencias[0]
+                self.stdout.write(
+                    f"{nome:<10} {statistics.mean(resultados):>10.1f} "
+                    f"{statistics.median(latencias):>8.2f} {p95:>8.2f} {max(latencias):>8.2f}"
+                )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark concluído (nenhum dado foi gravado).'))
@@ -0,0 +1,67 @@
+# indexar_busca_chat.py
+
+"""
+Preenche o índice de busca do chat (chat.busca) para mensagens gravadas
+antes dele existir. Mensagens novas são indexadas por Message.save.
+
+Idempotente: só processa mensagens sem ChatSearchIndex.
+
+    python manage.py indexar_busca_chat
+    python manage.py indexar_busca_chat --lote 5000 --reindexar
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.busca import indexar_lote
+from chat.models import ChatSearchIndex, ChatSearchToken, Message
+
+
+class Command(BaseCommand):
+    help = 'Indexa para busca as mensagens do chat que ainda não têm índice'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=2000,
+            help='Mensagens por lote (padrão: 2000)',
+        )
+        parser.add_argument(
+            '--reindexar', action='store_true',
+            help='Apaga o índice atual e indexa tudo de novo',
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        if options['reindexar']:
+            ChatSearchToken.objects.all().delete()
+            apagados, _ = ChatSearchIndex.objects.all().delete()
+            self.stdout.write(f'🗑️  Índice apagado ({apagados} linhas)')
+
+        pendentes = Message.objects.filter(search_index__isnull=True)
+        total = pendentes.count()
+        self.stdout.write(f'🔎 {total} mensagens sem índice')
+
+        inicio = time.perf_counter()
+        indexadas = lidas = 0
+        ultimo_pk = None
+        while True:
+            # Keyset por pk: mensagens sem texto nunca ganham índice e não
+            # podem fazer o mesmo lote voltar para sempre
+            consulta = pendentes.order_by('pk').only(
+                'pk', 'room_id', 'timestamp', 'content', 'original_filename',
+            )
+            if ultimo_pk is not None:
+                consulta = consulta.filter(pk__gt=ultimo_pk)
+            mensagens = list(consulta[:lote])
+            if not mensagens:
+                break
+
+            indexadas += indexar_lote(mensagens)
+            lidas += len(mensagens)
+            ultimo_pk = mensagens[-1].pk
+            self.stdout.write(f'   {lidas}/{total} lidas, {indexadas} indexadas')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {indexadas} mensagens indexadas em {time.perf_counter() - inicio:.1f}s'
+        ))
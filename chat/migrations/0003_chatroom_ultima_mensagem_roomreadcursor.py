@@ -0,0 +1,79 @@
+# Generated by Django 5.2.17 on 2026-10-17 23:52
+
+# chat/migrations/0003_chatroom_ultima_mensagem_roomreadcursor.py
+"""
+Desnormaliza a última mensagem em ChatRoom (last_message_*) e cria os
+cursores de leitura por (sala, usuário). Salas existentes são preenchidas
+a partir da mensagem mais recente de cada uma.
+"""
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def preencher_ultima_mensagem(apps, schema_editor):
+    """Copia a mensagem mais recente de cada sala para last_message_*."""
+    ChatRoom = apps.get_model("chat", "ChatRoom")
+    Message = apps.get_model("chat", "Message")
+
+    for room_id in ChatRoom.objects.values_list("pk", flat=True).iterator():
+        ultima = Message.objects.filter(room_id=room_id).order_by("-timestamp").first()
+        if ultima is None:
+            continue
+        if ultima.file_attachment:
+            preview = "📎 Arquivo"
+        elif ultima.image:
+            preview = "📷 [Imagem]"
+        else:
+            content = ultima.content or ""
+            preview = (content[:40] + "…") if len(content) > 40 else content
+        ChatRoom.objects.filter(pk=room_id).update(
+            last_message_at=ultima.timestamp,
+            last_message_preview=preview,
+            last_message_user=ultima.user_id,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_alter_chatroom_tarefa_alter_message_file_attachment_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', editable=False, max_length=60),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_user',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='RoomReadCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_read_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to='chat.chatroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_read_cursors', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Cursor de Leitura',
+                'verbose_name_plural': 'Cursores de Leitura',
+                'db_table': 'chat_read_cursors',
+                'constraints': [models.UniqueConstraint(fields=('room', 'user'), name='chat_cursor_sala_usuario_uniq')],
+            },
+        ),
+        migrations.RunPython(preencher_ultima_mensagem, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# chat/migrations/0004_cursores_substituem_messageread.py
+"""
+Troca as leituras por mensagem (MessageRead, uma linha por mensagem por
+participante) pelos cursores de leitura (uma linha por sala/participante).
+
+Cada par (sala, usuário) vira um cursor na mensagem lida mais recente.
+Cursores já gravados só avançam, nunca recuam.
+"""
+
+from django.db import migrations, models
+from django.db.models import Max
+
+LOTE = 1000
+
+
+def colapsar_leituras(apps, schema_editor):
+    MessageRead = apps.get_model("chat", "MessageRead")
+    RoomReadCursor = apps.get_model("chat", "RoomReadCursor")
+
+    ultimas = (
+        MessageRead.objects.values("message__room_id", "user_id")
+        .annotate(lido_ate=Max("message__timestamp"))
+        .order_by()
+    )
+
+    novos = []
+    for linha in ultimas.iterator(chunk_size=LOTE):
+        room_id, user_id, lido_ate = linha["message__room_id"], linha["user_id"], linha["lido_ate"]
+        mensagem_id = (
+            MessageRead.objects.filter(user_id=user_id, message__room_id=room_id)
+            .order_by("-message__timestamp")
+            .values_list("message_id", flat=True)
+            .first()
+        )
+        if RoomReadCursor.objects.filter(room_id=room_id, user_id=user_id).exists():
+            RoomReadCursor.objects.filter(
+                room_id=room_id, user_id=user_id, last_read_at__lt=lido_ate,
+            ).update(last_read_at=lido_ate, last_read_message_id=mensagem_id)
+            continue
+        novos.append(RoomReadCursor(
+            room_id=room_id,
+            user_id=user_id,
+            last_read_at=lido_ate,
+            last_read_message_id=mensagem_id,
+        ))
+        if len(novos) >= LOTE:
+            RoomReadCursor.objects.bulk_create(novos, ignore_conflicts=True)
+            novos = []
+
+    if novos:
+        RoomReadCursor.objects.bulk_create(novos, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0003_chatroom_ultima_mensagem_roomreadcursor"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="roomreadcursor",
+            index=models.Index(fields=["room", "last_read_at"], name="chat_cursor_sala_lido_idx"),
+        ),
+        # Sem volta: os cursores não guardam quais mensagens foram lidas uma a uma
+        migrations.RunPython(colapsar_leituras, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name="MessageRead",
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.17 on 2026-10-18 00:03
+
+# chat/migrations/0005_historico_versao_e_anexo.py
+"""
+Versão do histórico por sala (ETag) e metadados de anexo pré-calculados
+em Message.attachment. Mensagens existentes com arquivo/imagem são
+preenchidas aqui.
+"""
+
+import os
+
+from django.db import migrations, models
+from django.db.models import Q
+
+LOTE = 500
+
+
+def preencher_anexos(apps, schema_editor):
+    Message = apps.get_model("chat", "Message")
+
+    sem_imagem = Q(image="") | Q(image__isnull=True)
+    sem_arquivo = Q(file_attachment="") | Q(file_attachment__isnull=True)
+    com_anexo = (
+        Message.objects.exclude(sem_imagem & sem_arquivo)
+        .only("image", "file_attachment", "original_filename", "file_size", "file_type")
+    )
+    lote = []
+    for mensagem in com_anexo.iterator(chunk_size=LOTE):
+        if mensagem.file_attachment:
+            kind, arquivo = "file", mensagem.file_attachment
+        else:
+            kind, arquivo = "image", mensagem.image
+        mensagem.attachment = {
+            "kind": kind,
+            "url": arquivo.url,
+            "name": mensagem.original_filename or os.path.basename(arquivo.name),
+            "size": mensagem.file_size,
+            "type": mensagem.file_type,
+        }
+        lote.append(mensagem)
+        if len(lote) >= LOTE:
+            Message.objects.bulk_update(lote, ["attachment"])
+            lote = []
+    if lote:
+        Message.objects.bulk_update(lote, ["attachment"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_cursores_substituem_messageread'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='versao_historico',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(preencher_anexos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.17 on 2026-10-18 00:06
+
+# chat/migrations/0006_busca_textual.py
+"""
+Busca textual (chat.busca): tabela de tokens para MySQL/SQLite e, só no
+PostgreSQL, índice GIN sobre a mesma expressão que SearchVector gera —
+sem ela idêntica o planner não usa o índice.
+"""
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+INDICE_GIN = "chat_busca_tsvector_gin"
+
+
+def criar_indice_gin(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    tabela = apps.get_model("chat", "ChatSearchIndex")._meta.db_table
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDICE_GIN} ON {tabela} "
+        "USING GIN (to_tsvector('simple'::regconfig, COALESCE(search_text, '')))"
+    )
+
+
+def remover_indice_gin(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDICE_GIN}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_historico_versao_e_anexo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=40)),
+                ('timestamp', models.DateTimeField()),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='chat.message')),
+                ('room', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='chat.chatroom')),
+            ],
+            options={
+                'verbose_name': 'Token de Busca',
+                'verbose_name_plural': 'Tokens de Busca',
+                'db_table': 'chat_search_tokens',
+                'indexes': [
+                    models.Index(fields=['token', '-timestamp'], name='chat_busca_token_tempo_idx'),
+                    models.Index(fields=['message', 'token'], name='chat_busca_msg_token_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(criar_indice_gin, remover_indice_gin),
+    ]
@@ -1,14 +1,22 @@
 
 # chat/models.py
 
+import os
 import uuid
-from django.db import models
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from core.upload import delete_old_file, safe_delete_file
 from core.validators import SecureFileValidator
 
+from .busca import indexar_mensagem
+
 User = get_user_model()
 
 
@@ -34,6 +42,59 @@ def chat_file_path(instance, filename):
 # CHAT ROOM
 # ══════════════════════════════════════════════
 
+# Cursor ausente = nada lido ainda
+_NUNCA_LIDO = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+TAMANHO_PREVIEW = 40
+
+
+class ChatRoomQuerySet(models.QuerySet):
+
+    def lista_do_usuario(self, user):
+        """
+        Salas do usuário numa única query, anotadas com tudo que a lista
+        lateral precisa: `nao_lidas` (mensagens de outros após o cursor
+        de leitura) e, para DMs, o nome do outro participante
+        (`outro_first_name`, `outro_last_name`, `outro_username`).
+        Ordenadas pela última atividade.
+        """
+        cursor = RoomReadCursor.objects.filter(room=OuterRef('pk'), user=user)
+
+        nao_lidas = (
+            Message.objects.filter(room=OuterRef('pk'), timestamp__gt=OuterRef('lido_ate'))
+            .exclude(user=user)
+            .order_by()
+            .values('room')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+
+        return (
+            self.filter(participants=user)
+            .com_outro_participante(user)
+            .select_related('last_message_user')
+            .annotate(
+                lido_ate=Coalesce(Subquery(cursor.values('last_read_at')[:1]), Value(_NUNCA_LIDO)),
+                nao_lidas=Coalesce(Subquery(nao_lidas, output_field=IntegerField()), Value(0)),
+                ultima_atividade=Coalesce('last_message_at', 'created_at'),
+            )
+            .order_by(F('ultima_atividade').desc(), '-updated_at')
+        )
+
+    def com_outro_participante(self, user):
+        """
+        Anota o nome do outro participante das DMs (`outro_first_name`,
+        `outro_last_name`, `outro_username`), usado por
+        `get_room_display_name(user)` sem consultar os participantes.
+        """
+        outro = User.objects.filter(chat_rooms=OuterRef('pk')).exclude(pk=user.pk).order_by('pk')
+        return self.annotate(
+            outro_first_name=Subquery(outro.values('first_name')[:1]),
+            outro_last_name=Subquery(outro.values('last_name')[:1]),
+            outro_username=Subquery(outro.values('username')[:1]),
+        )
+
+
 class ChatRoom(models.Model):
 
     ROOM_TYPES = [
@@ -69,9 +130,27 @@ class ChatRoom(models.Model):
 
     enable_push_notifications = models.BooleanField(default=True)
 
+    # ── Última mensagem (desnormalizada por Message.save) ─────────────────
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_message_preview = models.CharField(max_length=60, blank=True, default='', editable=False)
+    last_message_user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+    )
+    # ──────────────────────────────────────────────────────────────────────
+
+    # Incrementada a cada mensagem gravada/apagada: compõe o ETag do histórico
+    versao_historico = models.PositiveIntegerField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ChatRoomQuerySet.as_manager()
+
     class Meta:
         db_table        = "chat_rooms"
         verbose_name    = "Sala de Chat"
@@ -81,8 +160,18 @@ class ChatRoom(models.Model):
         return f"{self.name} ({self.room_type})"
 
     def get_room_display_name(self, user):
-        """Retorna o nome de exibição correto da sala."""
+        """
+        Retorna o nome de exibição correto da sala.
+
+        Em salas vindas de `lista_do_usuario`/`com_outro_participante` o
+        outro participante da DM já está anotado; nas demais, consulta.
+        """
         if self.room_type == 'DM':
+            if hasattr(self, 'outro_username'):
+                if not self.outro_username:
+                    return "Usuário Desconhecido"
+                nome = f"{self.outro_first_name or ''} {self.outro_last_name or ''}".strip()
+                return nome or self.outro_username
             other_user = self.participants.exclude(id=user.id).first()
             if other_user:
                 return f"{other_user.first_name} {other_user.last_name}".strip() or other_user.username
@@ -91,19 +180,35 @@ class ChatRoom(models.Model):
 
     def get_last_message_preview(self):
         """Retorna o conteúdo da última mensagem."""
-        last_msg = self.messages.order_by('-timestamp').first()
-        if not last_msg:
-            return ""
-        if last_msg.file_attachment:
-            return f"📎 {last_msg.get_file_type_emoji()} Arquivo"
-        if last_msg.image:
-            return "📷 [Imagem]"
-        content = last_msg.content or ""
-        return (content[:40] + '…') if len(content) > 40 else content
+        return self.last_message_preview
 
     def get_unread_count(self, user):
-        """Retorna quantidade de mensagens não lidas para o usuário."""
-        return self.messages.exclude(message_reads__user=user).count()
+        """Mensagens de outros participantes após o cursor de leitura do usuário."""
+        if hasattr(self, 'nao_lidas'):
+            return self.nao_lidas
+        lido_ate = (
+            RoomReadCursor.objects.filter(room=self, user=user)
+            .values_list('last_read_at', flat=True)
+            .first()
+        )
+        mensagens = self.messages.exclude(user=user)
+        if lido_ate:
+            mensagens = mensagens.filter(timestamp__gt=lido_ate)
+        return mensagens.count()
+
+    def cursores_de_leitura(self):
+        """{user_id: last_read_at} dos participantes — base dos recibos de leitura."""
+        return dict(self.read_cursors.values_list('user_id', 'last_read_at'))
+
+    def atualizar_ultima_mensagem(self):
+        """Recalcula os campos last_message_* (após apagar a última mensagem)."""
+        ultima = self.messages.order_by('-timestamp').first()
+        ChatRoom.objects.filter(pk=self.pk).update(
+            last_message_at=ultima.timestamp if ultima else None,
+            last_message_preview=ultima.texto_preview() if ultima else '',
+            last_message_user=ultima.user_id if ultima else None,
+            versao_historico=F('versao_historico') + 1,
+        )
 
 
 # ══════════════════════════════════════════════
@@ -140,6 +245,10 @@ class Message(models.Model):
     file_size         = models.BigIntegerField(null=True, blank=True)
     file_type         = models.CharField(max_length=100, null=True, blank=True)
 
+    # {kind, url, name, size, type} calculado no save — o histórico não
+    # resolve URL de storage mensagem a mensagem
+    attachment = models.JSONField(null=True, blank=True, editable=False)
+
     # ── Edição ────────────────────────────────────────────────────────────
     is_edited = models.BooleanField(default=False)
     edited_at = models.DateTimeField(null=True, blank=True)
@@ -176,15 +285,84 @@ class Message(models.Model):
     def save(self, *args, **kwargs):
         delete_old_file(self, 'image')
         delete_old_file(self, 'file_attachment')
+        self.attachment = self.metadados_anexo()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'attachment'}
         super().save(*args, **kwargs)
+        self._atualizar_sala()
+        indexar_mensagem(self)
 
     def delete(self, *args, **kwargs):
         safe_delete_file(self, 'image')
         safe_delete_file(self, 'file_attachment')
+        room_id = self.room_id
         super().delete(*args, **kwargs)
+        # Recalcula a última mensagem e invalida os ETags do histórico
+        ChatRoom(pk=room_id).atualizar_ultima_mensagem()
+
+    def _atualizar_sala(self):
+        """
+        Invalida o histórico da sala e, se esta for a mensagem mais
+        recente, propaga-a para os campos last_message_*. A condição por
+        timestamp (num único UPDATE) torna a propagação monotônica:
+        re-salvar uma mensagem antiga (edição, anexo) não regride a sala.
+        """
+        mais_recente = Q(last_message_at__isnull=True) | Q(last_message_at__lte=self.timestamp)
+
+        def se_mais_recente(valor, campo):
+            field = ChatRoom._meta.get_field(campo)
+            return Case(
+                When(mais_recente, then=Value(valor)),
+                default=F(campo),
+                output_field=field.target_field if field.is_relation else field,
+            )
+
+        ChatRoom.objects.filter(pk=self.room_id).update(
+            versao_historico=F('versao_historico') + 1,
+            last_message_at=se_mais_recente(self.timestamp, 'last_message_at'),
+            last_message_preview=se_mais_recente(self.texto_preview(), 'last_message_preview'),
+            last_message_user=se_mais_recente(self.user_id, 'last_message_user'),
+            updated_at=se_mais_recente(self.timestamp, 'updated_at'),
+        )
 
     # ── Helpers ───────────────────────────────────────────────────────────
 
+    def lida_por(self):
+        """
+        Recibo de leitura: participantes (exceto o autor) cujo cursor já
+        alcançou esta mensagem.
+        """
+        return User.objects.filter(
+            chat_read_cursors__room_id=self.room_id,
+            chat_read_cursors__last_read_at__gte=self.timestamp,
+        ).exclude(pk=self.user_id)
+
+    def metadados_anexo(self):
+        """{kind, url, name, size, type} do arquivo/imagem, ou None."""
+        if self.file_attachment:
+            kind, arquivo = 'file', self.file_attachment
+        elif self.image:
+            kind, arquivo = 'image', self.image
+        else:
+            return None
+        return {
+            'kind': kind,
+            'url': arquivo.url,
+            'name': self.original_filename or os.path.basename(arquivo.name),
+            'size': self.file_size,
+            'type': self.file_type,
+        }
+
+    def texto_preview(self):
+        """Resumo de uma linha para a lista de salas."""
+        if self.file_attachment:
+            return f"📎 {self.get_file_type_emoji()} Arquivo"
+        if self.image:
+            return "📷 [Imagem]"
+        content = self.content or ""
+        return (content[:TAMANHO_PREVIEW] + '…') if len(content) > TAMANHO_PREVIEW else content
+
     def get_file_type_emoji(self):
         """Retorna emoji baseado no tipo do arquivo."""
         if not self.file_type:
@@ -213,27 +391,79 @@ class Message(models.Model):
 
 
 # ══════════════════════════════════════════════
-# MESSAGE READ
+# READ CURSOR
 # ══════════════════════════════════════════════
 
-class MessageRead(models.Model):
-    """Controla quais mensagens cada usuário já leu."""
+class RoomReadCursor(models.Model):
+    """
+    Até onde cada participante leu a sala: uma linha por (sala, usuário),
+    independente do volume de mensagens.
 
-    id      = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='message_reads')
-    user    = models.ForeignKey(User, on_delete=models.CASCADE)
-    read_at = models.DateTimeField(auto_now_add=True)
+    - Não lidas = mensagens de outros com timestamp posterior ao cursor.
+    - Recibo de leitura = participantes cujo cursor alcançou a mensagem
+      (Message.lida_por).
+    """
+
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='read_cursors')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_read_cursors')
+    last_read_at = models.DateTimeField()
+    last_read_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ['message', 'user']
+        db_table = "chat_read_cursors"
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'user'], name='chat_cursor_sala_usuario_uniq'),
+        ]
         indexes = [
-            models.Index(fields=['message', 'user']),
+            models.Index(fields=['room', 'last_read_at'], name='chat_cursor_sala_lido_idx'),
         ]
-        verbose_name        = "Leitura de Mensagem"
-        verbose_name_plural = "Leituras de Mensagens"
+        verbose_name        = "Cursor de Leitura"
+        verbose_name_plural = "Cursores de Leitura"
 
     def __str__(self):
-        return f'{self.user.username} leu mensagem {self.message.id}'
+        return f'{self.user_id} leu {self.room_id} até {self.last_read_at:%d/%m/%Y %H:%M}'
+
+    @classmethod
+    def marcar_lido(cls, room_id, user, message=None):
+        """
+        Upsert monotônico: avança o cursor do usuário até `message` (ou a
+        última mensagem da sala) e nunca o recua — marcar uma mensagem
+        antiga como lida não reabre as posteriores, e duas abas/processos
+        marcando ao mesmo tempo ficam com o maior dos dois.
+
+        Retorna True se o cursor avançou.
+        """
+        if message is None:
+            message = Message.objects.filter(room_id=room_id).order_by('-timestamp').first()
+            if message is None:
+                return False
+
+        avancar = dict(
+            last_read_at=message.timestamp,
+            last_read_message=message,
+            updated_at=timezone.now(),
+        )
+        # O filtro por last_read_at__lt torna o UPDATE a própria checagem
+        if cls.objects.filter(room_id=room_id, user=user, last_read_at__lt=message.timestamp).update(**avancar):
+            return True
+
+        try:
+            with transaction.atomic():
+                cls.objects.create(room_id=room_id, user=user, **avancar)
+            return True
+        except IntegrityError:
+            # Cursor já existia (à frente) ou foi criado em paralelo
+            return bool(
+                cls.objects.filter(room_id=room_id, user=user, last_read_at__lt=message.timestamp)
+                .update(**avancar)
+            )
 
 
 # ══════════════════════════════════════════════
@@ -265,7 +495,10 @@ class PushNotificationSubscription(models.Model):
 # ══════════════════════════════════════════════
 
 class ChatSearchIndex(models.Model):
-    """Indexação de busca otimizada sobre mensagens."""
+    """
+    Texto de busca de uma mensagem, dobrado (minúsculas, sem acentos).
+    Mantido por Message.save; ver chat.busca.
+    """
 
     id          = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     message     = models.OneToOneField(Message, on_delete=models.CASCADE, related_name='search_index')
@@ -281,5 +514,33 @@ class ChatSearchIndex(models.Model):
         verbose_name_plural = "Índices de Busca"
 
     def __str__(self):
-        return f'Search index for message {self.message.id}'
+        return f'Search index for message {self.message_id}'
 
+
+class ChatSearchToken(models.Model):
+    """
+    Um token de ChatSearchIndex por linha — busca portátil para MySQL e
+    SQLite (no PostgreSQL a busca usa tsvector e esta tabela fica vazia).
+    O timestamp da mensagem vem junto para o índice (token, timestamp)
+    entregar os resultados já na ordem, sem ordenar todos os acertos.
+    """
+
+    message   = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='search_tokens')
+    # Sem índice próprio: com ele o planner prefere varrer a sala inteira
+    # ao índice (token, timestamp). Apagar a sala apaga as mensagens, e as
+    # mensagens levam os tokens.
+    room      = models.ForeignKey(ChatRoom, on_delete=models.DO_NOTHING, db_index=False, related_name='+')
+    token     = models.CharField(max_length=40)
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        db_table = "chat_search_tokens"
+        indexes = [
+            models.Index(fields=['token', '-timestamp'], name='chat_busca_token_tempo_idx'),
+            models.Index(fields=['message', 'token'], name='chat_busca_msg_token_idx'),
+        ]
+        verbose_name        = "Token de Busca"
+        verbose_name_plural = "Tokens de Busca"
+
+    def __str__(self):
+        return self.token
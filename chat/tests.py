@@ -1,3 +1,268 @@
-from django.test import TestCase
+# chat/tests.py
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from chat.busca import buscar_mensagens, tokenizar
+from chat.historico import cursor_da_mensagem
+from chat.models import ChatRoom, ChatSearchIndex, Message, RoomReadCursor
+
+User = get_user_model()
+
+urlpatterns = [
+    path('chat/', include('chat.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class ListaDeSalasTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_superuser('ana', 'ana@example.com', 'senha123', first_name='Ana', last_name='Lima')
+        cls.bruno = User.objects.create_user('bruno', 'bruno@example.com', 'senha123', first_name='Bruno')
+        cls.carla = User.objects.create_user('carla', 'carla@example.com', 'senha123')
+
+    def _dm(self, outro):
+        room = ChatRoom.objects.create(name=f'DM {outro.username}', room_type='DM')
+        room.participants.add(self.ana, outro)
+        return room
+
+    def test_ultima_mensagem_desnormalizada(self):
+        room = self._dm(self.bruno)
+        Message.objects.create(room=room, user=self.ana, content='primeira')
+        ultima = Message.objects.create(room=room, user=self.bruno, content='x' * 50)
+
+        room.refresh_from_db()
+        self.assertEqual(room.last_message_at, ultima.timestamp)
+        self.assertEqual(room.last_message_preview, 'x' * 40 + '…')
+        self.assertEqual(room.last_message_user, self.bruno)
+
+        # Apagar a última devolve a sala para a anterior
+        ultima.delete()
+        room.refresh_from_db()
+        self.assertEqual(room.last_message_preview, 'primeira')
+
+    def test_nao_lidas_contadas_a_partir_do_cursor(self):
+        room = self._dm(self.bruno)
+        primeira = Message.objects.create(room=room, user=self.bruno, content='1')
+        Message.objects.create(room=room, user=self.bruno, content='2')
+        Message.objects.create(room=room, user=self.ana, content='minha')
+
+        self.assertEqual(room.get_unread_count(self.ana), 2)
+
+        RoomReadCursor.marcar_lido(room.id, self.ana)
+        self.assertEqual(room.get_unread_count(self.ana), 0)
+
+        # Marcar uma mensagem antiga não recua o cursor
+        self.assertFalse(RoomReadCursor.marcar_lido(room.id, self.ana, primeira))
+        self.assertEqual(room.get_unread_count(self.ana), 0)
+        self.assertEqual(RoomReadCursor.objects.filter(room=room, user=self.ana).count(), 1)
+
+    def test_recibo_de_leitura_compara_cursores(self):
+        grupo = ChatRoom.objects.create(name='Obra', room_type='GROUP', is_group_chat=True)
+        grupo.participants.add(self.ana, self.bruno, self.carla)
+        primeira = Message.objects.create(room=grupo, user=self.ana, content='1')
+        segunda = Message.objects.create(room=grupo, user=self.ana, content='2')
+
+        RoomReadCursor.marcar_lido(grupo.id, self.bruno)
+        RoomReadCursor.marcar_lido(grupo.id, self.carla, primeira)
+
+        self.assertEqual(set(primeira.lida_por()), {self.bruno, self.carla})
+        self.assertEqual(list(segunda.lida_por()), [self.bruno])
+        self.assertEqual(set(grupo.cursores_de_leitura()), {self.bruno.pk, self.carla.pk})
+
+    def test_lista_em_query_unica(self):
+        for outro in (self.bruno, self.carla):
+            room = self._dm(outro)
+            Message.objects.create(room=room, user=outro, content=f'oi de {outro.username}')
+        grupo = ChatRoom.objects.create(name='Obra', room_type='GROUP', is_group_chat=True)
+        grupo.participants.add(self.ana, self.bruno, self.carla)
+
+        self.client.force_login(self.ana)
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('chat:get_active_room_list'))
+        rooms = resposta.json()['rooms']
+
+        consultas_da_lista = [q for q in consultas.captured_queries if 'chat_rooms' in q['sql']]
+        self.assertEqual(len(consultas_da_lista), 1)
+        self.assertEqual(
+            [(r['room_name'], r['unread_count'], r['last_message']) for r in rooms],
+            # Sala nova sem mensagens entra pela data de criação
+            [('Obra', 0, ''), ('carla', 1, 'oi de carla'), ('Bruno', 1, 'oi de bruno')],
+        )
+
+    def test_marcar_sala_como_lida_zera_contagem(self):
+        room = self._dm(self.bruno)
+        Message.objects.create(room=room, user=self.bruno, content='oi')
+
+        self.client.force_login(self.ana)
+        resposta = self.client.post(reverse('chat:mark_room_read', args=[room.id]))
+
+        self.assertEqual(resposta.json(), {'status': 'ok', 'marked': 1})
+        self.assertEqual(ChatRoom.objects.lista_do_usuario(self.ana).get().nao_lidas, 0)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class HistoricoTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_superuser('ana', 'ana@example.com', 'senha123')
+        cls.bruno = User.objects.create_user('bruno', 'bruno@example.com', 'senha123')
+        cls.room = ChatRoom.objects.create(name='Obra', room_type='GROUP', is_group_chat=True)
+        cls.room.participants.add(cls.ana, cls.bruno)
+        # Instantes distintos e fixos: auto_now_add pode repetir o microssegundo
+        inicio = timezone.now() - timedelta(hours=1)
+        for i in range(7):
+            mensagem = Message.objects.create(room=cls.room, user=cls.bruno, content=str(i))
+            Message.objects.filter(pk=mensagem.pk).update(timestamp=inicio + timedelta(seconds=i))
+        cls.mensagens = list(Message.objects.filter(room=cls.room).order_by('timestamp'))
+
+    def setUp(self):
+        self.client.force_login(self.ana)
+        self.url = reverse('chat:get_chat_history', args=[self.room.id])
+
+    def _conteudos(self, resposta):
+        return [m['message'] for m in resposta.json()['messages']]
+
+    def test_paginas_em_ambas_as_direcoes(self):
+        recentes = self.client.get(self.url, {'limit': 3})
+        self.assertEqual(self._conteudos(recentes), ['4', '5', '6'])
+
+        anteriores = self.client.get(self.url, {'limit': 3, 'before': recentes.json()['before']})
+        self.assertEqual(self._conteudos(anteriores), ['1', '2', '3'])
+
+        inicio = self.client.get(self.url, {'limit': 3, 'before': anteriores.json()['before']})
+        self.assertEqual(self._conteudos(inicio), ['0'])
+        self.assertIsNone(inicio.json()['before'])
+
+        seguintes = self.client.get(self.url, {'limit': 4, 'after': inicio.json()['after']})
+        self.assertEqual(self._conteudos(seguintes), ['1', '2', '3', '4'])
+        self.assertTrue(seguintes.json()['has_more_after'])
+
+    def test_since_busca_apenas_o_intervalo(self):
+        quarta = self.mensagens[3]
+        resposta = self.client.get(self.url, {'since': quarta.timestamp.isoformat()})
+
+        self.assertEqual(self._conteudos(resposta), ['4', '5', '6'])
+        self.assertEqual(
+            resposta.json()['after'],
+            cursor_da_mensagem(self.mensagens[-1].timestamp, self.mensagens[-1].id),
+        )
+
+    def test_etag_devolve_304_ate_a_sala_mudar(self):
+        primeira = self.client.get(self.url)
+        etag = primeira['ETag']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Message.objects.create(room=self.room, user=self.ana, content='nova')
+        segunda = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(self._conteudos(segunda)[-1], 'nova')
+
+    def test_anexo_calculado_no_save(self):
+        Message.objects.create(
+            room=self.room, user=self.bruno, image='chat/x/images/foto.png', file_type='image/png',
+        )
+
+        ultima = self.client.get(self.url).json()['messages'][-1]
+
+        self.assertEqual(ultima['message_type'], 'image')
+        self.assertTrue(ultima['image_url'].endswith('chat/x/images/foto.png'))
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.client.get(self.url, {'before': 'xyz'}).status_code, 400)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class BuscaTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_superuser('ana', 'ana@example.com', 'senha123')
+        cls.bruno = User.objects.create_user('bruno', 'bruno@example.com', 'senha123')
+        cls.obra = ChatRoom.objects.create(name='Obra', room_type='GROUP', is_group_chat=True)
+        cls.obra.participants.add(cls.ana, cls.bruno)
+        cls.diretoria = ChatRoom.objects.create(name='Diretoria', room_type='GROUP', is_group_chat=True)
+        cls.diretoria.participants.add(cls.bruno)
+
+    def test_tokens_sem_acento_e_caixa(self):
+        self.assertEqual(tokenizar('Relatório de MEDIÇÃO — medição final'), ['relatorio', 'de', 'medicao', 'final'])
+
+    def test_busca_restrita_as_salas_do_usuario(self):
+        Message.objects.create(room=self.obra, user=self.bruno, content='Relatório de medição enviado')
+        Message.objects.create(room=self.diretoria, user=self.bruno, content='relatorio de medicao sigiloso')
+
+        resultados = buscar_mensagens(self.ana, 'RELATORIO medi')
+
+        self.assertEqual([m.content for m in resultados], ['Relatório de medição enviado'])
+
+    def test_edicao_reindexa(self):
+        mensagem = Message.objects.create(room=self.obra, user=self.ana, content='concreto usinado')
+        mensagem.content = 'cimento ensacado'
+        mensagem.save()
+
+        self.assertEqual(buscar_mensagens(self.ana, 'concreto'), [])
+        self.assertEqual(buscar_mensagens(self.ana, 'cimento'), [mensagem])
+
+    def test_endpoint_de_busca(self):
+        Message.objects.create(room=self.obra, user=self.bruno, content='Orçamento do andaime aprovado')
+        self.client.force_login(self.ana)
+
+        resposta = self.client.get(reverse('chat:search_messages'), {'q': 'orcamento'})
+
+        resultado = resposta.json()['results'][0]
+        self.assertEqual(resultado['room_name'], 'Obra')
+        self.assertIn('Orçamento', resultado['snippet'])
+        self.assertEqual(self.client.get(reverse('chat:search_messages'), {'q': 'a'}).status_code, 400)
+
+    def test_busca_resolve_nome_das_dms_sem_n_mais_1(self):
+        self.client.force_login(self.ana)
+        url = reverse('chat:search_messages')
+
+        def consultas():
+            with CaptureQueriesContext(connection) as ctx:
+                resultados = self.client.get(url, {'q': 'entrega'}).json()['results']
+            return len(ctx.captured_queries), resultados
+
+        def dm(n):
+            outro = User.objects.create_user(f'dm{n}', f'dm{n}@example.com', 'senha123', first_name=f'Contato {n}')
+            room = ChatRoom.objects.create(room_type='DM')
+            room.participants.add(self.ana, outro)
+            Message.objects.create(room=room, user=outro, content=f'entrega {n} confirmada')
+
+        dm(0)
+        consultas()  # aquece sessão/permissões
+        poucas, _ = consultas()
+        for n in range(1, 6):
+            dm(n)
+        muitas, resultados = consultas()
+
+        self.assertEqual(poucas, muitas)
+        self.assertEqual([r['room_name'] for r in resultados], [f'Contato {n}' for n in range(5, -1, -1)])
+
+    def test_backfill_indexa_mensagens_antigas(self):
+        Message.objects.bulk_create([
+            Message(room=self.obra, user=self.bruno, content=f'vistoria {i}') for i in range(5)
+        ])
+        self.assertFalse(ChatSearchIndex.objects.exists())
+
+        call_command('indexar_busca_chat', lote=2, stdout=StringIO())
+
+        self.assertEqual(len(buscar_mensagens(self.ana, 'vistoria')), 5)
+
+    def test_benchmark_busca(self):
+        saida = StringIO()
+        call_command('benchmark_busca_chat', mensagens=300, salas=3, consultas=2, lote=100, stdout=saida)
+
+        self.assertIn('prefixo', saida.getvalue())
+        self.assertFalse(Message.objects.exists())
@@ -10,6 +10,7 @@ urlpatterns = [
     path('api/users/', views.get_user_list, name='get_user_list'),
     path('api/history/<uuid:room_id>/', views.get_chat_history, name='get_chat_history'),
     path('api/tasks/', views.get_task_list, name='get_task_list'),
+    path('api/search/', views.search_messages, name='search_messages'),
 
     # Ações do Chat
     path('api/start-dm/<int:user_id>/', views.start_or_get_dm_chat, name='start_dm'),
@@ -18,6 +19,7 @@ urlpatterns = [
     # Upload
     path('api/upload/', views.chat_file_upload, name='chat_image_upload'),
     path('api/room/<uuid:room_id>/mark-read/', views.mark_room_as_read, name='mark_room_read'),
+    path('api/room/<uuid:room_id>/read-cursors/', views.get_room_read_cursors, name='room_read_cursors'),
 ]
 
 # URL condicional para tarefas
@@ -1,6 +1,7 @@
 
 # chat/views.py
 
+import hashlib
 import json
 import logging
 import os
@@ -10,16 +11,24 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from core.mixins import AppPermissionMixin, FuncionarioRequiredMixin
+from django.core.exceptions import ValidationError
 from django.core.files.storage import default_storage
 from django.db.models import Count, Q
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
 from django.views import View
 from django.views.decorators.http import require_GET, require_POST
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from core.decorators import app_permission_required
-from .models import ChatRoom, Message, MessageRead
+from core.ratelimit import limitar_taxa
+from .busca import RESULTADOS_POR_BUSCA, buscar_mensagens, termos_da_consulta, trecho
+from .historico import (
+    MENSAGENS_POR_PAGINA, cursor_da_mensagem, ler_cursor, ler_instante, pagina_de_mensagens,
+)
+from .models import ChatRoom, RoomReadCursor
 
 logger = logging.getLogger(__name__)
 
@@ -80,10 +89,29 @@ def get_user_list(request):
 # HISTÓRICO DE MENSAGENS
 # =============================================================================
 
+def _etag_historico(room, user, request):
+    """
+    Muda a cada mensagem gravada/apagada na sala (versao_historico), por
+    usuário (nome da DM) e por página pedida.
+    """
+    pagina = hashlib.md5(request.GET.urlencode().encode(), usedforsecurity=False).hexdigest()[:12]
+    return quote_etag(f'{room.pk.hex}-{room.versao_historico}-{user.pk}-{pagina}')
+
+
 @app_permission_required('chat')
 @require_GET
 def get_chat_history(request, room_id):
-    """Retorna o histórico de mensagens de uma sala."""
+    """
+    Retorna uma página do histórico de mensagens de uma sala.
+
+    Query params (chat.historico):
+        before=<cursor>   mensagens anteriores (rolar para cima)
+        after=<cursor>    mensagens posteriores
+        since=<ISO 8601>  mensagens após o instante (websocket reconectado)
+        limit=<n>         padrão 50, máximo 200
+
+    Sem cursor, as mais recentes. Página inalterada → 304 (If-None-Match).
+    """
     try:
         room = _get_room_for_user(request.user, room_id)
 
@@ -93,46 +121,40 @@ def get_chat_history(request, room_id):
                 'error': 'Sala não encontrada ou acesso negado',
             }, status=404)
 
-        messages_qs = Message.objects.filter(
-            room=room
-        ).select_related('user').order_by('timestamp')[:100]
-
-        messages_data = []
-        for msg in messages_qs:
-            message_dict = {
-                'id': str(msg.id),
-                'message': msg.content or '',
-                'content': msg.content or '',
-                'username': msg.user.get_full_name() or msg.user.username,
-                'user_id': msg.user.id,
-                'timestamp': msg.timestamp.isoformat(),
-                'is_edited': msg.is_edited,
-            }
+        etag = _etag_historico(room, request.user, request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            resposta = HttpResponseNotModified()
+            resposta['ETag'] = etag
+            return resposta
 
-            if msg.file_attachment:
-                message_dict['message_type'] = 'file'
-                message_dict['file_data'] = json.dumps({
-                    'url': msg.file_attachment.url if msg.file_attachment else None,
-                    'name': msg.original_filename or 'arquivo',
-                    'size': msg.file_size,
-                    'type': msg.file_type,
-                })
-            elif msg.image:
-                message_dict['message_type'] = 'image'
-                message_dict['image_url'] = msg.image.url if msg.image else None
+        try:
+            antes = ler_cursor(request.GET['before']) if request.GET.get('before') else None
+            if request.GET.get('after'):
+                depois = ler_cursor(request.GET['after'])
+            elif request.GET.get('since'):
+                depois = ler_instante(request.GET['since'])
             else:
-                message_dict['message_type'] = 'text'
+                depois = None
+            limite = int(request.GET.get('limit', MENSAGENS_POR_PAGINA))
+        except ValueError:
+            return JsonResponse({
+                'status': 'error',
+                'error': 'Parâmetros de paginação inválidos',
+            }, status=400)
 
-            messages_data.append(message_dict)
+        pagina = pagina_de_mensagens(room.id, antes=antes, depois=depois, limite=limite)
 
-        logger.debug("Retornando %d mensagens para sala %s", len(messages_data), room_id)
+        logger.debug("Retornando %d mensagens para sala %s", len(pagina['messages']), room_id)
 
-        return JsonResponse({
+        resposta = JsonResponse({
             'status': 'success',
-            'messages': messages_data,
             'room_id': str(room_id),
             'room_name': room.get_room_display_name(request.user),
+            **pagina,
         })
+        resposta['ETag'] = etag
+        resposta['Cache-Control'] = 'private, no-cache'
+        return resposta
 
     except Exception as e:
         logger.exception("Erro get_chat_history sala=%s", room_id)
@@ -142,6 +164,86 @@ def get_chat_history(request, room_id):
         }, status=500)
 
 
+@app_permission_required('chat')
+@require_GET
+def get_room_read_cursors(request, room_id):
+    """
+    Cursores de leitura dos participantes ({user_id: last_read_at}).
+    Mensagem lida por quem tem last_read_at >= timestamp da mensagem.
+    """
+    room = _get_room_for_user(request.user, room_id)
+    if not room:
+        return JsonResponse({
+            'status': 'error',
+            'error': 'Sala não encontrada ou acesso negado',
+        }, status=404)
+
+    return JsonResponse({
+        'status': 'success',
+        'room_id': str(room_id),
+        'read_cursors': {
+            str(user_id): lido_ate.isoformat()
+            for user_id, lido_ate in room.cursores_de_leitura().items()
+        },
+    })
+
+
+# =============================================================================
+# BUSCA
+# =============================================================================
+
+@app_permission_required('chat')
+@limitar_taxa('chat_busca', limite=30, janela=60)
+@require_GET
+def search_messages(request):
+    """
+    Busca mensagens nas salas do usuário (chat.busca).
+
+    Query params: q (obrigatório), room (opcional), limit.
+    Cada resultado traz o `cursor` para abrir o histórico no ponto.
+    """
+    consulta = request.GET.get('q', '').strip()
+    termos = termos_da_consulta(consulta)
+    if not termos:
+        return JsonResponse({
+            'status': 'error',
+            'error': 'Informe ao menos um termo com 2 ou mais caracteres',
+        }, status=400)
+
+    try:
+        limite = int(request.GET.get('limit', RESULTADOS_POR_BUSCA))
+    except ValueError:
+        limite = RESULTADOS_POR_BUSCA
+
+    try:
+        mensagens = buscar_mensagens(
+            request.user, consulta, room_id=request.GET.get('room') or None, limite=limite,
+        )
+    except ValidationError:
+        return JsonResponse({'status': 'error', 'error': 'Sala inválida'}, status=400)
+
+    resultados = [
+        {
+            'id': str(msg.id),
+            'room_id': str(msg.room_id),
+            'room_name': msg.room.get_room_display_name(request.user),
+            'cursor': cursor_da_mensagem(msg.timestamp, msg.id),
+            'user_id': msg.user_id,
+            'username': msg.user.get_full_name() or msg.user.username,
+            'snippet': trecho(msg.content or msg.original_filename, termos),
+            'timestamp': msg.timestamp.isoformat(),
+        }
+        for msg in mensagens
+    ]
+
+    return JsonResponse({
+        'status': 'success',
+        'query': consulta,
+        'results': resultados,
+        'count': len(resultados),
+    })
+
+
 # =============================================================================
 # LISTA DE TAREFAS
 # =============================================================================
@@ -192,11 +294,15 @@ def get_task_list(request):
 @app_permission_required('chat')
 @require_GET
 def get_active_room_list(request):
-    """Retorna lista de salas ativas do usuário."""
+    """
+    Retorna lista de salas ativas do usuário.
+
+    Uma única query (ChatRoom.objects.lista_do_usuario): última mensagem
+    desnormalizada na sala, não lidas contadas a partir do cursor de
+    leitura e nome do outro participante das DMs anotado.
+    """
     try:
-        rooms = ChatRoom.objects.filter(
-            participants=request.user
-        ).prefetch_related('participants').order_by('-updated_at')
+        rooms = ChatRoom.objects.lista_do_usuario(request.user)
 
         rooms_data = []
         for room in rooms:
@@ -204,8 +310,9 @@ def get_active_room_list(request):
                 'room_id': str(room.id),
                 'room_name': room.get_room_display_name(request.user),
                 'room_type': room.room_type,
-                'last_message': room.get_last_message_preview(),
-                'unread_count': room.get_unread_count(request.user),
+                'last_message': room.last_message_preview,
+                'last_message_at': room.last_message_at.isoformat() if room.last_message_at else None,
+                'unread_count': room.nao_lidas,
                 'updated_at': room.updated_at.isoformat() if room.updated_at else None,
             })
 
@@ -509,19 +616,9 @@ def chat_file_upload(request):
 def mark_room_as_read(request, room_id):
     """Marca todas as mensagens da sala como lidas pelo usuário atual."""
     room = get_object_or_404(ChatRoom, id=room_id, participants=request.user)
-    
-    # Pega só mensagens AINDA não lidas (otimização)
-    mensagens_nao_lidas = room.messages.exclude(
-        message_reads__user=request.user
-    ).exclude(
-        sender=request.user  # ignora as próprias mensagens
-    )
-    
-    # Cria registros de leitura em massa (bulk_create + ignore_conflicts)
-    reads = [
-        MessageRead(message=msg, user=request.user)
-        for msg in mensagens_nao_lidas
-    ]
-    MessageRead.objects.bulk_create(reads, ignore_conflicts=True)
-    
-    return JsonResponse({'status': 'ok', 'marked': len(reads)})
+
+    # Avança o cursor até a última mensagem: uma linha por (sala, usuário)
+    marcadas = room.get_unread_count(request.user)
+    RoomReadCursor.marcar_lido(room.id, request.user)
+
+    return JsonResponse({'status': 'ok', 'marked': marcadas})
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
-from .models import Cliente
+from .models import Cliente, ImportacaoCliente
 from core.mixins import AdminFilialScopedMixin
 
 @admin.register(Cliente)
@@ -71,4 +71,16 @@ class ClienteAdmin(AdminFilialScopedMixin, admin.ModelAdmin):
     @admin.action(description=_('Desativar clientes selecionados'))
     def desativar_clientes(self, request, queryset):
         updated = queryset.update(estatus=False)
-        self.message_user(request, _(f'{updated} clientes foram desativados com sucesso.'))
\ No newline at end of file
+        self.message_user(request, _(f'{updated} clientes foram desativados com sucesso.'))
+
+
+@admin.register(ImportacaoCliente)
+class ImportacaoClienteAdmin(AdminFilialScopedMixin, admin.ModelAdmin):
+    list_display = ('nome_arquivo', 'filial', 'usuario', 'simulacao', 'status',
+                    'processadas', 'sucessos', 'erros', 'criado_em', 'concluido_em')
+    list_filter = ('status', 'simulacao', 'filial', 'criado_em')
+    search_fields = ('nome_arquivo', 'usuario__username', 'task_id')
+    readonly_fields = ('filial', 'usuario', 'arquivo', 'nome_arquivo', 'simulacao', 'status',
+                       'total_linhas', 'processadas', 'sucessos', 'erros', 'resultado',
+                       'mensagem_erro', 'task_id', 'criado_em', 'iniciado_em', 'concluido_em')
+    ordering = ('-criado_em',)
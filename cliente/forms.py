@@ -73,6 +73,9 @@ class ClienteForm(forms.ModelForm):
 class ImportacaoMassaForm(forms.Form):
     """Form para upload de planilha de importação em massa."""
 
+    # A planilha é lida em streaming num job Celery; o limite só protege o upload
+    TAMANHO_MAXIMO_MB = 20
+
     arquivo = forms.FileField(
         label=_("Planilha Excel (.xlsx)"),
         help_text=_("Envie o arquivo .xlsx preenchido com base no modelo."),
@@ -83,6 +86,12 @@ class ImportacaoMassaForm(forms.Form):
             }
         ),
     )
+    simular = forms.BooleanField(
+        label=_("Apenas validar (simulação)"),
+        help_text=_("Confere todas as linhas sem gravar nenhum cliente."),
+        required=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
 
     def clean_arquivo(self):
         arquivo = self.cleaned_data.get("arquivo")
@@ -91,9 +100,10 @@ class ImportacaoMassaForm(forms.Form):
                 raise forms.ValidationError(
                     _("Apenas arquivos .xlsx são aceitos.")
                 )
-            if arquivo.size > 5 * 1024 * 1024:
+            if arquivo.size > self.TAMANHO_MAXIMO_MB * 1024 * 1024:
                 raise forms.ValidationError(
-                    _("Arquivo muito grande. Tamanho máximo: 5MB.")
+                    _("Arquivo muito grande. Tamanho máximo: %(mb)sMB.")
+                    % {"mb": self.TAMANHO_MAXIMO_MB}
                 )
         return arquivo
 
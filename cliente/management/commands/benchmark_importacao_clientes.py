@@ -0,0 +1,125 @@
+# benchmark_importacao_clientes.py
+
+"""
+Mede a vazão (linhas/s) da importação em massa de clientes.
+
+Gera planilhas sintéticas no layout do modelo (1k, 10k e 50k linhas por
+padrão, com endereços repetidos entre clientes) e roda
+`processar_planilha` sobre cada uma dentro de uma transação desfeita ao
+final — nada fica gravado.
+
+    python manage.py benchmark_importacao_clientes
+    python manage.py benchmark_importacao_clientes --linhas 1000 5000 --simular
+"""
+
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from openpyxl import Workbook
+
+from cliente.services.importacao_massa import (
+    TAMANHO_LOTE,
+    TODAS_COLUNAS,
+    processar_planilha,
+)
+from usuario.models import Filial
+
+
+# Clientes por endereço nas planilhas geradas
+CLIENTES_POR_ENDERECO = 3
+
+
+def _cnpj_sintetico(n):
+    """CNPJ válido (com dígitos verificadores) derivado de `n`."""
+    base = f"{n % 10**8:08d}0001"
+    for pesos in ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]):
+        resto = sum(int(d) * p for d, p in zip(base, pesos)) % 11
+        base += str(0 if resto < 2 else 11 - resto)
+    return f"{base[:2]}.{base[2:5]}.{base[5:8]}/{base[8:12]}-{base[12:]}"
+
+
+def gerar_planilha_sintetica(total_linhas, semente=0):
+    """Planilha .xlsx (BytesIO) com `total_linhas` clientes válidos."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Dados Clientes")
+    ws.append(["Linha gerada para benchmark"])
+    ws.append([header for header, *_ in TODAS_COLUNAS])
+
+    for i in range(total_linhas):
+        endereco = i // CLIENTES_POR_ENDERECO
+        ws.append([
+            f"Cliente Benchmark {i} LTDA", f"Benchmark {i}",
+            _cnpj_sintetico(semente + i), "CM1", None, None, None,
+            "(11) 3333-4444", f"contato{i}@exemplo.com.br",
+            "01/01/2024", None, "SIM", None,
+            "Rua", f"Benchmark {endereco}", endereco % 9000 + 1,
+            f"{10000000 + endereco % 80000000:08d}", None,
+            "Centro", "São Paulo", "SP", "Brasil", None, None, None,
+        ])
+
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class Command(BaseCommand):
+    help = 'Mede linhas/s da importação em massa de clientes (nada é gravado)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--linhas',
+            nargs='+',
+            type=int,
+            default=[1000, 10000, 50000],
+            help='Tamanhos de planilha a medir (padrão: 1000 10000 50000)',
+        )
+        parser.add_argument(
+            '--filial',
+            type=int,
+            help='ID da filial usada na importação (padrão: a primeira)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANHO_LOTE,
+            help=f'Linhas por lote (padrão: {TAMANHO_LOTE})',
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Mede só a validação (modo simulação)',
+        )
+
+    def handle(self, *args, **options):
+        if options['filial']:
+            filial = Filial.objects.filter(pk=options['filial']).first()
+        else:
+            filial = Filial.objects.order_by('pk').first()
+        if filial is None:
+            raise CommandError('Nenhuma filial encontrada. Informe --filial.')
+
+        modo = 'simulação' if options['simular'] else 'gravação'
+        self.stdout.write(f"📊 Importação de clientes — {modo}, lotes de {options['lote']}, filial {filial}")
+        self.stdout.write(f"{'Linhas':>8} {'Leitura+gravação':>18} {'Linhas/s':>10} {'OK':>8} {'Erros':>7}")
+
+        for total in options['linhas']:
+            planilha = gerar_planilha_sintetica(total, semente=total * 7)
+
+            with transaction.atomic():
+                inicio = time.perf_counter()
+                resultado = processar_planilha(
+                    planilha, filial,
+                    simular=options['simular'], tamanho_lote=options['lote'],
+                )
+                decorrido = time.perf_counter() - inicio
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{total:>8} {decorrido:>17.2f}s {total / decorrido:>10.0f} "
+                f"{resultado['sucessos']:>8} {resultado['erros']:>7}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark concluído (nenhum dado foi gravado).'))
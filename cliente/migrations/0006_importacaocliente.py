@@ -0,0 +1,46 @@
+# Generated by Django 5.2.17 on 2026-10-17 23:01
+
+import django.db.models.deletion
+import documentos.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliente', '0005_alter_cliente_options'),
+        ('usuario', '0003_padroniza_nomes_grupos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacaoCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arquivo', models.FileField(blank=True, storage=documentos.storage.PrivateMediaStorage(), upload_to='importacoes/clientes/%Y/%m/', verbose_name='Planilha')),
+                ('nome_arquivo', models.CharField(blank=True, max_length=255, verbose_name='Nome do Arquivo')),
+                ('simulacao', models.BooleanField(default=False, verbose_name='Simulação')),
+                ('status', models.CharField(choices=[('pendente', 'Na fila'), ('processando', 'Processando'), ('concluido', 'Concluída'), ('erro', 'Erro')], db_index=True, default='pendente', max_length=15, verbose_name='Status')),
+                ('total_linhas', models.PositiveIntegerField(default=0, verbose_name='Linhas (estimativa)')),
+                ('processadas', models.PositiveIntegerField(default=0, verbose_name='Linhas Processadas')),
+                ('sucessos', models.PositiveIntegerField(default=0, verbose_name='Sucessos')),
+                ('erros', models.PositiveIntegerField(default=0, verbose_name='Erros')),
+                ('resultado', models.JSONField(blank=True, default=dict, verbose_name='Relatório')),
+                ('mensagem_erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('task_id', models.CharField(blank=True, max_length=255, verbose_name='ID da Task')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Enviado em')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('filial', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='importacoes_clientes', to='usuario.filial', verbose_name='Filial')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='importacoes_clientes', to=settings.AUTH_USER_MODEL, verbose_name='Enviado por')),
+            ],
+            options={
+                'verbose_name': 'Importação de Clientes',
+                'verbose_name_plural': 'Importações de Clientes',
+                'db_table': 'cliente_importacao',
+                'ordering': ['-criado_em'],
+            },
+        ),
+    ]
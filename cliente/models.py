@@ -12,15 +12,20 @@ Arquitetura de Filial:
   ✅ Model com campo `filial` direto → FilialManager
 """
 
+from django.conf import settings
 from django.db import models
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
+from core.importacao import ImportacaoPlanilha
 from core.managers import FilialManager
 from core.validators import validate_cnpj, validate_email, validate_telefone
+from documentos.storage import PrivateMediaStorage
 from logradouro.models import Logradouro
 from usuario.models import Filial
 
+private_storage = PrivateMediaStorage()
+
 
 class Cliente(models.Model):
     """
@@ -240,4 +245,48 @@ class Cliente(models.Model):
         return self.nome
 
     def __str__(self):
-        return self.nome
\ No newline at end of file
+        return self.nome
+
+
+class ImportacaoCliente(ImportacaoPlanilha):
+    """
+    Importação em massa de clientes processada em background (Celery).
+
+    Guarda a planilha enviada até o processamento terminar, o progresso
+    (linhas processadas / estimadas) e o relatório final em `resultado`.
+    """
+
+    filial = models.ForeignKey(
+        Filial,
+        on_delete=models.PROTECT,
+        related_name="importacoes_clientes",
+        verbose_name=_("Filial"),
+        null=True,
+        blank=True,
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="importacoes_clientes",
+        verbose_name=_("Enviado por"),
+        null=True,
+        blank=True,
+    )
+    arquivo = models.FileField(
+        _("Planilha"),
+        upload_to="importacoes/clientes/%Y/%m/",
+        storage=private_storage,
+        blank=True,
+    )
+    simulacao = models.BooleanField(_("Simulação"), default=False)
+
+    objects = FilialManager()
+
+    class Meta:
+        db_table = "cliente_importacao"
+        verbose_name = _("Importação de Clientes")
+        verbose_name_plural = _("Importações de Clientes")
+        ordering = ["-criado_em"]
+
+    def get_absolute_url(self):
+        return reverse("cliente:importacao_status", kwargs={"pk": self.pk})
@@ -5,16 +5,19 @@ Service para importação em massa de Clientes via planilha Excel.
 Responsabilidades:
   - Gerar planilha modelo (.xlsx) com instruções e validações
   - Processar upload: validar, criar Logradouro + Cliente
+    (leitura em streaming, lotes com bulk_create, modo simulação)
+  - Rodar a importação como job Celery com progresso
   - Retornar relatório detalhado (sucessos, erros por linha)
 """
 
+import logging
 import re
 from datetime import datetime
 from io import BytesIO
 
-from django.db import transaction
+from django.db import DatabaseError, transaction
 from django.utils.translation import gettext_lazy as _
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
 from openpyxl.styles import (
     Alignment,
     Border,
@@ -27,9 +30,11 @@ from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.datavalidation import DataValidation
 
 from cliente.models import Cliente
+from core.importacao import PlanilhaInvalida, abrir_planilha, criar_importacao, em_lotes, erros_modelo
 from logradouro.constant import ESTADOS_BRASIL, TIPOS_LOGRADOURO
 from logradouro.models import Logradouro
 
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # CONSTANTES
@@ -502,17 +507,32 @@ def _criar_aba_referencia(ws):
 # PROCESSAMENTO DA PLANILHA ENVIADA
 # ============================================================================
 
+TAMANHO_LOTE = 500
+LINHA_INICIAL = 3  # Linha 1=dica, 2=header, 3+=dados
 
-def processar_planilha(arquivo, filial):
+# O relatório fica guardado no job (JSONField); acima disso só conta
+LIMITE_DETALHES_SUCESSO = 500
+LIMITE_DETALHES_ERRO = 2000
+
+CAMPOS_CHAVE_LOGRADOURO = ("tipo_logradouro", "endereco", "numero", "complemento", "cep")
+
+
+def processar_planilha(arquivo, filial, simular=False, progresso=None, tamanho_lote=TAMANHO_LOTE):
     """
     Processa planilha Excel enviada e cria Logradouros + Clientes.
 
+    A planilha é lida em streaming (read_only) e tratada em lotes de
+    `tamanho_lote` linhas: CNPJs e endereços já cadastrados são buscados
+    uma vez por lote e os registros novos entram com bulk_create.
+
     Args:
-        arquivo: InMemoryUploadedFile (arquivo .xlsx)
+        arquivo: arquivo .xlsx (upload, arquivo aberto ou caminho)
         filial: Instância de Filial do usuário logado
+        simular: apenas valida — nada é gravado
+        progresso: callable(processadas, total_estimado), chamado a cada lote
 
     Returns:
-        dict com total, sucessos, erros, detalhes_sucesso, detalhes_erro
+        dict com total, sucessos, erros, detalhes_sucesso, detalhes_erro, simulacao
     """
     resultado = {
         "total": 0,
@@ -520,76 +540,270 @@ def processar_planilha(arquivo, filial):
         "erros": 0,
         "detalhes_sucesso": [],
         "detalhes_erro": [],
+        "simulacao": simular,
     }
 
     try:
-        wb = load_workbook(arquivo, data_only=True)
-    except Exception:
+        planilha = abrir_planilha(arquivo, aba="Dados Clientes")
+    except PlanilhaInvalida:
         resultado["detalhes_erro"].append(
             {"linha": 0, "erros": ["Arquivo inválido. Envie um arquivo .xlsx válido."]}
         )
         return resultado
 
-    # Procura aba "Dados Clientes"
-    if "Dados Clientes" in wb.sheetnames:
-        ws = wb["Dados Clientes"]
-    else:
-        ws = wb.worksheets[0]
+    importador = _ImportadorClientes(filial, simular, resultado)
 
-    start_row = 3  # Linha 1=dica, 2=header, 3+=dados
-    total_colunas = len(TODAS_COLUNAS)
+    with planilha:
+        total_estimado = planilha.total_estimado(LINHA_INICIAL)
+        linhas = planilha.linhas(LINHA_INICIAL, len(TODAS_COLUNAS))
 
-    for row_idx in range(start_row, ws.max_row + 1):
-        valores = []
-        for col_idx in range(1, total_colunas + 1):
-            cell_value = ws.cell(row=row_idx, column=col_idx).value
-            valores.append(cell_value)
+        for lote in em_lotes(linhas, tamanho_lote):
+            importador.processar_lote(lote)
+            if progresso:
+                progresso(resultado["total"], max(total_estimado, resultado["total"]))
 
-        # Pular linhas vazias
-        if all(v is None or str(v).strip() == "" for v in valores):
-            continue
-
-        resultado["total"] += 1
-        erros_linha = []
-
-        # Mapear valores
-        dados_cliente = {}
-        for i, (_, campo, _, _, _) in enumerate(COLUNAS_CLIENTE):
-            dados_cliente[campo] = valores[i]
+    # Erros de planilha e de banco são apurados em passadas diferentes do lote
+    resultado["detalhes_erro"].sort(key=lambda item: item["linha"])
+    return resultado
 
-        dados_endereco = {}
-        offset = len(COLUNAS_CLIENTE)
-        for i, (_, campo, _, _, _) in enumerate(COLUNAS_ENDERECO):
-            dados_endereco[campo] = valores[offset + i]
 
-        # Validações
-        erros_linha.extend(_validar_cliente(dados_cliente))
-        erros_linha.extend(_validar_endereco(dados_endereco))
+class _ImportadorClientes:
+    """
+    Estado da importação entre os lotes.
 
-        if erros_linha:
-            resultado["erros"] += 1
-            resultado["detalhes_erro"].append(
-                {"linha": row_idx, "erros": erros_linha}
-            )
-            continue
+    - `cnpjs_planilha`: CNPJs já aceitos nesta planilha (repetição = erro);
+    - `logradouros`: chave do endereço → pk do Logradouro da filial
+      (None = endereço novo numa simulação), para linhas seguintes que
+      repetem o mesmo endereço reaproveitarem o registro.
+    """
 
-        # Criar registros
+    def __init__(self, filial, simular, resultado):
+        self.filial = filial
+        self.simular = simular
+        self.resultado = resultado
+        self.cnpjs_planilha = set()
+        self.logradouros = {}
+        # FKs ficam fora do full_clean (cada uma seria uma query por linha);
+        # sem filial, deixa o full_clean acusar o campo obrigatório.
+        self.exclude_fk = ["filial"] if filial is not None else []
+
+    # ------------------------------------------------------------------
+    # LOTE
+    # ------------------------------------------------------------------
+
+    def processar_lote(self, lote):
+        validas = []
+        for row_idx, valores in lote:
+            self.resultado["total"] += 1
+            dados_cliente, dados_endereco = _mapear_linha(valores)
+
+            erros_linha = _validar_cliente(dados_cliente) + _validar_endereco(dados_endereco)
+            if erros_linha:
+                self._erro(row_idx, erros_linha)
+                continue
+
+            validas.append((
+                row_idx,
+                _montar_cliente(dados_cliente, self.filial),
+                _montar_logradouro(dados_endereco, self.filial),
+            ))
+
+        if not validas:
+            return
+
+        cnpjs_cadastrados = set(
+            Cliente.objects.all_filiais()
+            .filter(cnpj__in={cliente.cnpj for _linha, cliente, _log in validas})
+            .values_list("cnpj", flat=True)
+        )
+        outras_filiais = self._carregar_logradouros({log.cep for _linha, _cliente, log in validas})
+
+        novos = {}       # chave → Logradouro a criar neste lote
+        pendentes = []   # (linha, Cliente, chave do logradouro)
+        for row_idx, cliente, logradouro in validas:
+            erros_linha = self._validar_cliente_modelo(cliente, cnpjs_cadastrados)
+
+            chave = _chave_logradouro(logradouro)
+            if not erros_linha and chave not in self.logradouros and chave not in novos:
+                if chave in outras_filiais:
+                    erros_linha = ["Endereço já cadastrado em outra filial."]
+                else:
+                    erros_linha = erros_modelo(logradouro, self.exclude_fk)
+                    if not erros_linha:
+                        novos[chave] = logradouro
+
+            if erros_linha:
+                self._erro(row_idx, erros_linha)
+                continue
+
+            self.cnpjs_planilha.add(cliente.cnpj)
+            pendentes.append((row_idx, cliente, chave))
+
+        if self.simular:
+            self.logradouros.update(dict.fromkeys(novos))
+            for row_idx, cliente, _chave in pendentes:
+                self._sucesso(row_idx, cliente)
+            return
+
+        self._gravar(novos, pendentes)
+
+    def _validar_cliente_modelo(self, cliente, cnpjs_cadastrados):
+        if cliente.cnpj in cnpjs_cadastrados:
+            return [f"Já existe um cliente cadastrado com o CNPJ {cliente.cnpj}."]
+        if cliente.cnpj in self.cnpjs_planilha:
+            return [f"CNPJ {cliente.cnpj} repetido na planilha."]
+        return erros_modelo(cliente, ["logradouro"] + self.exclude_fk)
+
+    def _carregar_logradouros(self, ceps):
+        """
+        Busca de uma vez os endereços já cadastrados com os CEPs do lote.
+
+        Os da filial vão para `self.logradouros`; retorna as chaves que
+        pertencem a outras filiais (a constraint de endereço é global).
+        """
+        outras_filiais = set()
+        existentes = (
+            Logradouro.objects.all_filiais()
+            .filter(cep__in=ceps)
+            .values_list("pk", "filial_id", *CAMPOS_CHAVE_LOGRADOURO)
+        )
+        filial_id = getattr(self.filial, "pk", None)
+        for pk, log_filial_id, *campos in existentes:
+            chave = _chave_logradouro_valores(*campos)
+            if log_filial_id == filial_id:
+                self.logradouros.setdefault(chave, pk)
+            else:
+                outras_filiais.add(chave)
+        return outras_filiais
+
+    # ------------------------------------------------------------------
+    # GRAVAÇÃO
+    # ------------------------------------------------------------------
+
+    def _gravar(self, novos, pendentes):
         try:
             with transaction.atomic():
-                logradouro = _criar_ou_buscar_logradouro(dados_endereco, filial)
-                cliente = _criar_cliente(dados_cliente, logradouro, filial)
-                resultado["sucessos"] += 1
-                resultado["detalhes_sucesso"].append(
-                    f"Linha {row_idx}: {cliente.razao_social} "
-                    f"(CNPJ: {cliente.cnpj}) — importado com sucesso."
-                )
-        except Exception as e:
-            resultado["erros"] += 1
-            resultado["detalhes_erro"].append(
-                {"linha": row_idx, "erros": [f"Erro ao salvar: {str(e)}"]}
+                criados = self._inserir_logradouros(novos)
+                clientes = []
+                for _linha, cliente, chave in pendentes:
+                    cliente.logradouro_id = criados.get(chave) or self.logradouros[chave]
+                    clientes.append(cliente)
+                Cliente.objects.bulk_create(clientes)
+        except DatabaseError:
+            # Conflito com algo gravado em paralelo: refaz linha a linha
+            # para atribuir o erro à linha certa.
+            logger.warning("Lote da importação de clientes falhou; gravando linha a linha.", exc_info=True)
+            self._gravar_linha_a_linha(novos, pendentes)
+            return
+
+        self.logradouros.update(criados)
+        for row_idx, cliente, _chave in pendentes:
+            self._sucesso(row_idx, cliente)
+
+    def _inserir_logradouros(self, novos):
+        """bulk_create dos endereços novos; retorna chave → pk."""
+        if not novos:
+            return {}
+
+        objetos = Logradouro.objects.bulk_create(list(novos.values()))
+        if all(obj.pk for obj in objetos):
+            return {chave: obj.pk for chave, obj in zip(novos, objetos)}
+
+        # MySQL não devolve os ids do bulk_create: relê pelos CEPs do lote
+        criados = {}
+        recarregados = (
+            Logradouro.objects.all_filiais()
+            .filter(filial=self.filial, cep__in={obj.cep for obj in objetos})
+            .values_list("pk", *CAMPOS_CHAVE_LOGRADOURO)
+        )
+        for pk, *campos in recarregados:
+            chave = _chave_logradouro_valores(*campos)
+            if chave in novos:
+                criados[chave] = pk
+        return criados
+
+    def _gravar_linha_a_linha(self, novos, pendentes):
+        for row_idx, cliente, chave in pendentes:
+            logradouro_id = self.logradouros.get(chave)
+            try:
+                with transaction.atomic():
+                    if logradouro_id is None:
+                        logradouro = novos[chave]
+                        logradouro.pk = None
+                        logradouro._state.adding = True
+                        logradouro.save()
+                        logradouro_id = logradouro.pk
+
+                    cliente.pk = None
+                    cliente._state.adding = True
+                    cliente.logradouro_id = logradouro_id
+                    cliente.full_clean()
+                    cliente.save()
+            except Exception as e:
+                self._erro(row_idx, [f"Erro ao salvar: {str(e)}"])
+                continue
+
+            self.logradouros[chave] = logradouro_id
+            self._sucesso(row_idx, cliente)
+
+    # ------------------------------------------------------------------
+    # RELATÓRIO
+    # ------------------------------------------------------------------
+
+    def _sucesso(self, row_idx, cliente):
+        self.resultado["sucessos"] += 1
+        if len(self.resultado["detalhes_sucesso"]) < LIMITE_DETALHES_SUCESSO:
+            situacao = "válido (simulação)" if self.simular else "importado com sucesso"
+            self.resultado["detalhes_sucesso"].append(
+                f"Linha {row_idx}: {cliente.razao_social} "
+                f"(CNPJ: {cliente.cnpj}) — {situacao}."
             )
 
-    return resultado
+    def _erro(self, row_idx, erros_linha):
+        self.resultado["erros"] += 1
+        if len(self.resultado["detalhes_erro"]) < LIMITE_DETALHES_ERRO:
+            self.resultado["detalhes_erro"].append({"linha": row_idx, "erros": erros_linha})
+
+
+def _mapear_linha(valores):
+    """Separa os valores da linha em (dados_cliente, dados_endereco)."""
+    offset = len(COLUNAS_CLIENTE)
+    dados_cliente = {
+        coluna[1]: valores[i] for i, coluna in enumerate(COLUNAS_CLIENTE)
+    }
+    dados_endereco = {
+        coluna[1]: valores[offset + i] for i, coluna in enumerate(COLUNAS_ENDERECO)
+    }
+    return dados_cliente, dados_endereco
+
+
+def _chave_logradouro_valores(tipo_logradouro, endereco, numero, complemento, cep):
+    return (tipo_logradouro, endereco.strip().lower(), numero, complemento or None, cep)
+
+
+def _chave_logradouro(logradouro):
+    return _chave_logradouro_valores(
+        *(getattr(logradouro, campo) for campo in CAMPOS_CHAVE_LOGRADOURO)
+    )
+
+
+# ============================================================================
+# JOB EM BACKGROUND
+# ============================================================================
+
+
+def iniciar_importacao(arquivo, filial, usuario, simular=False):
+    """
+    Guarda a planilha num ImportacaoCliente e enfileira o processamento
+    (task `cliente.importar_planilha`) após o commit.
+    """
+    from cliente.models import ImportacaoCliente
+    from cliente.tasks import importar_planilha_clientes_task
+
+    return criar_importacao(
+        ImportacaoCliente, arquivo, filial, usuario,
+        importar_planilha_clientes_task, simulacao=simular,
+    )
 
 
 # ============================================================================
@@ -726,7 +940,7 @@ def _validar_endereco(dados):
 
 
 # ============================================================================
-# CRIAÇÃO DE REGISTROS
+# MONTAGEM DOS REGISTROS
 # ============================================================================
 
 
@@ -750,10 +964,8 @@ def _resolver_tipo_logradouro(valor):
     return "RUA"
 
 
-def _criar_ou_buscar_logradouro(dados, filial):
-    """
-    Busca logradouro existente ou cria novo.
-    """
+def _montar_logradouro(dados, filial):
+    """Logradouro (não salvo) com os dados validados da linha."""
     tipo_logradouro = _resolver_tipo_logradouro(dados["tipo_logradouro"])
     endereco = str(dados["endereco"]).strip()
     numero = int(float(str(dados["numero"])))
@@ -783,23 +995,7 @@ def _criar_ou_buscar_logradouro(dados, filial):
     latitude = _parse_decimal(dados.get("latitude"))
     longitude = _parse_decimal(dados.get("longitude"))
 
-    # Busca existente
-    try:
-        logradouro = Logradouro.objects.model.objects.filter(
-            tipo_logradouro=tipo_logradouro,
-            endereco__iexact=endereco,
-            numero=numero,
-            complemento=complemento,
-            cep=cep,
-            filial=filial,
-        ).first()
-    except Exception:
-        logradouro = None
-
-    if logradouro:
-        return logradouro
-
-    logradouro = Logradouro(
+    return Logradouro(
         tipo_logradouro=tipo_logradouro,
         endereco=endereco,
         numero=numero,
@@ -814,12 +1010,10 @@ def _criar_ou_buscar_logradouro(dados, filial):
         longitude=longitude,
         filial=filial,
     )
-    logradouro.save()
-    return logradouro
 
 
-def _criar_cliente(dados, logradouro, filial):
-    """Cria instância de Cliente com os dados validados."""
+def _montar_cliente(dados, filial):
+    """Cliente (não salvo, sem logradouro) com os dados validados da linha."""
     cnpj_str = str(dados["cnpj"]).strip()
     digitos = re.sub(r"\D", "", cnpj_str)
     cnpj_formatado = (
@@ -873,7 +1067,7 @@ def _criar_cliente(dados, logradouro, filial):
         else None
     )
 
-    cliente = Cliente(
+    return Cliente(
         razao_social=str(dados["razao_social"]).strip(),
         nome=str(dados["nome"]).strip(),
         cnpj=cnpj_formatado,
@@ -883,16 +1077,12 @@ def _criar_cliente(dados, logradouro, filial):
         inscricao_municipal=inscricao_municipal,
         telefone=telefone,
         email=email,
-        logradouro=logradouro,
         data_de_inicio=data_inicio,
         data_encerramento=data_enc,
         estatus=estatus,
         observacoes=observacoes,
         filial=filial,
     )
-    cliente.full_clean()
-    cliente.save()
-    return cliente
 
 
 # ============================================================================
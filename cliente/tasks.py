@@ -0,0 +1,27 @@
+# cliente/tasks.py
+import logging
+
+from celery import shared_task
+
+from core.importacao import executar_importacao
+
+from .models import ImportacaoCliente
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="cliente.importar_planilha")
+def importar_planilha_clientes_task(importacao_id):
+    """Processa a planilha de um ImportacaoCliente e guarda o relatório."""
+    from .services.importacao_massa import processar_planilha
+
+    def processar(importacao, arquivo, progresso):
+        return processar_planilha(
+            arquivo, importacao.filial,
+            simular=importacao.simulacao, progresso=progresso,
+        )
+
+    return executar_importacao(
+        ImportacaoCliente, importacao_id, processar,
+        itens="clientes", icone="bi-file-earmark-spreadsheet",
+    )
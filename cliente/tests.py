@@ -1,3 +1,222 @@
-from django.test import TestCase
+"""
+Testes para o módulo cliente
+python manage.py test cliente
+"""
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from openpyxl import Workbook
+
+from core.jobs import concluir
+from logradouro.models import Logradouro
+from notifications.models import Notificacao
+from usuario.models import Filial
+
+from .management.commands.benchmark_importacao_clientes import _cnpj_sintetico
+from .models import Cliente, ImportacaoCliente
+from .services.importacao_massa import TODAS_COLUNAS, processar_planilha
+from .tasks import importar_planilha_clientes_task
+
+User = get_user_model()
+
+# URLconf só com o app (a raiz importa apps que exigem as libs do WeasyPrint)
+urlpatterns = [path('cliente/', include('cliente.urls'))]
+
+
+def _linha(n, **campos):
+    """Valores de uma linha válida da planilha, na ordem de TODAS_COLUNAS."""
+    dados = {
+        "razao_social": f"Cliente {n} LTDA", "nome": f"Cliente {n}",
+        "cnpj": _cnpj_sintetico(n), "data_de_inicio": "01/01/2024", "estatus": "SIM",
+        "tipo_logradouro": "Rua", "endereco": f"Teste {n}", "numero": 10,
+        "cep": "01001000", "bairro": "Centro", "cidade": "São Paulo", "estado": "SP",
+    }
+    dados.update(campos)
+    return [dados.get(campo) for _, campo, *_ in TODAS_COLUNAS]
+
+
+def _planilha(linhas):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Dados Clientes")
+    ws.append(["Dica"])
+    ws.append([header for header, *_ in TODAS_COLUNAS])
+    for linha in linhas:
+        ws.append(linha)
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class ImportacaoClientesTestBase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial Importação')
+        cls.outra_filial = Filial.objects.create(nome='Outra Filial')
+        cls.usuario = User.objects.create_superuser(
+            username='importador', email='importador@example.com', password='x',
+            filial_ativa=cls.filial,
+        )
+
+
+class ProcessarPlanilhaTestCase(ImportacaoClientesTestBase):
+
+    def test_importa_clientes_e_reaproveita_endereco(self):
+        planilha = _planilha([
+            _linha(1, endereco='Compartilhado'),
+            _linha(2, endereco='Compartilhado'),
+            [None] * len(TODAS_COLUNAS),
+            _linha(3),
+        ])
+
+        resultado = processar_planilha(planilha, self.filial)
+
+        self.assertEqual((resultado['total'], resultado['sucessos'], resultado['erros']), (3, 3, 0))
+        self.assertEqual(Cliente.objects.filter(filial=self.filial).count(), 3)
+        self.assertEqual(Logradouro.objects.filter(filial=self.filial).count(), 2)
+        self.assertEqual(
+            Cliente.objects.get(cnpj=_cnpj_sintetico(1)).logradouro_id,
+            Cliente.objects.get(cnpj=_cnpj_sintetico(2)).logradouro_id,
+        )
+
+    def test_simulacao_nao_grava(self):
+        resultado = processar_planilha(
+            _planilha([_linha(1), _linha(2, cnpj=_cnpj_sintetico(1))]),
+            self.filial, simular=True,
+        )
+
+        self.assertTrue(resultado['simulacao'])
+        self.assertEqual((resultado['sucessos'], resultado['erros']), (1, 1))
+        self.assertFalse(Cliente.objects.exists())
+        self.assertFalse(Logradouro.objects.exists())
+
+    def test_erros_por_linha(self):
+        existente = Logradouro.objects.create(
+            endereco='Outra', numero=1, cep='02002000', bairro='Centro',
+            cidade='São Paulo', estado='SP', filial=self.outra_filial,
+        )
+        Cliente.objects.create(
+            razao_social='Já Existe LTDA', nome='Já Existe', cnpj=_cnpj_sintetico(1),
+            logradouro=existente, data_de_inicio=date.today(), filial=self.outra_filial,
+        )
+
+        resultado = processar_planilha(_planilha([
+            _linha(1),                                   # CNPJ já cadastrado
+            _linha(2),
+            _linha(3, cnpj=_cnpj_sintetico(2)),          # repetido na planilha
+            _linha(4, endereco='Outra', numero=1, cep='02002000'),  # endereço de outra filial
+            _linha(5, estado='XX'),                      # validação da planilha
+            _linha(6, cnpj='11.111.111/1111-12'),        # dígito verificador
+        ]), self.filial)
+
+        self.assertEqual((resultado['sucessos'], resultado['erros']), (1, 5))
+        linhas_com_erro = [item['linha'] for item in resultado['detalhes_erro']]
+        self.assertEqual(linhas_com_erro, [3, 5, 6, 7, 8])
+        self.assertTrue(Cliente.objects.filter(cnpj=_cnpj_sintetico(2)).exists())
+
+    def test_arquivo_invalido(self):
+        resultado = processar_planilha(BytesIO(b'nao e xlsx'), self.filial)
+        self.assertEqual(resultado['total'], 0)
+        self.assertEqual(resultado['detalhes_erro'][0]['linha'], 0)
+
+    def test_queries_por_lote_nao_dependem_das_linhas(self):
+        def queries(inicio, total):
+            planilha = _planilha([_linha(n) for n in range(inicio, inicio + total)])
+            with CaptureQueriesContext(connection) as ctx:
+                resultado = processar_planilha(planilha, self.filial, tamanho_lote=1000)
+            self.assertEqual(resultado['sucessos'], total)
+            # bulk_create no SQLite quebra os INSERTs pelo limite de parâmetros
+            return len([q for q in ctx.captured_queries if not q['sql'].startswith('INSERT')])
+
+        self.assertEqual(queries(100, 10), queries(1000, 300))
+
+    def test_conflito_no_lote_grava_linha_a_linha(self):
+        with patch.object(Cliente.objects, 'bulk_create', side_effect=IntegrityError('conflito')):
+            resultado = processar_planilha(_planilha([_linha(1), _linha(2)]), self.filial)
+
+        self.assertEqual(resultado['sucessos'], 2)
+        self.assertEqual(Cliente.objects.count(), 2)
+        self.assertEqual(Logradouro.objects.count(), 2)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class ImportacaoClienteTaskTestCase(ImportacaoClientesTestBase):
+    """Storage privado apontado para um diretório temporário."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        campo = ImportacaoCliente._meta.get_field('arquivo')
+        storage = patch.object(campo, 'storage', FileSystemStorage(location=self.media))
+        storage.start()
+        self.addCleanup(storage.stop)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+    def _importacao(self, conteudo, **kwargs):
+        importacao = ImportacaoCliente(
+            filial=self.filial, usuario=self.usuario, nome_arquivo='clientes.xlsx', **kwargs,
+        )
+        importacao.arquivo.save('clientes.xlsx', ContentFile(conteudo), save=False)
+        importacao.save()
+        return importacao
+
+    def test_task_processa_e_notifica(self):
+        importacao = self._importacao(_planilha([_linha(1), _linha(2)]).getvalue())
+        caminho = importacao.arquivo.path
+
+        importar_planilha_clientes_task(importacao.pk)
+
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.status, ImportacaoCliente.STATUS_CONCLUIDO)
+        self.assertEqual((importacao.processadas, importacao.sucessos), (2, 2))
+        self.assertEqual(importacao.progresso, 100)
+        self.assertEqual(importacao.resultado['sucessos'], 2)
+        self.assertFalse(importacao.arquivo)
+        self.assertFalse(FileSystemStorage(location=self.media).exists(caminho))
+        self.assertTrue(Notificacao.objects.filter(usuario=self.usuario, tipo='sucesso').exists())
+
+        # Job já assumido não roda de novo
+        self.assertIsNone(importar_planilha_clientes_task(importacao.pk))
+
+    def test_task_simulacao(self):
+        importacao = self._importacao(_planilha([_linha(1)]).getvalue(), simulacao=True)
+
+        importar_planilha_clientes_task(importacao.pk)
+
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.sucessos, 1)
+        self.assertFalse(Cliente.objects.exists())
+
+    def test_job_travado_e_encerrado(self):
+        importacao = self._importacao(b'x', status=ImportacaoCliente.STATUS_PROCESSANDO)
+        recente = self._importacao(b'x')
+        ImportacaoCliente.objects.all_filiais().filter(pk=importacao.pk).update(
+            iniciado_em=timezone.now() - ImportacaoCliente.TEMPO_LIMITE - timedelta(minutes=1),
+        )
+        importacao.refresh_from_db()
+
+        self.assertTrue(importacao.travado)
+        self.assertFalse(recente.travado)
+        travados = ImportacaoCliente.objects.all_filiais().filter(ImportacaoCliente.q_travados())
+        self.assertEqual(list(travados), [importacao])
+
+        self.assertTrue(importacao.encerrar_se_travado())
+        self.assertEqual(importacao.status, ImportacaoCliente.STATUS_ERRO)
+        self.assertTrue(importacao.mensagem_erro)
+        self.assertFalse(recente.encerrar_se_travado())
+
+        # O worker atrasado não sobrescreve o job já encerrado
+        self.assertFalse(concluir(importacao, ["sucessos"]))
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.status, ImportacaoCliente.STATUS_ERRO)
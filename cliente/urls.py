@@ -7,7 +7,8 @@ from .views import (
     ClienteUpdateView,
     ClienteDeleteView,
     ExportarClientesExcelView,
-    cliente_autocomplete_view, download_modelo_view, importacao_massa_view, ajax_buscar_logradouros
+    cliente_autocomplete_view, download_modelo_view, importacao_massa_view, importacao_status_view,
+    ajax_buscar_logradouros
 )
 
 
@@ -26,5 +27,6 @@ urlpatterns = [
     path('ajax/logradouros/', ajax_buscar_logradouros, name='ajax_buscar_logradouros'),
     path("importacao/modelo/", download_modelo_view, name='download_modelo_importacao'),
     path("importacao/", importacao_massa_view, name='importacao_massa'),
+    path("importacao/<int:pk>/", importacao_status_view, name='importacao_status'),
 ]
 
@@ -14,7 +14,7 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.db import models as db_models
 from django.db.models import Q
 from django.http import HttpResponse, JsonResponse
-from django.shortcuts import redirect, render
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.views.generic import (
     CreateView, DeleteView, DetailView, ListView, UpdateView,
@@ -26,8 +26,8 @@ from logradouro.models import Logradouro
 from usuario.models import Filial
 
 from .forms import ClienteForm, ImportacaoMassaForm
-from .models import Cliente
-from .services.importacao_massa import gerar_planilha_modelo, processar_planilha
+from .models import Cliente, ImportacaoCliente
+from .services.importacao_massa import gerar_planilha_modelo, iniciar_importacao
 
 
 _APP = 'cliente'
@@ -472,7 +472,7 @@ def download_modelo_view(request):
 @login_required
 @app_permission_required(_APP)
 def importacao_massa_view(request):
-    """Upload e processamento da planilha de clientes."""
+    """Upload da planilha de clientes; o processamento roda em background."""
     # Exige permissão granular de criação
     if not request.user.has_perm('cliente.add_cliente'):
         messages.error(
@@ -493,14 +493,13 @@ def importacao_massa_view(request):
                 )
                 return redirect(request.path)
 
-            arquivo = form.cleaned_data["arquivo"]
-            resultado = processar_planilha(arquivo, filial)
-
-            return render(
-                request,
-                "cliente/importacao_massa_resultado.html",
-                {"resultado": resultado, "form": ImportacaoMassaForm()},
+            importacao = iniciar_importacao(
+                form.cleaned_data["arquivo"],
+                filial,
+                request.user,
+                simular=form.cleaned_data["simular"],
             )
+            return redirect(importacao.get_absolute_url())
     else:
         form = ImportacaoMassaForm()
 
@@ -509,3 +508,36 @@ def importacao_massa_view(request):
         "filial_ativa": filial,
     })
 
+
+@login_required
+@app_permission_required(_APP)
+def importacao_status_view(request, pk):
+    """
+    Andamento e relatório de uma importação.
+
+    HTMX recebe o fragmento de progresso; quando o job termina a resposta
+    usa o status 286, que encerra o polling.
+    """
+    importacao = get_object_or_404(ImportacaoCliente.objects.for_request(request), pk=pk)
+    # Worker perdido: encerra para a tela parar de esperar
+    importacao.encerrar_se_travado()
+
+    if request.headers.get("HX-Request"):
+        response = render(request, "cliente/partials/_importacao_progresso.html", {
+            "importacao": importacao,
+        })
+        if not importacao.em_andamento:
+            response.status_code = 286
+        return response
+
+    if importacao.status == ImportacaoCliente.STATUS_CONCLUIDO:
+        return render(request, "cliente/importacao_massa_resultado.html", {
+            "resultado": importacao.resultado,
+            "importacao": importacao,
+            "form": ImportacaoMassaForm(),
+        })
+
+    return render(request, "cliente/importacao_massa_status.html", {
+        "importacao": importacao,
+    })
+
@@ -0,0 +1,285 @@
+# core/cache.py
+"""
+Subsistema de cache compartilhado entre os apps.
+
+Em produção o backend `default` é Redis (settings.CACHES reaproveita o
+REDIS_URL), então contadores e valores cacheados valem para TODOS os
+workers do gunicorn/Daphne/Celery. Em testes o backend é LocMemCache.
+
+Uso:
+
+    from core.cache import CacheNamespace
+
+    cache_sup = CacheNamespace('suprimentos', versao=1)
+
+    cache_sup.get_or_set(cache_sup.chave('contadores', user.pk), calcular, 300)
+    cache_sup.get(cache_sup.chave_filial(filial_id, 'resumo'))
+
+Chaves:
+    <namespace>:v<versao>:<partes...>
+    <namespace>:v<versao>:f<filial_id>:<partes...>   (chave_filial)
+
+Trocar `versao` de um namespace invalida de uma vez todas as chaves dele
+(ex.: mudança no formato do valor guardado). O settings.CACHES ainda
+aplica KEY_PREFIX/VERSION globais por cima.
+
+Falhas do backend (Redis fora do ar) nunca derrubam a request: leituras
+viram miss e escritas são ignoradas, com log de aviso.
+
+Cada leitura alimenta contadores de hit/miss por namespace, somados entre
+processos e expostos em core.views_monitoramento.monitoramento_api.
+"""
+import logging
+import threading
+import time
+
+from django.core.cache import cache as _cache
+
+logger = logging.getLogger(__name__)
+
+# Sentinela para distinguir "não está no cache" de valores falsy
+_AUSENTE = object()
+
+METRICAS_NAMESPACE = 'core:cache:metricas'
+METRICAS_FLUSH_OPERACOES = 100
+METRICAS_FLUSH_SEGUNDOS = 10
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# MÉTRICAS (hit/miss)
+# ════════════════════════════════════════════════════════════════════════════
+
+class _MetricasCache:
+    """
+    Contadores de hit/miss por namespace.
+
+    Acumula localmente (sem custo de rede por leitura) e descarrega os
+    deltas no próprio cache a cada METRICAS_FLUSH_OPERACOES leituras ou
+    METRICAS_FLUSH_SEGUNDOS — assim o total reflete todos os workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pendentes = {}
+        self._operacoes = 0
+        self._ultimo_flush = time.monotonic()
+
+    def registrar(self, namespace, hit):
+        campo = 'hits' if hit else 'misses'
+        with self._lock:
+            chave = (namespace, campo)
+            self._pendentes[chave] = self._pendentes.get(chave, 0) + 1
+            self._operacoes += 1
+            precisa_flush = (
+                self._operacoes >= METRICAS_FLUSH_OPERACOES
+                or time.monotonic() - self._ultimo_flush >= METRICAS_FLUSH_SEGUNDOS
+            )
+        if precisa_flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+            self._operacoes = 0
+            self._ultimo_flush = time.monotonic()
+
+        if not pendentes:
+            return
+        try:
+            namespaces = {ns for ns, _ in pendentes}
+            _cache.add(f'{METRICAS_NAMESPACE}:namespaces', set(), None)
+            registrados = _cache.get(f'{METRICAS_NAMESPACE}:namespaces') or set()
+            if not namespaces <= registrados:
+                _cache.set(f'{METRICAS_NAMESPACE}:namespaces', registrados | namespaces, None)
+
+            for (ns, campo), delta in pendentes.items():
+                chave = f'{METRICAS_NAMESPACE}:{ns}:{campo}'
+                try:
+                    _cache.incr(chave, delta)
+                except ValueError:
+                    _cache.add(chave, 0, None)
+                    _cache.incr(chave, delta)
+        except Exception:
+            logger.warning("Falha ao publicar métricas do cache", exc_info=True)
+
+    def snapshot(self):
+        """Totais {namespace: {hits, misses, hit_ratio}} de todos os processos."""
+        self.flush()
+        try:
+            namespaces = sorted(_cache.get(f'{METRICAS_NAMESPACE}:namespaces') or ())
+            chaves = [
+                f'{METRICAS_NAMESPACE}:{ns}:{campo}'
+                for ns in namespaces for campo in ('hits', 'misses')
+            ]
+            valores = _cache.get_many(chaves) if chaves else {}
+        except Exception:
+            logger.warning("Falha ao ler métricas do cache", exc_info=True)
+            return {}
+
+        resultado = {}
+        for ns in namespaces:
+            hits = valores.get(f'{METRICAS_NAMESPACE}:{ns}:hits', 0)
+            misses = valores.get(f'{METRICAS_NAMESPACE}:{ns}:misses', 0)
+            total = hits + misses
+            resultado[ns] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / total, 3) if total else None,
+            }
+        return resultado
+
+    def resetar(self):
+        """Zera os contadores (uso em testes)."""
+        with self._lock:
+            self._pendentes = {}
+            self._operacoes = 0
+        try:
+            namespaces = _cache.get(f'{METRICAS_NAMESPACE}:namespaces') or ()
+            _cache.delete_many(
+                [f'{METRICAS_NAMESPACE}:namespaces'] + [
+                    f'{METRICAS_NAMESPACE}:{ns}:{campo}'
+                    for ns in namespaces for campo in ('hits', 'misses')
+                ]
+            )
+        except Exception:
+            logger.warning("Falha ao zerar métricas do cache", exc_info=True)
+
+
+metricas = _MetricasCache()
+
+
+def metricas_cache():
+    """Hit/miss por namespace + totais — consumido pelo monitoramento."""
+    por_namespace = metricas.snapshot()
+    hits = sum(m['hits'] for m in por_namespace.values())
+    misses = sum(m['misses'] for m in por_namespace.values())
+    total = hits + misses
+    return {
+        'backend': type(_cache).__name__,
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 3) if total else None,
+        'namespaces': por_namespace,
+    }
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# NAMESPACE
+# ════════════════════════════════════════════════════════════════════════════
+
+class CacheNamespace:
+    """
+    Fachada sobre o cache default com chaves namespaced/versionadas,
+    degradação silenciosa e métricas de hit/miss.
+    """
+
+    def __init__(self, nome, versao=1, timeout=300):
+        self.nome = nome
+        self.versao = versao
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f'<CacheNamespace {self.nome} v{self.versao}>'
+
+    # ── Chaves ────────────────────────────────────────────────────────────
+
+    def chave(self, *partes):
+        """`<namespace>:v<versao>:<partes>`."""
+        sufixo = ':'.join(str(p) for p in partes)
+        return f'{self.nome}:v{self.versao}:{sufixo}'
+
+    def chave_filial(self, filial, *partes):
+        """Chave escopada por filial (aceita instância, id ou None)."""
+        filial_id = getattr(filial, 'pk', filial)
+        return self.chave(f'f{filial_id or "sem"}', *partes)
+
+    def chave_usuario(self, usuario, *partes):
+        """Chave escopada por usuário (aceita instância ou id)."""
+        return self.chave(f'u{getattr(usuario, "pk", usuario)}', *partes)
+
+    # ── Operações ─────────────────────────────────────────────────────────
+
+    def get(self, chave, default=None):
+        try:
+            valor = _cache.get(chave, _AUSENTE)
+        except Exception:
+            logger.warning("Cache indisponível ao ler %s", chave, exc_info=True)
+            valor = _AUSENTE
+
+        metricas.registrar(self.nome, hit=valor is not _AUSENTE)
+        return default if valor is _AUSENTE else valor
+
+    def get_many(self, chaves):
+        try:
+            valores = _cache.get_many(chaves)
+        except Exception:
+            logger.warning("Cache indisponível ao ler %s", chaves, exc_info=True)
+            valores = {}
+
+        for chave in chaves:
+            metricas.registrar(self.nome, hit=chave in valores)
+        return valores
+
+    def set(self, chave, valor, timeout=_AUSENTE):
+        try:
+            _cache.set(chave, valor, self.timeout if timeout is _AUSENTE else timeout)
+        except Exception:
+            logger.warning("Cache indisponível ao gravar %s", chave, exc_info=True)
+
+    def add(self, chave, valor, timeout=_AUSENTE):
+        try:
+            return _cache.add(chave, valor, self.timeout if timeout is _AUSENTE else timeout)
+        except Exception:
+            logger.warning("Cache indisponível ao gravar %s", chave, exc_info=True)
+            return False
+
+    def delete(self, *chaves):
+        chaves = [c for c in chaves if c]
+        if not chaves:
+            return
+        try:
+            _cache.delete_many(chaves)
+        except Exception:
+            logger.warning("Falha ao invalidar %s", chaves, exc_info=True)
+
+    def set_many(self, valores, timeout=_AUSENTE):
+        if not valores:
+            return
+        try:
+            _cache.set_many(valores, self.timeout if timeout is _AUSENTE else timeout)
+        except Exception:
+            logger.warning("Cache indisponível ao gravar %s", list(valores), exc_info=True)
+
+    def incr(self, chave, delta=1, timeout=_AUSENTE, criar=True):
+        """
+        Incremento atômico no backend; cria a chave se não existir.
+
+        Com `criar=False`, chave ausente retorna None sem criar — para
+        contadores que só podem ser ajustados a partir de um valor real.
+        """
+        try:
+            return _cache.incr(chave, delta)
+        except ValueError:
+            if not criar:
+                return None
+            self.add(chave, 0, timeout)
+            try:
+                return _cache.incr(chave, delta)
+            except Exception:
+                logger.warning("Falha ao incrementar %s", chave, exc_info=True)
+                return None
+        except Exception:
+            logger.warning("Falha ao incrementar %s", chave, exc_info=True)
+            return None
+
+    def get_or_set(self, chave, calcular, timeout=_AUSENTE):
+        """
+        Retorna o valor em cache ou executa `calcular()` e guarda o resultado.
+        Com o backend fora do ar, apenas calcula.
+        """
+        valor = self.get(chave, _AUSENTE)
+        if valor is not _AUSENTE:
+            return valor
+        valor = calcular()
+        self.set(chave, valor, timeout)
+        return valor
@@ -1,24 +1,36 @@
-
 # core/context_processors.py
 
 from usuario.models import Filial
 from django.db import close_old_connections
 
+from core.global_context import chave_global, contexto_global, obter_ou_calcular
+
+# Invalidado por usuario.signals (save/delete de Filial)
+CHAVE_FILIAIS = chave_global('filiais')
+
+
+def listar_filiais():
+    """Lista de filiais (cacheada) — usada em todos os headers."""
+    return obter_ou_calcular(CHAVE_FILIAIS, lambda: list(Filial.objects.all()))
+
+
+@contexto_global
 def filial_context(request):
     """
     Disponibiliza a lista de filiais e a filial ativa para todos os templates.
     """
     if request.user.is_authenticated:
+        filiais = listar_filiais()
         active_filial_id = request.session.get('active_filial_id')
         active_filial = None
         if active_filial_id:
-            try:
-                active_filial = Filial.objects.get(pk=active_filial_id)
-            except Filial.DoesNotExist:
-                pass
-        
+            active_filial = next(
+                (f for f in filiais if str(f.pk) == str(active_filial_id)),
+                None,
+            )
+
         return {
-            'available_filiais': Filial.objects.all(),
+            'available_filiais': filiais,
             'active_filial': active_filial,
         }
     return {}
@@ -0,0 +1,354 @@
+# core/geocoding.py
+"""
+Geocoding reverso compartilhado (rastreamento GPS, relatório fotográfico).
+
+Veículos parados no mesmo pátio e fotos tiradas na mesma obra mandam as
+mesmas coordenadas (a menos de poucos metros) várias vezes por dia; cada
+uma virava uma chamada ao Nominatim. Aqui as coordenadas são arredondadas
+para uma grade (GEOCODING_GRADE_GRAUS) e o endereço fica guardado por
+célula em dois níveis:
+
+    LRU em memória (por processo) ──► tabela EnderecoGeocodificado ──► provedor
+
+O provedor é plugável (GEOCODING_PROVEDOR): Nominatim em produção,
+ProvedorLocal (sem rede) em testes e benchmarks. As chamadas ao provedor
+respeitam o intervalo mínimo dele entre TODOS os workers (trava no cache)
+e, em lote, cada célula distinta é consultada uma única vez.
+
+Uso:
+
+    from core.geocoding import obter_servico
+
+    obter_servico().endereco(lat, lng)              # str ou None
+    obter_servico().enderecos([(lat, lng), ...])    # na mesma ordem
+    obter_servico().consultar([(lat, lng), ...], max_chamadas=50)
+                                                    # + chamadas ao provedor
+"""
+import logging
+import math
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .cache import CacheNamespace, metricas
+
+logger = logging.getLogger(__name__)
+
+cache_geocoding = CacheNamespace('geocoding', versao=1, timeout=60)
+
+# Política de uso do Nominatim: no máximo 1 requisição por segundo
+INTERVALO_NOMINATIM_SEGUNDOS = 1
+
+GRADE_PADRAO_GRAUS = 0.0005     # ~55 m de latitude
+TAMANHO_LRU_PADRAO = 4096
+ESPERA_MAXIMA_SEGUNDOS = 10     # fila pelo provedor antes de desistir da chamada
+CELULAS_POR_CONSULTA = 500
+
+# enderecos: um por coordenada (None se o provedor falhou ou se ficou adiado)
+# chamadas: consultas feitas ao provedor (cache miss); os demais pontos são hit
+# adiados: índices das coordenadas cujas células passaram de `max_chamadas`
+Consulta = namedtuple('Consulta', ['enderecos', 'chamadas', 'adiados'])
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# PROVEDORES
+# ════════════════════════════════════════════════════════════════════════════
+
+class ProvedorGeocoding:
+    """
+    Interface dos provedores. `reverter` devolve o endereço ou None
+    (falha ou coordenada sem endereço); não deve levantar exceção.
+    """
+
+    nome = 'base'
+    intervalo_segundos = 0
+
+    def reverter(self, lat, lng):
+        raise NotImplementedError
+
+
+class ProvedorNominatim(ProvedorGeocoding):
+    """OpenStreetMap Nominatim (https://operations.osmfoundation.org/policies/nominatim/)."""
+
+    nome = 'nominatim'
+    intervalo_segundos = INTERVALO_NOMINATIM_SEGUNDOS
+    url = 'https://nominatim.openstreetmap.org/reverse'
+    headers = {'User-Agent': 'ControleTarefas/1.0 (esg@cetestsp.com.br)'}
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+
+    def reverter(self, lat, lng):
+        import requests
+
+        try:
+            resposta = requests.get(
+                self.url,
+                params={'lat': f'{lat:.6f}', 'lon': f'{lng:.6f}', 'format': 'json', 'zoom': 18},
+                headers=self.headers, timeout=self.timeout,
+            )
+            resposta.raise_for_status()
+            return resposta.json().get('display_name') or None
+        except Exception:
+            logger.warning('Falha ao geocodificar (%s, %s)', lat, lng, exc_info=True)
+            return None
+
+
+class ProvedorLocal(ProvedorGeocoding):
+    """Sem rede: endereço sintético a partir das coordenadas (testes, benchmark)."""
+
+    nome = 'local'
+
+    def __init__(self, latencia_segundos=0):
+        self.latencia_segundos = latencia_segundos
+        self.chamadas = 0
+
+    def reverter(self, lat, lng):
+        self.chamadas += 1
+        if self.latencia_segundos:
+            time.sleep(self.latencia_segundos)
+        return f'Próximo de {lat:.5f}, {lng:.5f}'
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# CACHE EM MEMÓRIA
+# ════════════════════════════════════════════════════════════════════════════
+
+class _LRU:
+    """Dicionário limitado, descarta o item usado há mais tempo. Thread-safe."""
+
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            valor = self._itens.get(chave)
+            if valor is not None:
+                self._itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# SERVIÇO
+# ════════════════════════════════════════════════════════════════════════════
+
+class ServicoGeocoding:
+    """
+    Endereço por célula da grade, consultando LRU, banco e provedor nessa
+    ordem. `estatisticas` conta de onde veio cada resposta.
+    """
+
+    def __init__(self, provedor=None, grade=None, tamanho_lru=None):
+        self.provedor = provedor or ProvedorNominatim()
+        self.grade = grade or GRADE_PADRAO_GRAUS
+        # A grade faz parte da chave: trocar a configuração não reaproveita células antigas
+        self.grade_micrograus = round(self.grade * 1_000_000)
+        self.lru = _LRU(tamanho_lru or TAMANHO_LRU_PADRAO)
+        self._lock_provedor = threading.Lock()
+        self._proxima_chamada = 0.0
+        self.zerar_estatisticas()
+
+    def zerar_estatisticas(self):
+        self.estatisticas = {'lru': 0, 'banco': 0, 'provedor': 0, 'falhas': 0}
+
+    # ── Grade ─────────────────────────────────────────────────────────────
+
+    def celula(self, lat, lng):
+        return round(float(lat) / self.grade), round(float(lng) / self.grade)
+
+    def centro(self, celula):
+        """Coordenada enviada ao provedor: o centro da célula, igual para todos os pontos dela."""
+        return round(celula[0] * self.grade, 6), round(celula[1] * self.grade, 6)
+
+    # ── Consulta ──────────────────────────────────────────────────────────
+
+    def endereco(self, lat, lng):
+        """Endereço aproximado de (lat, lng), ou None se o provedor falhar."""
+        if lat is None or lng is None:
+            return None
+        return self.enderecos([(lat, lng)])[0]
+
+    def enderecos(self, coordenadas):
+        """Endereços de uma lista de (lat, lng), na mesma ordem."""
+        return self.consultar(coordenadas).enderecos
+
+    def consultar(self, coordenadas, max_chamadas=None):
+        """
+        Endereços de uma lista de (lat, lng) e o custo da consulta
+        (`Consulta`). Uma consulta ao banco para as células fora do LRU e
+        uma chamada ao provedor por célula que ainda não tem endereço — no
+        máximo `max_chamadas`; as células além do limite ficam adiadas.
+        """
+        celulas = [self.celula(lat, lng) for lat, lng in coordenadas]
+        pontos_por_celula = Counter(celulas)
+        encontrados = {}
+        faltando = []
+        for celula in pontos_por_celula:
+            endereco = self.lru.get(celula)
+            if endereco is None:
+                faltando.append(celula)
+            else:
+                encontrados[celula] = endereco
+                self._contar('lru', pontos_por_celula[celula])
+
+        chamadas = 0
+        adiadas = set()
+        if faltando:
+            do_banco = self._buscar_no_banco(faltando)
+            for celula, endereco in do_banco.items():
+                self.lru.set(celula, endereco)
+                self._contar('banco', pontos_por_celula[celula])
+            encontrados.update(do_banco)
+
+            novos = {}
+            for celula in faltando:
+                if celula in do_banco:
+                    continue
+                if max_chamadas is not None and chamadas >= max_chamadas:
+                    adiadas.add(celula)
+                    continue
+                chamadas += 1
+                endereco = self._consultar_provedor(celula)
+                if endereco is None:
+                    self.estatisticas['falhas'] += 1
+                    continue
+                novos[celula] = endereco
+                self.lru.set(celula, endereco)
+                # Repetições da célula no mesmo lote já saem da memória
+                self._contar('provedor', 1)
+                self._contar('lru', pontos_por_celula[celula] - 1)
+            self._gravar_no_banco(novos)
+            encontrados.update(novos)
+
+        return Consulta(
+            enderecos=[encontrados.get(celula) for celula in celulas],
+            chamadas=chamadas,
+            adiados={i for i, celula in enumerate(celulas) if celula in adiadas},
+        )
+
+    def limpar_lru(self):
+        self.lru.limpar()
+
+    # ── Internos ──────────────────────────────────────────────────────────
+
+    def _contar(self, origem, pontos):
+        self.estatisticas[origem] += pontos
+        # Hit ratio no painel de monitoramento (core.cache): provedor = miss
+        for _ in range(pontos):
+            metricas.registrar(cache_geocoding.nome, hit=origem != 'provedor')
+
+    def _buscar_no_banco(self, celulas):
+        from .models import EnderecoGeocodificado
+
+        encontrados = {}
+        for inicio in range(0, len(celulas), CELULAS_POR_CONSULTA):
+            parte = set(celulas[inicio:inicio + CELULAS_POR_CONSULTA])
+            linhas = EnderecoGeocodificado.objects.filter(
+                grade_micrograus=self.grade_micrograus,
+                celula_lat__in={lat for lat, _ in parte},
+                celula_lng__in={lng for _, lng in parte},
+            ).values_list('celula_lat', 'celula_lng', 'endereco')
+            for lat, lng, endereco in linhas:
+                if (lat, lng) in parte:
+                    encontrados[(lat, lng)] = endereco
+        return encontrados
+
+    def _gravar_no_banco(self, novos):
+        from .models import EnderecoGeocodificado
+
+        if not novos:
+            return
+        EnderecoGeocodificado.objects.bulk_create(
+            [
+                EnderecoGeocodificado(
+                    grade_micrograus=self.grade_micrograus,
+                    celula_lat=lat, celula_lng=lng,
+                    endereco=endereco, provedor=self.provedor.nome,
+                )
+                for (lat, lng), endereco in novos.items()
+            ],
+            # Outro worker pode ter gravado a mesma célula no meio tempo
+            ignore_conflicts=True,
+        )
+
+    def _consultar_provedor(self, celula):
+        if not self._aguardar_vez():
+            logger.warning('Geocoding: fila do provedor %s cheia; célula %s adiada', self.provedor.nome, celula)
+            return None
+        return self.provedor.reverter(*self.centro(celula))
+
+    def _aguardar_vez(self):
+        """
+        Respeita o intervalo mínimo do provedor entre chamadas: no processo
+        (relógio local) e entre workers (chave no cache com TTL do intervalo).
+        """
+        intervalo = self.provedor.intervalo_segundos
+        if not intervalo:
+            return True
+
+        with self._lock_provedor:
+            espera = self._proxima_chamada - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            self._proxima_chamada = time.monotonic() + intervalo
+
+        chave = cache_geocoding.chave('vez', self.provedor.nome)
+        limite = time.monotonic() + ESPERA_MAXIMA_SEGUNDOS
+        while not cache_geocoding.add(chave, 1, timeout=math.ceil(intervalo)):
+            if time.monotonic() >= limite:
+                return False
+            time.sleep(min(intervalo, 0.2))
+        return True
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# INSTÂNCIA CONFIGURADA
+# ════════════════════════════════════════════════════════════════════════════
+
+_servico = None
+_servico_lock = threading.Lock()
+
+
+def obter_servico():
+    """Serviço do processo, montado a partir das settings GEOCODING_*."""
+    global _servico
+    if _servico is None:
+        with _servico_lock:
+            if _servico is None:
+                provedor = import_string(
+                    getattr(settings, 'GEOCODING_PROVEDOR', 'core.geocoding.ProvedorNominatim')
+                )()
+                _servico = ServicoGeocoding(
+                    provedor=provedor,
+                    grade=getattr(settings, 'GEOCODING_GRADE_GRAUS', GRADE_PADRAO_GRAUS),
+                    tamanho_lru=getattr(settings, 'GEOCODING_TAMANHO_LRU', TAMANHO_LRU_PADRAO),
+                )
+    return _servico
+
+
+@receiver(setting_changed)
+def _recarregar_servico(setting, **kwargs):
+    global _servico
+    if setting.startswith('GEOCODING_'):
+        _servico = None
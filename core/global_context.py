@@ -0,0 +1,170 @@
+# core/global_context.py
+"""
+Camada compartilhada do "contexto global" dos templates.
+
+Os context processors rodam em TODA página autenticada. Em vez de cada um
+refazer seus COUNTs/consultas por request, os valores ficam no cache
+(por usuário, por filial ou globais) e são invalidados por signals nos
+models de origem.
+
+Uso típico num context processor:
+
+    from core.global_context import contexto_global, chave_usuario, obter_ou_calcular
+
+    @contexto_global
+    def meu_processor(request):
+        return obter_ou_calcular(
+            chave_usuario('meu_processor', request.user.pk),
+            lambda: {...consultas...},
+        )
+
+E no signal do model de origem:
+
+    invalidar(chave_usuario('meu_processor', instance.usuario_id))
+
+Para conjuntos de chaves que não dá para enumerar (ex.: contadores por
+usuário que dependem da filial), use escopos versionados:
+`versoes_escopos()` entra na chave e `invalidar_escopo()` troca a versão.
+
+O decorator `contexto_global` também mede quantas queries cada processor
+custou; o `ContextQueryCountMiddleware` expõe o total no header
+`X-Context-Queries` (ativo em DEBUG ou com GLOBAL_CONTEXT_DEBUG_HEADER).
+"""
+import functools
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from core.cache import CacheNamespace
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_PADRAO = 300  # segundos — a invalidação por signal é a fonte da verdade
+
+cache_contexto = CacheNamespace('ctxglobal', versao=1, timeout=TIMEOUT_PADRAO)
+
+# Atributos anotados no request pelo decorator
+ATTR_QUERIES = '_contexto_global_queries'
+ATTR_DETALHE = '_contexto_global_detalhe'
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# CHAVES
+# ════════════════════════════════════════════════════════════════════════════
+
+def chave_global(nome):
+    """Chave de um valor único para o sistema todo."""
+    return cache_contexto.chave(nome, 'global')
+
+
+def chave_usuario(nome, user_id):
+    """Chave de um valor por usuário."""
+    return cache_contexto.chave_usuario(user_id, nome)
+
+
+def chave_filial(nome, filial_id):
+    """Chave de um valor por filial (`None` vira 'sem')."""
+    return cache_contexto.chave_filial(filial_id, nome)
+
+
+def _timeout():
+    return getattr(settings, 'GLOBAL_CONTEXT_CACHE_TIMEOUT', TIMEOUT_PADRAO)
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# LEITURA / INVALIDAÇÃO
+# ════════════════════════════════════════════════════════════════════════════
+
+def obter_ou_calcular(chave, calcular, timeout=None):
+    """
+    Retorna o valor em cache ou executa `calcular()` e guarda o resultado.
+
+    Falhas do backend de cache não derrubam a página: o valor é calculado
+    direto no banco (ver core.cache).
+    """
+    return cache_contexto.get_or_set(chave, calcular, timeout or _timeout())
+
+
+def invalidar(*chaves):
+    """Remove as chaves informadas do cache (silencioso em caso de falha)."""
+    cache_contexto.delete(*chaves)
+
+
+def _chave_versao(escopo):
+    return cache_contexto.chave('versao', escopo)
+
+
+def versoes_escopos(*escopos):
+    """
+    Retorna a versão atual de cada escopo (na mesma ordem), numa ida ao cache.
+
+    Versões ausentes (primeiro acesso ou despejo do cache) são inicializadas
+    com um timestamp em nanossegundos — nunca repetem um valor já usado,
+    então uma chave antiga jamais volta a ser "válida".
+    """
+    chaves = [_chave_versao(e) for e in escopos]
+    atuais = cache_contexto.get_many(chaves)
+
+    versoes = []
+    for chave in chaves:
+        versao = atuais.get(chave)
+        if versao is None:
+            cache_contexto.add(chave, time.time_ns(), None)
+            versao = cache_contexto.get(chave, 0)
+        versoes.append(versao)
+    return tuple(versoes)
+
+
+def invalidar_escopo(*escopos):
+    """Troca a versão dos escopos — todas as chaves que a usavam expiram."""
+    for escopo in escopos:
+        chave = _chave_versao(escopo)
+        # Versão ausente: qualquer timestamp novo já invalida
+        if not cache_contexto.add(chave, time.time_ns(), None):
+            cache_contexto.incr(chave)
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# MEDIÇÃO DE QUERIES
+# ════════════════════════════════════════════════════════════════════════════
+
+class _ContadorQueries:
+    """execute_wrapper que apenas conta as queries executadas."""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+def contexto_global(func):
+    """
+    Decorator para context processors do contexto global.
+
+    Conta as queries executadas pelo processor e acumula no request
+    (total + detalhe por processor) para o `ContextQueryCountMiddleware`.
+    """
+    @functools.wraps(func)
+    def wrapper(request):
+        contador = _ContadorQueries()
+        with connection.execute_wrapper(contador):
+            resultado = func(request)
+
+        setattr(request, ATTR_QUERIES, getattr(request, ATTR_QUERIES, 0) + contador.total)
+        detalhe = getattr(request, ATTR_DETALHE, None)
+        if detalhe is None:
+            detalhe = {}
+            setattr(request, ATTR_DETALHE, detalhe)
+        detalhe[func.__name__] = detalhe.get(func.__name__, 0) + contador.total
+        return resultado
+
+    return wrapper
+
+
+def queries_do_contexto(request):
+    """Total de queries gastas pelos context processors neste request."""
+    return getattr(request, ATTR_QUERIES, 0)
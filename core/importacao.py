@@ -0,0 +1,255 @@
+# core/importacao.py
+"""
+Leitura em streaming de planilhas .xlsx para importações em massa.
+
+`load_workbook()` normal monta a planilha inteira em memória (células,
+estilos, validações) antes de devolver a primeira linha — com dezenas de
+milhares de linhas isso custa centenas de MB e vários segundos. Aqui a
+planilha é aberta em `read_only=True` e as linhas saem de `iter_rows()`
+como tuplas de valores, uma por vez, agrupadas em lotes para o chamador
+validar e gravar com `bulk_create`.
+
+Uso:
+
+    with abrir_planilha(arquivo, aba='Dados Clientes') as planilha:
+        for lote in em_lotes(planilha.linhas(linha_inicial=3, total_colunas=25), 500):
+            ...
+
+A importação em si roda como job (core.jobs): `ImportacaoPlanilha` é a
+base dos models, `criar_importacao` guarda a planilha e enfileira, e
+`executar_importacao` é o corpo das tasks sem checkpoint.
+"""
+import logging
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils.translation import gettext_lazy as _
+from openpyxl import load_workbook
+
+from core.jobs import JobAssincrono, assumir, concluir, enfileirar_apos_commit, marcar_erro
+from core.upload import safe_delete_file
+
+logger = logging.getLogger(__name__)
+
+
+class PlanilhaInvalida(Exception):
+    """O arquivo enviado não pôde ser aberto como .xlsx."""
+
+
+class PlanilhaStreaming:
+    """Aba de uma planilha aberta em modo somente-leitura."""
+
+    def __init__(self, workbook, aba=None):
+        self.workbook = workbook
+        if aba and aba in workbook.sheetnames:
+            self.ws = workbook[aba]
+        else:
+            self.ws = workbook.worksheets[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        # read_only mantém o arquivo aberto até o close()
+        self.workbook.close()
+
+    def total_estimado(self, linha_inicial):
+        """
+        Linhas de dados segundo a dimensão gravada no arquivo.
+
+        É só uma estimativa para a barra de progresso: planilhas geradas por
+        outras ferramentas podem não gravar a dimensão, e linhas vazias no
+        meio também entram na conta.
+        """
+        max_row = self.ws.max_row or 0
+        return max(max_row - linha_inicial + 1, 0)
+
+    def linhas(self, linha_inicial, total_colunas):
+        """
+        Gera (número da linha, lista de valores) das linhas não vazias.
+
+        As linhas curtas são completadas com None até `total_colunas`.
+        """
+        for numero, valores in enumerate(
+            self.ws.iter_rows(min_row=linha_inicial, max_col=total_colunas, values_only=True),
+            start=linha_inicial,
+        ):
+            if all(v is None or str(v).strip() == "" for v in valores):
+                continue
+            valores = list(valores)
+            if len(valores) < total_colunas:
+                valores.extend([None] * (total_colunas - len(valores)))
+            yield numero, valores
+
+
+def abrir_planilha(arquivo, aba=None):
+    """Abre `arquivo` (caminho ou file-like) em streaming; levanta PlanilhaInvalida."""
+    try:
+        workbook = load_workbook(arquivo, read_only=True, data_only=True)
+    except Exception as e:
+        raise PlanilhaInvalida(str(e)) from e
+    return PlanilhaStreaming(workbook, aba=aba)
+
+
+def em_lotes(iteravel, tamanho):
+    """Agrupa `iteravel` em listas de até `tamanho` itens, sem materializar tudo."""
+    iterador = iter(iteravel)
+    while True:
+        lote = list(islice(iterador, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+def erros_modelo(instancia, exclude=()):
+    """
+    `full_clean()` sem as checagens que vão ao banco; retorna lista de erros.
+
+    Unicidade e constraints ficam de fora (o importador confere contra os
+    valores pré-carregados do lote), e as FKs vão em `exclude` — validar
+    uma FK é uma query por linha.
+    """
+    try:
+        instancia.full_clean(exclude=list(exclude), validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        return e.messages
+    return []
+
+
+# ============================================================================
+# JOB DE IMPORTAÇÃO
+# ============================================================================
+
+class ImportacaoPlanilha(JobAssincrono):
+    """
+    Base dos jobs de importação (abstrato): progresso em linhas e o
+    relatório final em `resultado`. Os models concretos declaram `filial`,
+    `usuario` e `arquivo` (related_name e pasta próprios).
+    """
+
+    CAMPO_ERRO = "mensagem_erro"
+
+    nome_arquivo = models.CharField(_("Nome do Arquivo"), max_length=255, blank=True)
+    total_linhas = models.PositiveIntegerField(_("Linhas (estimativa)"), default=0)
+    processadas = models.PositiveIntegerField(_("Linhas Processadas"), default=0)
+    sucessos = models.PositiveIntegerField(_("Sucessos"), default=0)
+    erros = models.PositiveIntegerField(_("Erros"), default=0)
+    resultado = models.JSONField(_("Relatório"), default=dict, blank=True)
+    mensagem_erro = models.TextField(_("Erro"), blank=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.nome_arquivo or self.pk} — {self.get_status_display()}"
+
+    @property
+    def progresso(self):
+        """Percentual para a barra de progresso (100 só ao concluir)."""
+        if self.status == self.STATUS_CONCLUIDO:
+            return 100
+        if not self.total_linhas:
+            return 0
+        return min(99, self.processadas * 100 // self.total_linhas)
+
+
+def criar_importacao(modelo, arquivo, filial, usuario, task, **campos):
+    """Guarda a planilha num job `modelo` e enfileira `task` após o commit."""
+    with transaction.atomic():
+        importacao = modelo(
+            filial=filial,
+            usuario=usuario if getattr(usuario, "is_authenticated", False) else None,
+            nome_arquivo=arquivo.name[:255],
+            **campos,
+        )
+        importacao.arquivo.save(arquivo.name, arquivo, save=False)
+        importacao.save()
+        enfileirar_apos_commit(importacao, task)
+
+    return importacao
+
+
+def executar_importacao(modelo, importacao_id, processar, itens, icone):
+    """
+    Corpo das tasks de importação sem checkpoint.
+
+    Assume o job, roda `processar(importacao, arquivo, progresso)` — que
+    devolve o relatório — e grava o resultado. A planilha é apagada ao
+    concluir; quem enviou recebe uma notificação (`itens`: "clientes"...).
+    """
+    if not assumir(modelo, importacao_id):
+        logger.info("Importação de %s %s inexistente ou já assumida.", itens, importacao_id)
+        return None
+
+    consulta = modelo._base_manager.filter(pk=importacao_id)
+    importacao = consulta.select_related("filial", "usuario").get()
+
+    def progresso(processadas, total):
+        consulta.update(processadas=processadas, total_linhas=total)
+
+    try:
+        with importacao.arquivo.open("rb") as arquivo:
+            resultado = processar(importacao, arquivo, progresso)
+    except Exception as e:
+        logger.exception("Erro na importação de %s %s", itens, importacao_id)
+        marcar_erro(importacao, e)
+        notificar_importacao(importacao, itens, icone)
+        return None
+
+    # A planilha só serve para o processamento; o relatório fica no job
+    safe_delete_file(importacao, "arquivo")
+
+    importacao.arquivo = ""
+    importacao.resultado = resultado
+    importacao.total_linhas = importacao.processadas = resultado["total"]
+    importacao.sucessos = resultado["sucessos"]
+    importacao.erros = resultado["erros"]
+    if not concluir(importacao, ["arquivo", "resultado", "total_linhas", "processadas", "sucessos", "erros"]):
+        logger.warning("Importação de %s %s foi encerrada antes de concluir.", itens, importacao_id)
+        return None
+
+    notificar_importacao(importacao, itens, icone)
+    logger.info(
+        "Importação de %s %s: %s ok, %s erro(s) de %s linha(s).",
+        itens, importacao_id, importacao.sucessos, importacao.erros, importacao.processadas,
+    )
+    return importacao.pk
+
+
+def notificar_importacao(importacao, itens, icone, titulo=None, mensagem=None):
+    """
+    Avisa quem enviou a planilha que a importação terminou. `titulo` e
+    `mensagem` substituem o texto padrão.
+    """
+    if importacao.usuario is None:
+        return
+
+    from notifications.services import criar_notificacao
+
+    simulacao = getattr(importacao, "simulacao", False)
+    if importacao.status == importacao.STATUS_ERRO:
+        tipo = "erro"
+        titulo = titulo or f"Falha na importação de {itens}"
+        mensagem = mensagem or f"Não foi possível processar {importacao.nome_arquivo}."
+    else:
+        tipo = "aviso" if importacao.erros else "sucesso"
+        titulo = titulo or f"{'Simulação' if simulacao else 'Importação'} de {itens} concluída"
+        mensagem = mensagem or (
+            f"{importacao.nome_arquivo}: {importacao.sucessos} linha(s) ok, "
+            f"{importacao.erros} com erro."
+        )
+
+    try:
+        criar_notificacao(
+            importacao.usuario, titulo,
+            tipo=tipo, mensagem=mensagem,
+            url_destino=importacao.get_absolute_url(),
+            icone=icone,
+            duplicar=True,
+        )
+    except Exception:
+        logger.exception("Falha ao notificar a importação de %s %s", itens, importacao.pk)
@@ -0,0 +1,191 @@
+# core/jobs.py
+"""
+Jobs em background (Celery) registrados no banco.
+
+Importações de planilha, PDFs do PGR e lotes de certificados seguem o
+mesmo ciclo:
+
+    request  → cria a linha do job e `enfileirar_apos_commit(job, task)`
+    task     → `assumir(...)` (UPDATE condicional: só um worker ganha),
+               grava progresso, termina com `concluir(...)` ou `marcar_erro(...)`
+
+Um worker que morre no meio deixa o job ativo para sempre. Como o Celery
+mata qualquer task depois de CELERY_TASK_TIME_LIMIT, um job ativo sem
+sinal há mais que `TEMPO_LIMITE` já não tem worker: `encerrar_travados`
+marca esses jobs como erro, e quem os procura pode pedir um novo. O
+`concluir` só grava se o job ainda estiver com esta execução, então um
+worker atrasado não sobrescreve um job já encerrado.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+logger = logging.getLogger(__name__)
+
+MENSAGEM_TRAVADO = "Processamento interrompido: o worker parou de responder."
+
+
+class JobAssincrono(models.Model):
+    """Status, datas e task_id comuns aos jobs (abstrato)."""
+
+    STATUS_PENDENTE = "pendente"
+    STATUS_PROCESSANDO = "processando"
+    STATUS_CONCLUIDO = "concluido"
+    STATUS_ERRO = "erro"
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, _("Na fila")),
+        (STATUS_PROCESSANDO, _("Processando")),
+        (STATUS_CONCLUIDO, _("Concluído")),
+        (STATUS_ERRO, _("Erro")),
+    ]
+    STATUS_ATIVOS = (STATUS_PENDENTE, STATUS_PROCESSANDO)
+
+    # Além do hard limit o Celery já matou a task; a margem cobre a fila
+    TEMPO_LIMITE = timedelta(seconds=getattr(settings, "CELERY_TASK_TIME_LIMIT", 30 * 60) + 5 * 60)
+
+    # Campo com o texto do erro
+    CAMPO_ERRO = "erro"
+    # Datas que contam como sinal de vida do worker, da mais recente à mais
+    # antiga; sem nenhuma, vale o criado_em
+    CAMPOS_SINAL = ("iniciado_em",)
+
+    status = models.CharField(
+        _("Status"),
+        max_length=15,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDENTE,
+        db_index=True,
+    )
+    task_id = models.CharField(_("ID da Task"), max_length=255, blank=True)
+    criado_em = models.DateTimeField(_("Criado em"), auto_now_add=True)
+    iniciado_em = models.DateTimeField(_("Iniciado em"), null=True, blank=True)
+    concluido_em = models.DateTimeField(_("Concluído em"), null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def em_andamento(self):
+        return self.status in self.STATUS_ATIVOS
+
+    @property
+    def ultimo_sinal(self):
+        for campo in self.CAMPOS_SINAL:
+            valor = getattr(self, campo)
+            if valor:
+                return valor
+        return self.criado_em
+
+    @property
+    def travado(self):
+        """Ativo, mas sem sinal do worker há mais de TEMPO_LIMITE."""
+        ultimo_sinal = self.ultimo_sinal
+        return (
+            self.em_andamento
+            and ultimo_sinal is not None
+            and timezone.now() - ultimo_sinal > self.TEMPO_LIMITE
+        )
+
+    @classmethod
+    def q_travados(cls):
+        """Filtro equivalente a `travado`, para usar em querysets."""
+        limite = timezone.now() - cls.TEMPO_LIMITE
+        sinal_antigo, sem_sinal = Q(), Q()
+        for campo in (*cls.CAMPOS_SINAL, "criado_em"):
+            sinal_antigo |= sem_sinal & Q(**{f"{campo}__lt": limite})
+            sem_sinal &= Q(**{f"{campo}__isnull": True})
+        return Q(status__in=cls.STATUS_ATIVOS) & sinal_antigo
+
+    def encerrar_se_travado(self):
+        """Marca o job como erro se estiver travado; retorna True se encerrou."""
+        if not self.travado:
+            return False
+        if encerrar_travados(type(self)._base_manager.filter(pk=self.pk)):
+            self.refresh_from_db()
+            return True
+        return False
+
+
+def enfileirar(job, task):
+    """
+    `task.delay(job.pk)` e guarda o task_id. Com o broker fora do ar,
+    registra o erro no job em vez de deixá-lo na fila para sempre.
+    """
+    modelo = type(job)
+    try:
+        resultado = task.delay(job.pk)
+    except Exception as e:
+        logger.exception("Falha ao enfileirar %s %s", modelo._meta.verbose_name, job.pk)
+        modelo._base_manager.filter(pk=job.pk, status=modelo.STATUS_PENDENTE).update(
+            status=modelo.STATUS_ERRO,
+            concluido_em=timezone.now(),
+            **{modelo.CAMPO_ERRO: f"Não foi possível enfileirar o processamento: {e}"},
+        )
+        return
+
+    task_id = getattr(resultado, "id", "") or ""
+    if task_id:
+        modelo._base_manager.filter(pk=job.pk).update(task_id=task_id)
+
+
+def enfileirar_apos_commit(job, task):
+    """Enfileira depois do commit (a task precisa ver a linha do job)."""
+    transaction.on_commit(lambda: enfileirar(job, task))
+
+
+def assumir(modelo, pk, **campos):
+    """
+    Passa o job de pendente para processando. Só um worker ganha
+    (entregas duplicadas com acks_late); retorna False para os demais.
+    """
+    campos.setdefault("iniciado_em", timezone.now())
+    return bool(
+        modelo._base_manager
+        .filter(pk=pk, status=modelo.STATUS_PENDENTE)
+        .update(status=modelo.STATUS_PROCESSANDO, **campos)
+    )
+
+
+def concluir(job, campos=()):
+    """
+    Grava `campos` do job como concluído, se ele ainda estiver processando
+    (não foi encerrado como travado nem substituído). Retorna se gravou.
+    """
+    modelo = type(job)
+    job.status = modelo.STATUS_CONCLUIDO
+    job.concluido_em = timezone.now()
+    valores = {campo: getattr(job, campo) for campo in (*campos, "status", "concluido_em")}
+    return bool(
+        modelo._base_manager
+        .filter(pk=job.pk, status=modelo.STATUS_PROCESSANDO)
+        .update(**valores)
+    )
+
+
+def marcar_erro(job, erro, **filtros):
+    """Encerra o job com erro (`filtros` restringem a execução dona do job)."""
+    modelo = type(job)
+    job.status = modelo.STATUS_ERRO
+    return modelo._base_manager.filter(pk=job.pk, **filtros).update(
+        status=modelo.STATUS_ERRO,
+        concluido_em=timezone.now(),
+        **{modelo.CAMPO_ERRO: str(erro)[:2000]},
+    )
+
+
+def encerrar_travados(queryset, mensagem=MENSAGEM_TRAVADO):
+    """Marca como erro os jobs travados de `queryset`; retorna quantos."""
+    modelo = queryset.model
+    encerrados = queryset.filter(modelo.q_travados()).update(
+        status=modelo.STATUS_ERRO,
+        concluido_em=timezone.now(),
+        **{modelo.CAMPO_ERRO: mensagem},
+    )
+    if encerrados:
+        logger.warning("%s %s travado(s) encerrado(s) como erro.", encerrados, modelo._meta.verbose_name)
+    return encerrados
@@ -0,0 +1,145 @@
+# benchmark_geocoding.py
+
+"""
+Mede hit ratio e latência do geocoding reverso (core.geocoding) sobre uma
+trajetória gravada.
+
+A trajetória vem dos pontos de um agendamento (--agendamento), de um CSV
+"latitude,longitude" (--arquivo) ou, sem nenhum dos dois, é gerada: um
+veículo que sai do pátio, roda e volta, com paradas. Cada ponto é
+geocodificado três vezes:
+
+    fria     — LRU e tabela vazios para essas células
+    reinício — LRU vazio, tabela preenchida (outro worker / deploy)
+    quente   — LRU preenchido
+
+Tudo roda numa transação desfeita ao final. Por padrão usa o provedor
+local com latência simulada — nada vai ao Nominatim.
+
+    python manage.py benchmark_geocoding
+    python manage.py benchmark_geocoding --agendamento 42 --grade 0.001
+"""
+
+import csv
+import math
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from core.geocoding import GRADE_PADRAO_GRAUS, ProvedorLocal, ServicoGeocoding
+
+
+def trajetoria_sintetica(total_pontos, origem=(-23.5505, -46.6333)):
+    """
+    Pontos a cada ~5 s de um veículo a ~40 km/h em laço, com um terço do
+    tempo parado no pátio e paradas curtas no caminho.
+    """
+    pontos = []
+    lat, lng = origem
+    passo = 0.0005  # ~55 m por leitura
+    for i in range(total_pontos):
+        fase = i % 300
+        if fase < 100 or fase % 40 < 8:
+            pontos.append((lat, lng))  # parado
+            continue
+        angulo = 2 * math.pi * fase / 300
+        lat += passo * math.cos(angulo)
+        lng += passo * math.sin(angulo)
+        pontos.append((round(lat, 6), round(lng, 6)))
+    return pontos
+
+
+class Command(BaseCommand):
+    help = 'Mede hit ratio e latência do geocoding reverso numa trajetória (nada é gravado)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agendamento', type=int, help='Trajetória gravada de um Carro_agendamento')
+        parser.add_argument('--arquivo', help='CSV com colunas latitude,longitude')
+        parser.add_argument(
+            '--pontos', type=int, default=2000,
+            help='Pontos da trajetória sintética (padrão: 2000)',
+        )
+        parser.add_argument(
+            '--grade', type=float, default=GRADE_PADRAO_GRAUS,
+            help=f'Tamanho da célula em graus (padrão: {GRADE_PADRAO_GRAUS})',
+        )
+        parser.add_argument(
+            '--provedor',
+            help='Caminho do provedor (padrão: provedor local com latência simulada)',
+        )
+        parser.add_argument(
+            '--latencia-ms', type=int, default=300,
+            help='Latência simulada do provedor local em ms (padrão: 300)',
+        )
+
+    def _trajetoria(self, options):
+        if options['agendamento']:
+            from automovel.models import Carro_rastreamento
+
+            pontos = list(
+                Carro_rastreamento.objects.all_filiais()
+                .filter(agendamento_id=options['agendamento'])
+                .order_by('data_hora')
+                .values_list('latitude', 'longitude')
+            )
+            origem = f"agendamento {options['agendamento']}"
+        elif options['arquivo']:
+            with open(options['arquivo'], newline='') as arquivo:
+                pontos = [
+                    (float(linha['latitude']), float(linha['longitude']))
+                    for linha in csv.DictReader(arquivo)
+                ]
+            origem = options['arquivo']
+        else:
+            pontos = trajetoria_sintetica(options['pontos'])
+            origem = 'trajetória sintética'
+
+        if not pontos:
+            raise CommandError('Trajetória vazia.')
+        return pontos, origem
+
+    def handle(self, *args, **options):
+        pontos, origem = self._trajetoria(options)
+        if options['provedor']:
+            provedor = import_string(options['provedor'])()
+        else:
+            provedor = ProvedorLocal(latencia_segundos=options['latencia_ms'] / 1000)
+        servico = ServicoGeocoding(provedor=provedor, grade=options['grade'])
+
+        celulas = len({servico.celula(lat, lng) for lat, lng in pontos})
+        self.stdout.write(
+            f"📍 Geocoding — {origem}: {len(pontos)} pontos, {celulas} células "
+            f"(grade {options['grade']}°), provedor {provedor.nome}"
+        )
+        self.stdout.write(
+            f"{'Passada':<10} {'Provedor':>9} {'Hit ratio':>10} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'Total s':>8}"
+        )
+
+        with transaction.atomic():
+            for passada in ('fria', 'reinício', 'quente'):
+                if passada == 'reinício':
+                    servico.limpar_lru()
+                servico.zerar_estatisticas()
+
+                latencias = []
+                inicio = time.perf_counter()
+                for lat, lng in pontos:
+                    t0 = time.perf_counter()
+                    servico.endereco(lat, lng)
+                    latencias.append((time.perf_counter() - t0) * 1000)
+                decorrido = time.perf_counter() - inicio
+
+                stats = servico.estatisticas
+                hits = stats['lru'] + stats['banco']
+                p95 = statistics.quantiles(latencias, n=20)[-1] if len(latencias) > 1 else latencias[0]
+                self.stdout.write(
+                    f"{passada:<10} {stats['provedor']:>9} {hits / len(pontos):>10.1%} "
+                    f"{statistics.median(latencias):>8.2f} {p95:>8.2f} {decorrido:>8.2f}"
+                )
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark concluído (nenhum dado foi gravado).'))
@@ -106,3 +106,37 @@ class DBConnectionMiddleware:
         close_old_connections()
         return self.get_response(request)
 
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# MIDDLEWARE — Custo do contexto global (debug)
+# ════════════════════════════════════════════════════════════════════════════
+
+class ContextQueryCountMiddleware:
+    """
+    Expõe no header `X-Context-Queries` quantas queries os context processors
+    do contexto global gastaram no request (ver core.global_context).
+
+    `X-Context-Queries-Detail` traz o detalhe por processor.
+    Ativo quando DEBUG=True ou GLOBAL_CONTEXT_DEBUG_HEADER=True.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        ativo = getattr(settings, 'GLOBAL_CONTEXT_DEBUG_HEADER', settings.DEBUG)
+        if not ativo:
+            return response
+
+        from core.global_context import ATTR_DETALHE, queries_do_contexto
+
+        detalhe = getattr(request, ATTR_DETALHE, None)
+        if detalhe is not None:
+            response['X-Context-Queries'] = str(queries_do_contexto(request))
+            response['X-Context-Queries-Detail'] = ';'.join(
+                f'{nome}={total}' for nome, total in detalhe.items()
+            )
+        return response
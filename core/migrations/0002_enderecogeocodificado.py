@@ -0,0 +1,30 @@
+# Generated by Django 5.2.17 on 2026-10-17 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnderecoGeocodificado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade_micrograus', models.PositiveIntegerField(verbose_name='Grade (milionésimos de grau)')),
+                ('celula_lat', models.IntegerField()),
+                ('celula_lng', models.IntegerField()),
+                ('endereco', models.TextField(verbose_name='Endereço')),
+                ('provedor', models.CharField(max_length=30)),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'Endereço geocodificado',
+                'verbose_name_plural': 'Endereços geocodificados',
+                'constraints': [models.UniqueConstraint(fields=('grade_micrograus', 'celula_lat', 'celula_lng'), name='uniq_endereco_geocodificado_celula')],
+            },
+        ),
+    ]
@@ -19,3 +19,29 @@ class BaseModel(models.Model):
         if self.codigo_identificacao and not self.qr_code:
             self._gerar_qr_code()
         super().save(*args, **kwargs)  
+
+
+class EnderecoGeocodificado(models.Model):
+    """
+    Endereço de uma célula da grade de geocoding reverso (core.geocoding).
+    A célula é (lat, lng) dividido pelo tamanho da grade, arredondado.
+    """
+    grade_micrograus = models.PositiveIntegerField(verbose_name="Grade (milionésimos de grau)")
+    celula_lat = models.IntegerField()
+    celula_lng = models.IntegerField()
+    endereco = models.TextField(verbose_name="Endereço")
+    provedor = models.CharField(max_length=30)
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+
+    class Meta:
+        verbose_name = "Endereço geocodificado"
+        verbose_name_plural = "Endereços geocodificados"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['grade_micrograus', 'celula_lat', 'celula_lng'],
+                name='uniq_endereco_geocodificado_celula',
+            ),
+        ]
+
+    def __str__(self):
+        return f"({self.celula_lat}, {self.celula_lng}) {self.endereco[:60]}"
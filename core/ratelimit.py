@@ -0,0 +1,319 @@
+# core/ratelimit.py
+"""
+Rate-limit compartilhado entre todos os processos (gunicorn, Daphne, Celery).
+
+Janela deslizante (sliding window log): cada request aceito vira um
+membro de um sorted set no Redis com o timestamp como score; um script
+Lua remove os que saíram da janela, conta e insere numa única operação
+atômica — dois workers nunca aceitam o mesmo "último" request.
+
+Sem Redis configurado (RATELIMIT_REDIS_URL vazio: testes/dev) ou com ele
+fora do ar, cada processo limita sozinho em memória, com a mesma regra.
+
+Uso:
+
+    from core.ratelimit import RateLimiter, RateLimitMixin, limitar_taxa
+
+    limiter = RateLimiter('rastreamento', limite=60, janela=60)
+    if not limiter.is_allowed(token):
+        ...
+
+    @limitar_taxa('chat_mensagens', limite=30, janela=60)      # FBV (por usuário)
+    def enviar(request): ...
+
+    class MinhaView(RateLimitMixin, View):                        # CBV (por IP)
+        rate_limit_escopo = 'certificados'
+        rate_limit_max = 30
+
+    await limiter.verificar_async(user.pk)                        # consumers Channels
+
+Rejeições são contadas por escopo (somadas entre processos) e expostas em
+core.views_monitoramento.monitoramento_api.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict, deque, namedtuple
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from .cache import CacheNamespace
+
+logger = logging.getLogger(__name__)
+
+cache_ratelimit = CacheNamespace('ratelimit', versao=1, timeout=None)
+
+Resultado = namedtuple('Resultado', ['permitido', 'restantes', 'retry_after'])
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# BACKENDS
+# ════════════════════════════════════════════════════════════════════════════
+
+class BackendMemoria:
+    """Janela deslizante em memória do processo. Thread-safe."""
+
+    def __init__(self):
+        self._janelas = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._requests = 0  # para limpeza periódica
+
+    def registrar(self, chave, limite, janela):
+        agora = time.monotonic()
+        corte = agora - janela
+
+        with self._lock:
+            registros = self._janelas[chave]
+            while registros and registros[0] <= corte:
+                registros.popleft()
+
+            if len(registros) >= limite:
+                return Resultado(False, 0, registros[0] + janela - agora)
+
+            registros.append(agora)
+
+            self._requests += 1
+            if self._requests >= 1000:
+                self._requests = 0
+                self._limpar(corte)
+
+            return Resultado(True, limite - len(registros), 0)
+
+    def _limpar(self, corte):
+        """Remove janelas vazias ou expiradas. Lock já adquirido."""
+        for chave in [c for c, r in self._janelas.items() if not r or r[-1] <= corte]:
+            del self._janelas[chave]
+
+    def resetar(self, chave):
+        with self._lock:
+            self._janelas.pop(chave, None)
+
+
+class BackendRedis:
+    """Janela deslizante num sorted set do Redis, atualizada por script Lua."""
+
+    # Relógio do próprio Redis: workers com relógios diferentes contam igual
+    SCRIPT = """
+    local tempo = redis.call('TIME')
+    local agora = tonumber(tempo[1]) * 1000 + math.floor(tonumber(tempo[2]) / 1000)
+    local janela = tonumber(ARGV[1])
+    local limite = tonumber(ARGV[2])
+
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, agora - janela)
+    local atual = redis.call('ZCARD', KEYS[1])
+    if atual >= limite then
+        local primeiro = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+        return {0, 0, tonumber(primeiro[2]) + janela - agora}
+    end
+
+    redis.call('ZADD', KEYS[1], agora, agora .. ':' .. ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], janela)
+    return {1, limite - atual - 1, 0}
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self.cliente = redis.from_url(url, socket_connect_timeout=2, socket_timeout=2)
+        self._script = self.cliente.register_script(self.SCRIPT)
+
+    def registrar(self, chave, limite, janela):
+        permitido, restantes, espera_ms = self._script(
+            keys=[chave], args=[int(janela * 1000), limite, uuid.uuid4().hex],
+        )
+        return Resultado(bool(permitido), int(restantes), int(espera_ms) / 1000)
+
+    def resetar(self, chave):
+        self.cliente.delete(chave)
+
+
+_memoria = BackendMemoria()
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def _backend():
+    url = getattr(settings, 'RATELIMIT_REDIS_URL', '')
+    if not url:
+        return _memoria
+    if url not in _backends:
+        with _backends_lock:
+            if url not in _backends:
+                try:
+                    _backends[url] = BackendRedis(url)
+                except Exception:
+                    logger.warning('Rate-limit: Redis indisponível; limitando em memória', exc_info=True)
+                    return _memoria
+    return _backends[url]
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# LIMITER
+# ════════════════════════════════════════════════════════════════════════════
+
+class RateLimiter:
+    """
+    Até `limite` requests por `janela` segundos para cada chave do escopo.
+
+    Args:
+        escopo: Nome do limite (prefixo das chaves e das métricas).
+        limite: Máximo de requests aceitos na janela.
+        janela: Tamanho da janela em segundos.
+    """
+
+    def __init__(self, escopo, limite, janela=60):
+        if limite < 1 or janela <= 0:
+            raise ValueError('limite deve ser >= 1 e janela > 0')
+        self.escopo = escopo
+        self.limite = limite
+        self.janela = janela
+
+    def __repr__(self):
+        return f'<RateLimiter {self.escopo} {self.limite}/{self.janela}s>'
+
+    def chave(self, identificador):
+        return f'ratelimit:{self.escopo}:{identificador}'
+
+    def verificar(self, identificador):
+        """Registra um request de `identificador`; retorna Resultado."""
+        chave = self.chave(identificador)
+        backend = _backend()
+        try:
+            resultado = backend.registrar(chave, self.limite, self.janela)
+        except Exception:
+            if backend is _memoria:
+                raise
+            logger.warning('Rate-limit: falha no Redis; limitando em memória', exc_info=True)
+            resultado = _memoria.registrar(chave, self.limite, self.janela)
+
+        if not resultado.permitido:
+            registrar_rejeicao(self.escopo)
+        return resultado
+
+    def is_allowed(self, identificador):
+        return self.verificar(identificador).permitido
+
+    async def verificar_async(self, identificador):
+        """Para consumers do Channels (a chamada ao Redis é bloqueante)."""
+        return await sync_to_async(self.verificar)(identificador)
+
+    def reset(self, identificador):
+        """Limpa a janela de uma chave (uso administrativo/testes)."""
+        chave = self.chave(identificador)
+        _memoria.resetar(chave)
+        backend = _backend()
+        if backend is not _memoria:
+            try:
+                backend.resetar(chave)
+            except Exception:
+                logger.warning('Rate-limit: falha ao limpar %s', chave, exc_info=True)
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# MÉTRICAS
+# ════════════════════════════════════════════════════════════════════════════
+
+def registrar_rejeicao(escopo):
+    escopos = cache_ratelimit.chave('escopos')
+    registrados = cache_ratelimit.get(escopos) or set()
+    if escopo not in registrados:
+        cache_ratelimit.set(escopos, registrados | {escopo})
+    cache_ratelimit.incr(cache_ratelimit.chave('rejeicoes', escopo))
+    logger.info('Rate-limit excedido: %s', escopo)
+
+
+def metricas_ratelimit():
+    """Requests rejeitados por escopo, somados entre processos."""
+    escopos = sorted(cache_ratelimit.get(cache_ratelimit.chave('escopos')) or ())
+    chaves = {cache_ratelimit.chave('rejeicoes', escopo): escopo for escopo in escopos}
+    valores = cache_ratelimit.get_many(list(chaves)) if chaves else {}
+    por_escopo = {escopo: valores.get(chave, 0) for chave, escopo in chaves.items()}
+    return {'rejeicoes': sum(por_escopo.values()), 'escopos': por_escopo}
+
+
+# ════════════════════════════════════════════════════════════════════════════
+# VIEWS
+# ════════════════════════════════════════════════════════════════════════════
+
+def ip_cliente(request):
+    """Best-effort para obter IP do cliente (atrás de proxy)."""
+    xff = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    if xff:
+        return xff.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+def _identificador(request, chave):
+    if callable(chave):
+        return chave(request)
+    if chave == 'user' and request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    return f'ip{ip_cliente(request)}'
+
+
+def resposta_limite_excedido(request, resultado):
+    """429 com Retry-After; JSON para AJAX/API, texto para navegação."""
+    from .decorators import _is_ajax
+
+    espera = max(int(resultado.retry_after + 0.999), 1)
+    if _is_ajax(request):
+        resposta = JsonResponse(
+            {'error': f'Muitas requisições. Aguarde {espera}s', 'retry_after': espera},
+            status=429,
+        )
+    else:
+        resposta = HttpResponse('Rate-limit excedido', status=429)
+    resposta['Retry-After'] = str(espera)
+    return resposta
+
+
+def limitar_taxa(escopo, limite, janela=60, chave='user'):
+    """
+    Decorator para FBVs. `chave`: 'user' (cai para IP se anônimo), 'ip'
+    ou uma função request -> str.
+    """
+    limiter = RateLimiter(escopo, limite, janela)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            resultado = limiter.verificar(_identificador(request, chave))
+            if not resultado.permitido:
+                return resposta_limite_excedido(request, resultado)
+            return view_func(request, *args, **kwargs)
+        _wrapped_view.limiter = limiter
+        return _wrapped_view
+    return decorator
+
+
+class RateLimitMixin:
+    """
+    Rate-limit para CBVs, checado no dispatch. `rate_limit_chave` segue
+    as opções de limitar_taxa.
+    """
+    rate_limit_escopo = None
+    rate_limit_max = 60
+    rate_limit_janela = 60
+    rate_limit_chave = 'ip'
+
+    @classmethod
+    def get_rate_limiter(cls):
+        # Um limiter por classe; subclasses com outro escopo ganham o seu
+        limiter = cls.__dict__.get('_rate_limiter')
+        if limiter is None:
+            limiter = RateLimiter(
+                cls.rate_limit_escopo or cls.__name__, cls.rate_limit_max, cls.rate_limit_janela,
+            )
+            cls._rate_limiter = limiter
+        return limiter
+
+    def dispatch(self, request, *args, **kwargs):
+        resultado = self.get_rate_limiter().verificar(_identificador(request, self.rate_limit_chave))
+        if not resultado.permitido:
+            logger.warning('Rate-limit %s: IP=%s', self.get_rate_limiter().escopo, ip_cliente(request))
+            return resposta_limite_excedido(request, resultado)
+        return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,68 @@
+# core/tests/test_cache.py
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core.cache import CacheNamespace, metricas, metricas_cache
+
+
+class CacheNamespaceTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        metricas.resetar()
+        self.ns = CacheNamespace('teste', versao=2, timeout=60)
+
+    def test_chaves_namespaced_e_versionadas(self):
+        self.assertEqual(self.ns.chave('a', 1), 'teste:v2:a:1')
+        self.assertEqual(self.ns.chave_filial(7, 'resumo'), 'teste:v2:f7:resumo')
+        self.assertEqual(self.ns.chave_filial(None, 'resumo'), 'teste:v2:fsem:resumo')
+        self.assertEqual(self.ns.chave_usuario(3, 'x'), 'teste:v2:u3:x')
+
+    def test_trocar_versao_isola_valores(self):
+        self.ns.set(self.ns.chave('a'), 'antigo')
+        novo = CacheNamespace('teste', versao=3)
+        self.assertIsNone(novo.get(novo.chave('a')))
+
+    def test_get_or_set_guarda_valores_falsy(self):
+        chamadas = []
+
+        def calcular():
+            chamadas.append(1)
+            return 0
+
+        chave = self.ns.chave('zero')
+        self.assertEqual(self.ns.get_or_set(chave, calcular), 0)
+        self.assertEqual(self.ns.get_or_set(chave, calcular), 0)
+        self.assertEqual(len(chamadas), 1)
+
+    def test_incr_cria_chave(self):
+        chave = self.ns.chave('contador')
+        self.assertEqual(self.ns.incr(chave), 1)
+        self.assertEqual(self.ns.incr(chave, 4), 5)
+
+    def test_incr_sem_criar_ignora_chave_ausente(self):
+        chave = self.ns.chave('contador')
+        self.assertIsNone(self.ns.incr(chave, criar=False))
+        self.assertIsNone(self.ns.get(chave))
+        self.ns.set(chave, 2)
+        self.assertEqual(self.ns.incr(chave, -1, criar=False), 1)
+
+    def test_backend_fora_do_ar_degrada(self):
+        with patch('core.cache._cache.get', side_effect=ConnectionError('redis off')), \
+                patch('core.cache._cache.set', side_effect=ConnectionError('redis off')):
+            valor = self.ns.get_or_set(self.ns.chave('x'), lambda: 'calculado')
+        self.assertEqual(valor, 'calculado')
+
+    def test_metricas_hit_miss(self):
+        chave = self.ns.chave('m')
+        self.ns.get(chave)
+        self.ns.set(chave, 1)
+        self.ns.get(chave)
+        self.ns.get(chave)
+
+        dados = metricas_cache()
+        self.assertEqual(dados['namespaces']['teste']['hits'], 2)
+        self.assertEqual(dados['namespaces']['teste']['misses'], 1)
+        self.assertEqual(dados['hit_ratio'], round(2 / 3, 3))
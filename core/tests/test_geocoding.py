@@ -0,0 +1,94 @@
+# core/tests/test_geocoding.py
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.geocoding import ProvedorGeocoding, ProvedorLocal, ServicoGeocoding
+from core.models import EnderecoGeocodificado
+
+
+class ProvedorFalho(ProvedorGeocoding):
+    nome = 'falho'
+
+    def __init__(self):
+        self.chamadas = 0
+
+    def reverter(self, lat, lng):
+        self.chamadas += 1
+        return None
+
+
+class ServicoGeocodingTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.provedor = ProvedorLocal()
+        self.servico = ServicoGeocoding(provedor=self.provedor, grade=0.001)
+
+    def test_pontos_na_mesma_celula_consultam_uma_vez(self):
+        primeiro = self.servico.endereco(-23.55021, -46.63331)
+        segundo = self.servico.endereco(-23.55019, -46.63329)
+
+        self.assertEqual(primeiro, segundo)
+        self.assertEqual(self.provedor.chamadas, 1)
+        self.assertEqual(self.servico.estatisticas['lru'], 1)
+        self.assertEqual(EnderecoGeocodificado.objects.count(), 1)
+
+    def test_tabela_atende_outro_processo(self):
+        self.servico.endereco(-23.5505, -46.6333)
+
+        # Outro worker: LRU vazio, mesma tabela
+        outro = ServicoGeocoding(provedor=ProvedorLocal(), grade=0.001)
+        self.assertEqual(outro.endereco(-23.5505, -46.6333), self.servico.endereco(-23.5505, -46.6333))
+        self.assertEqual((outro.provedor.chamadas, outro.estatisticas['banco']), (0, 1))
+
+        # Grade diferente não reaproveita a célula
+        fina = ServicoGeocoding(provedor=ProvedorLocal(), grade=0.0001)
+        fina.endereco(-23.5505, -46.6333)
+        self.assertEqual(fina.provedor.chamadas, 1)
+
+    def test_lote_mantem_ordem_e_deduplica(self):
+        coordenadas = [(-23.5505, -46.6333), (-22.9068, -43.1729), (-23.5505, -46.6333)]
+
+        enderecos = self.servico.enderecos(coordenadas)
+
+        self.assertEqual(enderecos[0], enderecos[2])
+        self.assertNotEqual(enderecos[0], enderecos[1])
+        self.assertEqual(self.provedor.chamadas, 2)
+
+    def test_consulta_conta_chamadas_e_adia_alem_do_limite(self):
+        self.servico.endereco(-23.5505, -46.6333)
+        coordenadas = [
+            (-23.5505, -46.6333), (-22.9068, -43.1729), (-22.9068, -43.1729),
+            (-19.9167, -43.9345), (-23.5505, -46.6333),
+        ]
+
+        consulta = self.servico.consultar(coordenadas, max_chamadas=1)
+
+        self.assertEqual((consulta.chamadas, consulta.adiados), (1, {3}))
+        self.assertIsNone(consulta.enderecos[3])
+        self.assertEqual(consulta.enderecos[1], consulta.enderecos[2])
+        self.assertEqual(self.provedor.chamadas, 2)
+
+        # Células já conhecidas não gastam chamadas
+        self.assertEqual(self.servico.consultar(coordenadas[:3], max_chamadas=0).chamadas, 0)
+
+    def test_falha_do_provedor_nao_e_cacheada(self):
+        provedor = ProvedorFalho()
+        servico = ServicoGeocoding(provedor=provedor, grade=0.001)
+
+        self.assertIsNone(servico.endereco(-23.5505, -46.6333))
+        self.assertIsNone(servico.endereco(-23.5505, -46.6333))
+
+        self.assertEqual((provedor.chamadas, servico.estatisticas['falhas']), (2, 2))
+        self.assertFalse(EnderecoGeocodificado.objects.exists())
+
+    def test_benchmark_trajetoria_sintetica(self):
+        saida = StringIO()
+        call_command('benchmark_geocoding', pontos=300, latencia_ms=0, stdout=saida)
+
+        linhas = saida.getvalue().splitlines()
+        self.assertTrue(any(linha.startswith('quente') and '100.0%' in linha for linha in linhas))
+        self.assertFalse(EnderecoGeocodificado.objects.exists())
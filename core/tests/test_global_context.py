@@ -0,0 +1,183 @@
+# core/tests/test_global_context.py
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from core.context_processors import filial_context
+from core.global_context import (
+    chave_usuario, contexto_global, invalidar, invalidar_escopo,
+    obter_ou_calcular, versoes_escopos,
+)
+from core.middleware import ContextQueryCountMiddleware
+from gestao_riscos.context_processors import dias_sem_acidentes
+from gestao_riscos.models import Incidente
+from notifications.context_processors import notification_processor
+from notifications.models import Notificacao
+from usuario.context_processors import usuario_filial_context
+from usuario.models import Filial
+
+User = get_user_model()
+
+
+class GlobalContextTestBase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial Cache')
+        cls.usuario = User.objects.create_user(
+            username='ctx', email='ctx@example.com', password='x',
+            filial_ativa=cls.filial,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def _request(self):
+        request = self.factory.get('/')
+        request.user = self.usuario
+        request.session = {}
+        return request
+
+
+class PrimitivasCacheTestCase(GlobalContextTestBase):
+    """obter_ou_calcular / invalidar / escopos versionados."""
+
+    def test_calcula_uma_vez(self):
+        chamadas = []
+
+        def calcular():
+            chamadas.append(1)
+            return {'valor': 42}
+
+        chave = chave_usuario('teste', 1)
+        self.assertEqual(obter_ou_calcular(chave, calcular), {'valor': 42})
+        self.assertEqual(obter_ou_calcular(chave, calcular), {'valor': 42})
+        self.assertEqual(len(chamadas), 1)
+
+        invalidar(chave)
+        obter_ou_calcular(chave, calcular)
+        self.assertEqual(len(chamadas), 2)
+
+    def test_invalidar_escopo_troca_versao(self):
+        (antes,) = versoes_escopos('escopo:a')
+        self.assertEqual(versoes_escopos('escopo:a'), (antes,))
+
+        invalidar_escopo('escopo:a')
+        (depois,) = versoes_escopos('escopo:a')
+        self.assertNotEqual(antes, depois)
+
+    def test_versao_apagada_nao_repete(self):
+        (antes,) = versoes_escopos('escopo:b')
+        cache.clear()
+        (depois,) = versoes_escopos('escopo:b')
+        self.assertNotEqual(antes, depois)
+
+
+class NotificacoesCacheTestCase(GlobalContextTestBase):
+
+    def test_segunda_renderizacao_sem_queries(self):
+        Notificacao.objects.create(usuario=self.usuario, titulo='A')
+        notification_processor(self._request())
+
+        with self.assertNumQueries(0):
+            ctx = notification_processor(self._request())
+        self.assertEqual(ctx['notification_count'], 1)
+
+    def test_nova_notificacao_invalida(self):
+        notification_processor(self._request())
+        Notificacao.objects.create(usuario=self.usuario, titulo='B')
+
+        ctx = notification_processor(self._request())
+        self.assertEqual(ctx['notification_count'], 1)
+
+    def test_marcar_lida_invalida(self):
+        notif = Notificacao.objects.create(usuario=self.usuario, titulo='C')
+        notification_processor(self._request())
+        notif.marcar_como_lida()
+
+        ctx = notification_processor(self._request())
+        self.assertEqual(ctx['notification_count'], 0)
+
+
+class FiliaisCacheTestCase(GlobalContextTestBase):
+
+    def test_nova_filial_invalida_lista(self):
+        filial_context(self._request())
+        Filial.objects.create(nome='Filial Nova')
+
+        ctx = filial_context(self._request())
+        self.assertIn('Filial Nova', [f.nome for f in ctx['available_filiais']])
+
+    def test_filial_ativa_da_sessao(self):
+        request = self._request()
+        request.session['active_filial_id'] = self.filial.pk
+
+        with self.assertNumQueries(1):
+            ctx = filial_context(request)
+        self.assertEqual(ctx['active_filial'], self.filial)
+
+    def test_filiais_permitidas_invalidadas_pelo_m2m(self):
+        ctx = usuario_filial_context(self._request())
+        self.assertEqual(ctx['filiais_permitidas_global'], [])
+
+        self.usuario.filiais_permitidas.add(self.filial)
+        ctx = usuario_filial_context(self._request())
+        self.assertEqual(ctx['filiais_permitidas_global'], [self.filial])
+
+
+class DiasSemAcidentesCacheTestCase(GlobalContextTestBase):
+
+    def _incidente(self, **kwargs):
+        return Incidente.objects.create(
+            descricao='Teste', detalhes='-', setor='ADMINISTRACAO',
+            filial=self.filial, **kwargs,
+        )
+
+    def test_acidente_novo_zera_contador(self):
+        self._incidente(
+            classificacao='COM_AFASTAMENTO',
+            data_ocorrencia=timezone.now() - timedelta(days=10),
+        )
+        self.assertEqual(dias_sem_acidentes(self._request())['dias_sem_acidentes'], 10)
+
+        with self.assertNumQueries(0):
+            dias_sem_acidentes(self._request())
+
+        self._incidente(classificacao='COM_AFASTAMENTO')
+        self.assertEqual(dias_sem_acidentes(self._request())['dias_sem_acidentes'], 0)
+
+
+class ContextQueryHeaderTestCase(GlobalContextTestBase):
+
+    @override_settings(GLOBAL_CONTEXT_DEBUG_HEADER=True)
+    def test_header_reporta_queries(self):
+        request = self._request()
+
+        def view(req):
+            notification_processor(req)
+            return HttpResponse('ok')
+
+        response = ContextQueryCountMiddleware(view)(request)
+        self.assertEqual(response['X-Context-Queries'], '2')
+        self.assertIn('notification_processor=2', response['X-Context-Queries-Detail'])
+
+        response = ContextQueryCountMiddleware(view)(self._request())
+        self.assertEqual(response['X-Context-Queries'], '0')
+
+    @override_settings(GLOBAL_CONTEXT_DEBUG_HEADER=False)
+    def test_header_desligado(self):
+        @contexto_global
+        def processor(req):
+            return {}
+
+        def view(req):
+            processor(req)
+            return HttpResponse('ok')
+
+        response = ContextQueryCountMiddleware(view)(self._request())
+        self.assertNotIn('X-Context-Queries', response)
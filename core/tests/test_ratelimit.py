@@ -0,0 +1,82 @@
+# core/tests/test_ratelimit.py
+import json
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.views import View
+
+from core import ratelimit
+from core.ratelimit import RateLimiter, RateLimitMixin, limitar_taxa, metricas_ratelimit
+
+
+class RedisForaDoAr:
+    def registrar(self, *args):
+        raise ConnectionError('redis fora do ar')
+
+
+class RateLimiterTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        ratelimit._memoria = ratelimit.BackendMemoria()
+        self.factory = RequestFactory()
+
+    def test_janela_deslizante(self):
+        limiter = RateLimiter('teste', limite=2, janela=10)
+        with patch('core.ratelimit.time.monotonic', return_value=100.0):
+            self.assertTrue(limiter.is_allowed('a'))
+        with patch('core.ratelimit.time.monotonic', return_value=105.0):
+            self.assertTrue(limiter.is_allowed('a'))
+            resultado = limiter.verificar('a')
+            self.assertTrue(limiter.is_allowed('b'))   # chaves independentes
+
+        self.assertFalse(resultado.permitido)
+        self.assertEqual(resultado.retry_after, 5.0)
+
+        # O primeiro request saiu da janela; o segundo ainda conta
+        with patch('core.ratelimit.time.monotonic', return_value=110.5):
+            self.assertTrue(limiter.is_allowed('a'))
+            self.assertFalse(limiter.is_allowed('a'))
+
+    def test_rejeicoes_somadas_por_escopo(self):
+        limiter = RateLimiter('metricas', limite=1, janela=60)
+        for _ in range(3):
+            limiter.verificar('x')
+
+        self.assertEqual(metricas_ratelimit(), {'rejeicoes': 2, 'escopos': {'metricas': 2}})
+
+    def test_falha_no_redis_limita_em_memoria(self):
+        limiter = RateLimiter('fallback', limite=1, janela=60)
+        with patch('core.ratelimit._backend', return_value=RedisForaDoAr()):
+            self.assertTrue(limiter.is_allowed('x'))
+            self.assertFalse(limiter.is_allowed('x'))
+
+    def test_decorator_responde_429_com_retry_after(self):
+        @limitar_taxa('decorator', limite=1, janela=30, chave='ip')
+        def view(request):
+            return HttpResponse('ok')
+
+        request = self.factory.get('/api/x/', REMOTE_ADDR='10.0.0.1')
+        request.user = AnonymousUser()
+
+        self.assertEqual(view(request).status_code, 200)
+        resposta = view(request)
+        self.assertEqual(resposta.status_code, 429)
+        self.assertEqual(resposta['Retry-After'], '30')
+        self.assertEqual(json.loads(resposta.content)['retry_after'], 30)
+
+    def test_mixin_por_ip(self):
+        class PublicaView(RateLimitMixin, View):
+            rate_limit_escopo = 'mixin'
+            rate_limit_max = 1
+
+            def get(self, request):
+                return HttpResponse('ok')
+
+        view = PublicaView.as_view()
+        self.assertEqual(view(self.factory.get('/x/', REMOTE_ADDR='10.0.0.1')).status_code, 200)
+        self.assertEqual(view(self.factory.get('/x/', REMOTE_ADDR='10.0.0.1')).status_code, 429)
+        self.assertEqual(view(self.factory.get('/x/', REMOTE_ADDR='10.0.0.2')).status_code, 200)
@@ -12,6 +12,8 @@ from django.views.decorators.cache import never_cache
 from django.conf import settings
 import redis
 
+from core.cache import metricas_cache
+from core.ratelimit import metricas_ratelimit
 from core.mixins import MonitoramentoAccessMixin
 
 
@@ -131,6 +133,18 @@ def monitoramento_api(request):
     except Exception:
         celery_info = {'fila_celery': 'N/A'}
 
+    # Cache (hit/miss somados entre todos os workers)
+    try:
+        cache_info = metricas_cache()
+    except Exception as e:
+        cache_info = {'erro': str(e)[:100]}
+
+    # Rate-limit (rejeições somadas entre todos os workers)
+    try:
+        ratelimit_info = metricas_ratelimit()
+    except Exception as e:
+        ratelimit_info = {'erro': str(e)[:100]}
+
     # Uptime
     try:
         boot_time = datetime.fromtimestamp(psutil.boot_time())
@@ -163,6 +177,8 @@ def monitoramento_api(request):
         'processos': processos,
         'redis': redis_info,
         'celery': celery_info,
+        'cache': cache_info,
+        'ratelimit': ratelimit_info,
         'uptime_horas': uptime_horas,
     }
 
@@ -3,7 +3,7 @@
 
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Departamento, Cargo, Funcionario, Documento
+from .models import Departamento, Cargo, Funcionario, Documento, ImportacaoFuncionarios
 from core.mixins import AdminFilialScopedMixin, ChangeFilialAdminMixin
 
 
@@ -208,3 +208,16 @@ class DocumentoAdmin(AdminFilialScopedMixin, admin.ModelAdmin):
         if not obj.filial_id and obj.funcionario_id:
             obj.filial = obj.funcionario.filial
         super().save_model(request, obj, form, change)
+
+
+@admin.register(ImportacaoFuncionarios)
+class ImportacaoFuncionariosAdmin(AdminFilialScopedMixin, admin.ModelAdmin):
+    list_display = ('nome_arquivo', 'filial', 'usuario', 'status', 'processadas',
+                    'lotes_concluidos', 'sucessos', 'erros', 'tentativas', 'criado_em', 'concluido_em')
+    list_filter = ('status', 'filial', 'criado_em')
+    search_fields = ('nome_arquivo', 'usuario__username', 'task_id')
+    readonly_fields = ('filial', 'usuario', 'arquivo', 'nome_arquivo', 'status',
+                       'total_linhas', 'processadas', 'ultima_linha', 'lotes_concluidos',
+                       'sucessos', 'erros', 'resultado', 'mensagem_erro', 'tentativas', 'task_id',
+                       'criado_em', 'iniciado_em', 'checkpoint_em', 'concluido_em')
+    ordering = ('-criado_em',)
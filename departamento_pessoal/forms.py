@@ -308,6 +308,9 @@ class UploadFuncionariosForm(forms.Form):
 class ImportacaoMassaFuncionarioForm(forms.Form):
     """Form para upload de planilha de importação em massa de funcionários."""
 
+    # A planilha é lida em streaming no worker, então o limite é só de upload
+    TAMANHO_MAXIMO_MB = 20
+
     arquivo = forms.FileField(
         label=_("Planilha Excel (.xlsx)"),
         help_text=_("Envie o arquivo .xlsx preenchido com base no modelo."),
@@ -326,8 +329,8 @@ class ImportacaoMassaFuncionarioForm(forms.Form):
                 raise forms.ValidationError(
                     _("Apenas arquivos .xlsx são aceitos.")
                 )
-            if arquivo.size > 5 * 1024 * 1024:
+            if arquivo.size > self.TAMANHO_MAXIMO_MB * 1024 * 1024:
                 raise forms.ValidationError(
-                    _("Arquivo muito grande. Tamanho máximo: 5MB.")
+                    _("Arquivo muito grande. Tamanho máximo: %(mb)sMB.") % {"mb": self.TAMANHO_MAXIMO_MB}
                 )
         return arquivo
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.17 on 2026-10-18 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departamento_pessoal', '0010_importacaofuncionarios'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importacaofuncionarios',
+            name='criado_em',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Criado em'),
+        ),
+        migrations.AlterField(
+            model_name='importacaofuncionarios',
+            name='status',
+            field=models.CharField(choices=[('pendente', 'Na fila'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], db_index=True, default='pendente', max_length=15, verbose_name='Status'),
+        ),
+    ]
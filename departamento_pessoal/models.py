@@ -9,19 +9,23 @@ Arquitetura de Filial:
   ✅ Models com campo `filial` direto → FilialManager
 """
 
-from datetime import date
+from datetime import date, timedelta
 
 from django.conf import settings
 from django.db import models
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
+from core.importacao import ImportacaoPlanilha
 from core.managers import FilialManager
 from core.upload import make_upload_path
 from core.validators import SecureFileValidator, SecureImageValidator
+from documentos.storage import PrivateMediaStorage
 from usuario.models import Filial
 from cliente.models import Cliente
 
+private_storage = PrivateMediaStorage()
+
 
 # ═════════════════════════════════════════════════════════════════════════════
 # DEPARTAMENTO
@@ -760,3 +764,66 @@ class Documento(models.Model):
             return "warning"
         return "success"
 
+
+# ═════════════════════════════════════════════════════════════════════════════
+# IMPORTAÇÃO EM MASSA
+# ═════════════════════════════════════════════════════════════════════════════
+
+class ImportacaoFuncionarios(ImportacaoPlanilha):
+    """
+    Importação em massa de funcionários processada em background (Celery).
+
+    A planilha é gravada em lotes; a cada lote, na mesma transação dos
+    registros, o job guarda o checkpoint (`ultima_linha`) e o relatório
+    parcial. Uma importação interrompida é retomada a partir dali.
+    """
+
+    # Sem checkpoint há mais tempo que isso, o worker é considerado perdido
+    TEMPO_LIMITE = timedelta(minutes=30)
+    CAMPOS_SINAL = ("checkpoint_em", "iniciado_em")
+
+    filial = models.ForeignKey(
+        Filial,
+        on_delete=models.PROTECT,
+        related_name="importacoes_funcionarios",
+        verbose_name=_("Filial"),
+        null=True,
+        blank=True,
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="importacoes_funcionarios",
+        verbose_name=_("Enviado por"),
+        null=True,
+        blank=True,
+    )
+    arquivo = models.FileField(
+        _("Planilha"),
+        upload_to="importacoes/funcionarios/%Y/%m/",
+        storage=private_storage,
+        blank=True,
+    )
+    ultima_linha = models.PositiveIntegerField(
+        _("Última Linha Gravada"),
+        default=0,
+        help_text=_("Checkpoint: a retomada continua da linha seguinte."),
+    )
+    lotes_concluidos = models.PositiveIntegerField(_("Lotes Concluídos"), default=0)
+    tentativas = models.PositiveSmallIntegerField(_("Execuções"), default=0)
+    checkpoint_em = models.DateTimeField(_("Último Checkpoint"), null=True, blank=True)
+
+    objects = FilialManager()
+
+    class Meta:
+        db_table = "departamento_pessoal_importacao"
+        verbose_name = _("Importação de Funcionários")
+        verbose_name_plural = _("Importações de Funcionários")
+        ordering = ["-criado_em"]
+
+    def get_absolute_url(self):
+        return reverse("departamento_pessoal:importacao_funcionarios_status", kwargs={"pk": self.pk})
+
+    @property
+    def pode_retomar(self):
+        return bool(self.arquivo) and (self.status == self.STATUS_ERRO or self.travado)
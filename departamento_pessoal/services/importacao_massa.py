@@ -6,17 +6,21 @@ Responsabilidades:
   - Gerar planilha modelo (.xlsx) com instruções e validações
   - Processar upload: validar, criar/buscar Departamento, Cargo, Cliente
     e criar Funcionário + Documentos (CPF, RG, CTPS, PIS)
+    (leitura em streaming, lotes com bulk_create e checkpoint por lote)
+  - Rodar a importação como job Celery retomável
   - Retornar relatório detalhado (sucessos, erros por linha)
 """
 
+import logging
 import re
 from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
 from io import BytesIO
 
-from django.db import transaction
+from django.db import DatabaseError, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
 from openpyxl.styles import (
     Alignment,
     Border,
@@ -30,6 +34,8 @@ from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.datavalidation import DataValidation
 
 from cliente.models import Cliente
+from core.importacao import PlanilhaInvalida, abrir_planilha, criar_importacao, em_lotes, erros_modelo
+from core.jobs import enfileirar_apos_commit
 from departamento_pessoal.models import (
     Cargo,
     Departamento,
@@ -37,6 +43,8 @@ from departamento_pessoal.models import (
     Funcionario,
 )
 
+logger = logging.getLogger(__name__)
+
 
 # ============================================================================
 # CONSTANTES — COLUNAS DA PLANILHA
@@ -497,100 +505,331 @@ def _criar_aba_referencia(ws, filial):
 # PROCESSAMENTO DA PLANILHA ENVIADA
 # ============================================================================
 
+TAMANHO_LOTE = 500
+LINHA_INICIAL = 3  # Linha 1=dica, 2=header, 3+=dados
+
+# O relatório fica guardado no job (JSONField); acima disso só conta
+LIMITE_DETALHES_SUCESSO = 500
+LIMITE_DETALHES_ERRO = 2000
+
+# FKs resolvidas pelos dicionários de referência — fora do full_clean
+FKS_FUNCIONARIO = ["cargo", "departamento", "cliente", "filial", "funcao", "usuario"]
+
+
+def novo_resultado():
+    return {
+        "total": 0,
+        "sucessos": 0,
+        "erros": 0,
+        "detalhes_sucesso": [],
+        "detalhes_erro": [],
+    }
+
 
-def processar_planilha(arquivo, filial):
+def processar_planilha(
+    arquivo,
+    filial,
+    resultado=None,
+    retomar_apos=0,
+    ao_concluir_lote=None,
+    tamanho_lote=TAMANHO_LOTE,
+):
     """
     Processa planilha Excel enviada e cria Funcionários + Documentos.
 
+    A planilha é lida em streaming e gravada em lotes de `tamanho_lote`
+    linhas, cada lote na sua transação. Departamentos, cargos e clientes
+    da filial são carregados uma vez por importação; matrículas e e-mails
+    já cadastrados, uma vez por lote.
+
     Args:
-        arquivo: InMemoryUploadedFile (arquivo .xlsx)
+        arquivo: arquivo .xlsx (upload, arquivo aberto ou caminho)
         filial: Instância de Filial do usuário logado
+        resultado: relatório parcial de uma execução anterior (retomada)
+        retomar_apos: última linha já gravada — as anteriores são puladas
+        ao_concluir_lote: callable(ultima_linha, resultado, total_estimado),
+            chamado DENTRO da transação do lote: o checkpoint é gravado
+            junto com os registros, ou nenhum dos dois.
 
     Returns:
         dict com total, sucessos, erros, detalhes_sucesso, detalhes_erro
     """
-    resultado = {
-        "total": 0,
-        "sucessos": 0,
-        "erros": 0,
-        "detalhes_sucesso": [],
-        "detalhes_erro": [],
-    }
+    if resultado is None:
+        resultado = novo_resultado()
 
     try:
-        wb = load_workbook(arquivo, data_only=True)
-    except Exception:
+        planilha = abrir_planilha(arquivo, aba="Dados Funcionários")
+    except PlanilhaInvalida:
         resultado["detalhes_erro"].append(
             {"linha": 0, "erros": ["Arquivo inválido. Envie um arquivo .xlsx válido."]}
         )
         return resultado
 
-    # Procura aba "Dados Funcionários"
-    if "Dados Funcionários" in wb.sheetnames:
-        ws = wb["Dados Funcionários"]
-    else:
-        ws = wb.worksheets[0]
+    importador = _ImportadorFuncionarios(filial, resultado)
 
-    start_row = 3  # Linha 1=dica, 2=header, 3+=dados
-    total_colunas = len(TODAS_COLUNAS)
+    with planilha:
+        total_estimado = planilha.total_estimado(LINHA_INICIAL)
+        linhas = planilha.linhas(max(LINHA_INICIAL, retomar_apos + 1), len(TODAS_COLUNAS))
 
-    for row_idx in range(start_row, ws.max_row + 1):
-        valores = []
-        for col_idx in range(1, total_colunas + 1):
-            cell_value = ws.cell(row=row_idx, column=col_idx).value
-            valores.append(cell_value)
+        for lote in em_lotes(linhas, tamanho_lote):
+            with transaction.atomic():
+                importador.processar_lote(lote)
+                if ao_concluir_lote:
+                    ao_concluir_lote(lote[-1][0], resultado, total_estimado)
 
-        # Pular linhas totalmente vazias
-        if all(v is None or str(v).strip() == "" for v in valores):
-            continue
+    # Erros de planilha e de banco são apurados em passadas diferentes do lote
+    resultado["detalhes_erro"].sort(key=lambda item: item["linha"])
+    return resultado
+
+
+class _Referencias:
+    """Departamentos, cargos e clientes da filial por nome (minúsculo) → pk."""
+
+    def __init__(self, filial):
+        self.departamentos = _por_nome(
+            Departamento.objects.all_filiais().filter(filial=filial, ativo=True)
+        )
+        self.cargos = _por_nome(
+            Cargo.objects.all_filiais().filter(filial=filial, ativo=True)
+        )
+        self.clientes = _por_nome(
+            Cliente.objects.all_filiais().filter(filial=filial)
+        )
+
+
+def _por_nome(queryset):
+    mapa = {}
+    for pk, nome in queryset.order_by("pk").values_list("pk", "nome"):
+        mapa.setdefault(nome.strip().lower(), pk)
+    return mapa
 
-        resultado["total"] += 1
-        erros_linha = []
-
-        # Mapear valores para dicionários
-        dados_func = {}
-        for i, (_, campo, _, _, _) in enumerate(COLUNAS_FUNCIONARIO):
-            dados_func[campo] = valores[i]
-
-        dados_vinculo = {}
-        offset_v = len(COLUNAS_FUNCIONARIO)
-        for i, (_, campo, _, _, _) in enumerate(COLUNAS_VINCULO):
-            dados_vinculo[campo] = valores[offset_v + i]
-
-        dados_docs = {}
-        offset_d = offset_v + len(COLUNAS_VINCULO)
-        for i, (_, campo, _, _, _) in enumerate(COLUNAS_DOCUMENTOS):
-            dados_docs[campo] = valores[offset_d + i]
-
-        # Validações
-        erros_linha.extend(_validar_funcionario(dados_func))
-        erros_linha.extend(_validar_vinculo(dados_vinculo, filial))
-        erros_linha.extend(_validar_documentos(dados_docs))
-
-        if erros_linha:
-            resultado["erros"] += 1
-            resultado["detalhes_erro"].append(
-                {"linha": row_idx, "erros": erros_linha}
-            )
-            continue
 
-        # Criar registros
+def _chave_nome(valor):
+    return str(valor).strip().lower()
+
+
+class _ImportadorFuncionarios:
+    """
+    Estado da importação entre os lotes: referências da filial e
+    matrículas/e-mails já aceitos nesta planilha (repetição = erro).
+    """
+
+    def __init__(self, filial, resultado):
+        self.filial = filial
+        self.resultado = resultado
+        self.referencias = _Referencias(filial)
+        self.matriculas_planilha = set()
+        self.emails_planilha = set()
+
+    # ------------------------------------------------------------------
+    # LOTE
+    # ------------------------------------------------------------------
+
+    def processar_lote(self, lote):
+        validas = []
+        for row_idx, valores in lote:
+            self.resultado["total"] += 1
+            dados_func, dados_vinculo, dados_docs = _mapear_linha(valores)
+
+            erros_linha = (
+                _validar_funcionario(dados_func)
+                + _validar_vinculo(dados_vinculo, self.referencias)
+                + _validar_documentos(dados_docs)
+            )
+            if erros_linha:
+                self._erro(row_idx, erros_linha)
+                continue
+
+            validas.append((
+                row_idx,
+                _montar_funcionario(dados_func, dados_vinculo, self.filial, self.referencias),
+                dados_docs,
+            ))
+
+        if not validas:
+            return
+
+        matriculas_cadastradas = set(
+            Funcionario.objects.all_filiais()
+            .filter(matricula__in={func.matricula for _linha, func, _docs in validas})
+            .values_list("matricula", flat=True)
+        )
+        emails = {func.email_pessoal for _linha, func, _docs in validas if func.email_pessoal}
+        emails_cadastrados = set(
+            Funcionario.objects.all_filiais()
+            .filter(email_pessoal__in=emails)
+            .values_list("email_pessoal", flat=True)
+        ) if emails else set()
+
+        pendentes = []  # (linha, Funcionario, [Documento])
+        for row_idx, funcionario, dados_docs in validas:
+            erros_linha = self._checar_unicidade(funcionario, matriculas_cadastradas, emails_cadastrados)
+            if not erros_linha:
+                erros_linha = erros_modelo(funcionario, FKS_FUNCIONARIO)
+            if erros_linha:
+                self._erro(row_idx, erros_linha)
+                continue
+
+            self.matriculas_planilha.add(funcionario.matricula)
+            if funcionario.email_pessoal:
+                self.emails_planilha.add(funcionario.email_pessoal)
+            pendentes.append((row_idx, funcionario, _montar_documentos(dados_docs, self.filial)))
+
+        if pendentes:
+            self._gravar(pendentes)
+
+    def _checar_unicidade(self, funcionario, matriculas_cadastradas, emails_cadastrados):
+        erros = []
+        matricula = funcionario.matricula
+        if matricula in matriculas_cadastradas:
+            erros.append(f"Matrícula '{matricula}' já existe no sistema.")
+        elif matricula in self.matriculas_planilha:
+            erros.append(f"Matrícula '{matricula}' repetida na planilha.")
+
+        email = funcionario.email_pessoal
+        if email in emails_cadastrados:
+            erros.append(f"E-mail '{email}' já está vinculado a outro funcionário.")
+        elif email and email in self.emails_planilha:
+            erros.append(f"E-mail '{email}' repetido na planilha.")
+        return erros
+
+    # ------------------------------------------------------------------
+    # GRAVAÇÃO
+    # ------------------------------------------------------------------
+
+    def _gravar(self, pendentes):
         try:
             with transaction.atomic():
-                funcionario = _criar_funcionario(dados_func, dados_vinculo, filial)
-                _criar_documentos(dados_docs, funcionario, filial)
-                resultado["sucessos"] += 1
-                resultado["detalhes_sucesso"].append(
-                    f"Linha {row_idx}: {funcionario.nome_completo} "
-                    f"(Mat: {funcionario.matricula}) — importado com sucesso."
-                )
-        except Exception as e:
-            resultado["erros"] += 1
-            resultado["detalhes_erro"].append(
-                {"linha": row_idx, "erros": [f"Erro ao salvar: {str(e)}"]}
+                self._inserir(pendentes)
+        except DatabaseError:
+            # Conflito com algo gravado em paralelo: refaz linha a linha
+            # para atribuir o erro à linha certa.
+            logger.warning("Lote da importação de funcionários falhou; gravando linha a linha.", exc_info=True)
+            self._gravar_linha_a_linha(pendentes)
+            return
+
+        for row_idx, funcionario, _docs in pendentes:
+            self._sucesso(row_idx, funcionario)
+
+    def _inserir(self, pendentes):
+        """bulk_create dos funcionários e, com os ids, dos documentos."""
+        funcionarios = Funcionario.objects.bulk_create([func for _linha, func, _docs in pendentes])
+
+        if not all(func.pk for func in funcionarios):
+            # MySQL não devolve os ids do bulk_create: relê pelas matrículas
+            ids = dict(
+                Funcionario.objects.all_filiais()
+                .filter(matricula__in=[func.matricula for func in funcionarios])
+                .values_list("matricula", "pk")
+            )
+            for func in funcionarios:
+                func.pk = ids[func.matricula]
+
+        documentos = []
+        for _linha, funcionario, docs in pendentes:
+            for documento in docs:
+                documento.funcionario = funcionario
+                documentos.append(documento)
+        Documento.objects.bulk_create(documentos)
+
+    def _gravar_linha_a_linha(self, pendentes):
+        for row_idx, funcionario, documentos in pendentes:
+            try:
+                with transaction.atomic():
+                    funcionario.pk = None
+                    funcionario._state.adding = True
+                    funcionario.full_clean()
+                    funcionario.save()
+                    for documento in documentos:
+                        documento.pk = None
+                        documento._state.adding = True
+                        documento.funcionario = funcionario
+                        documento.save()
+            except Exception as e:
+                self._erro(row_idx, [f"Erro ao salvar: {str(e)}"])
+                continue
+
+            self._sucesso(row_idx, funcionario)
+
+    # ------------------------------------------------------------------
+    # RELATÓRIO
+    # ------------------------------------------------------------------
+
+    def _sucesso(self, row_idx, funcionario):
+        self.resultado["sucessos"] += 1
+        if len(self.resultado["detalhes_sucesso"]) < LIMITE_DETALHES_SUCESSO:
+            self.resultado["detalhes_sucesso"].append(
+                f"Linha {row_idx}: {funcionario.nome_completo} "
+                f"(Mat: {funcionario.matricula}) — importado com sucesso."
             )
 
-    return resultado
+    def _erro(self, row_idx, erros_linha):
+        self.resultado["erros"] += 1
+        if len(self.resultado["detalhes_erro"]) < LIMITE_DETALHES_ERRO:
+            self.resultado["detalhes_erro"].append({"linha": row_idx, "erros": erros_linha})
+
+
+def _mapear_linha(valores):
+    """Separa os valores da linha em (dados_func, dados_vinculo, dados_docs)."""
+    offset_v = len(COLUNAS_FUNCIONARIO)
+    offset_d = offset_v + len(COLUNAS_VINCULO)
+
+    dados_func = {
+        coluna[1]: valores[i] for i, coluna in enumerate(COLUNAS_FUNCIONARIO)
+    }
+    dados_vinculo = {
+        coluna[1]: valores[offset_v + i] for i, coluna in enumerate(COLUNAS_VINCULO)
+    }
+    dados_docs = {
+        coluna[1]: valores[offset_d + i] for i, coluna in enumerate(COLUNAS_DOCUMENTOS)
+    }
+    return dados_func, dados_vinculo, dados_docs
+
+
+# ============================================================================
+# JOB EM BACKGROUND
+# ============================================================================
+
+
+def iniciar_importacao(arquivo, filial, usuario):
+    """
+    Guarda a planilha num ImportacaoFuncionarios e enfileira o
+    processamento (task `departamento_pessoal.importar_funcionarios`).
+    """
+    from departamento_pessoal.models import ImportacaoFuncionarios
+    from departamento_pessoal.tasks import processar_planilha_funcionarios_task
+
+    return criar_importacao(
+        ImportacaoFuncionarios, arquivo, filial, usuario, processar_planilha_funcionarios_task,
+    )
+
+
+def retomar_importacao(importacao):
+    """
+    Recoloca na fila uma importação interrompida. O processamento continua
+    a partir do último lote gravado (`ultima_linha`). Retorna False se a
+    importação não pode ser retomada.
+    """
+    from departamento_pessoal.models import ImportacaoFuncionarios
+    from departamento_pessoal.tasks import processar_planilha_funcionarios_task
+
+    if not importacao.pode_retomar:
+        return False
+
+    with transaction.atomic():
+        retomada = ImportacaoFuncionarios.objects.all_filiais().filter(
+            pk=importacao.pk, status=importacao.status,
+        ).update(
+            status=ImportacaoFuncionarios.STATUS_PENDENTE,
+            mensagem_erro="",
+            concluido_em=None,
+            # Conta como sinal: a retomada não aparece travada enquanto espera na fila
+            checkpoint_em=timezone.now(),
+        )
+        if retomada:
+            enfileirar_apos_commit(importacao, processar_planilha_funcionarios_task)
+
+    return bool(retomada)
 
 
 # ============================================================================
@@ -599,7 +838,11 @@ def processar_planilha(arquivo, filial):
 
 
 def _validar_funcionario(dados):
-    """Valida campos do funcionário e retorna lista de erros."""
+    """
+    Valida campos do funcionário e retorna lista de erros.
+
+    Matrícula e e-mail duplicados são conferidos por lote, no importador.
+    """
     erros = []
 
     # Nome
@@ -610,10 +853,6 @@ def _validar_funcionario(dados):
     matricula = dados.get("matricula")
     if not _tem_valor(matricula):
         erros.append("Matrícula é obrigatória.")
-    else:
-        mat_str = str(matricula).strip()
-        if Funcionario.objects.model.objects.filter(matricula=mat_str).exists():
-            erros.append(f"Matrícula '{mat_str}' já existe no sistema.")
 
     # Data admissão
     if not dados.get("data_admissao"):
@@ -646,8 +885,6 @@ def _validar_funcionario(dados):
         email_str = str(email).strip()
         if not re.match(r"[^@]+@[^@]+\.[^@]+", email_str):
             erros.append(f"E-mail inválido: '{email_str}'.")
-        elif Funcionario.objects.model.objects.filter(email_pessoal=email_str).exists():
-            erros.append(f"E-mail '{email_str}' já está vinculado a outro funcionário.")
 
     # Salário
     salario = dados.get("salario")
@@ -671,49 +908,37 @@ def _validar_funcionario(dados):
     return erros
 
 
-def _validar_vinculo(dados, filial):
-    """Valida campos de vínculo (departamento, cargo, cliente)."""
+def _validar_vinculo(dados, referencias):
+    """Valida campos de vínculo (departamento, cargo, cliente) contra as referências da filial."""
     erros = []
 
     # Departamento
     dep_nome = dados.get("departamento")
     if not _tem_valor(dep_nome):
         erros.append("Departamento é obrigatório.")
-    else:
-        dep_str = str(dep_nome).strip()
-        if not Departamento.objects.model.objects.filter(
-            nome__iexact=dep_str, filial=filial, ativo=True
-        ).exists():
-            erros.append(
-                f"Departamento '{dep_str}' não encontrado. "
-                f"Verifique na aba 'Referência' ou cadastre-o antes."
-            )
+    elif _chave_nome(dep_nome) not in referencias.departamentos:
+        erros.append(
+            f"Departamento '{str(dep_nome).strip()}' não encontrado. "
+            f"Verifique na aba 'Referência' ou cadastre-o antes."
+        )
 
     # Cargo
     cargo_nome = dados.get("cargo")
     if not _tem_valor(cargo_nome):
         erros.append("Cargo é obrigatório.")
-    else:
-        cargo_str = str(cargo_nome).strip()
-        if not Cargo.objects.model.objects.filter(
-            nome__iexact=cargo_str, filial=filial, ativo=True
-        ).exists():
-            erros.append(
-                f"Cargo '{cargo_str}' não encontrado. "
-                f"Verifique na aba 'Referência' ou cadastre-o antes."
-            )
+    elif _chave_nome(cargo_nome) not in referencias.cargos:
+        erros.append(
+            f"Cargo '{str(cargo_nome).strip()}' não encontrado. "
+            f"Verifique na aba 'Referência' ou cadastre-o antes."
+        )
 
     # Cliente (opcional)
     cliente_nome = dados.get("cliente")
-    if cliente_nome and _tem_valor(cliente_nome):
-        cli_str = str(cliente_nome).strip()
-        if not Cliente.objects.model.objects.filter(
-            nome__iexact=cli_str, filial=filial
-        ).exists():
-            erros.append(
-                f"Cliente '{cli_str}' não encontrado. "
-                f"Verifique na aba 'Referência' ou cadastre-o antes."
-            )
+    if _tem_valor(cliente_nome) and _chave_nome(cliente_nome) not in referencias.clientes:
+        erros.append(
+            f"Cliente '{str(cliente_nome).strip()}' não encontrado. "
+            f"Verifique na aba 'Referência' ou cadastre-o antes."
+        )
 
     return erros
 
@@ -751,31 +976,15 @@ def _validar_documentos(dados):
 
 
 # ============================================================================
-# CRIAÇÃO DE REGISTROS
+# MONTAGEM DOS REGISTROS
 # ============================================================================
 
 
-def _criar_funcionario(dados_func, dados_vinculo, filial):
-    """Cria instância de Funcionário com os dados validados."""
-    # Buscar vínculo
-    departamento = Departamento.objects.model.objects.filter(
-        nome__iexact=str(dados_vinculo["departamento"]).strip(),
-        filial=filial,
-        ativo=True,
-    ).first()
-
-    cargo = Cargo.objects.model.objects.filter(
-        nome__iexact=str(dados_vinculo["cargo"]).strip(),
-        filial=filial,
-        ativo=True,
-    ).first()
-
-    cliente = None
-    if dados_vinculo.get("cliente") and _tem_valor(dados_vinculo["cliente"]):
-        cliente = Cliente.objects.model.objects.filter(
-            nome__iexact=str(dados_vinculo["cliente"]).strip(),
-            filial=filial,
-        ).first()
+def _montar_funcionario(dados_func, dados_vinculo, filial, referencias):
+    """Funcionário (não salvo) com os dados validados e o vínculo já resolvido."""
+    cliente_id = None
+    if _tem_valor(dados_vinculo.get("cliente")):
+        cliente_id = referencias.clientes[_chave_nome(dados_vinculo["cliente"])]
 
     # Dados do funcionário
     nome = str(dados_func["nome_completo"]).strip()
@@ -808,7 +1017,7 @@ def _criar_funcionario(dados_func, dados_vinculo, filial):
 
     status = str(dados_func["status"]).strip().upper()
 
-    funcionario = Funcionario(
+    return Funcionario(
         nome_completo=nome,
         matricula=matricula,
         data_admissao=data_admissao,
@@ -819,18 +1028,16 @@ def _criar_funcionario(dados_func, dados_vinculo, filial):
         telefone=telefone,
         salario=salario,
         status=status,
-        departamento=departamento,
-        cargo=cargo,
-        cliente=cliente,
+        departamento_id=referencias.departamentos[_chave_nome(dados_vinculo["departamento"])],
+        cargo_id=referencias.cargos[_chave_nome(dados_vinculo["cargo"])],
+        cliente_id=cliente_id,
         filial=filial,
     )
-    funcionario.full_clean()
-    funcionario.save()
-    return funcionario
 
 
-def _criar_documentos(dados_docs, funcionario, filial):
-    """Cria documentos vinculados ao funcionário (CPF, RG, CTPS, PIS)."""
+def _montar_documentos(dados_docs, filial):
+    """Documentos (não salvos, sem funcionário) da linha: CPF, RG, CTPS, PIS."""
+    documentos = []
 
     # ── CPF ──
     cpf = dados_docs.get("cpf")
@@ -839,12 +1046,11 @@ def _criar_documentos(dados_docs, funcionario, filial):
         cpf_formatado = (
             f"{cpf_digitos[:3]}.{cpf_digitos[3:6]}.{cpf_digitos[6:9]}-{cpf_digitos[9:]}"
         )
-        Documento.objects.create(
-            funcionario=funcionario,
+        documentos.append(Documento(
             tipo_documento="CPF",
             numero=cpf_formatado,
             filial=filial,
-        )
+        ))
 
     # ── RG ──
     rg_numero = dados_docs.get("rg_numero")
@@ -879,8 +1085,7 @@ def _criar_documentos(dados_docs, funcionario, filial):
             else None
         )
 
-        Documento.objects.create(
-            funcionario=funcionario,
+        documentos.append(Documento(
             tipo_documento="RG",
             numero=str(rg_numero).strip(),
             orgao_expedidor=rg_orgao,
@@ -890,7 +1095,7 @@ def _criar_documentos(dados_docs, funcionario, filial):
             rg_nome_pai=rg_nome_pai,
             rg_naturalidade=rg_naturalidade,
             filial=filial,
-        )
+        ))
 
     # ── CTPS ──
     ctps_numero = dados_docs.get("ctps_numero")
@@ -906,24 +1111,24 @@ def _criar_documentos(dados_docs, funcionario, filial):
             else None
         )
 
-        Documento.objects.create(
-            funcionario=funcionario,
+        documentos.append(Documento(
             tipo_documento="CTPS",
             numero=str(ctps_numero).strip(),
             ctps_serie=ctps_serie,
             ctps_uf=ctps_uf,
             filial=filial,
-        )
+        ))
 
     # ── PIS/PASEP ──
     pis = dados_docs.get("pis")
     if pis and _tem_valor(pis):
-        Documento.objects.create(
-            funcionario=funcionario,
+        documentos.append(Documento(
             tipo_documento="PIS",
             numero=str(pis).strip(),
             filial=filial,
-        )
+        ))
+
+    return documentos
 
 
 # ============================================================================
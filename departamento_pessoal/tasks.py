@@ -1,28 +1,137 @@
-
 # departamento_pessoal/tasks.py
+import logging
+
 from celery import shared_task
-import pandas as pd
-from .models import Funcionario, Cargo, Departamento
-from django.contrib.auth.models import User
-from notifications.models import Notificacao
-
-@shared_task
-def processar_planilha_funcionarios_task(caminho_arquivo, user_id):
-    # A lógica de leitura do arquivo e iteração (o loop for da view síncrona)
-    # seria colocada aqui.
-    df = pd.read_excel(caminho_arquivo, ...)
-    # ... loop, validações, etc. ...
-    user = User.objects.get(id=user_id)
-    if houve_erros: # pyright: ignore[reportUndefinedVariable]
-        #caminho_relatorio = salvar_relatorio_de_erros_em_arquivo(linhas_com_erro)
-        Notificacao.objects.create(
-            usuario=user,
-            mensagem=f"A importação de funcionários falhou. Baixe o relatório.",
-            link=caminho_relatorio # pyright: ignore[reportUndefinedVariable]
+from django.db import OperationalError
+from django.db.models import F
+from django.utils import timezone
+
+from core.importacao import notificar_importacao
+from core.jobs import assumir, concluir, marcar_erro
+from core.upload import safe_delete_file
+
+from .models import ImportacaoFuncionarios
+
+logger = logging.getLogger(__name__)
+
+
+class ImportacaoAssumidaPorOutraExecucao(Exception):
+    """O job foi retomado enquanto esta execução ainda gravava lotes."""
+
+
+@shared_task(bind=True, name="departamento_pessoal.importar_funcionarios", max_retries=3)
+def processar_planilha_funcionarios_task(self, importacao_id):
+    """
+    Processa a planilha de um ImportacaoFuncionarios em lotes com checkpoint.
+
+    Cada lote grava os registros e o checkpoint do job na mesma transação.
+    Se a execução cair no meio, a próxima (retry automático para erros
+    transitórios do banco, ou "Retomar" na tela) continua da linha
+    seguinte ao último lote gravado.
+    """
+    from .services.importacao_massa import LINHA_INICIAL, processar_planilha
+
+    consulta = ImportacaoFuncionarios.objects.all_filiais().filter(pk=importacao_id)
+
+    agora = timezone.now()
+    assumiu = assumir(
+        ImportacaoFuncionarios, importacao_id,
+        iniciado_em=agora, checkpoint_em=agora, tentativas=F("tentativas") + 1,
+    )
+    if not assumiu:
+        logger.info(f"[Importação Funcionários] Job {importacao_id} inexistente ou já assumido.")
+        return None
+
+    importacao = consulta.select_related("filial", "usuario").get()
+    execucao = importacao.tentativas
+
+    def checkpoint(ultima_linha, resultado, total_estimado):
+        processadas = max(ultima_linha - LINHA_INICIAL + 1, 0)
+        gravou = consulta.filter(
+            status=ImportacaoFuncionarios.STATUS_PROCESSANDO, tentativas=execucao,
+        ).update(
+            ultima_linha=ultima_linha,
+            processadas=processadas,
+            total_linhas=max(total_estimado, processadas),
+            lotes_concluidos=F("lotes_concluidos") + 1,
+            sucessos=resultado["sucessos"],
+            erros=resultado["erros"],
+            resultado=resultado,
+            checkpoint_em=timezone.now(),
         )
-    else:
-        Notificacao.objects.create(usuario=user, mensagem="Importação de funcionários concluída!")
+        if not gravou:
+            # Desfaz o lote: outra execução já responde por este job
+            raise ImportacaoAssumidaPorOutraExecucao(importacao_id)
+
+    try:
+        with importacao.arquivo.open("rb") as arquivo:
+            resultado = processar_planilha(
+                arquivo, importacao.filial,
+                resultado=importacao.resultado or None,
+                retomar_apos=importacao.ultima_linha,
+                ao_concluir_lote=checkpoint,
+            )
+    except ImportacaoAssumidaPorOutraExecucao:
+        logger.warning(f"[Importação Funcionários] Job {importacao_id} retomado por outra execução; parando.")
+        return None
+    except OperationalError as e:
+        # Banco fora do ar/deadlock: volta para a fila e continua do checkpoint
+        if self.request.retries < self.max_retries:
+            logger.warning(f"[Importação Funcionários] Job {importacao_id}: {e}; nova tentativa.")
+            consulta.filter(tentativas=execucao).update(
+                status=ImportacaoFuncionarios.STATUS_PENDENTE, checkpoint_em=timezone.now(),
+            )
+            raise self.retry(exc=e, countdown=30 * 2 ** self.request.retries)
+        _marcar_erro(importacao, e)
+        return None
+    except Exception as e:
+        _marcar_erro(importacao, e)
+        return None
+
+    # A planilha só serve para o processamento; o relatório fica no job
+    safe_delete_file(importacao, "arquivo")
+
+    importacao.refresh_from_db()
+    importacao.arquivo = ""
+    importacao.resultado = resultado
+    importacao.sucessos = resultado["sucessos"]
+    importacao.erros = resultado["erros"]
+    importacao.total_linhas = importacao.processadas
+    if not concluir(importacao, ["arquivo", "resultado", "sucessos", "erros", "total_linhas"]):
+        logger.warning(f"[Importação Funcionários] Job {importacao_id} encerrado antes de concluir.")
+        return None
+
+    _notificar(importacao)
+    logger.info(
+        f"[Importação Funcionários] Job {importacao_id}: {importacao.sucessos} ok, "
+        f"{importacao.erros} erro(s) em {importacao.lotes_concluidos} lote(s)."
+    )
+    return importacao.pk
 
-    # Aqui, apenas simulamos o processo
-    print(f"Processando arquivo {caminho_arquivo} para o usuário {user_id}...")
-    return "Processamento concluído."
+
+def _marcar_erro(importacao, erro):
+    """Interrompe o job mantendo o checkpoint (e a planilha) para retomada."""
+    logger.error(f"[Importação Funcionários] Erro no job {importacao.pk}", exc_info=erro)
+    marcar_erro(importacao, erro, tentativas=importacao.tentativas)
+    _notificar(importacao)
+
+
+def _notificar(importacao):
+    """Avisa quem enviou a planilha que a importação terminou ou parou."""
+    if importacao.status == ImportacaoFuncionarios.STATUS_ERRO:
+        notificar_importacao(
+            importacao, "funcionários", "bi-people",
+            titulo="Importação de funcionários interrompida",
+            mensagem=(
+                f"{importacao.nome_arquivo}: os lotes já gravados foram mantidos. "
+                f"Abra a importação para retomar."
+            ),
+        )
+    else:
+        notificar_importacao(
+            importacao, "funcionários", "bi-people",
+            mensagem=(
+                f"{importacao.nome_arquivo}: {importacao.sucessos} funcionário(s) importado(s), "
+                f"{importacao.erros} linha(s) com erro."
+            ),
+        )
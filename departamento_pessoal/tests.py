@@ -53,4 +53,208 @@ def setUpTestData(cls):
             funcao=self.funcao,
             data_admissao=date.today()
         )
-        self.assertEqual(funcionario_sem_rg.rg_numero, 'N/A')   
\ No newline at end of file
+        self.assertEqual(funcionario_sem_rg.rg_numero, 'N/A')   
+
+# ─────────────────────────────────────────────
+# Importação em massa
+# ─────────────────────────────────────────────
+
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import override_settings
+from django.urls import include, path
+from django.utils import timezone
+from openpyxl import Workbook
+
+from notifications.models import Notificacao
+
+from .models import Cargo, Departamento, ImportacaoFuncionarios
+from .services.importacao_massa import TODAS_COLUNAS, processar_planilha, retomar_importacao
+from .tasks import processar_planilha_funcionarios_task
+
+# As views do app importam o WeasyPrint; para o reverse() das notificações
+# basta a rota de status no namespace do app.
+urlpatterns = [
+    path('departamento-pessoal/', include(([
+        path('importacao/<int:pk>/', lambda request, pk: None, name='importacao_funcionarios_status'),
+    ], 'departamento_pessoal'))),
+]
+
+
+def _linha(n, **campos):
+    """Valores de uma linha válida da planilha, na ordem de TODAS_COLUNAS."""
+    dados = {
+        'nome_completo': f'Funcionário {n}', 'matricula': f'MAT{n:05d}',
+        'data_admissao': '01/02/2024', 'email_pessoal': f'func{n}@exemplo.com.br',
+        'salario': '3500.00', 'status': 'ATIVO',
+        'departamento': 'Operações', 'cargo': 'Técnico',
+        'cpf': f'{n:011d}', 'pis': f'{n:011d}',
+    }
+    dados.update(campos)
+    return [dados.get(campo) for _, campo, *_ in TODAS_COLUNAS]
+
+
+def _planilha(linhas):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Dados Funcionários')
+    ws.append(['Dica'])
+    ws.append([header for header, *_ in TODAS_COLUNAS])
+    for linha in linhas:
+        ws.append(linha)
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class ImportacaoFuncionariosTestBase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial Importação')
+        cls.usuario = User.objects.create_superuser(
+            username='importador', email='importador@example.com', password='x',
+            filial_ativa=cls.filial,
+        )
+        cls.departamento = Departamento.objects.create(nome='Operações', filial=cls.filial)
+        cls.cargo = Cargo.objects.create(nome='Técnico', filial=cls.filial)
+
+
+class ProcessarPlanilhaFuncionariosTestCase(ImportacaoFuncionariosTestBase):
+
+    def test_importa_funcionarios_e_documentos(self):
+        resultado = processar_planilha(_planilha([_linha(1), _linha(2, cpf=None, pis=None)]), self.filial)
+
+        self.assertEqual((resultado['total'], resultado['sucessos'], resultado['erros']), (2, 2, 0))
+        funcionario = Funcionario.objects.get(matricula='MAT00001')
+        self.assertEqual(funcionario.cargo.nome, 'Técnico')
+        self.assertEqual(funcionario.filial, self.filial)
+        self.assertEqual(
+            set(funcionario.documentos_dp.values_list('tipo_documento', flat=True)),
+            {'CPF', 'PIS'},
+        )
+        self.assertFalse(Documento.objects.filter(funcionario__matricula='MAT00002').exists())
+
+    def test_erros_por_linha(self):
+        Funcionario.objects.create(
+            nome_completo='Já Existe', matricula='MAT00001', data_admissao=date.today(),
+            salario=1000, cargo=self.cargo, departamento=self.departamento, filial=self.filial,
+        )
+
+        resultado = processar_planilha(_planilha([
+            _linha(1),                                   # matrícula já cadastrada
+            _linha(2),
+            _linha(3, matricula='MAT00002'),             # repetida na planilha
+            _linha(4, cargo='Inexistente'),              # cargo de outra filial/inexistente
+            _linha(5, salario='abc'),
+        ]), self.filial)
+
+        self.assertEqual((resultado['sucessos'], resultado['erros']), (1, 4))
+        self.assertEqual([item['linha'] for item in resultado['detalhes_erro']], [3, 5, 6, 7])
+        self.assertEqual(Funcionario.objects.count(), 2)
+
+    def test_retomada_continua_do_checkpoint(self):
+        planilha = _planilha([_linha(n) for n in range(1, 6)]).getvalue()
+        checkpoints = []
+
+        def interrompe_no_segundo_lote(ultima_linha, resultado, total_estimado):
+            if checkpoints:
+                raise RuntimeError('worker caiu')
+            checkpoints.append(ultima_linha)
+
+        with self.assertRaises(RuntimeError):
+            processar_planilha(
+                BytesIO(planilha), self.filial,
+                ao_concluir_lote=interrompe_no_segundo_lote, tamanho_lote=2,
+            )
+
+        # O lote com o checkpoint falho foi desfeito; o primeiro ficou gravado
+        self.assertEqual(checkpoints, [4])
+        self.assertEqual(Funcionario.objects.count(), 2)
+
+        parcial = {'total': 2, 'sucessos': 2, 'erros': 0, 'detalhes_sucesso': [], 'detalhes_erro': []}
+        resultado = processar_planilha(
+            BytesIO(planilha), self.filial, resultado=parcial, retomar_apos=checkpoints[-1], tamanho_lote=2,
+        )
+
+        self.assertEqual((resultado['total'], resultado['sucessos'], resultado['erros']), (5, 5, 0))
+        self.assertEqual(Funcionario.objects.count(), 5)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class ImportacaoFuncionariosTaskTestCase(ImportacaoFuncionariosTestBase):
+    """Storage privado apontado para um diretório temporário."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        campo = ImportacaoFuncionarios._meta.get_field('arquivo')
+        storage = patch.object(campo, 'storage', FileSystemStorage(location=self.media))
+        storage.start()
+        self.addCleanup(storage.stop)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+    def _importacao(self, conteudo, **kwargs):
+        importacao = ImportacaoFuncionarios(
+            filial=self.filial, usuario=self.usuario, nome_arquivo='funcionarios.xlsx', **kwargs,
+        )
+        importacao.arquivo.save('funcionarios.xlsx', ContentFile(conteudo), save=False)
+        importacao.save()
+        return importacao
+
+    def test_task_processa_e_notifica(self):
+        importacao = self._importacao(_planilha([_linha(1), _linha(2)]).getvalue())
+
+        processar_planilha_funcionarios_task(importacao.pk)
+
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.status, ImportacaoFuncionarios.STATUS_CONCLUIDO)
+        self.assertEqual((importacao.processadas, importacao.sucessos, importacao.lotes_concluidos), (2, 2, 1))
+        self.assertEqual(importacao.ultima_linha, 4)
+        self.assertEqual(importacao.progresso, 100)
+        self.assertFalse(importacao.arquivo)
+        self.assertTrue(Notificacao.objects.filter(usuario=self.usuario, tipo='sucesso').exists())
+
+        # Job já assumido não roda de novo
+        self.assertIsNone(processar_planilha_funcionarios_task(importacao.pk))
+
+    def test_retomar_importacao_interrompida(self):
+        # Primeiro lote (linhas 3 e 4) gravado antes da interrupção
+        processar_planilha(_planilha([_linha(1), _linha(2)]), self.filial)
+        importacao = self._importacao(
+            _planilha([_linha(n) for n in range(1, 5)]).getvalue(),
+            status=ImportacaoFuncionarios.STATUS_ERRO, mensagem_erro='worker caiu',
+            ultima_linha=4, processadas=2, lotes_concluidos=1, sucessos=2, tentativas=1,
+            resultado={'total': 2, 'sucessos': 2, 'erros': 0, 'detalhes_sucesso': [], 'detalhes_erro': []},
+        )
+        self.assertTrue(importacao.pode_retomar)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(retomar_importacao(importacao))
+
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.status, ImportacaoFuncionarios.STATUS_CONCLUIDO)
+        self.assertEqual((importacao.sucessos, importacao.erros, importacao.lotes_concluidos), (4, 0, 2))
+        self.assertEqual(Funcionario.objects.count(), 4)
+        self.assertFalse(retomar_importacao(importacao))
+
+    def test_job_sem_checkpoint_pode_ser_retomado(self):
+        importacao = self._importacao(
+            _planilha([_linha(1)]).getvalue(), status=ImportacaoFuncionarios.STATUS_PROCESSANDO,
+            checkpoint_em=timezone.now() - ImportacaoFuncionarios.TEMPO_LIMITE - timedelta(minutes=1),
+        )
+        self.assertTrue(importacao.travado)
+        self.assertTrue(importacao.pode_retomar)
+
+        with self.captureOnCommitCallbacks():
+            self.assertTrue(retomar_importacao(importacao))
+
+        # Na fila de novo, com sinal renovado
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.status, ImportacaoFuncionarios.STATUS_PENDENTE)
+        self.assertFalse(importacao.travado)
@@ -19,6 +19,7 @@ from .views import (
     UploadFuncionariosView, baixar_modelo_funcionarios, baixar_relatorio_erros,
     # Importação em Massa (novo serviço)
     download_modelo_funcionarios_view, importacao_massa_funcionarios_view,
+    importacao_funcionarios_status_view, retomar_importacao_funcionarios_view,
 )
 
 app_name = 'departamento_pessoal'
@@ -81,6 +82,8 @@ urlpatterns = [
     # ─────────────────────────────────────────────────────
     path('importacao/', importacao_massa_funcionarios_view, name='importacao_massa_funcionarios'),
     path('importacao/modelo/', download_modelo_funcionarios_view, name='download_modelo_importacao_funcionarios'),
+    path('importacao/<int:pk>/', importacao_funcionarios_status_view, name='importacao_funcionarios_status'),
+    path('importacao/<int:pk>/retomar/', retomar_importacao_funcionarios_view, name='retomar_importacao_funcionarios'),
 ]
 
 
@@ -47,8 +47,8 @@ from .forms import (
     AdmissaoForm, CargoForm, DepartamentoForm, DocumentoForm, FuncionarioForm,
     ImportacaoMassaFuncionarioForm, UploadFuncionariosForm,
 )
-from .models import Cargo, Cliente, Departamento, Documento, Filial, Funcionario
-from .services.importacao_massa import gerar_planilha_modelo, processar_planilha
+from .models import Cargo, Cliente, Departamento, Documento, Filial, Funcionario, ImportacaoFuncionarios
+from .services.importacao_massa import gerar_planilha_modelo, iniciar_importacao, retomar_importacao
 
 logger = logging.getLogger(__name__)
 
@@ -1228,7 +1228,7 @@ def download_modelo_funcionarios_view(request):
 
 @app_permission_required(APP_LABEL)
 def importacao_massa_funcionarios_view(request):
-    """Upload e processamento da planilha de funcionários."""
+    """Upload da planilha de funcionários; o processamento roda em background."""
     
     # Verificação de permissão
     if not request.user.has_perm(f'{APP_LABEL}.add_funcionario'):
@@ -1248,39 +1248,12 @@ def importacao_massa_funcionarios_view(request):
         form = ImportacaoMassaFuncionarioForm(request.POST, request.FILES)
         
         if form.is_valid():
-            try:
-                arquivo = form.cleaned_data['arquivo']
-                resultado = processar_planilha(arquivo, filial)
-
-                # Mensagem de sucesso/erro baseada no resultado
-                if resultado.get('sucessos', 0) > 0:
-                    messages.success(
-                        request,
-                        f"✅ {resultado['sucessos']} funcionário(s) importado(s) com sucesso."
-                    )
-                if resultado.get('erros', 0) > 0:
-                    messages.warning(
-                        request,
-                        f"⚠️ {resultado['erros']} linha(s) com erro. Verifique o relatório abaixo."
-                    )
-
-                return render(
-                    request,
-                    'departamento_pessoal/importacao_massa_resultado.html',
-                    {
-                        'resultado': resultado,
-                        'form': ImportacaoMassaFuncionarioForm()
-                    },
-                )
-            except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.exception("Erro ao processar planilha de funcionários")
-                messages.error(
-                    request,
-                    f"Erro ao processar planilha: {str(e)}"
-                )
-                # Cai pro render com o form (preserva os dados)
+            importacao = iniciar_importacao(form.cleaned_data['arquivo'], filial, request.user)
+            messages.info(
+                request,
+                "Planilha recebida. A importação roda em segundo plano — acompanhe o progresso abaixo."
+            )
+            return redirect(importacao.get_absolute_url())
         else:
             # Form inválido — mostra erros no template
             messages.error(
@@ -1296,3 +1269,60 @@ def importacao_massa_funcionarios_view(request):
         {'form': form},
     )
 
+
+@app_permission_required(APP_LABEL)
+def importacao_funcionarios_status_view(request, pk):
+    """
+    Andamento e relatório de uma importação.
+
+    HTMX recebe o fragmento de progresso; quando o job sai da fila/execução
+    a resposta usa o status 286, que encerra o polling.
+    """
+    importacao = get_object_or_404(ImportacaoFuncionarios.objects.for_request(request), pk=pk)
+
+    if request.headers.get('HX-Request'):
+        response = render(
+            request,
+            'departamento_pessoal/partials/_importacao_progresso.html',
+            {'importacao': importacao},
+        )
+        if not importacao.em_andamento:
+            response.status_code = 286
+        return response
+
+    if importacao.status == ImportacaoFuncionarios.STATUS_CONCLUIDO:
+        return render(
+            request,
+            'departamento_pessoal/importacao_massa_resultado.html',
+            {
+                'resultado': importacao.resultado,
+                'importacao': importacao,
+                'form': ImportacaoMassaFuncionarioForm(),
+            },
+        )
+
+    return render(
+        request,
+        'departamento_pessoal/importacao_massa_status.html',
+        {'importacao': importacao},
+    )
+
+
+@app_permission_required(APP_LABEL)
+def retomar_importacao_funcionarios_view(request, pk):
+    """Recoloca na fila uma importação interrompida (continua do último lote gravado)."""
+    importacao = get_object_or_404(ImportacaoFuncionarios.objects.for_request(request), pk=pk)
+
+    if request.method == 'POST':
+        if not request.user.has_perm(f'{APP_LABEL}.add_funcionario'):
+            messages.error(request, "Você não tem permissão para importar funcionários.")
+        elif retomar_importacao(importacao):
+            messages.success(
+                request,
+                f"Importação retomada a partir da linha {importacao.ultima_linha + 1}."
+            )
+        else:
+            messages.warning(request, "Esta importação não pode ser retomada.")
+
+    return redirect(importacao.get_absolute_url())
+
@@ -6,7 +6,7 @@ from django.urls import reverse
 from django.utils.html import format_html
 from core.mixins import AdminFilialScopedMixin, ChangeFilialAdminMixin
 # Importa o modelo MalaFerramentas
-from .models import Atividade, Ferramenta, MalaFerramentas, Movimentacao
+from .models import Atividade, Ferramenta, ImportacaoFerramentas, MalaFerramentas, Movimentacao
 from django.contrib import admin
 from .models import TermoDeResponsabilidade, ItemTermo
 from django.contrib.auth import get_user_model
@@ -165,6 +165,18 @@ class AtividadeAdmin(AdminFilialScopedMixin, ChangeFilialAdminMixin, admin.Model
 
 # Termos de responsabilidade
 
+@admin.register(ImportacaoFerramentas)
+class ImportacaoFerramentasAdmin(AdminFilialScopedMixin, admin.ModelAdmin):
+    list_display = ('nome_arquivo', 'filial', 'usuario', 'simulacao', 'status',
+                    'processadas', 'sucessos', 'erros', 'criado_em', 'concluido_em')
+    list_filter = ('status', 'simulacao', 'filial', 'criado_em')
+    search_fields = ('nome_arquivo', 'usuario__username', 'task_id')
+    readonly_fields = ('filial', 'usuario', 'arquivo', 'nome_arquivo', 'simulacao', 'status',
+                       'total_linhas', 'processadas', 'sucessos', 'erros', 'resultado',
+                       'mensagem_erro', 'task_id', 'criado_em', 'iniciado_em', 'concluido_em')
+    ordering = ('-criado_em',)
+
+
 class ItemTermoInline(admin.TabularInline):
     model = ItemTermo
     extra = 1 # Quantidade de formulários extras para adicionar
@@ -229,17 +229,27 @@ class DevolucaoForm(forms.ModelForm):
 
 class UploadFileForm(forms.Form):
     """Upload de planilha Excel para importação."""
+
+    # A planilha é lida em streaming num job Celery; o limite só protege o upload
+    TAMANHO_MAXIMO_MB = 20
+
     file = forms.FileField(
         label="Selecione a planilha (.xlsx)",
         widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.xlsx'})
     )
+    simular = forms.BooleanField(
+        label="Apenas validar (simulação)",
+        help_text="Confere todas as linhas sem gravar nenhuma ferramenta.",
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
 
     def clean_file(self):
         f = self.cleaned_data['file']
         if not f.name.endswith('.xlsx'):
             raise forms.ValidationError("Apenas arquivos .xlsx são aceitos.")
-        if f.size > 5 * 1024 * 1024:  # 5MB
-            raise forms.ValidationError("Arquivo muito grande. Máximo: 5MB.")
+        if f.size > self.TAMANHO_MAXIMO_MB * 1024 * 1024:
+            raise forms.ValidationError(f"Arquivo muito grande. Máximo: {self.TAMANHO_MAXIMO_MB}MB.")
         return f
 
 
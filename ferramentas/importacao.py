@@ -0,0 +1,349 @@
+# ferramentas/importacao.py
+"""
+Importação em massa de ferramentas via planilha (modelo do
+DownloadTemplateView), processada como job Celery com progresso.
+
+A planilha é lida em streaming e tratada em lotes: filiais e malas são
+carregadas uma vez no início, códigos/patrimônios repetidos são apurados
+em memória (uma consulta por lote para os já cadastrados) e cada lote
+grava ferramentas e registros de Atividade com bulk_create. Os QR Codes
+das ferramentas criadas são gerados num job à parte.
+"""
+
+import logging
+from datetime import date, datetime
+
+from django.db import DatabaseError, transaction
+
+from core.importacao import PlanilhaInvalida, abrir_planilha, criar_importacao, em_lotes, erros_modelo
+from usuario.models import Filial
+
+from .models import Atividade, Ferramenta, ImportacaoFerramentas, MalaFerramentas
+from .qrcodes import agendar_qr_codes
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 500
+LINHA_INICIAL = 2  # Linha 1=header, 2+=dados
+
+# Ordem das colunas do modelo (DownloadTemplateView.HEADERS)
+COLUNAS = (
+    'nome', 'codigo_identificacao', 'data_aquisicao', 'localizacao_padrao',
+    'patrimonio', 'fabricante_marca', 'modelo', 'serie',
+    'tamanho_polegadas', 'numero_laudo_tecnico',
+    'mala', 'filial', 'quantidade', 'observacoes',
+)
+OBRIGATORIAS = ('nome', 'codigo_identificacao', 'data_aquisicao', 'localizacao_padrao')
+
+# O relatório fica guardado no job (JSONField); acima disso só conta
+LIMITE_DETALHES_SUCESSO = 500
+LIMITE_DETALHES_ERRO = 2000
+
+DESCRICAO_ATIVIDADE = "Ferramenta cadastrada via importação de planilha."
+
+
+def processar_planilha(arquivo, filial, usuario=None, simular=False, progresso=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Valida a planilha e cria as ferramentas das linhas válidas.
+
+    Args:
+        arquivo: arquivo .xlsx (upload, arquivo aberto ou caminho)
+        filial: filial padrão das linhas sem a coluna Filial
+        usuario: autor dos registros de Atividade
+        simular: apenas valida — nada é gravado
+        progresso: callable(processadas, total_estimado), chamado a cada lote
+
+    Returns:
+        dict com total, sucessos, erros, detalhes_sucesso, detalhes_erro, simulacao
+    """
+    resultado = {
+        'total': 0,
+        'sucessos': 0,
+        'erros': 0,
+        'detalhes_sucesso': [],
+        'detalhes_erro': [],
+        'simulacao': simular,
+    }
+
+    try:
+        planilha = abrir_planilha(arquivo)
+    except PlanilhaInvalida:
+        resultado['detalhes_erro'].append(
+            {'linha': 0, 'erros': ["Arquivo inválido. Envie um arquivo .xlsx válido."]}
+        )
+        return resultado
+
+    importador = _ImportadorFerramentas(filial, usuario, simular, resultado)
+
+    with planilha:
+        total_estimado = planilha.total_estimado(LINHA_INICIAL)
+        linhas = planilha.linhas(LINHA_INICIAL, len(COLUNAS))
+
+        for lote in em_lotes(linhas, tamanho_lote):
+            importador.processar_lote(lote)
+            if progresso:
+                progresso(resultado['total'], max(total_estimado, resultado['total']))
+
+    resultado['detalhes_erro'].sort(key=lambda item: item['linha'])
+    return resultado
+
+
+class _ImportadorFerramentas:
+    """
+    Estado da importação entre os lotes.
+
+    - `filiais`: nome (minúsculo) → Filial, carregado uma vez;
+    - `malas`: (filial_id, nome minúsculo) → pk da mala, carregado uma vez;
+    - `codigos` / `patrimonios`: valores já aceitos nesta planilha.
+    """
+
+    def __init__(self, filial, usuario, simular, resultado):
+        self.filial = filial
+        self.usuario = usuario
+        self.simular = simular
+        self.resultado = resultado
+        self.codigos = set()
+        self.patrimonios = set()
+        self.filiais = {f.nome.strip().lower(): f for f in Filial.objects.all()}
+        self.malas = {
+            (filial_id, nome.strip().lower()): pk
+            for pk, filial_id, nome in MalaFerramentas.objects.all_filiais().values_list('pk', 'filial_id', 'nome')
+        }
+
+    # ------------------------------------------------------------------
+    # LOTE
+    # ------------------------------------------------------------------
+
+    def processar_lote(self, lote):
+        validas = []
+        for row_idx, valores in lote:
+            self.resultado['total'] += 1
+            dados = dict(zip(COLUNAS, valores))
+            ferramenta, erros_linha = self._montar(dados)
+            if erros_linha:
+                self._erro(row_idx, erros_linha)
+            else:
+                validas.append((row_idx, ferramenta))
+
+        if not validas:
+            return
+
+        codigos_cadastrados = set(
+            Ferramenta.objects.all_filiais()
+            .filter(codigo_identificacao__in={f.codigo_identificacao for _, f in validas})
+            .values_list('codigo_identificacao', flat=True)
+        )
+        patrimonios_cadastrados = set(
+            Ferramenta.objects.all_filiais()
+            .filter(patrimonio__in={f.patrimonio for _, f in validas if f.patrimonio})
+            .values_list('patrimonio', flat=True)
+        )
+
+        pendentes = []
+        for row_idx, ferramenta in validas:
+            erros_linha = self._duplicidades(ferramenta, codigos_cadastrados, patrimonios_cadastrados)
+            if erros_linha:
+                self._erro(row_idx, erros_linha)
+                continue
+            self.codigos.add(ferramenta.codigo_identificacao)
+            if ferramenta.patrimonio:
+                self.patrimonios.add(ferramenta.patrimonio)
+            pendentes.append((row_idx, ferramenta))
+
+        if self.simular:
+            for row_idx, ferramenta in pendentes:
+                self._sucesso(row_idx, ferramenta)
+            return
+
+        self._gravar(pendentes)
+
+    def _montar(self, dados):
+        """Ferramenta (não salva) a partir da linha; retorna (ferramenta, erros)."""
+        faltando = [campo for campo in OBRIGATORIAS if _texto(dados[campo]) is None]
+        if faltando:
+            return None, ["Dados obrigatórios faltando: " + ", ".join(faltando) + "."]
+
+        erros = []
+        data_aquisicao = _parse_data(dados['data_aquisicao'])
+        if data_aquisicao is None:
+            erros.append(f"Data inválida '{dados['data_aquisicao']}'. Use dd/mm/aaaa.")
+
+        quantidade = _parse_inteiro(dados['quantidade'])
+        if quantidade is None:
+            erros.append(f"Quantidade inválida '{dados['quantidade']}'.")
+
+        filial = self.filial
+        nome_filial = _texto(dados['filial'])
+        if nome_filial:
+            filial = self.filiais.get(nome_filial.lower())
+            if filial is None:
+                erros.append(f"Filial '{nome_filial}' não encontrada.")
+
+        mala_id = None
+        nome_mala = _texto(dados['mala'])
+        if nome_mala and filial is not None:
+            mala_id = self.malas.get((filial.pk, nome_mala.lower()))
+            if mala_id is None:
+                erros.append(f"Mala '{nome_mala}' não encontrada na filial '{filial.nome}'.")
+
+        if erros:
+            return None, erros
+
+        ferramenta = Ferramenta(
+            nome=_texto(dados['nome']),
+            codigo_identificacao=_texto(dados['codigo_identificacao']).upper(),
+            data_aquisicao=data_aquisicao,
+            localizacao_padrao=_texto(dados['localizacao_padrao']),
+            patrimonio=_texto(dados['patrimonio']),
+            fabricante_marca=_texto(dados['fabricante_marca']),
+            modelo=_texto(dados['modelo']),
+            serie=_texto(dados['serie']),
+            tamanho_polegadas=_texto(dados['tamanho_polegadas']),
+            numero_laudo_tecnico=_texto(dados['numero_laudo_tecnico']),
+            quantidade=quantidade,
+            mala_id=mala_id,
+            filial=filial,
+            observacoes=_texto(dados['observacoes']),
+        )
+        # FKs já resolvidas pelos mapas; validá-las seria uma query por linha
+        return ferramenta, erros_modelo(ferramenta, ['filial', 'mala', 'fornecedor', 'pedido_compra_origem'])
+
+    def _duplicidades(self, ferramenta, codigos_cadastrados, patrimonios_cadastrados):
+        codigo, patrimonio = ferramenta.codigo_identificacao, ferramenta.patrimonio
+        if codigo in codigos_cadastrados:
+            return [f"Código '{codigo}' já existe no sistema."]
+        if codigo in self.codigos:
+            return [f"Código '{codigo}' duplicado na planilha."]
+        if patrimonio in patrimonios_cadastrados:
+            return [f"Patrimônio '{patrimonio}' já existe no sistema."]
+        if patrimonio and patrimonio in self.patrimonios:
+            return [f"Patrimônio '{patrimonio}' duplicado na planilha."]
+        return []
+
+    # ------------------------------------------------------------------
+    # GRAVAÇÃO
+    # ------------------------------------------------------------------
+
+    def _gravar(self, pendentes):
+        if not pendentes:
+            return
+        try:
+            with transaction.atomic():
+                self._registrar(self._inserir([f for _, f in pendentes]))
+        except DatabaseError:
+            # Conflito com algo gravado em paralelo: refaz linha a linha
+            # para atribuir o erro à linha certa.
+            logger.warning("Lote da importação de ferramentas falhou; gravando linha a linha.", exc_info=True)
+            self._gravar_linha_a_linha(pendentes)
+            return
+
+        for row_idx, ferramenta in pendentes:
+            self._sucesso(row_idx, ferramenta)
+
+    def _inserir(self, ferramentas):
+        """bulk_create das ferramentas, com os pks preenchidos."""
+        criadas = Ferramenta.objects.bulk_create(ferramentas)
+
+        if not all(ferramenta.pk for ferramenta in criadas):
+            # MySQL não devolve os ids do bulk_create: relê pelos códigos
+            ids = dict(
+                Ferramenta.objects.all_filiais()
+                .filter(codigo_identificacao__in=[f.codigo_identificacao for f in criadas])
+                .values_list('codigo_identificacao', 'pk')
+            )
+            for ferramenta in criadas:
+                ferramenta.pk = ids[ferramenta.codigo_identificacao]
+        return criadas
+
+    def _registrar(self, criadas):
+        """Atividade de criação em bulk e QR Codes do lote num job só."""
+        Atividade.objects.bulk_create([
+            Atividade(
+                ferramenta=ferramenta,
+                tipo_atividade=Atividade.TipoAtividade.CRIACAO,
+                descricao=DESCRICAO_ATIVIDADE,
+                usuario=self.usuario,
+                filial=ferramenta.filial,
+            )
+            for ferramenta in criadas
+        ])
+        agendar_qr_codes(Ferramenta, [ferramenta.pk for ferramenta in criadas])
+
+    def _gravar_linha_a_linha(self, pendentes):
+        for row_idx, ferramenta in pendentes:
+            try:
+                with transaction.atomic():
+                    ferramenta.pk = None
+                    ferramenta._state.adding = True
+                    # bulk_create como no lote: o QR Code vai pelo _registrar
+                    self._registrar(self._inserir([ferramenta]))
+            except Exception as e:
+                self._erro(row_idx, [f"Erro ao salvar: {str(e)}"])
+                continue
+            self._sucesso(row_idx, ferramenta)
+
+    # ------------------------------------------------------------------
+    # RELATÓRIO
+    # ------------------------------------------------------------------
+
+    def _sucesso(self, row_idx, ferramenta):
+        self.resultado['sucessos'] += 1
+        if len(self.resultado['detalhes_sucesso']) < LIMITE_DETALHES_SUCESSO:
+            situacao = "válida (simulação)" if self.simular else "importada com sucesso"
+            self.resultado['detalhes_sucesso'].append(
+                f"Linha {row_idx}: {ferramenta.nome} ({ferramenta.codigo_identificacao}) — {situacao}."
+            )
+
+    def _erro(self, row_idx, erros_linha):
+        self.resultado['erros'] += 1
+        if len(self.resultado['detalhes_erro']) < LIMITE_DETALHES_ERRO:
+            self.resultado['detalhes_erro'].append({'linha': row_idx, 'erros': erros_linha})
+
+
+def _texto(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)  # códigos numéricos chegam como float do Excel
+    valor = str(valor).strip()
+    return valor or None
+
+
+def _parse_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return datetime.strptime(str(valor).strip().split(" ")[0], '%d/%m/%Y').date()
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_inteiro(valor):
+    if _texto(valor) is None:
+        return 0
+    try:
+        numero = float(str(valor).strip().replace(',', '.'))
+    except ValueError:
+        return None
+    if numero < 0 or not numero.is_integer():
+        return None
+    return int(numero)
+
+
+# ============================================================================
+# JOB EM BACKGROUND
+# ============================================================================
+
+def iniciar_importacao(arquivo, filial, usuario, simular=False):
+    """
+    Guarda a planilha num ImportacaoFerramentas e enfileira o processamento
+    (task `ferramentas.importar_planilha`) após o commit.
+    """
+    from .tasks import importar_planilha_ferramentas_task
+
+    return criar_importacao(
+        ImportacaoFerramentas, arquivo, filial, usuario,
+        importar_planilha_ferramentas_task, simulacao=simular,
+    )
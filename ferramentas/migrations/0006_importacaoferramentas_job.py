@@ -0,0 +1,33 @@
+# Generated by Django 5.2.17 on 2026-10-18 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ferramentas', '0005_importacaoferramentas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importacaoferramentas',
+            name='criado_em',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Criado em'),
+        ),
+        migrations.AlterField(
+            model_name='importacaoferramentas',
+            name='erros',
+            field=models.PositiveIntegerField(default=0, verbose_name='Erros'),
+        ),
+        migrations.AlterField(
+            model_name='importacaoferramentas',
+            name='status',
+            field=models.CharField(choices=[('pendente', 'Na fila'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], db_index=True, default='pendente', max_length=15, verbose_name='Status'),
+        ),
+        migrations.AlterField(
+            model_name='importacaoferramentas',
+            name='sucessos',
+            field=models.PositiveIntegerField(default=0, verbose_name='Sucessos'),
+        ),
+    ]
@@ -8,16 +8,17 @@ from usuario.models import Filial, Usuario
 
 from cliente.models import Cliente
 # ferramentas/models.py
-import qrcode
-from io import BytesIO
 from django.conf import settings
-from django.core.files import File
 from django.db import models
 from django.db.models import Q
 from django.urls import reverse
 from django.utils import timezone
+from core.importacao import ImportacaoPlanilha
 from core.managers import FilialQuerySet, FilialManager
 from departamento_pessoal.models import Funcionario
+from documentos.storage import PrivateMediaStorage
+
+private_storage = PrivateMediaStorage()
 
 # =============================================================================
 # QUERYSETS E MANAGERS CUSTOMIZADOS
@@ -118,27 +119,10 @@ class MalaFerramentas(models.Model):
         return self.status == self.Status.DISPONIVEL
 
     def save(self, *args, **kwargs):
-        if self.codigo_identificacao and not self.qr_code:
-            self._gerar_qr_code(f"MALA_ID:{self.codigo_identificacao}", prefix='qr_code_mala')
         super().save(*args, **kwargs)
-
-    def _gerar_qr_code(self, data, prefix='qr_code'):
-        """Gera QR Code e salva no campo qr_code."""
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10, border=4
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-
-        buffer = BytesIO()
-        qr_img.save(buffer, 'PNG')
-        buffer.seek(0)
-
-        fname = f'{prefix}-{self.codigo_identificacao}.png'
-        self.qr_code.save(fname, File(buffer), save=False)
+        if self.codigo_identificacao and not self.qr_code:
+            from .qrcodes import agendar_qr_codes
+            agendar_qr_codes(MalaFerramentas, [self.pk])
 
 
 # =============================================================================
@@ -267,31 +251,13 @@ class Ferramenta(models.Model):
                 return mov.termo_responsabilidade
         return None
 
-    # --- Save com geração de QR Code ---
+    # --- Save agenda o QR Code (ferramentas/qrcodes.py) ---
 
     def save(self, *args, **kwargs):
-        identifier = self.codigo_identificacao or self.patrimonio
-        if identifier and not self.qr_code:
-            qr_url = f"{settings.SITE_URL}{self.get_scan_url()}" if hasattr(settings, 'SITE_URL') else self.get_scan_url()
-            self._gerar_qr_code(qr_url)
         super().save(*args, **kwargs)
-
-    def _gerar_qr_code(self, data):
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10, border=4
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-
-        buffer = BytesIO()
-        qr_img.save(buffer, 'PNG')
-        buffer.seek(0)
-
-        fname = f'qr_code-{self.codigo_identificacao}.png'
-        self.qr_code.save(fname, File(buffer), save=False)
+        if self.codigo_identificacao and not self.qr_code:
+            from .qrcodes import agendar_qr_codes
+            agendar_qr_codes(Ferramenta, [self.pk])
 
 
 # =============================================================================
@@ -562,4 +528,42 @@ class ItemTermo(models.Model):
     def item_vinculado(self):
         return self.ferramenta or self.mala
 
-    
\ No newline at end of file
+    
+
+
+# =============================================================================
+# IMPORTAÇÃO EM MASSA
+# =============================================================================
+
+class ImportacaoFerramentas(ImportacaoPlanilha):
+    """
+    Importação de ferramentas via planilha processada em background (Celery).
+
+    Guarda a planilha até o processamento terminar, o progresso (linhas
+    processadas / estimadas) e o relatório final em `resultado`.
+    """
+
+    filial = models.ForeignKey(
+        Filial, on_delete=models.PROTECT,
+        related_name='importacoes_ferramentas'
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+        related_name='importacoes_ferramentas',
+        null=True, blank=True, verbose_name="Enviado por"
+    )
+    arquivo = models.FileField(
+        upload_to='importacoes/ferramentas/%Y/%m/',
+        storage=private_storage, blank=True, verbose_name="Planilha"
+    )
+    simulacao = models.BooleanField(default=False, verbose_name="Simulação")
+
+    objects = FilialManager()
+
+    class Meta:
+        verbose_name = "Importação de Ferramentas"
+        verbose_name_plural = "Importações de Ferramentas"
+        ordering = ['-criado_em']
+
+    def get_absolute_url(self):
+        return reverse('ferramentas:importacao_status', kwargs={'pk': self.pk})
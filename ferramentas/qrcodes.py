@@ -0,0 +1,166 @@
+# ferramentas/qrcodes.py
+"""
+QR Codes de ferramentas e malas.
+
+O save() dos models não renderiza nem envia imagem: só agenda a geração
+do PNG guardado no storage, feita em lote pela task gerar_qr_codes_task.
+O nome do arquivo é o hash do conteúdo — reprocessar não reenvia o que
+já está no storage.
+
+Telas e folhas de etiquetas usam SVG renderizado na hora, cacheado pelo
+mesmo hash (o conteúdo define a imagem), sem baixar os PNGs.
+"""
+
+import hashlib
+import logging
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+
+from core.cache import CacheNamespace
+
+from .models import Ferramenta, MalaFerramentas
+
+logger = logging.getLogger(__name__)
+
+# O SVG é função pura do conteúdo: pode ficar bastante tempo
+cache_qr = CacheNamespace('ferramentas_qr', versao=1, timeout=60 * 60 * 24 * 30)
+
+TAMANHO_LOTE = 100
+
+# Nome usado na task (JSON) → model
+MODELOS = {
+    'ferramenta': Ferramenta,
+    'mala': MalaFerramentas,
+}
+
+
+def nome_modelo(modelo):
+    return next(nome for nome, classe in MODELOS.items() if classe is modelo)
+
+
+def conteudo_qr(obj):
+    """Texto codificado no QR: link de scan da ferramenta ou ID da mala."""
+    if isinstance(obj, MalaFerramentas):
+        return f"MALA_ID:{obj.codigo_identificacao}"
+    return f"{getattr(settings, 'SITE_URL', '')}{obj.get_scan_url()}"
+
+
+def hash_conteudo(conteudo):
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def _renderizar(conteudo, fabrica=None):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10, border=4,
+        image_factory=fabrica,
+    )
+    qr.add_data(conteudo)
+    qr.make(fit=True)
+    buffer = BytesIO()
+    qr.make_image().save(buffer)
+    return buffer.getvalue()
+
+
+def qr_png(conteudo):
+    return _renderizar(conteudo)
+
+
+def qr_svgs(conteudos):
+    """{conteudo: svg} — uma leitura no cache para a folha inteira."""
+    chaves = {conteudo: cache_qr.chave('svg', hash_conteudo(conteudo)) for conteudo in conteudos}
+    em_cache = cache_qr.get_many(list(chaves.values()))
+
+    svgs, novos = {}, {}
+    for conteudo, chave in chaves.items():
+        if chave not in em_cache:
+            svg = _renderizar(conteudo, qrcode.image.svg.SvgPathImage).decode('utf-8')
+            # Sem a declaração XML o SVG pode ir inline no HTML
+            novos[chave] = em_cache[chave] = svg[svg.index('<svg'):]
+        svgs[conteudo] = em_cache[chave]
+    cache_qr.set_many(novos)
+    return svgs
+
+
+def qr_svg(conteudo):
+    return qr_svgs([conteudo])[conteudo]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PNG guardado no storage (download, admin)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def guardar_png(obj):
+    """
+    Aponta obj.qr_code para `<upload_to><hash>.png`, enviando o arquivo só
+    se ele ainda não existir no storage. Não salva o obj.
+    """
+    conteudo = conteudo_qr(obj)
+    campo = obj.qr_code
+    nome = f"{campo.field.upload_to}{hash_conteudo(conteudo)}.png"
+    if not campo.storage.exists(nome):
+        nome = campo.storage.save(nome, ContentFile(qr_png(conteudo)))
+    campo.name = nome
+    return nome
+
+
+def pendentes(modelo):
+    """Registros com código e sem PNG — ignora o filtro de filial."""
+    return modelo._base_manager.filter(
+        Q(qr_code__isnull=True) | Q(qr_code='')
+    ).exclude(codigo_identificacao='').order_by('pk')
+
+
+def gerar_qr_codes(modelo, pks=None):
+    """
+    Gera os PNGs pendentes do `modelo` (opcionalmente só `pks`), um
+    bulk_update por lote. Falha em um registro não derruba o lote.
+    Retorna quantos foram gerados.
+    """
+    registros = pendentes(modelo)
+    if pks is not None:
+        registros = registros.filter(pk__in=pks)
+
+    total, lote = 0, []
+    for obj in registros.iterator(chunk_size=TAMANHO_LOTE):
+        try:
+            guardar_png(obj)
+        except Exception:
+            logger.exception('Falha ao gerar QR Code de %s %s', nome_modelo(modelo), obj.pk)
+            continue
+        lote.append(obj)
+        if len(lote) >= TAMANHO_LOTE:
+            total += _gravar(modelo, lote)
+            lote = []
+    return total + _gravar(modelo, lote)
+
+
+def _gravar(modelo, lote):
+    if lote:
+        modelo._base_manager.bulk_update(lote, ['qr_code'])
+    return len(lote)
+
+
+def agendar_qr_codes(modelo, pks):
+    """Enfileira a geração depois do commit (a task precisa ver os registros)."""
+    from .tasks import gerar_qr_codes_task
+
+    pks = [pk for pk in pks if pk]
+    if not pks:
+        return
+
+    def _enfileirar():
+        try:
+            gerar_qr_codes_task.delay(nome_modelo(modelo), pks)
+        except Exception:
+            # Sem broker: o comando generate_qrcodes recolhe os pendentes
+            logger.warning('Falha ao enfileirar QR Codes de %s', nome_modelo(modelo), exc_info=True)
+
+    transaction.on_commit(_enfileirar)
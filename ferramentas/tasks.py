@@ -0,0 +1,37 @@
+# ferramentas/tasks.py
+import logging
+
+from celery import shared_task
+
+from core.importacao import executar_importacao
+
+from .models import ImportacaoFerramentas
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="ferramentas.gerar_qr_codes")
+def gerar_qr_codes_task(modelo, pks=None):
+    """Gera em lote os PNGs de QR Code pendentes ('ferramenta' ou 'mala')."""
+    from .qrcodes import MODELOS, gerar_qr_codes
+
+    total = gerar_qr_codes(MODELOS[modelo], pks)
+    logger.info(f"[QR Codes] {total} {modelo}(s) com QR Code gerado.")
+    return total
+
+
+@shared_task(name="ferramentas.importar_planilha")
+def importar_planilha_ferramentas_task(importacao_id):
+    """Processa a planilha de um ImportacaoFerramentas e guarda o relatório."""
+    from .importacao import processar_planilha
+
+    def processar(importacao, arquivo, progresso):
+        return processar_planilha(
+            arquivo, importacao.filial, usuario=importacao.usuario,
+            simular=importacao.simulacao, progresso=progresso,
+        )
+
+    return executar_importacao(
+        ImportacaoFerramentas, importacao_id, processar,
+        itens="ferramentas", icone="bi-file-earmark-spreadsheet",
+    )
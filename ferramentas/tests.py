@@ -2,9 +2,19 @@
 """
 Testes para o app ferramentas
 """
+import shutil
+import tempfile
 from datetime import datetime
 from datetime import date, timedelta
-from django.test import TestCase, TestCase
+from unittest.mock import patch
+from io import BytesIO
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
+from django.test import TestCase, TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db.utils import IntegrityError
@@ -13,9 +23,12 @@ from django.utils import timezone
 
 # Modelos da app 'ferramentas'
 from .models import (
-    MalaFerramentas, Ferramenta, Atividade, 
+    MalaFerramentas, Ferramenta, Atividade, ImportacaoFerramentas,
     Movimentacao, TermoDeResponsabilidade, ItemTermo
 )
+from . import qrcodes
+from .importacao import COLUNAS, processar_planilha
+from .tasks import importar_planilha_ferramentas_task
 
 # Dependências de outras apps
 from usuario.models import Filial
@@ -513,3 +526,241 @@ class TermoResponsabilidadeModelTest(FerramentasBaseTestCase):
         if hasattr(ferramenta, 'termo_ativo'):
             self.assertIsNone(ferramenta.termo_ativo)
 
+
+class QRCodeTest(FerramentasBaseTestCase):
+    """PNG gerado em lote fora do save() e SVG cacheado por conteúdo."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+        render = patch.object(qrcodes, '_renderizar', wraps=qrcodes._renderizar)
+        self.render = render.start()
+        self.addCleanup(render.stop)
+
+    def test_save_so_agenda_e_task_gera_png(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            mala = MalaFerramentas.objects.create(
+                nome="Mala QR", codigo_identificacao="M-QR-01", filial=self.filial,
+            )
+        self.assertFalse(mala.qr_code)
+        self.render.assert_not_called()
+
+        for callback in callbacks:
+            callback()  # Celery eager: roda gerar_qr_codes_task
+        mala.refresh_from_db()
+        hash_mala = qrcodes.hash_conteudo("MALA_ID:M-QR-01")
+        self.assertEqual(mala.qr_code.name, f"qrcodes/malas/{hash_mala}.png")
+        self.assertEqual(self.render.call_count, 1)
+
+        # Reprocessar reaproveita o arquivo que já está no storage
+        MalaFerramentas.objects.filter(pk=mala.pk).update(qr_code='')
+        self.assertEqual(qrcodes.gerar_qr_codes(MalaFerramentas), 1)
+        mala.refresh_from_db()
+        self.assertEqual(mala.qr_code.name, f"qrcodes/malas/{hash_mala}.png")
+        self.assertEqual(self.render.call_count, 1)
+
+    def test_svg_cacheado_por_conteudo(self):
+        svgs = qrcodes.qr_svgs(["MALA_ID:A", "MALA_ID:B"])
+        self.assertTrue(svgs["MALA_ID:A"].startswith("<svg"))
+        self.assertNotEqual(svgs["MALA_ID:A"], svgs["MALA_ID:B"])
+
+        self.assertEqual(qrcodes.qr_svgs(["MALA_ID:B", "MALA_ID:A"]), svgs)
+        self.assertEqual(qrcodes.qr_svg("MALA_ID:A"), svgs["MALA_ID:A"])
+        self.assertEqual(self.render.call_count, 2)
+
+
+def _linha(n, **campos):
+    """Valores de uma linha válida da planilha, na ordem de COLUNAS."""
+    dados = {
+        'nome': f"Ferramenta {n}", 'codigo_identificacao': f"IMP-{n:05d}",
+        'data_aquisicao': "01/02/2024", 'localizacao_padrao': "Almoxarifado",
+        'patrimonio': f"PAT-{n:05d}", 'quantidade': 1,
+    }
+    dados.update(campos)
+    return [dados.get(coluna) for coluna in COLUNAS]
+
+
+def _planilha(linhas):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Ferramentas")
+    ws.append([coluna for coluna in COLUNAS])
+    for linha in linhas:
+        ws.append(linha)
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class ImportacaoFerramentasTest(FerramentasBaseTestCase):
+    """Importação em lotes: mapas carregados uma vez e bulk_create."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.mala = MalaFerramentas.objects.create(
+            nome="Mala Importação", codigo_identificacao="M-IMP-01", filial=cls.filial,
+        )
+        Ferramenta.objects.create(
+            nome="Já cadastrada", codigo_identificacao="IMP-00001", patrimonio="PAT-EXISTE",
+            data_aquisicao=date(2024, 1, 1), localizacao_padrao="Almoxarifado", filial=cls.filial,
+        )
+
+    def test_importa_ferramentas_com_atividade_e_qr_agendado(self):
+        with patch('ferramentas.importacao.agendar_qr_codes') as agendar:
+            resultado = processar_planilha(_planilha([
+                _linha(2, mala="mala importação"),
+                [None] * len(COLUNAS),
+                _linha(3, filial=self.filial.nome.upper(), quantidade=""),
+            ]), self.filial, usuario=self.user)
+
+        self.assertEqual((resultado['total'], resultado['sucessos'], resultado['erros']), (2, 2, 0))
+        ferramenta = Ferramenta.objects.get(codigo_identificacao="IMP-00002")
+        self.assertEqual(ferramenta.mala, self.mala)
+        self.assertEqual(ferramenta.data_aquisicao, date(2024, 2, 1))
+        self.assertEqual(Ferramenta.objects.get(codigo_identificacao="IMP-00003").quantidade, 0)
+        self.assertEqual(
+            Atividade.objects.filter(
+                tipo_atividade=Atividade.TipoAtividade.CRIACAO, usuario=self.user,
+                ferramenta__codigo_identificacao__in=["IMP-00002", "IMP-00003"],
+            ).count(), 2,
+        )
+        agendar.assert_called_once()
+        self.assertEqual(len(agendar.call_args.args[1]), 2)
+
+    def test_banco_sem_ids_no_bulk_create(self):
+        # Como o MySQL: o bulk_create não devolve os pks
+        with patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                patch('ferramentas.importacao.agendar_qr_codes') as agendar:
+            resultado = processar_planilha(_planilha([_linha(2), _linha(3)]), self.filial, usuario=self.user)
+
+        self.assertEqual((resultado['sucessos'], resultado['erros']), (2, 0))
+        criadas = Ferramenta.objects.filter(codigo_identificacao__in=["IMP-00002", "IMP-00003"])
+        self.assertEqual(
+            set(Atividade.objects.filter(ferramenta__in=criadas).values_list('ferramenta_id', flat=True)),
+            set(criadas.values_list('pk', flat=True)),
+        )
+        self.assertEqual(sorted(agendar.call_args.args[1]), sorted(criadas.values_list('pk', flat=True)))
+
+    def test_simulacao_nao_grava(self):
+        resultado = processar_planilha(
+            _planilha([_linha(2), _linha(3, codigo_identificacao="imp-00002")]),
+            self.filial, simular=True,
+        )
+
+        self.assertTrue(resultado['simulacao'])
+        self.assertEqual((resultado['sucessos'], resultado['erros']), (1, 1))
+        self.assertFalse(Ferramenta.objects.filter(codigo_identificacao="IMP-00002").exists())
+
+    def test_erros_por_linha(self):
+        resultado = processar_planilha(_planilha([
+            _linha(1),                                   # código já cadastrado
+            _linha(2),
+            _linha(3, codigo_identificacao="IMP-00002"), # código repetido na planilha
+            _linha(4, patrimonio="PAT-EXISTE"),          # patrimônio já cadastrado
+            _linha(5, patrimonio="PAT-00002"),           # patrimônio repetido na planilha
+            _linha(6, mala="Inexistente"),
+            _linha(7, filial="Filial Inexistente"),
+            _linha(8, data_aquisicao="2024-13-01", quantidade="-1"),
+            _linha(9, nome=None),
+        ]), self.filial)
+
+        self.assertEqual((resultado['sucessos'], resultado['erros']), (1, 8))
+        linhas_com_erro = [item['linha'] for item in resultado['detalhes_erro']]
+        self.assertEqual(linhas_com_erro, [2, 4, 5, 6, 7, 8, 9, 10])
+        self.assertEqual(len(resultado['detalhes_erro'][6]['erros']), 2)
+        self.assertTrue(Ferramenta.objects.filter(codigo_identificacao="IMP-00002").exists())
+
+    def test_arquivo_invalido(self):
+        resultado = processar_planilha(BytesIO(b'nao e xlsx'), self.filial)
+        self.assertEqual(resultado['total'], 0)
+        self.assertEqual(resultado['detalhes_erro'][0]['linha'], 0)
+
+    def test_queries_por_lote_nao_dependem_das_linhas(self):
+        def queries(inicio, total):
+            planilha = _planilha([_linha(n, mala=self.mala.nome) for n in range(inicio, inicio + total)])
+            with CaptureQueriesContext(connection) as ctx:
+                resultado = processar_planilha(planilha, self.filial, tamanho_lote=1000)
+            self.assertEqual(resultado['sucessos'], total)
+            # bulk_create no SQLite quebra os INSERTs pelo limite de parâmetros
+            return len([q for q in ctx.captured_queries if not q['sql'].startswith('INSERT')])
+
+        self.assertEqual(queries(100, 10), queries(1000, 300))
+
+    def test_conflito_no_lote_grava_linha_a_linha(self):
+        bulk_create = Ferramenta.objects.bulk_create
+        chamadas = []
+
+        def falha_no_lote(objs, *args, **kwargs):
+            chamadas.append(len(objs))
+            if len(objs) > 1:
+                raise IntegrityError('conflito')
+            return bulk_create(objs, *args, **kwargs)
+
+        with patch.object(Ferramenta.objects, 'bulk_create', side_effect=falha_no_lote):
+            resultado = processar_planilha(_planilha([_linha(2), _linha(3)]), self.filial)
+
+        self.assertEqual(chamadas, [2, 1, 1])
+        self.assertEqual(resultado['sucessos'], 2)
+        self.assertEqual(Atividade.objects.filter(tipo_atividade=Atividade.TipoAtividade.CRIACAO).count(), 2)
+
+
+class ImportacaoFerramentasTaskTest(FerramentasBaseTestCase):
+    """Storage privado apontado para um diretório temporário."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        campo = ImportacaoFerramentas._meta.get_field('arquivo')
+        storage = patch.object(campo, 'storage', FileSystemStorage(location=self.media))
+        storage.start()
+        self.addCleanup(storage.stop)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+    def _importacao(self, conteudo, **kwargs):
+        importacao = ImportacaoFerramentas(
+            filial=self.filial, usuario=self.user, nome_arquivo='ferramentas.xlsx', **kwargs,
+        )
+        importacao.arquivo.save('ferramentas.xlsx', ContentFile(conteudo), save=False)
+        importacao.save()
+        return importacao
+
+    def test_task_processa_e_apaga_planilha(self):
+        importacao = self._importacao(_planilha([_linha(2), _linha(3)]).getvalue())
+        caminho = importacao.arquivo.path
+
+        importar_planilha_ferramentas_task(importacao.pk)
+
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.status, ImportacaoFerramentas.STATUS_CONCLUIDO)
+        self.assertEqual((importacao.processadas, importacao.sucessos), (2, 2))
+        self.assertEqual(importacao.progresso, 100)
+        self.assertFalse(importacao.arquivo)
+        self.assertFalse(FileSystemStorage(location=self.media).exists(caminho))
+        self.assertEqual(Ferramenta.objects.filter(codigo_identificacao__startswith="IMP-").count(), 2)
+
+        # Job já assumido não roda de novo
+        self.assertIsNone(importar_planilha_ferramentas_task(importacao.pk))
+
+    def test_task_simulacao(self):
+        importacao = self._importacao(_planilha([_linha(2)]).getvalue(), simulacao=True)
+
+        importar_planilha_ferramentas_task(importacao.pk)
+
+        importacao.refresh_from_db()
+        self.assertEqual(importacao.sucessos, 1)
+        self.assertFalse(Ferramenta.objects.exists())
+
+    def test_job_travado_e_encerrado(self):
+        importacao = self._importacao(b'x', status=ImportacaoFerramentas.STATUS_PROCESSANDO)
+        ImportacaoFerramentas.objects.all_filiais().filter(pk=importacao.pk).update(
+            iniciado_em=timezone.now() - ImportacaoFerramentas.TEMPO_LIMITE - timedelta(minutes=1),
+        )
+        importacao.refresh_from_db()
+
+        self.assertTrue(importacao.encerrar_se_travado())
+        self.assertEqual(importacao.status, ImportacaoFerramentas.STATUS_ERRO)
+        self.assertFalse(importacao.em_andamento)
@@ -34,9 +34,12 @@ urlpatterns = [
     # -- URLs Utilitárias (QR Code, Importação, etc.) --
     path('qrcodes/gerar/', views.GerarQRCodesView.as_view(), name='gerar_qrcodes_view'),
     path('qrcodes/imprimir/', views.ImprimirQRCodesView.as_view(), name='imprimir_qrcodes'),
+    path('<int:pk>/qrcode.svg', views.FerramentaQRCodeSVGView.as_view(), name='ferramenta_qrcode_svg'),
+    path('malas/<int:pk>/qrcode.svg', views.MalaQRCodeSVGView.as_view(), name='mala_qrcode_svg'),
     path('scan/<str:codigo_identificacao>/', views.ResultadoScanView.as_view(), name='resultado_scan'),
     path('importar/', views.ImportarFerramentasView.as_view(), name='importar_ferramentas'),
     path('importar/template/', views.DownloadTemplateView.as_view(), name='download_template'),
+    path('importar/<int:pk>/', views.ImportacaoStatusView.as_view(), name='importacao_status'),
 
     # URLS DE TERMOS ATUALIZADAS E NOVAS
     path('termos/', views.TermoListView.as_view(), name='termoderesponsabilidade_list'),
@@ -4,23 +4,21 @@ import logging
 from io import BytesIO
 import base64
 import json
-import subprocess
-import sys
 import tempfile
 import zipfile
-from datetime import timedelta, datetime
-from django.conf import settings
+from datetime import timedelta
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.files.base import ContentFile
 from django.db import transaction
 from django.db.models import Count, Q, Sum
 from django.db.models.functions import TruncMonth
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404, redirect
 from django.template.loader import render_to_string
-from django.urls import reverse, reverse_lazy
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.safestring import mark_safe
 from django.views import View
 from django.views.generic import (
     CreateView, DetailView, FormView,
@@ -35,16 +33,19 @@ from core.mixins import (
     SSTPermissionMixin, ViewFilialScopedMixin,
     AtividadeLogMixin, AppPermissionMixin
 )
-from usuario.models import Filial
+from core.utils import get_filial_ativa
 
 from .forms import (
     DevolucaoForm, FerramentaForm, MovimentacaoForm,
     UploadFileForm, MalaFerramentasForm, TermoResponsabilidadeForm
 )
+from .importacao import iniciar_importacao
 from .models import (
-    Atividade, Ferramenta, MalaFerramentas,
+    Atividade, Ferramenta, ImportacaoFerramentas, MalaFerramentas,
     Movimentacao, TermoDeResponsabilidade, ItemTermo
 )
+from .qrcodes import conteudo_qr, hash_conteudo, qr_svg, qr_svgs
+from .tasks import gerar_qr_codes_task
 
 logger = logging.getLogger(__name__)
 
@@ -710,136 +711,102 @@ class DownloadTemplateView(LoginRequiredMixin, AppPermissionMixin, View):
 
 
 class ImportarFerramentasView(LoginRequiredMixin, AppPermissionMixin, FormView):
-    """Importa ferramentas via planilha Excel."""
+    """Recebe a planilha; o processamento roda em background (ferramentas/importacao.py)."""
     app_label_required = _APP
     template_name = 'ferramentas/importar_ferramentas.html'
     form_class = UploadFileForm
-    success_url = reverse_lazy('ferramentas:ferramenta_list')
 
     def form_valid(self, form):
-        file = form.cleaned_data['file']
-        active_filial_id = self.request.session.get('active_filial_id')
-
-        if not active_filial_id:
+        filial = get_filial_ativa(self.request.user, self.request)
+        if filial is None:
             messages.error(self.request, "Selecione uma filial ativa antes de importar.")
             return self.form_invalid(form)
 
-        try:
-            result = self._processar_planilha(file, active_filial_id)
-        except Exception as e:
-            messages.error(self.request, f"Erro inesperado ao processar o arquivo: {e}")
-            return self.form_invalid(form)
-
-        if result['erros']:
-            for erro in result['erros']:
-                messages.error(self.request, erro)
-            return self.form_invalid(form)
-
-        with transaction.atomic():
-            Ferramenta.objects.bulk_create(result['ferramentas'])
-
-        messages.success(self.request, f"{len(result['ferramentas'])} ferramentas importadas com sucesso!")
-        return super().form_valid(form)
-
-    def _processar_planilha(self, file, active_filial_id):
-        """Processa planilha e retorna dict com ferramentas e erros."""
-        wb = openpyxl.load_workbook(file)
-        ws = wb.active
-        ferramentas, erros = [], []
-        codigos_processados = set()
-
-        for i, row in enumerate(ws.iter_rows(min_row=2, max_col=14, values_only=True), start=2):
-            if all(cell is None for cell in row):
-                continue
-
-            (
-                nome, codigo, data_str, localizacao, patrimonio,
-                fabricante, modelo, serie, tamanho, laudo,
-                mala_nome, filial_nome, quantidade, observacoes
-            ) = row
-
-            # Validação de campos obrigatórios
-            if not all([nome, codigo, data_str, localizacao]):
-                erros.append(f"Linha {i}: Dados obrigatórios faltando.")
-                continue
-
-            codigo = str(codigo).strip()
-            if codigo in codigos_processados:
-                erros.append(f"Linha {i}: Código '{codigo}' duplicado na planilha.")
-                continue
-
-            # Parse da data
-            try:
-                if isinstance(data_str, datetime):
-                    data_aquisicao = data_str.date()
-                else:
-                    data_aquisicao = datetime.strptime(str(data_str).split(" ")[0], '%d/%m/%Y').date()
-            except (ValueError, TypeError):
-                erros.append(f"Linha {i}: Data inválida '{data_str}'. Use dd/mm/aaaa.")
-                continue
+        importacao = iniciar_importacao(
+            form.cleaned_data['file'], filial, self.request.user,
+            simular=form.cleaned_data['simular'],
+        )
+        return redirect(importacao.get_absolute_url())
 
-            # Verifica duplicidade no banco
-            if Ferramenta.objects.filter(codigo_identificacao=codigo).exists():
-                erros.append(f"Linha {i}: Código '{codigo}' já existe no sistema.")
-                continue
 
-            # Resolve filial
-            filial_obj = self._resolver_filial(filial_nome, active_filial_id, i, erros)
-            if filial_obj is None and filial_nome:
-                continue
-
-            # Resolve mala
-            mala_obj = self._resolver_mala(mala_nome, filial_obj, i, erros)
-            if mala_obj is None and mala_nome:
-                continue
+class ImportacaoStatusView(LoginRequiredMixin, AppPermissionMixin, ViewFilialScopedMixin, DetailView):
+    """
+    Andamento e relatório de uma importação.
 
-            ferramentas.append(Ferramenta(
-                nome=nome,
-                codigo_identificacao=codigo.upper(),
-                data_aquisicao=data_aquisicao,
-                localizacao_padrao=localizacao,
-                patrimonio=patrimonio or None,
-                fabricante_marca=fabricante or None,
-                modelo=modelo or None,
-                serie=serie or None,
-                tamanho_polegadas=tamanho or None,
-                numero_laudo_tecnico=laudo or None,
-                quantidade=quantidade or 0,
-                mala=mala_obj,
-                filial=filial_obj or Filial.objects.get(pk=active_filial_id),
-                observacoes=observacoes or None,
-            ))
-            codigos_processados.add(codigo)
-
-        return {'ferramentas': ferramentas, 'erros': erros}
-
-    def _resolver_filial(self, nome, default_id, linha, erros):
-        if nome:
-            try:
-                return Filial.objects.get(nome__iexact=str(nome).strip())
-            except Filial.DoesNotExist:
-                erros.append(f"Linha {linha}: Filial '{nome}' não encontrada.")
-                return None
-        return Filial.objects.get(pk=default_id)
-
-    def _resolver_mala(self, nome, filial, linha, erros):
-        if nome and filial:
-            try:
-                return MalaFerramentas.objects.get(nome__iexact=str(nome).strip(), filial=filial)
-            except MalaFerramentas.DoesNotExist:
-                erros.append(f"Linha {linha}: Mala '{nome}' não encontrada na filial '{filial.nome}'.")
-                return None
-        return None
+    HTMX recebe o fragmento de progresso; quando o job termina a resposta
+    usa o status 286, que encerra o polling.
+    """
+    app_label_required = _APP
+    model = ImportacaoFerramentas
+    template_name = 'ferramentas/importacao_status.html'
+    context_object_name = 'importacao'
+
+    def get_object(self, queryset=None):
+        importacao = super().get_object(queryset)
+        # Worker perdido: encerra para a tela parar de esperar
+        importacao.encerrar_se_travado()
+        return importacao
+
+    def get_template_names(self):
+        if self.request.headers.get('HX-Request'):
+            return ['ferramentas/partials/_importacao_progresso.html']
+        return [self.template_name]
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        if self.request.headers.get('HX-Request') and not self.object.em_andamento:
+            response.status_code = 286
+        return response
 
 
 class ImprimirQRCodesView(LoginRequiredMixin, AppPermissionMixin, ViewFilialScopedMixin, ListView):
+    """
+    Folha de etiquetas com SVG inline (cache por conteúdo) — não depende
+    do PNG gerado em segundo plano nem baixa nada do storage.
+    """
     app_label_required = _APP
     model = Ferramenta
     template_name = 'ferramentas/imprimir_qrcodes.html'
     context_object_name = 'ferramentas'
 
     def get_queryset(self):
-        return super().get_queryset().ativas().com_qr_code().order_by('nome')
+        return super().get_queryset().ativas().order_by('nome')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        malas = list(
+            MalaFerramentas.objects.filter(filial=get_filial_ativa(self.request.user, self.request))
+            .exclude(codigo_identificacao='').order_by('nome')
+        )
+        objetos = list(context['ferramentas']) + malas
+        conteudos = {obj: conteudo_qr(obj) for obj in objetos}
+        svgs = qr_svgs(set(conteudos.values()))
+        for obj, conteudo in conteudos.items():
+            obj.qr_svg = mark_safe(svgs[conteudo])
+        context['malas'] = malas
+        return context
+
+
+class FerramentaQRCodeSVGView(LoginRequiredMixin, AppPermissionMixin, ViewFilialScopedMixin, DetailView):
+    """QR Code em SVG gerado na hora; ETag = hash do conteúdo."""
+    app_label_required = _APP
+    model = Ferramenta
+
+    def render_to_response(self, context, **response_kwargs):
+        conteudo = conteudo_qr(self.object)
+        etag = f'"{hash_conteudo(conteudo)}"'
+        if self.request.headers.get('If-None-Match') == etag:
+            return HttpResponseNotModified(headers={'ETag': etag})
+        response = HttpResponse(qr_svg(conteudo), content_type='image/svg+xml')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=86400'
+        if 'baixar' in self.request.GET:
+            response['Content-Disposition'] = f'attachment; filename="qr-{self.object.codigo_identificacao}.svg"'
+        return response
+
+
+class MalaQRCodeSVGView(FerramentaQRCodeSVGView):
+    model = MalaFerramentas
 
 
 class ResultadoScanView(LoginRequiredMixin, AppPermissionMixin, ViewFilialScopedMixin, DetailView):
@@ -863,11 +830,8 @@ class GerarQRCodesView(LoginRequiredMixin, AppPermissionMixin, SSTPermissionMixi
     permission_required = 'ferramentas.change_ferramenta'
 
     def post(self, request, *args, **kwargs):
-        subprocess.Popen([
-            sys.executable,
-            str(settings.BASE_DIR / "manage.py"),
-            "generate_qrcodes",
-        ])
+        for modelo in ('ferramenta', 'mala'):
+            gerar_qr_codes_task.delay(modelo)
         messages.success(request, "Geração de QR Codes iniciada em segundo plano.")
         return redirect('ferramentas:ferramenta_list')
 
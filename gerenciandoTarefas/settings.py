@@ -213,6 +213,7 @@ MIDDLEWARE.extend([
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'core.middleware.CurrentFilialMiddleware',
+    'core.middleware.ContextQueryCountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
@@ -250,6 +251,12 @@ TEMPLATES = [
     },
 ]
 
+# Contexto global (core.global_context) — valores dos context processors
+# ficam em cache e são invalidados por signals; o TTL é só uma rede de segurança.
+GLOBAL_CONTEXT_CACHE_TIMEOUT = 300
+# Header X-Context-Queries com o custo em queries dos context processors
+GLOBAL_CONTEXT_DEBUG_HEADER = DEBUG
+
 DEFAULT_CHARSET = 'utf-8'
 FILE_CHARSET = 'utf-8'  # Django < 4.0
 DEFAULT_CONTENT_TYPE = 'text/html'
@@ -409,8 +416,16 @@ REST_FRAMEWORK = {
 # =============================================================================
 # CONFIGURAÇÕES — APP TAREFAS
 # =============================================================================
-# Limite de recorrências geradas por execução do fallback (segurança)
-TAREFAS_MAX_RECORRENCIAS_POR_EXECUCAO = 50
+# Raízes por lote (bulk_create) no fallback de recorrências, por filial
+TAREFAS_RECORRENCIAS_POR_LOTE = 500
+# Tarefas por lote (trava + UPDATE) nas rotinas de lembrete, aviso de fim e atrasadas
+TAREFAS_ROTINAS_POR_LOTE = 500
+
+# Geocoding reverso compartilhado (core.geocoding): coordenadas na mesma
+# célula da grade (~55 m) reaproveitam o endereço já consultado
+GEOCODING_PROVEDOR = config('GEOCODING_PROVEDOR', default='core.geocoding.ProvedorNominatim')
+GEOCODING_GRADE_GRAUS = config('GEOCODING_GRADE_GRAUS', default=0.0005, cast=float)
+GEOCODING_TAMANHO_LRU = 4096
 
 # =============================================================================
 # CELERY - CONFIGURAÇÃO ADAPTATIVA
@@ -443,6 +458,10 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'notifications.gerar_notificacoes',
         'schedule': crontab(minute=0, hour=11),
     },
+    'notificacoes-reconciliar-contadores': {
+        'task': 'notifications.reconciliar_contadores',
+        'schedule': crontab(minute='*/30'),
+    },
 
     # ─── App Tarefas — Recorrência e Lembretes ────────────────
     'tarefas-marcar-atrasadas': {
@@ -461,8 +480,72 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'tarefas.avisar_recorrencias_proximas_fim',
         'schedule': crontab(hour=9, minute=0, day_of_week='monday'),
     },
+
+    # ─── App Automóvel — Ingestão GPS ─────────────────────────
+    # Rede de segurança: a descarga normal é agendada pela própria ingestão
+    'automovel-descarregar-buffer-rastreamento': {
+        'task': 'automovel.descarregar_buffer_rastreamento',
+        'schedule': crontab(minute='*'),
+    },
+    'automovel-enriquecer-enderecos-rastreamento': {
+        'task': 'automovel.enriquecer_enderecos_rastreamento',
+        'schedule': crontab(minute='*'),
+    },
+
+    # ─── App Treinamentos — Progresso EAD ─────────────────────
+    # Rede de segurança: o primeiro heartbeat já agenda a descarga
+    'treinamentos-descarregar-progresso-ead': {
+        'task': 'treinamentos.descarregar_progresso_ead',
+        'schedule': crontab(minute='*'),
+    },
+}
+
+# Buffer (lista no Redis) dos pontos GPS aguardando gravação em lote.
+# Vazio: cada request vira uma task do Celery (automovel.rastreamento)
+RASTREAMENTO_BUFFER_URL = '' if TESTING else config('RASTREAMENTO_BUFFER_URL', default=REDIS_URL)
+
+# Buffer (hash no Redis) com o último heartbeat de cada (matrícula, aula)
+# do player EAD. Vazio: cada heartbeat grava direto (treinamentos.progresso_ead)
+EAD_PROGRESSO_BUFFER_URL = '' if TESTING else config('EAD_PROGRESSO_BUFFER_URL', default=REDIS_URL)
+
+# =============================================================================
+# CACHE — Redis compartilhado entre workers (gunicorn/Daphne/Celery)
+# =============================================================================
+# Sem CACHES explícito o Django usa LocMemCache POR PROCESSO: rate limits e
+# contadores ficariam errados com vários workers. Uso via core.cache.
+CACHE_URL = config('CACHE_URL', default=REDIS_URL)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+        'KEY_PREFIX': 'gt',
+        'VERSION': 1,
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'socket_connect_timeout': 2,
+            'socket_timeout': 2,
+            'retry_on_timeout': True,
+            'health_check_interval': 30,
+        },
+    }
 }
 
+# Testes (ou CACHE_LOCAL=True) usam memória local — sem Redis
+if TESTING or config('CACHE_LOCAL', default=False, cast=bool):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'gerenciandotarefas',
+        }
+    }
+
+# Rate-limit (core.ratelimit): janela deslizante no Redis, valendo para
+# todos os processos. Vazio → cada processo limita em memória
+RATELIMIT_REDIS_URL = config('RATELIMIT_REDIS_URL', default=CACHE_URL)
+if TESTING or config('CACHE_LOCAL', default=False, cast=bool):
+    RATELIMIT_REDIS_URL = ''
+
 # =============================================================================
 # CHANNELS (WebSocket) - CONFIGURAÇÃO ADAPTATIVA
 # =============================================================================
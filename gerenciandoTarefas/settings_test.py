@@ -97,6 +97,11 @@ CHANNEL_LAYERS = {
 # Flag para o seu código pular push de WebSocket em testes
 NOTIFICATIONS_REALTIME_ENABLED = False
 
+# =============================================================================
+# 🗺️ GEOCODING — provedor local (sem chamadas ao Nominatim)
+# =============================================================================
+GEOCODING_PROVEDOR = 'core.geocoding.ProvedorLocal'
+
 # =============================================================================
 # 🌿 CELERY — síncrono (sem broker)
 # =============================================================================
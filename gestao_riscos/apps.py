@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GestaoRiscosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gestao_riscos'
+
+    def ready(self):
+        import gestao_riscos.signals  # noqa: F401
@@ -1,10 +1,50 @@
-
 # gestao_riscos/context_processors.py
 
 from django.utils import timezone
+
+from core.global_context import chave_filial, contexto_global, obter_ou_calcular
 from .models import Incidente
 
 
+def chave_ultimo_acidente(filial_id):
+    """Chave do cache por filial — invalidada por gestao_riscos.signals."""
+    return chave_filial('ultimo_acidente', filial_id)
+
+
+def _como_data(valor):
+    return valor.date() if hasattr(valor, 'date') else valor
+
+
+def _calcular_referencia(filial):
+    """
+    Data de referência da contagem: último acidente com afastamento ou,
+    sem acidentes, o primeiro incidente registrado da filial.
+
+    Guarda só as datas — os dias são calculados na renderização,
+    então o cache não "envelhece" na virada do dia.
+    """
+    ultimo_acidente = Incidente.objects.filter(
+        filial=filial,
+        classificacao='COM_AFASTAMENTO'  # ← COM ACENTO, como está no model
+    ).order_by('-data_ocorrencia').first()
+
+    if ultimo_acidente and ultimo_acidente.data_ocorrencia:
+        return {
+            'data_ref': _como_data(ultimo_acidente.data_ocorrencia),
+            'data_ultimo': ultimo_acidente.data_ocorrencia,
+        }
+
+    primeiro_registro = Incidente.objects.filter(
+        filial=filial
+    ).order_by('data_registro').first()
+
+    return {
+        'data_ref': _como_data(primeiro_registro.data_registro) if primeiro_registro else None,
+        'data_ultimo': None,
+    }
+
+
+@contexto_global
 def dias_sem_acidentes(request):
     """Disponibiliza dias_sem_acidentes em TODOS os templates (header incluso)."""
     if not hasattr(request, 'user') or not request.user.is_authenticated:
@@ -14,32 +54,15 @@ def dias_sem_acidentes(request):
     if not filial_ativa:
         return {'dias_sem_acidentes': 0, 'data_ultimo_acidente': None}
 
-    ultimo_acidente = Incidente.objects.filter(
-        filial=filial_ativa,
-        classificacao='COM_AFASTAMENTO'  # ← COM ACENTO, como está no model
-    ).order_by('-data_ocorrencia').first()
+    referencia = obter_ou_calcular(
+        chave_ultimo_acidente(filial_ativa.pk),
+        lambda: _calcular_referencia(filial_ativa),
+    )
 
-    if ultimo_acidente and ultimo_acidente.data_ocorrencia:
-        data_ref = ultimo_acidente.data_ocorrencia
-        if hasattr(data_ref, 'date'):
-            data_ref = data_ref.date()
-        dias = (timezone.now().date() - data_ref).days
-        data_ultimo = ultimo_acidente.data_ocorrencia
-    else:
-        primeiro_registro = Incidente.objects.filter(
-            filial=filial_ativa
-        ).order_by('data_registro').first()
-
-        if primeiro_registro:
-            data_ref = primeiro_registro.data_registro
-            if hasattr(data_ref, 'date'):
-                data_ref = data_ref.date()
-            dias = (timezone.now().date() - data_ref).days
-        else:
-            dias = 0
-        data_ultimo = None
+    data_ref = referencia['data_ref']
+    dias = (timezone.now().date() - data_ref).days if data_ref else 0
 
     return {
         'dias_sem_acidentes': dias,
-        'data_ultimo_acidente': data_ultimo,
+        'data_ultimo_acidente': referencia['data_ultimo'],
     }
@@ -0,0 +1,15 @@
+# gestao_riscos/signals.py
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.global_context import invalidar
+from .context_processors import chave_ultimo_acidente
+from .models import Incidente
+
+
+@receiver(post_save, sender=Incidente)
+@receiver(post_delete, sender=Incidente)
+def invalidar_cache_dias_sem_acidentes(sender, instance, **kwargs):
+    """Recalcula o contador "dias sem acidentes" da filial do incidente."""
+    invalidar(chave_ultimo_acidente(instance.filial_id))
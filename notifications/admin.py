@@ -2,9 +2,23 @@
 # notifications/admin.py
 
 from django.contrib import admin
+from core.global_context import invalidar
+from .context_processors import chave_notificacoes
+from .contador import descartar_nao_lidas
 from .models import Notificacao
 
 
+def _atualizar_e_invalidar(queryset, **campos):
+    """
+    update() não dispara signals — invalida o cache do sino e descarta o
+    contador de não lidas dos donos (recontado na próxima leitura).
+    """
+    usuarios = set(queryset.values_list('usuario_id', flat=True))
+    queryset.update(**campos)
+    invalidar(*(chave_notificacoes(uid) for uid in usuarios))
+    descartar_nao_lidas(*usuarios)
+
+
 @admin.register(Notificacao)
 class NotificacaoAdmin(admin.ModelAdmin):
     list_display = [
@@ -22,9 +36,9 @@ class NotificacaoAdmin(admin.ModelAdmin):
     @admin.action(description='Marcar como lida')
     def marcar_como_lida(self, request, queryset):
         from django.utils import timezone
-        queryset.update(lida=True, data_leitura=timezone.now())
+        _atualizar_e_invalidar(queryset, lida=True, data_leitura=timezone.now())
 
     @admin.action(description='Marcar como não lida')
     def marcar_como_nao_lida(self, request, queryset):
-        queryset.update(lida=False, data_leitura=None)
+        _atualizar_e_invalidar(queryset, lida=False, data_leitura=None)
 
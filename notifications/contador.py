@@ -0,0 +1,151 @@
+# notifications/contador.py
+"""
+Contador de notificações não lidas por usuário, mantido no cache.
+
+O badge do sino é lido em toda página, em cada push via WebSocket e na
+conexão do NotificationConsumer. Em vez de um COUNT(*) a cada leitura, o
+total fica numa chave por usuário, ajustada de forma incremental:
+
+    criação (não lida)         → +1   (signals / fan-out em massa)
+    marcar como lida / apagar  → -1
+    marcar todas como lidas    → 0
+
+A chave só nasce de uma contagem real (`contar_nao_lidas` num cache miss);
+ajustes sobre chave ausente são ignorados, e qualquer alteração que não
+passe por aqui (ex.: edição no admin) descarta a chave. A task
+`notifications.reconciliar_contadores` corrige periodicamente o que
+tiver divergido (ajuste perdido com o Redis fora do ar, por exemplo).
+"""
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+
+from core.cache import CacheNamespace
+
+from .models import Notificacao
+
+logger = logging.getLogger(__name__)
+
+# A reconciliação é a rede de segurança; o TTL só limita chaves órfãs
+TIMEOUT_CONTADOR = 60 * 60 * 24
+
+cache_nao_lidas = CacheNamespace('notif_nao_lidas', versao=1, timeout=TIMEOUT_CONTADOR)
+
+
+def chave_nao_lidas(user_id):
+    return cache_nao_lidas.chave_usuario(user_id)
+
+
+def _contar_no_banco(user_id):
+    return Notificacao.objects.filter(usuario_id=user_id, lida=False).count()
+
+
+def contar_nao_lidas(user_id):
+    """Total de não lidas — O(1) com a chave no cache; um COUNT no miss."""
+    chave = chave_nao_lidas(user_id)
+    total = cache_nao_lidas.get(chave)
+    if total is None:
+        total = _contar_no_banco(user_id)
+        # add: não sobrescreve um valor gravado entre o COUNT e aqui
+        cache_nao_lidas.add(chave, total)
+    return total
+
+
+def ajustar_nao_lidas(user_id, delta):
+    """
+    Soma `delta` ao contador; retorna o novo total ou None se a chave
+    não existe (o próximo `contar_nao_lidas` recalcula).
+    """
+    chave = chave_nao_lidas(user_id)
+    total = cache_nao_lidas.incr(chave, delta, criar=False)
+    if total is not None and total < 0:
+        logger.warning("Contador de não lidas negativo (user=%s); descartando.", user_id)
+        cache_nao_lidas.delete(chave)
+        return None
+    return total
+
+
+def zerar_nao_lidas(user_id):
+    cache_nao_lidas.set(chave_nao_lidas(user_id), 0)
+
+
+def descartar_nao_lidas(*user_ids):
+    """Força recontagem na próxima leitura."""
+    cache_nao_lidas.delete(*[chave_nao_lidas(user_id) for user_id in user_ids])
+
+
+def registrar_leitura(user_id, notificacao_id):
+    """
+    Efeitos de uma notificação marcada como lida via update() (sem
+    post_save): contador -1, cache do sino e push para as outras abas.
+    """
+    from core.global_context import invalidar
+    from .context_processors import chave_notificacoes
+    from .realtime import push_notification_read
+
+    total = ajustar_nao_lidas(user_id, -1)
+    invalidar(chave_notificacoes(user_id))
+    push_notification_read(user_id, notificacao_id, count=total)
+
+
+def registrar_leitura_todas(user_id):
+    """Idem para "marcar todas como lidas": o total passa a ser zero."""
+    from core.global_context import invalidar
+    from .context_processors import chave_notificacoes
+    from .realtime import push_notification_count
+
+    zerar_nao_lidas(user_id)
+    invalidar(chave_notificacoes(user_id))
+    push_notification_count(user_id, 0)
+
+
+def reconciliar_contadores(tamanho_lote=1000):
+    """
+    Compara os contadores em cache com o banco e corrige os divergentes.
+
+    Só olha chaves que existem (as ausentes já nascem certas); por lote de
+    usuários ativos: um get_many, um COUNT agrupado e um set_many.
+
+    Returns:
+        Quantidade de contadores corrigidos.
+    """
+    User = get_user_model()
+    user_ids = User.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)
+
+    corrigidos = 0
+    lote = []
+    for user_id in user_ids.iterator(chunk_size=tamanho_lote):
+        lote.append(user_id)
+        if len(lote) >= tamanho_lote:
+            corrigidos += _reconciliar_lote(lote)
+            lote = []
+    if lote:
+        corrigidos += _reconciliar_lote(lote)
+
+    if corrigidos:
+        logger.info("Contadores de não lidas corrigidos: %s", corrigidos)
+    return corrigidos
+
+
+def _reconciliar_lote(user_ids):
+    chaves = {chave_nao_lidas(user_id): user_id for user_id in user_ids}
+    em_cache = cache_nao_lidas.get_many(list(chaves))
+    if not em_cache:
+        return 0
+
+    reais = dict(
+        Notificacao.objects.filter(
+            usuario_id__in=[chaves[chave] for chave in em_cache], lida=False,
+        )
+        .values('usuario_id')
+        .annotate(total=Count('id'))
+        .values_list('usuario_id', 'total')
+    )
+    divergentes = {
+        chave: reais.get(chaves[chave], 0)
+        for chave, valor in em_cache.items()
+        if valor != reais.get(chaves[chave], 0)
+    }
+    cache_nao_lidas.set_many(divergentes)
+    return len(divergentes)
@@ -1,24 +1,37 @@
+from core.global_context import chave_usuario, contexto_global, obter_ou_calcular
+from .contador import contar_nao_lidas
 from .models import Notificacao
 
 MAX_DROPDOWN = 8
 
 
+def chave_notificacoes(user_id):
+    """Chave da lista do sino — invalidada por notifications.signals."""
+    return chave_usuario('notificacoes_lista', user_id)
+
+
+def _calcular_notificacoes(user):
+    return list(
+        Notificacao.objects.filter(usuario=user, lida=False)[:MAX_DROPDOWN]
+    )
+
+
+@contexto_global
 def notification_processor(request):
     """Injeta notificações não lidas no contexto global."""
     if not request.user.is_authenticated:
         return {}
 
     try:
-        qs = Notificacao.objects.filter(
-            usuario=request.user,
-            lida=False,
-        )
+        user = request.user
+        # Contagem pelo contador incremental; só a lista do dropdown é consultada
         return {
-            'notification_count': qs.count(),          
-            'notification_list': qs[:MAX_DROPDOWN],   
+            'notification_count': contar_nao_lidas(user.pk),
+            'notification_list': obter_ou_calcular(
+                chave_notificacoes(user.pk),
+                lambda: _calcular_notificacoes(user),
+            ),
         }
     except Exception as e:
         print(f"[ERROR] notification_processor: {e}")
         return {'notification_count': 0, 'notification_list': []}
-
-
@@ -106,10 +106,17 @@ class Notificacao(models.Model):
         status = '✔' if self.lida else '◉'
         return f"{status} {self.titulo} → {self.usuario.username}"
     def marcar_como_lida(self):
-        if not self.lida:
-            self.lida = True
-            self.data_leitura = timezone.now()
-            self.save(update_fields=['lida', 'data_leitura'])
+        if self.lida:
+            return
+        self.lida = True
+        self.data_leitura = timezone.now()
+        # Condicional: duas abas marcando a mesma notificação contam uma vez só
+        marcou = Notificacao.objects.filter(pk=self.pk, lida=False).update(
+            lida=True, data_leitura=self.data_leitura,
+        )
+        if marcou:
+            from .contador import registrar_leitura
+            registrar_leitura(self.usuario_id, self.pk)
     @property
     def badge_class(self):
         """Retorna a classe CSS do badge conforme prioridade."""
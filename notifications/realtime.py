@@ -7,7 +7,12 @@ Uso típico:
     from notifications.realtime import push_notification_count, push_new_notification
 
     push_notification_count(user)              # atualiza apenas o badge
-    push_new_notification(user, notificacao)   # envia toast + atualiza badge
+    push_notification_delta(user, -1)          # badge por delta (+1/-1)
+    push_new_notification(user, notificacao)   # envia toast + delta no badge
+    push_new_notifications(notificacoes)       # fan-out: vários usuários de uma vez
+
+O badge não é recontado no banco: os totais vêm do contador em cache
+(notifications.contador) e os eventos levam o delta junto.
 
 Resiliência:
     Se o Redis estiver indisponível (channels_redis), as funções degradam
@@ -133,10 +138,8 @@ def push_notification_count(
 
     if count is None:
         try:
-            from .models import Notificacao
-            count = Notificacao.objects.filter(
-                usuario_id=user_id, lida=False,
-            ).count()
+            from .contador import contar_nao_lidas
+            count = contar_nao_lidas(user_id)
         except Exception as e:
             logger.exception(
                 "Erro ao contar não lidas (user=%s): %s", user_id, e,
@@ -162,7 +165,38 @@ def push_notification_count(
     return ok
 
 
-def push_new_notification(user, notificacao) -> bool:
+def push_notification_delta(
+    user: Optional[Union[User, int]],
+    delta: int,
+    count: Optional[int] = None,
+) -> bool:
+    """
+    Ajusta o badge por delta (+1 nova, -1 lida) sem recontar.
+
+    `count` é o total já conhecido pelo contador, quando houver — o front
+    usa o absoluto se vier e cai para o delta se não vier.
+    """
+    user_id = _resolve_user_id(user)
+    if user_id is None:
+        return False
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return False
+
+    return _safe_group_send(
+        channel_layer,
+        _group_name(user_id),
+        {
+            'type': 'notification_count_delta',
+            'delta': int(delta),
+            'count': None if count is None else int(count),
+        },
+        ctx=f"delta user={user_id} delta={delta}",
+    )
+
+
+def push_new_notification(user, notificacao, count: Optional[int] = None) -> bool:
     """
     Envia uma nova notificação completa (para toast/popup) +
     atualiza o badge.
@@ -189,7 +223,7 @@ def push_new_notification(user, notificacao) -> bool:
     )
 
     # 2) Atualiza badge
-    ok_count = push_notification_count(user_id)
+    ok_count = push_notification_delta(user_id, +1, count)
 
     if ok_new:
         logger.debug(
@@ -199,7 +233,7 @@ def push_new_notification(user, notificacao) -> bool:
     return ok_new and ok_count
 
 
-def push_notification_read(user, notificacao_id: int) -> bool:
+def push_notification_read(user, notificacao_id: int, count: Optional[int] = None) -> bool:
     """
     Notifica o cliente que uma notificação foi marcada como lida
     (útil para sincronizar múltiplas abas/dispositivos).
@@ -222,6 +256,66 @@ def push_notification_read(user, notificacao_id: int) -> bool:
         ctx=f"read user={user_id} notif={notificacao_id}",
     )
     # Atualiza badge também
-    push_notification_count(user_id)
+    push_notification_delta(user_id, -1, count)
     return ok
 
+
+
+def push_new_notifications(notificacoes, contagens=None) -> int:
+    """
+    Versão em lote de push_new_notification, para o fan-out em massa
+    (bulk_create não dispara o post_save que faz o push unitário).
+
+    Todos os group_send rodam num único async_to_sync: um evento
+    new_notification por notificação e um delta de badge por usuário.
+    `contagens` ({user_id: total}) vem do contador, quando conhecido. Se o
+    Redis cair no meio, o restante é descartado — as notificações já
+    estão no banco.
+
+    Returns:
+        Quantidade de usuários que receberam o push.
+    """
+    notificacoes = [n for n in notificacoes if n.pk and n.usuario_id]
+    if not notificacoes or not getattr(settings, "NOTIFICATIONS_REALTIME_ENABLED", True):
+        return 0
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        logger.debug("Channel layer não configurado — push ignorado")
+        return 0
+
+    contagens = contagens or {}
+    deltas = {}
+    mensagens = []
+    for notificacao in notificacoes:
+        deltas[notificacao.usuario_id] = deltas.get(notificacao.usuario_id, 0) + 1
+        mensagens.append((
+            _group_name(notificacao.usuario_id),
+            {'type': 'new_notification', 'notification': _serialize_notificacao(notificacao)},
+        ))
+    for user_id, delta in deltas.items():
+        count = contagens.get(user_id)
+        mensagens.append((
+            _group_name(user_id),
+            {
+                'type': 'notification_count_delta',
+                'delta': delta,
+                'count': None if count is None else int(count),
+            },
+        ))
+
+    async def _enviar_todas():
+        for group, message in mensagens:
+            await channel_layer.group_send(group, message)
+
+    try:
+        async_to_sync(_enviar_todas)()
+    except _CONNECTION_ERRORS as e:
+        logger.warning("Redis indisponível no push WS em lote (%s usuários): %s", len(deltas), e)
+        return 0
+    except Exception as e:
+        logger.exception("Erro inesperado no push WS em lote: %s", e)
+        return 0
+
+    logger.debug("📡 Push em lote: %s notificação(ões) para %s usuário(s)", len(notificacoes), len(deltas))
+    return len(deltas)
@@ -11,15 +11,24 @@ import logging
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.mail import EmailMultiAlternatives
-from django.db.models import Q         
+from django.db import transaction
+from django.db.models import Max, Q, QuerySet
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
+
+from core.global_context import invalidar
+from .context_processors import chave_notificacoes
+from .contador import ajustar_nao_lidas
 from .models import Notificacao
+from .realtime import push_new_notifications
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Linhas por INSERT no fan-out em massa
+TAMANHO_LOTE_NOTIFICACOES = 500
+
 
 # =============================================================================
 # SERVIÇO DE NOTIFICAÇÕES (SISTEMA / SINO)
@@ -72,18 +81,126 @@ def criar_notificacao(
     )
 
 
-def criar_notificacao_para_grupo(usuarios, titulo, mensagem='', **kwargs):
+def criar_notificacao_para_grupo(
+    usuarios,
+    titulo,
+    mensagem='',
+    tipo='sistema',
+    categoria='sistema',
+    prioridade='media',
+    url_destino=None,
+    icone='bi-bell',
+    duplicar=False,
+    adiar=False,
+):
     """
-    Cria a mesma notificação para múltiplos usuários.
+    Cria a mesma notificação para múltiplos usuários, em lote.
+
+    Custo fixo, independente do número de destinatários: uma query acha
+    as duplicatas não lidas do grupo todo, um bulk_create grava o resto e
+    um único push em tempo real (após o commit) avisa todos. Como o
+    bulk_create não dispara post_save, o cache do sino e os contadores de
+    não lidas são atualizados aqui.
+
+    Args:
+        usuarios: Iterável de Users ou ids, ou QuerySet de User
+        adiar: Se True, o fan-out roda na task Celery
+            `notifications.criar_para_grupo` após o commit da transação
+            atual; retorna [] imediatamente.
+        (demais argumentos como em criar_notificacao)
+
+    Returns:
+        Lista das notificações criadas.
     """
-    notificacoes = []
+    user_ids = _ids_usuarios(usuarios)
+    if not user_ids:
+        return []
+
+    campos = {
+        'titulo': titulo,
+        'tipo': tipo,
+        'categoria': categoria,
+        'prioridade': prioridade,
+        'mensagem': mensagem,
+        'url_destino': url_destino,
+        'icone': icone,
+    }
+
+    if adiar:
+        transaction.on_commit(lambda: _enfileirar_notificacao_grupo(user_ids, campos, duplicar))
+        return []
+
+    return _criar_notificacoes_em_lote(user_ids, campos, duplicar)
+
+
+def _ids_usuarios(usuarios):
+    """Ids distintos (na ordem recebida) de Users, ids ou QuerySet."""
+    if isinstance(usuarios, QuerySet):
+        return list(dict.fromkeys(usuarios.values_list('pk', flat=True)))
+
+    ids = []
     for usuario in usuarios:
-        n = criar_notificacao(usuario, titulo, mensagem=mensagem, **kwargs)
-        if n:
-            notificacoes.append(n)
+        user_id = usuario if isinstance(usuario, int) else getattr(usuario, 'pk', None)
+        if user_id:
+            ids.append(user_id)
+    return list(dict.fromkeys(ids))
+
+
+def _criar_notificacoes_em_lote(user_ids, campos, duplicar):
+    if not duplicar:
+        ja_notificados = set(
+            Notificacao.objects.filter(
+                usuario_id__in=user_ids,
+                tipo=campos['tipo'],
+                titulo=campos['titulo'],
+                lida=False,
+            ).values_list('usuario_id', flat=True)
+        )
+        user_ids = [user_id for user_id in user_ids if user_id not in ja_notificados]
+        if not user_ids:
+            return []
+
+    notificacoes = Notificacao.objects.bulk_create(
+        [Notificacao(usuario_id=user_id, **campos) for user_id in user_ids],
+        batch_size=TAMANHO_LOTE_NOTIFICACOES,
+    )
+
+    if notificacoes and notificacoes[0].pk is None:
+        # MySQL não devolve os ids do bulk_create: relê o mais recente de cada usuário
+        ids = dict(
+            Notificacao.objects.filter(
+                usuario_id__in=user_ids,
+                tipo=campos['tipo'],
+                titulo=campos['titulo'],
+                data_criacao__gte=min(n.data_criacao for n in notificacoes),
+            )
+            .values('usuario_id')
+            .annotate(ultimo=Max('pk'))
+            .values_list('usuario_id', 'ultimo')
+        )
+        for notificacao in notificacoes:
+            notificacao.pk = ids.get(notificacao.usuario_id)
+
+    invalidar(*[chave_notificacoes(user_id) for user_id in user_ids])
+    contagens = {user_id: ajustar_nao_lidas(user_id, +1) for user_id in user_ids}
+    transaction.on_commit(lambda: push_new_notifications(notificacoes, contagens))
     return notificacoes
 
 
+def _enfileirar_notificacao_grupo(user_ids, campos, duplicar):
+    from .tasks import criar_notificacao_para_grupo_task
+
+    try:
+        criar_notificacao_para_grupo_task.delay(user_ids, duplicar=duplicar, **campos)
+    except Exception:
+        # Broker fora do ar: melhor notificar agora do que perder o aviso
+        logger.exception(
+            "Falha ao enfileirar notificação em grupo '%s'; criando de forma síncrona.",
+            campos['titulo'],
+        )
+        _criar_notificacoes_em_lote(user_ids, campos, duplicar)
+
+
 # =============================================================================
 # FUNÇÕES ESPECÍFICAS PARA TAREFAS
 # =============================================================================
@@ -157,21 +274,18 @@ def notificar_tarefa_status(tarefa, status_anterior, novo_status, alterado_por=N
         destinatarios.add(tarefa.responsavel)
 
     url = reverse('tarefas:tarefa_detail', kwargs={'pk': tarefa.pk})
-    resultados = []
 
-    for user in destinatarios:
-        n = criar_notificacao(
-            usuario=user,
-            titulo=f'Status alterado: {tarefa.titulo[:40]}',
-            tipo='tarefa_status',
-            categoria='tarefa',
-            prioridade='baixa',
-            mensagem=f'{status_anterior} → {novo_status}',
-            url_destino=url,
-            icone='bi-arrow-repeat',
-            duplicar=True,
-        )
-        resultados.append(n)
+    resultados = criar_notificacao_para_grupo(
+        destinatarios,
+        titulo=f'Status alterado: {tarefa.titulo[:40]}',
+        tipo='tarefa_status',
+        categoria='tarefa',
+        prioridade='baixa',
+        mensagem=f'{status_anterior} → {novo_status}',
+        url_destino=url,
+        icone='bi-arrow-repeat',
+        duplicar=True,
+    )
 
     return resultados
 
@@ -279,23 +393,23 @@ def notificar_pedido_pendente(pedido):
     contrato_info = f"{pedido.contrato.cm} — {pedido.contrato.cliente}"
     valor_total = f"R$ {pedido.valor_total:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
 
-    for gerente in gerentes:
-        criar_notificacao(
-            usuario=gerente,
-            titulo=f'📋 Pedido {pedido.numero} aguardando aprovação',
-            tipo='sistema',
-            categoria='suprimentos',
-            prioridade='alta',
-            mensagem=(
-                f'{solicitante} criou um pedido para {contrato_info}.\n'
-                f'Tipo: {pedido.get_tipo_obra_display()}\n'
-                f'Valor: {valor_total}\n'
-                f'Data necessária: {pedido.data_necessaria.strftime("%d/%m/%Y") if pedido.data_necessaria else "Não informada"}'
-            ),
-            url_destino=pedido.get_absolute_url(),
-            icone='bi-clipboard-check',
-        )
+    criar_notificacao_para_grupo(
+        gerentes,
+        titulo=f'📋 Pedido {pedido.numero} aguardando aprovação',
+        tipo='sistema',
+        categoria='suprimentos',
+        prioridade='alta',
+        mensagem=(
+            f'{solicitante} criou um pedido para {contrato_info}.\n'
+            f'Tipo: {pedido.get_tipo_obra_display()}\n'
+            f'Valor: {valor_total}\n'
+            f'Data necessária: {pedido.data_necessaria.strftime("%d/%m/%Y") if pedido.data_necessaria else "Não informada"}'
+        ),
+        url_destino=pedido.get_absolute_url(),
+        icone='bi-clipboard-check',
+    )
 
+    for gerente in gerentes:
         enviar_email_notificacao(
             assunto=f'[Suprimentos] Pedido {pedido.numero} — Aprovação Pendente',
             template_texto='notifications/emails/pedido_pendente.txt',
@@ -452,20 +566,19 @@ def notificar_pedido_verba_excedida(pedido, erros):
 
     erros_txt = '\n'.join(erros)
 
-    for gerente in gerentes:
-        criar_notificacao(
-            usuario=gerente,
-            titulo=f'⚠️ Pedido {pedido.numero} — Verba Excedida',
-            tipo='sistema',
-            categoria='suprimentos',
-            prioridade='critica',
-            mensagem=(
-                f'O pedido de {pedido.solicitante.get_full_name()} '
-                f'excede o limite de verba:\n{erros_txt}'
-            ),
-            url_destino=pedido.get_absolute_url(),
-            icone='bi-exclamation-triangle-fill',
-        )
+    criar_notificacao_para_grupo(
+        gerentes,
+        titulo=f'⚠️ Pedido {pedido.numero} — Verba Excedida',
+        tipo='sistema',
+        categoria='suprimentos',
+        prioridade='critica',
+        mensagem=(
+            f'O pedido de {pedido.solicitante.get_full_name()} '
+            f'excede o limite de verba:\n{erros_txt}'
+        ),
+        url_destino=pedido.get_absolute_url(),
+        icone='bi-exclamation-triangle-fill',
+    )
 
 
 # ═════════════════════════════════════════════════════════════════
@@ -500,24 +613,24 @@ def notificar_solicitacao_criada(solicitacao):
     contrato = f"{solicitacao.contrato.cm} — {solicitacao.contrato.cliente}"
     solicitante = solicitacao.solicitante.get_full_name() or solicitacao.solicitante.username
 
-    for comprador in compradores:
-        criar_notificacao(
-            usuario=comprador,
-            titulo=f'🆕 Nova Solicitação {solicitacao.numero} — Fazer Cotação',
-            tipo='sistema',
-            categoria='suprimentos',
-            prioridade='alta',
-            mensagem=(
-                f'Solicitante: {solicitante}\n'
-                f'Contrato: {contrato}\n'
-                f'Material: {solicitacao.descricao_material[:100]}...\n'
-                f'Qtd: {solicitacao.quantidade} {solicitacao.get_unidade_medida_display()}\n'
-                f'Data necessária: {solicitacao.data_necessaria.strftime("%d/%m/%Y") if solicitacao.data_necessaria else "Não informada"}'
-            ),
-            url_destino=solicitacao.get_absolute_url(),
-            icone='bi-cart-plus',
-        )
+    criar_notificacao_para_grupo(
+        compradores,
+        titulo=f'🆕 Nova Solicitação {solicitacao.numero} — Fazer Cotação',
+        tipo='sistema',
+        categoria='suprimentos',
+        prioridade='alta',
+        mensagem=(
+            f'Solicitante: {solicitante}\n'
+            f'Contrato: {contrato}\n'
+            f'Material: {solicitacao.descricao_material[:100]}...\n'
+            f'Qtd: {solicitacao.quantidade} {solicitacao.get_unidade_medida_display()}\n'
+            f'Data necessária: {solicitacao.data_necessaria.strftime("%d/%m/%Y") if solicitacao.data_necessaria else "Não informada"}'
+        ),
+        url_destino=solicitacao.get_absolute_url(),
+        icone='bi-cart-plus',
+    )
 
+    for comprador in compradores:
         enviar_email_notificacao(
             assunto=f'[Suprimentos] Nova Solicitação {solicitacao.numero} — Cotação Necessária',
             template_texto='notifications/emails/solicitacao_criada.txt',
@@ -538,23 +651,23 @@ def notificar_cotacao_enviada(solicitacao):
     gerentes = _get_gerentes(solicitacao.filial)
     comprador = solicitacao.comprador.get_full_name() if solicitacao.comprador else 'Comprador'
 
-    for gerente in gerentes:
-        criar_notificacao(
-            usuario=gerente,
-            titulo=f'📊 Cotação enviada — {solicitacao.numero}',
-            tipo='sistema',
-            categoria='suprimentos',
-            prioridade='alta',
-            mensagem=(
-                f'{comprador} registrou cotação Nº {solicitacao.numero_cotacao}.\n'
-                f'CNPJ: {solicitacao.cnpj_compra}\n'
-                f'Tipo NF: {solicitacao.get_tipo_nota_fiscal_display()}\n\n'
-                f'Valide a cotação para prosseguir.'
-            ),
-            url_destino=solicitacao.get_absolute_url(),
-            icone='bi-graph-up',
-        )
+    criar_notificacao_para_grupo(
+        gerentes,
+        titulo=f'📊 Cotação enviada — {solicitacao.numero}',
+        tipo='sistema',
+        categoria='suprimentos',
+        prioridade='alta',
+        mensagem=(
+            f'{comprador} registrou cotação Nº {solicitacao.numero_cotacao}.\n'
+            f'CNPJ: {solicitacao.cnpj_compra}\n'
+            f'Tipo NF: {solicitacao.get_tipo_nota_fiscal_display()}\n\n'
+            f'Valide a cotação para prosseguir.'
+        ),
+        url_destino=solicitacao.get_absolute_url(),
+        icone='bi-graph-up',
+    )
 
+    for gerente in gerentes:
         enviar_email_notificacao(
             assunto=f'[Suprimentos] Cotação {solicitacao.numero} — Validação Necessária',
             template_texto='notifications/emails/cotacao_enviada.txt',
@@ -773,22 +886,21 @@ def notificar_solicitacao_concluida(solicitacao):
         if solicitacao.valor_pedido else 'N/D'
     )
 
-    for user in envolvidos:
-        criar_notificacao(
-            usuario=user,
-            titulo=f'🎉 Solicitação {solicitacao.numero} CONCLUÍDA!',
-            tipo='sistema',
-            categoria='suprimentos',
-            prioridade='media',
-            mensagem=(
-                f'NF: {solicitacao.numero_nota_fiscal}\n'
-                f'Material: {solicitacao.descricao_material[:80]}...\n'
-                f'Fornecedor: {solicitacao.fornecedor}\n'
-                f'Valor: {valor_fmt}'
-            ),
-            url_destino=solicitacao.get_absolute_url(),
-            icone='bi-trophy',
-        )
+    criar_notificacao_para_grupo(
+        envolvidos,
+        titulo=f'🎉 Solicitação {solicitacao.numero} CONCLUÍDA!',
+        tipo='sistema',
+        categoria='suprimentos',
+        prioridade='media',
+        mensagem=(
+            f'NF: {solicitacao.numero_nota_fiscal}\n'
+            f'Material: {solicitacao.descricao_material[:80]}...\n'
+            f'Fornecedor: {solicitacao.fornecedor}\n'
+            f'Valor: {valor_fmt}'
+        ),
+        url_destino=solicitacao.get_absolute_url(),
+        icone='bi-trophy',
+    )
 
     enviar_email_notificacao(
         assunto=f'[Suprimentos] {solicitacao.numero} — CONCLUÍDA ✅🎉',
@@ -811,17 +923,16 @@ def notificar_solicitacao_cancelada(solicitacao):
     if solicitacao.comprador:
         envolvidos.add(solicitacao.comprador)
 
-    for user in envolvidos:
-        criar_notificacao(
-            usuario=user,
-            titulo=f'🚫 Solicitação {solicitacao.numero} CANCELADA',
-            tipo='sistema',
-            categoria='suprimentos',
-            prioridade='alta',
-            mensagem=f'Motivo: {solicitacao.motivo_cancelamento}',
-            url_destino=solicitacao.get_absolute_url(),
-            icone='bi-x-octagon-fill',
-        )
+    criar_notificacao_para_grupo(
+        envolvidos,
+        titulo=f'🚫 Solicitação {solicitacao.numero} CANCELADA',
+        tipo='sistema',
+        categoria='suprimentos',
+        prioridade='alta',
+        mensagem=f'Motivo: {solicitacao.motivo_cancelamento}',
+        url_destino=solicitacao.get_absolute_url(),
+        icone='bi-x-octagon-fill',
+    )
 
 
 # =============================================================================
@@ -898,26 +1009,22 @@ def notificar_tarefa_criada(tarefa, criador):
         return []
 
     url = reverse('tarefas:tarefa_detail', kwargs={'pk': tarefa.pk})
-    resultados = []
 
-    for user in destinatarios:
-        n = criar_notificacao(
-            usuario=user,
-            titulo=f'Nova tarefa: {tarefa.titulo[:50]}',
-            tipo='tarefa_atribuida',
-            categoria='tarefa',
-            prioridade='media',
-            mensagem=(
-                f'Você foi incluído na tarefa "{tarefa.titulo}".\n'
-                f'Criada por: {criador.get_full_name() or criador.username}\n'
-                f'Prazo: {tarefa.prazo.strftime("%d/%m/%Y %H:%M") if tarefa.prazo else "Não definido"}'
-            ),
-            url_destino=url,
-            icone='bi-plus-circle-fill',
-            duplicar=True,
-        )
-        if n:
-            resultados.append(n)
+    resultados = criar_notificacao_para_grupo(
+        destinatarios,
+        titulo=f'Nova tarefa: {tarefa.titulo[:50]}',
+        tipo='tarefa_atribuida',
+        categoria='tarefa',
+        prioridade='media',
+        mensagem=(
+            f'Você foi incluído na tarefa "{tarefa.titulo}".\n'
+            f'Criada por: {criador.get_full_name() or criador.username}\n'
+            f'Prazo: {tarefa.prazo.strftime("%d/%m/%Y %H:%M") if tarefa.prazo else "Não definido"}'
+        ),
+        url_destino=url,
+        icone='bi-plus-circle-fill',
+        duplicar=True,
+    )
 
     # E-mail
     emails_destinatarios = [u.email for u in destinatarios if u.email]
@@ -948,22 +1055,18 @@ def notificar_tarefa_comentario(tarefa, autor, texto_comentario):
 
     url = reverse('tarefas:tarefa_detail', kwargs={'pk': tarefa.pk})
     texto_curto = texto_comentario[:80] + ('...' if len(texto_comentario) > 80 else '')
-    resultados = []
 
-    for user in destinatarios:
-        n = criar_notificacao(
-            usuario=user,
-            titulo=f'Comentário em: {tarefa.titulo[:40]}',
-            tipo='tarefa_comentario',
-            categoria='tarefa',
-            prioridade='baixa',
-            mensagem=f'{autor.get_full_name() or autor.username}: "{texto_curto}"',
-            url_destino=url,
-            icone='bi-chat-dots-fill',
-            duplicar=True,
-        )
-        if n:
-            resultados.append(n)
+    resultados = criar_notificacao_para_grupo(
+        destinatarios,
+        titulo=f'Comentário em: {tarefa.titulo[:40]}',
+        tipo='tarefa_comentario',
+        categoria='tarefa',
+        prioridade='baixa',
+        mensagem=f'{autor.get_full_name() or autor.username}: "{texto_curto}"',
+        url_destino=url,
+        icone='bi-chat-dots-fill',
+        duplicar=True,
+    )
 
     # E-mail — usa novo template email_tarefa_comentario
     emails_dest = [u.email for u in destinatarios if u.email]
@@ -994,7 +1097,6 @@ def notificar_tarefa_status_participantes(tarefa, status_anterior, novo_status,
         return []
 
     url = reverse('tarefas:tarefa_detail', kwargs={'pk': tarefa.pk})
-    resultados = []
 
     # Prioridade e ícone conforme o novo status
     if novo_status in ('concluida', 'Concluída'):
@@ -1010,20 +1112,17 @@ def notificar_tarefa_status_participantes(tarefa, status_anterior, novo_status,
         prioridade = 'baixa'
         icone = 'bi-arrow-repeat'
 
-    for user in destinatarios:
-        n = criar_notificacao(
-            usuario=user,
-            titulo=f'Status alterado: {tarefa.titulo[:40]}',
-            tipo='tarefa_status',
-            categoria='tarefa',
-            prioridade=prioridade,
-            mensagem=f'{status_anterior} → {novo_status}',
-            url_destino=url,
-            icone=icone,
-            duplicar=True,
-        )
-        if n:
-            resultados.append(n)
+    resultados = criar_notificacao_para_grupo(
+        destinatarios,
+        titulo=f'Status alterado: {tarefa.titulo[:40]}',
+        tipo='tarefa_status',
+        categoria='tarefa',
+        prioridade=prioridade,
+        mensagem=f'{status_anterior} → {novo_status}',
+        url_destino=url,
+        icone=icone,
+        duplicar=True,
+    )
 
     # E-mail — usa template existente email_notificacao_status
     emails_dest = [u.email for u in destinatarios if u.email]
@@ -1051,35 +1150,28 @@ def notificar_tarefa_participante_adicionado(tarefa, novos_participantes, adicio
     Cria sino + envia e-mail com template específico.
     """
     url = reverse('tarefas:tarefa_detail', kwargs={'pk': tarefa.pk})
-    resultados = []
-
-    for user in novos_participantes:
-        if user == adicionado_por:
-            continue
+    destinatarios = [u for u in novos_participantes if u != adicionado_por]
+    if not destinatarios:
+        return []
 
-        n = criar_notificacao(
-            usuario=user,
-            titulo=f'Adicionado à tarefa: {tarefa.titulo[:45]}',
-            tipo='tarefa_atribuida',
-            categoria='tarefa',
-            prioridade='media',
-            mensagem=(
-                f'Você foi adicionado como participante.\n'
-                f'Responsável: {tarefa.responsavel.get_full_name() if tarefa.responsavel else "N/A"}\n'
-                f'Prazo: {tarefa.prazo.strftime("%d/%m/%Y %H:%M") if tarefa.prazo else "Não definido"}'
-            ),
-            url_destino=url,
-            icone='bi-person-plus-fill',
-            duplicar=True,
-        )
-        if n:
-            resultados.append(n)
+    resultados = criar_notificacao_para_grupo(
+        destinatarios,
+        titulo=f'Adicionado à tarefa: {tarefa.titulo[:45]}',
+        tipo='tarefa_atribuida',
+        categoria='tarefa',
+        prioridade='media',
+        mensagem=(
+            f'Você foi adicionado como participante.\n'
+            f'Responsável: {tarefa.responsavel.get_full_name() if tarefa.responsavel else "N/A"}\n'
+            f'Prazo: {tarefa.prazo.strftime("%d/%m/%Y %H:%M") if tarefa.prazo else "Não definido"}'
+        ),
+        url_destino=url,
+        icone='bi-person-plus-fill',
+        duplicar=True,
+    )
 
     # E-mail — usa novo template email_tarefa_participante
-    emails_dest = [
-        u.email for u in novos_participantes
-        if u.email and u != adicionado_por
-    ]
+    emails_dest = [u.email for u in destinatarios if u.email]
     if emails_dest:
         enviar_email(
             assunto=f"Você foi adicionado à tarefa: {tarefa.titulo}",
@@ -1230,7 +1322,6 @@ def notificar_tarefa_recorrente_gerada(tarefa_nova, tarefa_raiz):
 
     url = reverse('tarefas:tarefa_detail', kwargs={'pk': tarefa_nova.pk})
     url_raiz = reverse('tarefas:tarefa_detail', kwargs={'pk': tarefa_raiz.pk})
-    resultados = []
 
     prazo_fmt = (
         tarefa_nova.prazo.strftime("%d/%m/%Y %H:%M")
@@ -1238,24 +1329,21 @@ def notificar_tarefa_recorrente_gerada(tarefa_nova, tarefa_raiz):
     )
     frequencia = tarefa_raiz.get_frequencia_recorrencia_display() if tarefa_raiz.frequencia_recorrencia else 'Recorrente'
 
-    for user in destinatarios:
-        n = criar_notificacao(
-            usuario=user,
-            titulo=f'🔄 Nova ocorrência: {tarefa_nova.titulo[:45]}',
-            tipo='tarefa_atribuida',
-            categoria='tarefa',
-            prioridade='media',
-            mensagem=(
-                f'Uma nova ocorrência da tarefa recorrente "{tarefa_raiz.titulo}" foi gerada.\n'
-                f'Frequência: {frequencia}\n'
-                f'Prazo: {prazo_fmt}'
-            ),
-            url_destino=url,
-            icone='bi-arrow-repeat',
-            duplicar=True,
-        )
-        if n:
-            resultados.append(n)
+    resultados = criar_notificacao_para_grupo(
+        destinatarios,
+        titulo=f'🔄 Nova ocorrência: {tarefa_nova.titulo[:45]}',
+        tipo='tarefa_atribuida',
+        categoria='tarefa',
+        prioridade='media',
+        mensagem=(
+            f'Uma nova ocorrência da tarefa recorrente "{tarefa_raiz.titulo}" foi gerada.\n'
+            f'Frequência: {frequencia}\n'
+            f'Prazo: {prazo_fmt}'
+        ),
+        url_destino=url,
+        icone='bi-arrow-repeat',
+        duplicar=True,
+    )
 
     # E-mail
     emails_dest = [u.email for u in destinatarios if u.email]
@@ -1278,7 +1366,17 @@ def notificar_tarefa_recorrente_gerada(tarefa_nova, tarefa_raiz):
     return resultados
 
 
-def notificar_recorrencia_proxima_fim(tarefa_raiz, dias_restantes):
+def _interessados_fim_recorrencia(tarefa_raiz):
+    """Criador e responsável da tarefa-raiz."""
+    destinatarios = set()
+    if tarefa_raiz.usuario:
+        destinatarios.add(tarefa_raiz.usuario)
+    if tarefa_raiz.responsavel and tarefa_raiz.responsavel != tarefa_raiz.usuario:
+        destinatarios.add(tarefa_raiz.responsavel)
+    return destinatarios
+
+
+def notificar_recorrencia_proxima_fim(tarefa_raiz, dias_restantes, destinatarios=None):
     """
     Notifica criador e responsável que a recorrência está perto do fim.
     Permite que decidam estender ou criar novo fluxo.
@@ -1286,19 +1384,16 @@ def notificar_recorrencia_proxima_fim(tarefa_raiz, dias_restantes):
     Args:
         tarefa_raiz: A tarefa-raiz da recorrência
         dias_restantes: Quantos dias faltam para data_fim_recorrencia
+        destinatarios: Restringe o aviso a estes usuários (envio em lote)
     """
-    destinatarios = set()
-    if tarefa_raiz.usuario:
-        destinatarios.add(tarefa_raiz.usuario)
-    if tarefa_raiz.responsavel and tarefa_raiz.responsavel != tarefa_raiz.usuario:
-        destinatarios.add(tarefa_raiz.responsavel)
+    if destinatarios is None:
+        destinatarios = _interessados_fim_recorrencia(tarefa_raiz)
 
     if not destinatarios:
         return []
 
     url = reverse('tarefas:tarefa_detail', kwargs={'pk': tarefa_raiz.pk})
     url_editar = reverse('tarefas:editar_tarefa', kwargs={'pk': tarefa_raiz.pk})
-    resultados = []
 
     data_fim_fmt = (
         tarefa_raiz.data_fim_recorrencia.strftime("%d/%m/%Y")
@@ -1317,25 +1412,22 @@ def notificar_recorrencia_proxima_fim(tarefa_raiz, dias_restantes):
         prioridade = 'baixa'
         icone = 'bi-calendar-event'
 
-    for user in destinatarios:
-        n = criar_notificacao(
-            usuario=user,
-            titulo=f'⏰ Recorrência termina em {dias_restantes} dias: {tarefa_raiz.titulo[:35]}',
-            tipo='sistema',
-            categoria='tarefa',
-            prioridade=prioridade,
-            mensagem=(
-                f'A recorrência "{tarefa_raiz.titulo}" ({frequencia}) '
-                f'está programada para terminar em {data_fim_fmt}.\n\n'
-                f'Se desejar continuar gerando ocorrências, edite a tarefa '
-                f'e ajuste a data fim ou crie um novo fluxo de recorrência.'
-            ),
-            url_destino=url,
-            icone=icone,
-            duplicar=True,
-        )
-        if n:
-            resultados.append(n)
+    resultados = criar_notificacao_para_grupo(
+        destinatarios,
+        titulo=f'⏰ Recorrência termina em {dias_restantes} dias: {tarefa_raiz.titulo[:35]}',
+        tipo='sistema',
+        categoria='tarefa',
+        prioridade=prioridade,
+        mensagem=(
+            f'A recorrência "{tarefa_raiz.titulo}" ({frequencia}) '
+            f'está programada para terminar em {data_fim_fmt}.\n\n'
+            f'Se desejar continuar gerando ocorrências, edite a tarefa '
+            f'e ajuste a data fim ou crie um novo fluxo de recorrência.'
+        ),
+        url_destino=url,
+        icone=icone,
+        duplicar=True,
+    )
 
     # E-mail — um por destinatário, com nome personalizado
     for user in destinatarios:
@@ -1361,7 +1453,7 @@ def notificar_recorrencia_proxima_fim(tarefa_raiz, dias_restantes):
     return resultados
 
 
-def notificar_lembrete_tarefa_prazo(tarefa, dias_antes):
+def notificar_lembrete_tarefa_prazo(tarefa, dias_antes, destinatarios=None):
     """
     Envia lembrete antes do prazo da tarefa.
     Disparado pela task Celery quando faltam X dias (conforme dias_lembrete).
@@ -1369,13 +1461,14 @@ def notificar_lembrete_tarefa_prazo(tarefa, dias_antes):
     Args:
         tarefa: A tarefa em questão
         dias_antes: Quantos dias antes do prazo o lembrete está sendo enviado
+        destinatarios: Restringe o lembrete a estes usuários (envio em lote)
     """
-    destinatarios = _coletar_interessados_tarefa(tarefa, excluir_usuario=None)
+    if destinatarios is None:
+        destinatarios = _coletar_interessados_tarefa(tarefa, excluir_usuario=None)
     if not destinatarios:
         return []
 
     url = reverse('tarefas:tarefa_detail', kwargs={'pk': tarefa.pk})
-    resultados = []
 
     prazo_fmt = (
         tarefa.prazo.strftime("%d/%m/%Y %H:%M")
@@ -1396,23 +1489,20 @@ def notificar_lembrete_tarefa_prazo(tarefa, dias_antes):
         icone = 'bi-bell'
         urgencia = 'Lembrete'
 
-    for user in destinatarios:
-        n = criar_notificacao(
-            usuario=user,
-            titulo=f'⏰ {urgencia}: {tarefa.titulo[:40]} vence em {dias_antes} dias',
-            tipo='tarefa_lembrete',
-            categoria='tarefa',
-            prioridade=prioridade,
-            mensagem=(
-                f'A tarefa "{tarefa.titulo}" vence em {dias_antes} dia(s).\n'
-                f'Prazo final: {prazo_fmt}'
-            ),
-            url_destino=url,
-            icone=icone,
-            duplicar=True,
-        )
-        if n:
-            resultados.append(n)
+    resultados = criar_notificacao_para_grupo(
+        destinatarios,
+        titulo=f'⏰ {urgencia}: {tarefa.titulo[:40]} vence em {dias_antes} dias',
+        tipo='tarefa_lembrete',
+        categoria='tarefa',
+        prioridade=prioridade,
+        mensagem=(
+            f'A tarefa "{tarefa.titulo}" vence em {dias_antes} dia(s).\n'
+            f'Prazo final: {prazo_fmt}'
+        ),
+        url_destino=url,
+        icone=icone,
+        duplicar=True,
+    )
 
     # E-mail
     emails_dest = [u.email for u in destinatarios if u.email]
@@ -1434,6 +1524,223 @@ def notificar_lembrete_tarefa_prazo(tarefa, dias_antes):
     return resultados
 
 
+# ── Envio em lote (rotinas agendadas) ─────────────────────────
+
+# Itens listados na mensagem de um resumo; o restante vai como "e mais N"
+MAX_ITENS_RESUMO = 10
+
+
+def _agrupar_por_destinatarios(itens, interessados):
+    """
+    Agrupa os itens pelo conjunto exato que cada usuário deve receber.
+
+    Retorna [(destinatarios, itens)]: quem tem os mesmos itens cai no
+    mesmo grupo e recebe uma única notificação (um INSERT em lote).
+    """
+    usuarios = {}
+    por_usuario = {}
+    for indice, item in enumerate(itens):
+        for usuario in interessados(item):
+            usuarios[usuario.pk] = usuario
+            por_usuario.setdefault(usuario.pk, []).append(indice)
+
+    grupos = {}
+    for user_id, indices in por_usuario.items():
+        grupos.setdefault(tuple(indices), []).append(usuarios[user_id])
+
+    return [
+        (destinatarios, [itens[i] for i in indices])
+        for indices, destinatarios in grupos.items()
+    ]
+
+
+def _mensagem_resumo(linhas):
+    mensagem = '\n'.join(f'• {linha}' for linha in linhas[:MAX_ITENS_RESUMO])
+    if len(linhas) > MAX_ITENS_RESUMO:
+        mensagem += f'\n… e mais {len(linhas) - MAX_ITENS_RESUMO}.'
+    return mensagem
+
+
+def _enviar_resumo(destinatarios, notificacao, email):
+    """Notificação única para o grupo + um e-mail de resumo com a lista de itens."""
+    resultados = criar_notificacao_para_grupo(destinatarios, duplicar=True, **notificacao)
+
+    emails_dest = [u.email for u in destinatarios if u.email]
+    if emails_dest:
+        enviar_email(
+            assunto=email['assunto'],
+            template_texto='tarefas/emails/email_resumo_tarefas.txt',
+            template_html='tarefas/emails/email_resumo_tarefas.html',
+            contexto=email,
+            destinatarios=emails_dest,
+        )
+    return resultados
+
+
+def _notificar_grupos(grupos, notificar, rotina):
+    """
+    Chama `notificar(destinatarios, itens)` para cada grupo, cada um na
+    própria transação: a falha de um grupo não impede os seguintes.
+
+    Retorna (grupos notificados, [itens de cada grupo que falhou]).
+    """
+    notificados, falhas = 0, []
+    for destinatarios, itens in grupos:
+        try:
+            with transaction.atomic():
+                notificar(destinatarios, itens)
+        except Exception as e:
+            logger.error(
+                f'[{rotina}] Erro ao notificar {len(destinatarios)} destinatário(s) '
+                f'de {len(itens)} item(ns): {e}', exc_info=True,
+            )
+            falhas.append(itens)
+        else:
+            notificados += 1
+    return notificados, falhas
+
+
+def notificar_lembretes_prazo_em_lote(lembretes):
+    """
+    Lembretes de prazo agrupados por destinatário.
+
+    Args:
+        lembretes: lista de (tarefa, dias_antes); as tarefas devem vir com
+            usuario/responsavel em select_related e participantes em
+            prefetch_related.
+
+    Quem tem uma tarefa só recebe o lembrete de sempre; quem tem várias
+    recebe um resumo. Retorna (grupos notificados, lembretes dos grupos
+    que falharam) — ver `_notificar_grupos`.
+    """
+    grupos = _agrupar_por_destinatarios(
+        lembretes, lambda item: _coletar_interessados_tarefa(item[0]),
+    )
+    return _notificar_grupos(grupos, _notificar_grupo_lembretes, 'Lembretes')
+
+
+def _notificar_grupo_lembretes(destinatarios, itens):
+    """Lembrete (uma tarefa) ou resumo (várias) para um grupo de destinatários."""
+    if len(itens) == 1:
+        tarefa, dias_antes = itens[0]
+        notificar_lembrete_tarefa_prazo(tarefa, dias_antes, destinatarios=destinatarios)
+        return
+
+    itens = sorted(itens, key=lambda item: item[1])
+    menor = itens[0][1]
+    if menor <= 1:
+        prioridade, icone = 'critica', 'bi-alarm-fill'
+    elif menor <= 3:
+        prioridade, icone = 'alta', 'bi-alarm'
+    else:
+        prioridade, icone = 'media', 'bi-bell'
+
+    url = reverse('tarefas:listar_tarefas')
+    titulo = f'⏰ {len(itens)} tarefas com prazo próximo'
+    _enviar_resumo(
+        destinatarios,
+        notificacao={
+            'titulo': titulo,
+            'tipo': 'tarefa_lembrete',
+            'categoria': 'tarefa',
+            'prioridade': prioridade,
+            'mensagem': _mensagem_resumo([
+                f'{tarefa.titulo[:60]} — vence em {dias} dia(s)' for tarefa, dias in itens
+            ]),
+            'url_destino': url,
+            'icone': icone,
+        },
+        email={
+            'assunto': f'[Lembrete] {len(itens)} tarefas com prazo próximo',
+            'titulo': titulo,
+            'introducao': 'As tarefas abaixo estão com o prazo se aproximando.',
+            'itens': [
+                {
+                    'titulo': tarefa.titulo,
+                    'detalhe': (
+                        f'Vence em {dias} dia(s) — '
+                        f'{tarefa.prazo.strftime("%d/%m/%Y %H:%M")}'
+                    ),
+                    'url': reverse('tarefas:tarefa_detail', kwargs={'pk': tarefa.pk}),
+                }
+                for tarefa, dias in itens
+            ],
+            'url_lista': url,
+        },
+    )
+
+
+def notificar_recorrencias_proximas_fim_em_lote(avisos):
+    """
+    Avisos de fim de recorrência agrupados por destinatário.
+
+    Args:
+        avisos: lista de (tarefa_raiz, dias_restantes), com usuario e
+            responsavel em select_related.
+
+    Retorna (grupos notificados, avisos dos grupos que falharam).
+    """
+    grupos = _agrupar_por_destinatarios(
+        avisos, lambda item: _interessados_fim_recorrencia(item[0]),
+    )
+    return _notificar_grupos(grupos, _notificar_grupo_fim_recorrencia, 'Aviso Fim Recorrência')
+
+
+def _notificar_grupo_fim_recorrencia(destinatarios, itens):
+    """Aviso (uma recorrência) ou resumo (várias) para um grupo de destinatários."""
+    if len(itens) == 1:
+        raiz, dias_restantes = itens[0]
+        notificar_recorrencia_proxima_fim(raiz, dias_restantes, destinatarios=destinatarios)
+        return
+
+    itens = sorted(itens, key=lambda item: item[1])
+    menor = itens[0][1]
+    if menor <= 7:
+        prioridade, icone = 'alta', 'bi-exclamation-triangle-fill'
+    elif menor <= 15:
+        prioridade, icone = 'media', 'bi-clock-history'
+    else:
+        prioridade, icone = 'baixa', 'bi-calendar-event'
+
+    url = reverse('tarefas:listar_tarefas')
+    titulo = f'⏰ {len(itens)} recorrências perto do fim'
+    _enviar_resumo(
+        destinatarios,
+        notificacao={
+            'titulo': titulo,
+            'tipo': 'sistema',
+            'categoria': 'tarefa',
+            'prioridade': prioridade,
+            'mensagem': _mensagem_resumo([
+                f'{raiz.titulo[:60]} — termina em {raiz.data_fim_recorrencia.strftime("%d/%m/%Y")}'
+                for raiz, _ in itens
+            ]),
+            'url_destino': url,
+            'icone': icone,
+        },
+        email={
+            'assunto': f'[Tarefa Recorrente] {len(itens)} recorrências terminam em breve',
+            'titulo': titulo,
+            'introducao': (
+                'As recorrências abaixo estão perto do fim. Para continuar gerando '
+                'ocorrências, edite a tarefa e ajuste a data fim.'
+            ),
+            'itens': [
+                {
+                    'titulo': raiz.titulo,
+                    'detalhe': (
+                        f'Termina em {dias} dia(s) — '
+                        f'{raiz.data_fim_recorrencia.strftime("%d/%m/%Y")}'
+                    ),
+                    'url': reverse('tarefas:editar_tarefa', kwargs={'pk': raiz.pk}),
+                }
+                for raiz, dias in itens
+            ],
+            'url_lista': url,
+        },
+    )
+
+
 # Alias para compatibilidade com imports antigos
 enviar_email_tarefa = enviar_email
 enviar_email_pgr = enviar_email
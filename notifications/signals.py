@@ -12,9 +12,13 @@ from django.db.models.signals import post_save, m2m_changed
 from django.dispatch import receiver
 
 from django.db.models.signals import post_delete  # post_save já importado
+from core.global_context import invalidar
+from .context_processors import chave_notificacoes
+from .contador import ajustar_nao_lidas, descartar_nao_lidas
 from .models import Notificacao
 from .realtime import (
     push_notification_count,
+    push_notification_delta,
     push_new_notification,
 )
 
@@ -120,22 +124,27 @@ def registrar_e_notificar_participantes(sender, instance, action, pk_set, **kwar
 @receiver(post_save, sender=Notificacao)
 def push_notificacao_websocket(sender, instance, created, **kwargs):
     """
-    Push em tempo real via WebSocket sempre que uma Notificacao
-    é criada ou atualizada.
-    
-    - Nova notificação → push_new_notification (toast + badge)
-    - Atualização (ex: marcar como lida) → push_notification_count (só badge)
+    Mantém o contador de não lidas e faz o push em tempo real via
+    WebSocket sempre que uma Notificacao é criada ou atualizada.
+
+    - Nova notificação não lida → contador +1 e push_new_notification
+      (toast + delta no badge)
+    - Atualização por save() → o contador é descartado e recontado uma
+      vez; a leitura normal (marcar_como_lida) usa update() e não passa aqui
     """
-    user = instance.usuario
-    if not user:
+    user_id = instance.usuario_id
+    if not user_id:
         return
 
     try:
         if created:
-            push_new_notification(user, instance)
+            if instance.lida:
+                return
+            total = ajustar_nao_lidas(user_id, +1)
+            push_new_notification(user_id, instance, count=total)
         else:
-            # Update (ex: lida=True) → atualiza só o badge
-            push_notification_count(user)
+            descartar_nao_lidas(user_id)
+            push_notification_count(user_id)
     except Exception as e:
         logger.error(
             'Erro no push WebSocket para Notificacao %s: %s',
@@ -145,16 +154,27 @@ def push_notificacao_websocket(sender, instance, created, **kwargs):
 
 @receiver(post_delete, sender=Notificacao)
 def push_notificacao_deletada(sender, instance, **kwargs):
-    """Atualiza o badge quando uma notificação é deletada."""
-    user = getattr(instance, 'usuario', None)
-    if not user:
+    """Atualiza contador e badge quando uma notificação não lida é deletada."""
+    user_id = instance.usuario_id
+    if not user_id or instance.lida:
         return
 
     try:
-        push_notification_count(user)
+        total = ajustar_nao_lidas(user_id, -1)
+        push_notification_delta(user_id, -1, total)
     except Exception as e:
         logger.error(
             'Erro no push após delete de Notificacao %s: %s',
             instance.pk, e, exc_info=True,
         )
 
+
+# =============================================================================
+# SIGNAL: Notificacao alterada → invalida o cache do sino (contexto global)
+# =============================================================================
+
+@receiver(post_save, sender=Notificacao)
+@receiver(post_delete, sender=Notificacao)
+def invalidar_cache_notificacoes(sender, instance, **kwargs):
+    """Descarta contagem/lista cacheadas do dono da notificação."""
+    invalidar(chave_notificacoes(instance.usuario_id))
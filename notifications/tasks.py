@@ -19,4 +19,23 @@ def gerar_notificacoes_task():
     return 'Notificações geradas com sucesso!'
 
 
+@shared_task(name='notifications.reconciliar_contadores')
+def reconciliar_contadores_task():
+    """
+    Corrige contadores de não lidas que divergiram do banco.
+    Agendado pelo CELERY_BEAT_SCHEDULE.
+    """
+    from .contador import reconciliar_contadores
+
+    return reconciliar_contadores()
+
+
+@shared_task(name='notifications.criar_para_grupo')
+def criar_notificacao_para_grupo_task(user_ids, titulo, duplicar=False, **campos):
+    """
+    Fan-out de notificação adiado por criar_notificacao_para_grupo(adiar=True).
+    Retorna quantas notificações foram criadas.
+    """
+    from .services import criar_notificacao_para_grupo
 
+    return len(criar_notificacao_para_grupo(user_ids, titulo, duplicar=duplicar, **campos))
@@ -11,15 +11,27 @@ Executar:
 """
 
 from datetime import timedelta
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
 from notifications.models import Notificacao
 from notifications.context_processors import notification_processor, MAX_DROPDOWN
+from notifications.contador import (
+    cache_nao_lidas,
+    chave_nao_lidas,
+    contar_nao_lidas,
+    reconciliar_contadores,
+    registrar_leitura_todas,
+)
+from notifications.services import criar_notificacao_para_grupo
 
 User = get_user_model()
 
@@ -72,6 +84,8 @@ class NotificacaoTestBase(TestCase):
 
     def setUp(self):
         """Executado antes de CADA teste — cria notificações frescas."""
+        # Contadores de não lidas e lista do sino vivem no cache
+        cache.clear()
         self.client = Client()
         self.client.login(email='test@example.com', password=TEST_PASSWORD)
 
@@ -1185,3 +1199,163 @@ class NotificacaoSegurancaTest(NotificacaoTestBase):
         for notif in response.context['notificacoes']:
             self.assertEqual(notif.usuario_id, self.usuario.pk)
 
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 10. TESTES DO FAN-OUT EM MASSA (criar_notificacao_para_grupo)
+# ═════════════════════════════════════════════════════════════════════════════
+
+class NotificacaoGrupoTest(NotificacaoTestBase):
+    """Uma query de deduplicação + bulk_create, sem custo por destinatário."""
+
+    def _usuarios_extras(self, total, prefixo='grupo'):
+        return [
+            User.objects.create_user(
+                username=f'{prefixo}{i}', email=f'{prefixo}{i}@example.com', password=TEST_PASSWORD,
+            )
+            for i in range(total)
+        ]
+
+    def test_cria_para_todos_sem_duplicar_nao_lidas(self):
+        """Quem já tem a mesma notificação não lida fica de fora."""
+        criadas = criar_notificacao_para_grupo(
+            [self.usuario, self.outro_usuario, self.staff_user, self.usuario.pk],
+            'Notificação alheia', tipo='sistema', categoria='sistema',
+        )
+
+        self.assertEqual({n.usuario_id for n in criadas}, {self.usuario.pk, self.staff_user.pk})
+        self.assertTrue(all(n.pk for n in criadas))
+        self.assertEqual(Notificacao.objects.filter(titulo='Notificação alheia').count(), 3)
+
+    def test_duplicar_true_ignora_existentes(self):
+        criadas = criar_notificacao_para_grupo(
+            User.objects.filter(pk__in=[self.usuario.pk, self.outro_usuario.pk]),
+            'Notificação alheia', duplicar=True,
+        )
+        self.assertEqual(len(criadas), 2)
+
+    def test_queries_nao_dependem_do_numero_de_destinatarios(self):
+        def queries(usuarios):
+            with CaptureQueriesContext(connection) as ctx:
+                criadas = criar_notificacao_para_grupo(usuarios, f'Aviso {len(usuarios)}')
+            self.assertEqual(len(criadas), len(usuarios))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(
+            queries(self._usuarios_extras(3, 'poucos')),
+            queries(self._usuarios_extras(40, 'muitos')),
+        )
+
+    def test_invalida_cache_do_sino(self):
+        request = RequestFactory().get('/')
+        request.user = self.usuario
+        self.assertEqual(notification_processor(request)['notification_count'], 3)
+
+        criar_notificacao_para_grupo([self.usuario], 'Aviso novo')
+
+        self.assertEqual(notification_processor(request)['notification_count'], 4)
+
+    def test_push_em_lote_apos_commit(self):
+        """Um push só, com o total do contador de quem já tinha um."""
+        contar_nao_lidas(self.usuario.pk)
+        with patch('notifications.services.push_new_notifications') as push:
+            with self.captureOnCommitCallbacks(execute=True):
+                criadas = criar_notificacao_para_grupo([self.usuario, self.staff_user], 'Aviso push')
+
+        push.assert_called_once_with(criadas, {self.usuario.pk: 4, self.staff_user.pk: None})
+
+    def test_adiar_roda_na_task_apos_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            retorno = criar_notificacao_para_grupo(
+                [self.usuario, self.staff_user], 'Aviso adiado', adiar=True,
+            )
+            self.assertEqual(retorno, [])
+            self.assertFalse(Notificacao.objects.filter(titulo='Aviso adiado').exists())
+
+        self.assertTrue(callbacks)
+        self.assertEqual(Notificacao.objects.filter(titulo='Aviso adiado').count(), 2)
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# 11. TESTES DO CONTADOR DE NÃO LIDAS (notifications.contador)
+# ═════════════════════════════════════════════════════════════════════════════
+
+class ContadorNaoLidasTest(NotificacaoTestBase):
+    """Badge em O(1): contador no cache ajustado por delta."""
+
+    def _em_cache(self, user=None):
+        user = user or self.usuario
+        return cache_nao_lidas.get(chave_nao_lidas(user.pk))
+
+    def test_leitura_sem_query_depois_do_primeiro_count(self):
+        self.assertEqual(contar_nao_lidas(self.usuario.pk), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(contar_nao_lidas(self.usuario.pk), 3)
+
+    def test_criacao_incrementa_e_envia_delta(self):
+        contar_nao_lidas(self.usuario.pk)
+        with patch('notifications.signals.push_new_notification') as push:
+            nova = Notificacao.objects.create(usuario=self.usuario, titulo='Delta')
+
+        self.assertEqual(self._em_cache(), 4)
+        push.assert_called_once_with(self.usuario.pk, nova, count=4)
+
+    def test_ajuste_sem_chave_nao_cria_contador(self):
+        Notificacao.objects.create(usuario=self.staff_user, titulo='Sem chave')
+        self.assertIsNone(self._em_cache(self.staff_user))
+        self.assertEqual(contar_nao_lidas(self.staff_user.pk), 1)
+
+    def test_marcar_como_lida_conta_uma_vez(self):
+        contar_nao_lidas(self.usuario.pk)
+        copia = Notificacao.objects.get(pk=self.notif_critica.pk)
+
+        self.notif_critica.marcar_como_lida()
+        copia.marcar_como_lida()  # outra aba, instância desatualizada
+
+        self.assertEqual(self._em_cache(), 2)
+        self.assertEqual(self._em_cache(), self._total_nao_lidas())
+
+    def test_delete_e_marcar_todas(self):
+        contar_nao_lidas(self.usuario.pk)
+        self.notif_alta.delete()
+        self.notif_lida.delete()
+        self.assertEqual(self._em_cache(), 2)
+
+        Notificacao.objects.filter(usuario=self.usuario).update(lida=True)
+        registrar_leitura_todas(self.usuario.pk)
+        self.assertEqual(contar_nao_lidas(self.usuario.pk), 0)
+
+    def test_save_generico_recontagem(self):
+        """save() fora de marcar_como_lida descarta o contador e reconta."""
+        contar_nao_lidas(self.usuario.pk)
+        self.notif_media.lida = True
+        self.notif_media.save()
+
+        self.assertEqual(self._em_cache(), 2)
+
+    def test_reconciliacao_corrige_divergencia(self):
+        contar_nao_lidas(self.usuario.pk)
+        contar_nao_lidas(self.outro_usuario.pk)
+        cache_nao_lidas.set(chave_nao_lidas(self.usuario.pk), 42)
+
+        self.assertEqual(reconciliar_contadores(), 1)
+        self.assertEqual(self._em_cache(), 3)
+        self.assertEqual(self._em_cache(self.outro_usuario), 1)
+        self.assertIsNone(self._em_cache(self.staff_user))
+
+    def test_acoes_do_admin_descartam_contador(self):
+        from django.contrib.admin.sites import site
+        from notifications.admin import NotificacaoAdmin
+
+        contar_nao_lidas(self.usuario.pk)
+        contar_nao_lidas(self.outro_usuario.pk)
+        admin = NotificacaoAdmin(Notificacao, site)
+        request = RequestFactory().post('/')
+
+        admin.marcar_como_lida(request, Notificacao.objects.filter(usuario=self.usuario))
+        self.assertIsNone(self._em_cache())
+        self.assertEqual(contar_nao_lidas(self.usuario.pk), 0)
+        self.assertEqual(self._em_cache(self.outro_usuario), 1)
+
+        admin.marcar_como_nao_lida(request, Notificacao.objects.filter(pk=self.notif_critica.pk))
+        self.assertEqual(contar_nao_lidas(self.usuario.pk), 1)
@@ -11,6 +11,7 @@ from django.views.decorators.http import require_POST
 from datetime import datetime
 from django.utils import timezone
 
+from .contador import contar_nao_lidas, registrar_leitura_todas
 from .models import Notificacao
 
 MAX_DROPDOWN = 8
@@ -35,9 +36,7 @@ def notificacao_list(request):
     paginator = Paginator(qs, 30)
     notificacoes = paginator.get_page(request.GET.get('page'))
 
-    nao_lidas_count = Notificacao.objects.filter(
-        usuario=request.user, lida=False,
-    ).count()
+    nao_lidas_count = contar_nao_lidas(request.user.pk)
 
     return render(request, 'notifications/notificacao_list.html', {
         'notificacoes': notificacoes,
@@ -101,6 +100,8 @@ def marcar_todas_como_lidas(request):
         usuario=request.user,
         lida=False,
     ).update(lida=True, data_leitura=timezone.now())
+    # update() não dispara post_save — contador, sino e push manualmente
+    registrar_leitura_todas(request.user.pk)
 
     if _is_ajax(request):
         return JsonResponse({'status': 'ok', 'count': atualizadas})
@@ -111,10 +112,7 @@ def marcar_todas_como_lidas(request):
 def api_contagem(request):
     """Retorna apenas a contagem de notificações não lidas (leve e rápido)."""
     try:
-        total = Notificacao.objects.filter(
-            usuario=request.user,
-            lida=False,
-        ).count()
+        total = contar_nao_lidas(request.user.pk)
     except Exception:
         logger.exception("Erro em api_contagem")
         total = 0
@@ -129,10 +127,7 @@ def api_contagem(request):
 @login_required
 def dropdown_html(request):
     """HTML parcial do dropdown do sino."""
-    total_nao_lidas = Notificacao.objects.filter(
-        usuario=request.user,
-        lida=False,
-    ).count()
+    total_nao_lidas = contar_nao_lidas(request.user.pk)
 
     notificacoes = Notificacao.objects.filter(
         usuario=request.user,
@@ -169,10 +164,7 @@ def api_notificacoes_novas(request):
             'data_criacao': n.data_criacao.isoformat(),
         } for n in notificacoes_qs]
 
-        total_nao_lidas = Notificacao.objects.filter(
-            usuario=request.user,
-            lida=False,
-        ).count()
+        total_nao_lidas = contar_nao_lidas(request.user.pk)
 
         return JsonResponse({
             'novas': novas,
@@ -14,7 +14,7 @@ from .models import (
     CronogramaAcaoPGR,
     RiscoEPIRecomendado, RiscoTreinamentoNecessario
 )
-from pgr_gestao.models import AnexoPGR
+from pgr_gestao.models import AnexoPGR, PDFGeradoPGR
 
 # Ação customizada para o Admin
 @admin.action(description='Marcar planos de ação selecionados como Concluídos')
@@ -289,4 +289,15 @@ class AnexoPGRAdmin(admin.ModelAdmin):
                     'tamanho_formatado', 'incluir_no_pdf', 'criado_em']
     list_filter = ['tipo_anexo', 'incluir_no_pdf', 'criado_em']
     search_fields = ['titulo', 'descricao', 'pgr_documento__codigo_documento']
-    ordering = ['pgr_documento', 'ordem']
\ No newline at end of file
+    ordering = ['pgr_documento', 'ordem']
+
+@admin.register(PDFGeradoPGR)
+class PDFGeradoPGRAdmin(admin.ModelAdmin):
+    list_display = ['pgr_documento', 'status', 'progresso', 'etapa', 'tamanho_bytes',
+                    'solicitado_por', 'criado_em', 'concluido_em']
+    list_filter = ['status', 'criado_em']
+    search_fields = ['pgr_documento__codigo_documento', 'hash_conteudo', 'task_id']
+    readonly_fields = ['pgr_documento', 'hash_conteudo', 'status', 'progresso', 'etapa',
+                       'arquivo', 'tamanho_bytes', 'erro', 'task_id', 'solicitado_por',
+                       'criado_em', 'iniciado_em', 'concluido_em']
+    ordering = ['-criado_em']
@@ -2,8 +2,12 @@
 # pgr_gestao/context_processors.py
 from django.conf import settings
 from django.db.models import Count, Q
+from core.global_context import chave_global, contexto_global, obter_ou_calcular
 from .models import PGRDocumento, RiscoIdentificado, PlanoAcaoPGR
 
+# Invalidado por pgr_gestao.signals (PGRDocumento, RiscoIdentificado, PlanoAcaoPGR)
+CHAVE_PGR_STATS = chave_global('pgr_stats')
+
 def pgr_context(request):
     """
     Context processor para adicionar variáveis relacionadas ao PGR em todos os templates.
@@ -13,23 +17,31 @@ def pgr_context(request):
         'PGR_VERSION': '1.0',
         'pgr_active': True,  # Para verificar se está no módulo PGR
     }
+
+
+def _calcular_pgr_stats():
+    """Estatísticas básicas do PGR (quatro COUNTs nas tabelas inteiras)."""
+    return {
+        'total_documentos_pgr': PGRDocumento.objects.count(),
+        'total_riscos_identificados': RiscoIdentificado.objects.count(),
+        'total_planos_acao': PlanoAcaoPGR.objects.count(),
+        'planos_acao_pendentes': PlanoAcaoPGR.objects.filter(
+            status__in=['pendente', 'em_andamento']
+        ).count(),
+    }
+
+
+@contexto_global
 def pgr_stats(request):
     """
     Context processor que adiciona estatísticas do PGR aos templates.
+    Valores em cache global, invalidados por pgr_gestao.signals.
     """
     if not request.user.is_authenticated:
         return {}
     
     try:
-        # Estatísticas básicas (você pode personalizar conforme seus modelos)
-        stats = {
-            'total_documentos_pgr': PGRDocumento.objects.count(),
-            'total_riscos_identificados': RiscoIdentificado.objects.count(),
-            'total_planos_acao': PlanoAcaoPGR.objects.count(),
-            'planos_acao_pendentes': PlanoAcaoPGR.objects.filter(
-                status__in=['pendente', 'em_andamento']
-            ).count(),
-        }
+        stats = obter_ou_calcular(CHAVE_PGR_STATS, _calcular_pgr_stats)
     except:
         # Em caso de erro (ex: tabelas não criadas ainda), retorna valores padrão
         stats = {
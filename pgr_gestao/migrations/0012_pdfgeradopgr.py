@@ -0,0 +1,45 @@
+# Generated by Django 5.2.17 on 2026-10-17 22:50
+
+import django.core.validators
+import django.db.models.deletion
+import documentos.storage
+import pgr_gestao.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pgr_gestao', '0011_anexopgr_mime_type_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFGeradoPGR',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash_conteudo', models.CharField(max_length=64, verbose_name='Hash do Conteúdo')),
+                ('status', models.CharField(choices=[('pendente', 'Na fila'), ('processando', 'Gerando'), ('concluido', 'Concluído'), ('erro', 'Erro')], db_index=True, default='pendente', max_length=15, verbose_name='Status')),
+                ('progresso', models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(100)], verbose_name='Progresso (%)')),
+                ('etapa', models.CharField(blank=True, max_length=100, verbose_name='Etapa Atual')),
+                ('arquivo', models.FileField(blank=True, storage=documentos.storage.PrivateMediaStorage(), upload_to=pgr_gestao.models._pdf_pgr_upload_path, verbose_name='Arquivo PDF')),
+                ('tamanho_bytes', models.PositiveIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('task_id', models.CharField(blank=True, max_length=255, verbose_name='ID da Task')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Solicitado em')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('pgr_documento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pdfs_gerados', to='pgr_gestao.pgrdocumento', verbose_name='Documento PGR')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pdfs_pgr_solicitados', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'PDF Gerado do PGR',
+                'verbose_name_plural': 'PDFs Gerados do PGR',
+                'db_table': 'pgr_pdf_gerado',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['pgr_documento', 'hash_conteudo', 'status'], name='pgr_pdf_ger_pgr_doc_cf6e77_idx')],
+            },
+        ),
+    ]
@@ -12,6 +12,7 @@ from django.contrib.auth import get_user_model
 from datetime import date, timedelta
 
 from logradouro.constant import ESTADOS_BRASIL
+from core.jobs import JobAssincrono
 from core.managers import FilialManager
 from usuario.models import Filial
 from departamento_pessoal.models import Cargo, Funcionario
@@ -22,10 +23,14 @@ from core.upload import delete_old_file, safe_delete_file
 from core.validators import SecureFileValidator
 from core.mixins import make_upload_path, sanitize_image
 from core.magic_utils import get_mime_type
+from documentos.storage import PrivateMediaStorage
 import os
 
 User = get_user_model()
 
+# PDFs gerados do PGR ficam fora do storage público (Cloudinary)
+private_storage = PrivateMediaStorage()
+
 
 # =============================================================================
 # CHOICES GLOBAIS
@@ -1526,3 +1531,67 @@ class AnexoPGR(models.Model):
     def delete(self, *args, **kwargs):
         safe_delete_file(self, 'arquivo')
         super().delete(*args, **kwargs)
+
+
+# =============================================================================
+# PDF DO PGR — GERAÇÃO ASSÍNCRONA + CACHE POR CONTEÚDO
+# =============================================================================
+
+def _pdf_pgr_upload_path(instance, filename):
+    return f"pgr_pdf/{instance.pgr_documento_id}/{instance.hash_conteudo}.pdf"
+
+
+class PDFGeradoPGR(JobAssincrono):
+    """
+    Job de geração do PDF completo do PGR (Celery) e o arquivo resultante.
+
+    O PDF fica guardado contra o `hash_conteudo` (hash do documento e de
+    todas as linhas relacionadas — ver pgr_gestao.utils.pdf_cache). Enquanto
+    o hash não mudar, o download é servido direto do storage.
+    """
+
+    pgr_documento = models.ForeignKey(
+        'PGRDocumento', on_delete=models.CASCADE,
+        related_name='pdfs_gerados', verbose_name='Documento PGR',
+    )
+    hash_conteudo = models.CharField('Hash do Conteúdo', max_length=64)
+    progresso = models.PositiveSmallIntegerField(
+        'Progresso (%)', default=0,
+        validators=[MaxValueValidator(100)],
+    )
+    etapa = models.CharField('Etapa Atual', max_length=100, blank=True)
+    arquivo = models.FileField(
+        'Arquivo PDF', upload_to=_pdf_pgr_upload_path,
+        storage=private_storage, blank=True,
+    )
+    tamanho_bytes = models.PositiveIntegerField('Tamanho (bytes)', default=0)
+    erro = models.TextField('Erro', blank=True)
+
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='pdfs_pgr_solicitados',
+        verbose_name='Solicitado por',
+    )
+
+    _filial_lookup = 'pgr_documento__filial_id'
+    objects = FilialManager()
+
+    class Meta:
+        db_table = 'pgr_pdf_gerado'
+        verbose_name = 'PDF Gerado do PGR'
+        verbose_name_plural = 'PDFs Gerados do PGR'
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['pgr_documento', 'hash_conteudo', 'status']),
+        ]
+
+    def __str__(self):
+        return f"PDF {self.pgr_documento_id} [{self.hash_conteudo[:8]}] — {self.get_status_display()}"
+
+    @property
+    def disponivel(self):
+        return self.status == self.STATUS_CONCLUIDO and bool(self.arquivo)
+
+    def delete(self, *args, **kwargs):
+        safe_delete_file(self, 'arquivo')
+        super().delete(*args, **kwargs)
@@ -393,6 +393,26 @@ def gerar_codigo_ges_automatico(sender, instance, created, **kwargs):
         instance.save(update_fields=['codigo'])
 
 
+# ========================================
+# CACHE DO CONTEXTO GLOBAL (pgr_stats)
+# ========================================
+
+@receiver(post_save, sender='pgr_gestao.PGRDocumento')
+@receiver(post_delete, sender='pgr_gestao.PGRDocumento')
+@receiver(post_save, sender='pgr_gestao.RiscoIdentificado')
+@receiver(post_delete, sender='pgr_gestao.RiscoIdentificado')
+@receiver(post_save, sender='pgr_gestao.PlanoAcaoPGR')
+@receiver(post_delete, sender='pgr_gestao.PlanoAcaoPGR')
+def invalidar_cache_pgr_stats(sender, instance, **kwargs):
+    """
+    Descarta as estatísticas globais do PGR usadas em todos os templates
+    """
+    from core.global_context import invalidar
+    from pgr_gestao.context_processors import CHAVE_PGR_STATS
+
+    invalidar(CHAVE_PGR_STATS)
+
+
 # ========================================
 # TASK PERIÓDICA (Para usar com Celery/Django-Q)
 # ========================================
@@ -0,0 +1,58 @@
+# pgr_gestao/tasks.py
+import logging
+
+from celery import shared_task
+from django.core.files.base import ContentFile
+
+from core.jobs import assumir, concluir, marcar_erro
+
+from .models import PDFGeradoPGR
+
+logger = logging.getLogger(__name__)
+
+# Fatia do progresso reservada para montar as seções; o resto é o build
+# do ReportLab + mescla dos anexos.
+PROGRESSO_SECOES = 85
+
+
+@shared_task(name="pgr_gestao.gerar_pdf")
+def gerar_pdf_pgr_task(job_id):
+    """Gera o PDF completo do PGR de um PDFGeradoPGR e guarda o arquivo."""
+    from .utils.pdf_cache import limpar_pdfs_antigos
+    from .utils.pdf_generator import gerar_pdf_pgr
+
+    if not assumir(PDFGeradoPGR, job_id, etapa='Iniciando'):
+        logger.info(f"[PGR PDF] Job {job_id} inexistente ou já assumido.")
+        return None
+
+    job = PDFGeradoPGR.objects.select_related('pgr_documento__empresa').get(pk=job_id)
+    documento = job.pgr_documento
+
+    def progresso(feitas, total, etapa):
+        PDFGeradoPGR.objects.filter(pk=job_id).update(
+            progresso=int(feitas * PROGRESSO_SECOES / total),
+            etapa=etapa[:100],
+        )
+
+    try:
+        buffer = gerar_pdf_pgr(documento, progresso=progresso)
+        conteudo = buffer.getvalue()
+
+        job.arquivo.save(f"{job.hash_conteudo}.pdf", ContentFile(conteudo), save=False)
+        job.tamanho_bytes = len(conteudo)
+        job.progresso = 100
+        job.etapa = 'Concluído'
+    except Exception as e:
+        logger.exception(f"[PGR PDF] Erro ao gerar PDF do documento {documento.pk} (job {job_id})")
+        marcar_erro(job, e)
+        return None
+
+    if not concluir(job, ['arquivo', 'tamanho_bytes', 'progresso', 'etapa']):
+        # Encerrado como travado enquanto gerava: o arquivo não é de ninguém
+        logger.warning(f"[PGR PDF] Job {job_id} encerrado antes de concluir; descartando o arquivo.")
+        job.arquivo.delete(save=False)
+        return None
+
+    limpar_pdfs_antigos(documento, manter=job)
+    logger.info(f"[PGR PDF] Documento {documento.pk}: {job.tamanho_bytes} bytes (job {job_id}).")
+    return job.pk
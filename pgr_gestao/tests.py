@@ -1,5 +1,265 @@
-
 """
 Testes para o módulo pgr_gestao
 python manage.py test pgr_gestao
 """
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cliente.models import Cliente
+from gestao_riscos.models import TipoRisco
+from logradouro.models import Logradouro
+from treinamentos.models import TipoCurso
+from usuario.models import Filial
+
+from .models import (
+    AvaliacaoQuantitativa, GESGrupoExposicao, PDFGeradoPGR, PGRDocumento,
+    PGRRevisao, RiscoIdentificado, RiscoTreinamentoNecessario,
+)
+from .tasks import gerar_pdf_pgr_task
+from .utils.pdf_cache import calcular_hash_pgr, solicitar_pdf_pgr
+from .utils.pdf_generator import PGRPDFGenerator
+
+User = get_user_model()
+
+
+class PGRTestBase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial PGR')
+        cls.usuario = User.objects.create_superuser(
+            username='pgr', email='pgr@example.com', password='x',
+            filial_ativa=cls.filial,
+        )
+        logradouro = Logradouro.objects.create(
+            endereco='Rua Teste', numero=1, cep='01001000',
+            bairro='Centro', cidade='São Paulo', estado='SP',
+            filial=cls.filial,
+        )
+        cls.cliente = Cliente.objects.create(
+            razao_social='Cliente PGR LTDA', nome='Cliente PGR',
+            cnpj='11.222.333/0001-81', logradouro=logradouro,
+            data_de_inicio=date.today(), filial=cls.filial,
+        )
+        cls.documento = PGRDocumento.objects.create(
+            empresa=cls.cliente, filial=cls.filial,
+            codigo_documento='PGR-001',
+            data_elaboracao=date.today(),
+            data_vencimento=date.today() + timedelta(days=365),
+        )
+        cls.tipo_risco = TipoRisco.objects.create(
+            categoria='fisico', nome='Ruído', filial=cls.filial,
+        )
+
+    def _risco(self, **kwargs):
+        return RiscoIdentificado.objects.create(
+            pgr_documento=self.documento, tipo_risco=self.tipo_risco,
+            agente='Ruído contínuo', gravidade_g=3, exposicao_e=3,
+            severidade_s='C', probabilidade_p=3, classificacao_risco='moderado',
+            ambiente_trabalho=None, filial=self.filial, **kwargs,
+        )
+
+
+class PDFPGRTestBase(PGRTestBase):
+    """Storage privado apontado para um diretório temporário."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        campo = PDFGeradoPGR._meta.get_field('arquivo')
+        storage = patch.object(campo, 'storage', FileSystemStorage(location=self.media))
+        storage.start()
+        self.addCleanup(storage.stop)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+        gerador = patch(
+            'pgr_gestao.utils.pdf_generator.gerar_pdf_pgr',
+            side_effect=self._gerar_pdf_falso,
+        )
+        self.gerar_pdf = gerador.start()
+        self.addCleanup(gerador.stop)
+
+    @staticmethod
+    def _gerar_pdf_falso(documento, progresso=None):
+        if progresso:
+            progresso(1, 2, 'Capa')
+        return BytesIO(b'%PDF-1.4 falso')
+
+
+class HashConteudoPGRTestCase(PGRTestBase):
+
+    def test_hash_estavel_sem_alteracoes(self):
+        self.assertEqual(calcular_hash_pgr(self.documento), calcular_hash_pgr(self.documento))
+
+    def test_hash_muda_com_novo_risco(self):
+        antes = calcular_hash_pgr(self.documento)
+        self._risco()
+        self.assertNotEqual(antes, calcular_hash_pgr(self.documento))
+
+    def test_hash_muda_com_update_sem_auto_now(self):
+        antes = calcular_hash_pgr(self.documento)
+        PGRDocumento.objects.filter(pk=self.documento.pk).update(objetivo='Novo objetivo')
+        self.assertNotEqual(antes, calcular_hash_pgr(self.documento))
+
+
+class SolicitarPDFPGRTestCase(PDFPGRTestBase):
+
+    def test_gera_uma_vez_e_reaproveita(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = solicitar_pdf_pgr(self.documento, self.usuario)
+
+        job.refresh_from_db()
+        self.assertTrue(job.disponivel)
+        self.assertEqual(job.progresso, 100)
+        self.assertEqual(job.tamanho_bytes, len(b'%PDF-1.4 falso'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            novamente = solicitar_pdf_pgr(self.documento, self.usuario)
+        self.assertEqual(novamente.pk, job.pk)
+        self.assertEqual(self.gerar_pdf.call_count, 1)
+
+    def test_cliques_repetidos_reaproveitam_job_na_fila(self):
+        primeiro = solicitar_pdf_pgr(self.documento, self.usuario)
+        segundo = solicitar_pdf_pgr(self.documento, self.usuario)
+        self.assertEqual(primeiro.pk, segundo.pk)
+        self.assertEqual(PDFGeradoPGR.objects.count(), 1)
+
+    def test_alteracao_gera_novo_pdf_e_limpa_antigo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            antigo = solicitar_pdf_pgr(self.documento, self.usuario)
+        self._risco()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            novo = solicitar_pdf_pgr(self.documento, self.usuario)
+
+        self.assertNotEqual(antigo.pk, novo.pk)
+        self.assertFalse(PDFGeradoPGR.objects.filter(pk=antigo.pk).exists())
+
+    def test_job_travado_nao_bloqueia_nova_geracao(self):
+        for forcar in (False, True):
+            with self.subTest(forcar=forcar):
+                # Worker morreu no meio: o job ficou "processando" para sempre
+                travado = PDFGeradoPGR.objects.create(
+                    pgr_documento=self.documento,
+                    hash_conteudo=calcular_hash_pgr(self.documento),
+                    status=PDFGeradoPGR.STATUS_PROCESSANDO,
+                    iniciado_em=timezone.now() - PDFGeradoPGR.TEMPO_LIMITE - timedelta(minutes=1),
+                )
+
+                with self.captureOnCommitCallbacks() as callbacks:
+                    job = solicitar_pdf_pgr(self.documento, self.usuario, forcar=forcar)
+
+                self.assertNotEqual(job.pk, travado.pk)
+                travado.refresh_from_db()
+                self.assertEqual(travado.status, PDFGeradoPGR.STATUS_ERRO)
+                self.assertTrue(travado.erro)
+
+                for callback in callbacks:
+                    callback()
+                job.refresh_from_db()
+                self.assertTrue(job.disponivel)
+
+    def test_worker_atrasado_nao_conclui_job_encerrado(self):
+        job = PDFGeradoPGR.objects.create(pgr_documento=self.documento, hash_conteudo='x' * 64)
+
+        def encerrado_no_meio(documento, progresso=None):
+            PDFGeradoPGR.objects.filter(pk=job.pk).update(status=PDFGeradoPGR.STATUS_ERRO)
+            return BytesIO(b'%PDF-1.4 falso')
+
+        self.gerar_pdf.side_effect = encerrado_no_meio
+        self.assertIsNone(gerar_pdf_pgr_task(job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PDFGeradoPGR.STATUS_ERRO)
+        self.assertFalse(job.arquivo)
+        self.assertEqual([nome for _, _, nomes in os.walk(self.media) for nome in nomes], [])
+
+    def test_erro_na_geracao_fica_registrado(self):
+        self.gerar_pdf.side_effect = RuntimeError('falhou')
+        job = PDFGeradoPGR.objects.create(pgr_documento=self.documento, hash_conteudo='x' * 64)
+
+        gerar_pdf_pgr_task(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PDFGeradoPGR.STATUS_ERRO)
+        self.assertIn('falhou', job.erro)
+
+
+class SnapshotPDFPGRTestCase(PGRTestBase):
+    """O PDF carrega o grafo do PGR num número fixo de queries."""
+
+    # Queries do PGRSnapshot + gerar_pdf() inteiro, independente do tamanho
+    ORCAMENTO_QUERIES = 15
+
+    def setUp(self):
+        self.cursos = [
+            TipoCurso.objects.create(
+                nome=f'NR-{n:02d}', modalidade='P', area='SEG',
+                referencia_normativa=f'NR-{n:02d}', filial=self.filial,
+            )
+            for n in (6, 10, 35)
+        ]
+        PGRRevisao.objects.create(
+            pgr_documento=self.documento, numero_revisao=0,
+            descricao_revisao='Emissão inicial', data_realizacao=date.today(),
+            filial=self.filial,
+        )
+
+    def _popular(self, total_ges, riscos_por_ges, prefixo='GES'):
+        grupos = GESGrupoExposicao.objects.bulk_create([
+            GESGrupoExposicao(
+                pgr_documento=self.documento, codigo=f'{prefixo}-{i:03d}',
+                nome=f'Grupo {i}', descricao_atividades='Atividades',
+                numero_trabalhadores=3, filial=self.filial,
+            )
+            for i in range(total_ges)
+        ])
+        riscos = RiscoIdentificado.objects.bulk_create([
+            RiscoIdentificado(
+                pgr_documento=self.documento, ges=ges, tipo_risco=self.tipo_risco,
+                agente=f'Agente {i}', gravidade_g=3, exposicao_e=3,
+                severidade_s='C', probabilidade_p=3, classificacao_risco='moderado',
+                ambiente_trabalho=None, filial=self.filial,
+            )
+            for ges in grupos for i in range(riscos_por_ges)
+        ])
+        AvaliacaoQuantitativa.objects.bulk_create([
+            AvaliacaoQuantitativa(
+                risco_identificado=risco, tipo_avaliacao='ruido',
+                data_avaliacao=date.today(), resultado_medido=85, unidade_medida='dB(A)',
+            )
+            for risco in riscos
+        ])
+        RiscoTreinamentoNecessario.objects.bulk_create([
+            RiscoTreinamentoNecessario(risco_identificado=risco, tipo_curso=curso)
+            for risco in riscos for curso in self.cursos
+        ])
+
+    def _queries_do_pdf(self):
+        with CaptureQueriesContext(connection) as ctx:
+            buffer = PGRPDFGenerator(self.documento).gerar_pdf()
+        self.assertTrue(buffer.getvalue().startswith(b'%PDF'))
+        return len(ctx.captured_queries)
+
+    def test_pgr_com_500_riscos_dentro_do_orcamento(self):
+        self._popular(total_ges=10, riscos_por_ges=50)
+        self.assertEqual(self.documento.riscos_identificados.count(), 500)
+
+        self.assertLessEqual(self._queries_do_pdf(), self.ORCAMENTO_QUERIES)
+
+    def test_queries_nao_crescem_com_o_tamanho(self):
+        self._popular(total_ges=2, riscos_por_ges=2)
+        pequeno = self._queries_do_pdf()
+
+        self._popular(total_ges=5, riscos_por_ges=20, prefixo='GRD')
+        self.assertEqual(self._queries_do_pdf(), pequeno)
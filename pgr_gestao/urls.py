@@ -126,6 +126,8 @@ urlpatterns = [
     # EXPORTAÇÕES
     # ========================================
     path('documentos/<int:pk>/pdf/', views.gerar_relatorio_completo_pdf, name='relatorio_completo_pdf'),
+    path('documentos/<int:pk>/pdf/<int:job_id>/status/', views.status_relatorio_completo_pdf, name='relatorio_completo_pdf_status'),
+    path('documentos/<int:pk>/pdf/<int:job_id>/download/', views.download_relatorio_completo_pdf, name='relatorio_completo_pdf_download'),
     path('documentos/<int:pk>/excel/', views.exportar_inventario_riscos_excel, name='exportar_inventario_excel'),
     path('documentos/<int:pk>/cronograma-excel/', views.exportar_cronograma_acoes, name='exportar_cronograma_acoes'),
     #path('documentos/<int:pk>/cronograma-excel-v2/', views.exportar_cronograma_excel, name='exportar_cronograma_excel'),
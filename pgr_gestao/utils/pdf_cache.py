@@ -0,0 +1,173 @@
+"""
+Cache por conteúdo do PDF completo do PGR.
+
+Gerar o PDF de um PGR grande leva de segundos a minutos (centenas de
+riscos, tabelas, anexos mesclados). Em vez de gerar na request:
+
+    1. `calcular_hash_pgr()` resume o documento e TODAS as linhas que
+       entram no PDF num SHA-256;
+    2. se já existe um PDFGeradoPGR concluído com esse hash, o arquivo
+       guardado é servido direto;
+    3. senão `solicitar_pdf_pgr()` cria (ou reaproveita) um job e enfileira
+       a task Celery `pgr_gestao.gerar_pdf` — a tela acompanha o progresso.
+
+Qualquer alteração nos dados muda o hash, então não há invalidação manual.
+"""
+import hashlib
+import logging
+
+from django.db import transaction
+
+from cliente.models import Cliente
+from core.jobs import encerrar_travados, enfileirar_apos_commit
+from gestao_riscos.models import TipoRisco
+from pgr_gestao.models import (
+    AmbienteTrabalho, AnexoPGR, AvaliacaoQuantitativa, CronogramaAcaoPGR,
+    Empresa, GESGrupoExposicao, LocalPrestacaoServico, MedidaControle,
+    PDFGeradoPGR, PGRDocumento, PGRDocumentoResponsavel, PGRRevisao,
+    PGRSecaoTexto, PGRSecaoTextoPadrao, PlanoAcaoPGR, ProfissionalResponsavel,
+    RiscoEPIRecomendado, RiscoIdentificado, RiscoMedidaControle,
+    RiscoTreinamentoNecessario,
+)
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando o layout do PDF mudar — invalida todos os PDFs guardados
+GERADOR_VERSAO = 1
+
+
+# =============================================================================
+# HASH DO CONTEÚDO
+# =============================================================================
+
+def _fontes_conteudo(documento):
+    """
+    (rótulo, queryset) de tudo que o PGRPDFGenerator lê do banco.
+
+    As linhas são comparadas por TODOS os campos concretos (não só
+    `atualizado_em`), porque `QuerySet.update()` não dispara o auto_now.
+    """
+    do_documento = {'pgr_documento': documento}
+    dos_riscos = {'risco_identificado__pgr_documento': documento}
+
+    return [
+        ('documento', PGRDocumento.objects.filter(pk=documento.pk)),
+        ('cliente', Cliente.objects.filter(pk=documento.empresa_id)),
+        ('local_prestacao', LocalPrestacaoServico.objects.filter(pk=documento.local_prestacao_id)),
+        ('empresa_pgr', Empresa.objects.filter(cliente_id=documento.empresa_id)),
+        ('empresa_contratada', Empresa.objects.filter(
+            filial_id=documento.filial_id, tipo_empresa__in=['contratada', 'prestadora'],
+        )),
+        ('responsaveis', PGRDocumentoResponsavel.objects.filter(**do_documento)),
+        ('profissionais', ProfissionalResponsavel.objects.filter(
+            documento_info__pgr_documento=documento,
+        )),
+        ('revisoes', PGRRevisao.objects.filter(**do_documento)),
+        ('secoes', PGRSecaoTexto.objects.filter(**do_documento)),
+        ('textos_padrao', PGRSecaoTextoPadrao.objects.all()),
+        ('ges', GESGrupoExposicao.objects.filter(**do_documento)),
+        ('ambientes', AmbienteTrabalho.objects.filter(grupos_exposicao__pgr_documento=documento)),
+        ('riscos', RiscoIdentificado.objects.filter(**do_documento)),
+        ('locais_riscos', LocalPrestacaoServico.objects.filter(riscos__pgr_documento=documento)),
+        ('tipos_risco', TipoRisco.objects.filter(riscos_pgr__pgr_documento=documento)),
+        ('avaliacoes', AvaliacaoQuantitativa.objects.filter(**dos_riscos)),
+        ('medidas', RiscoMedidaControle.objects.filter(**dos_riscos)),
+        ('catalogo_medidas', MedidaControle.objects.filter(
+            riscos__risco_identificado__pgr_documento=documento,
+        )),
+        ('planos', PlanoAcaoPGR.objects.filter(**dos_riscos)),
+        ('epis', RiscoEPIRecomendado.objects.filter(**dos_riscos)),
+        ('treinamentos', RiscoTreinamentoNecessario.objects.filter(**dos_riscos)),
+        ('cronograma', CronogramaAcaoPGR.objects.filter(**do_documento)),
+        ('anexos', AnexoPGR.objects.filter(**do_documento)),
+    ]
+
+
+def calcular_hash_pgr(documento):
+    """
+    SHA-256 do conteúdo que compõe o PDF do PGR.
+
+    Uma query por fonte, lendo apenas tuplas (sem instanciar models).
+    """
+    h = hashlib.sha256(f'pgr-pdf:v{GERADOR_VERSAO}'.encode())
+    for rotulo, queryset in _fontes_conteudo(documento):
+        campos = [f.attname for f in queryset.model._meta.concrete_fields]
+        h.update(f'|{rotulo}|'.encode())
+        for linha in queryset.order_by('pk').distinct().values_list(*campos):
+            h.update(repr(linha).encode())
+    return h.hexdigest()
+
+
+# =============================================================================
+# JOBS
+# =============================================================================
+
+def pdf_pronto(documento, hash_conteudo):
+    """PDFGeradoPGR concluído para este conteúdo, se existir."""
+    return (
+        PDFGeradoPGR.objects
+        .filter(
+            pgr_documento=documento,
+            hash_conteudo=hash_conteudo,
+            status=PDFGeradoPGR.STATUS_CONCLUIDO,
+        )
+        .exclude(arquivo='')
+        .order_by('-concluido_em')
+        .first()
+    )
+
+
+def solicitar_pdf_pgr(documento, usuario=None, forcar=False):
+    """
+    Retorna o job do PDF do conteúdo atual do documento.
+
+    - já gerado (e `forcar` falso) → o job concluído;
+    - já na fila/gerando → o mesmo job (cliques repetidos não duplicam);
+    - senão → cria o job e enfileira a task após o commit.
+
+    Jobs travados (worker perdido) são encerrados antes da busca, então
+    nunca bloqueiam uma nova geração.
+    """
+    from pgr_gestao.tasks import gerar_pdf_pgr_task
+
+    hash_conteudo = calcular_hash_pgr(documento)
+
+    if not forcar:
+        pronto = pdf_pronto(documento, hash_conteudo)
+        if pronto:
+            return pronto
+
+    with transaction.atomic():
+        # Trava o documento para serializar solicitações simultâneas
+        PGRDocumento.objects.select_for_update().filter(pk=documento.pk).exists()
+
+        ativos = PDFGeradoPGR.objects.filter(
+            pgr_documento=documento,
+            status__in=PDFGeradoPGR.STATUS_ATIVOS,
+        )
+        encerrar_travados(ativos)
+
+        ativo = ativos.filter(hash_conteudo=hash_conteudo).first()
+        if ativo:
+            return ativo
+
+        job = PDFGeradoPGR.objects.create(
+            pgr_documento=documento,
+            hash_conteudo=hash_conteudo,
+            solicitado_por=usuario if getattr(usuario, 'is_authenticated', False) else None,
+        )
+        enfileirar_apos_commit(job, gerar_pdf_pgr_task)
+
+    return job
+
+
+def limpar_pdfs_antigos(documento, manter):
+    """Remove os PDFs concluídos do documento exceto `manter` (arquivo + linha)."""
+    antigos = (
+        PDFGeradoPGR.objects
+        .filter(pgr_documento=documento)
+        .exclude(pk=manter.pk)
+        .exclude(status__in=PDFGeradoPGR.STATUS_ATIVOS)
+    )
+    for antigo in antigos:
+        antigo.delete()
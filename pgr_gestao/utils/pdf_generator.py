@@ -21,9 +21,8 @@ from reportlab.platypus import (
 )
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
-from pgr_gestao.services import inicializar_secoes_pgr, get_texto_secao, get_titulo_secao
+from pgr_gestao.utils.pdf_snapshot import PGRSnapshot
 from pypdf import PdfReader, PdfWriter
-from pgr_gestao.models import AnexoPGR
 import os
 
 
@@ -220,46 +219,18 @@ class PGRPDFGenerator:
     Classe para gerar PDF do PGR conforme modelo oficial
     """
 
-    def __init__(self, pgr_documento):
-        self.pgr = pgr_documento
-        self.cliente = pgr_documento.empresa
-        self.local_prestacao = pgr_documento.local_prestacao
+    def __init__(self, pgr_documento, snapshot=None):
+        # Todos os dados do documento são carregados ANTES da montagem
+        # (número fixo de queries) — as seções só leem de self.dados.
+        self.dados = snapshot or PGRSnapshot(pgr_documento)
+        self.pgr = self.dados.documento
+        self.cliente = self.pgr.empresa
+        self.local_prestacao = self.pgr.local_prestacao
         self.width, self.height = A4
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
-        self.empresa_pgr = self._get_empresa_pgr()
-        self.empresa_contratada = self._get_empresa_contratada()
-
-    # =================================================================
-    # INICIALIZAÇÃO
-    # =================================================================
-
-    def _get_empresa_pgr(self):
-        """Busca o objeto Empresa PGR vinculado ao Cliente, se existir"""
-        try:
-            from pgr_gestao.models import Empresa
-            return Empresa.objects.filter(
-                cliente=self.cliente,
-                ativo=True
-            ).first()
-        except Exception:
-            return None
-
-    def _get_empresa_contratada(self):
-        """
-        Busca a empresa CONTRATADA (prestadora de serviços).
-        No modelo oficial, é ela que aparece como 'EMPRESA' na capa.
-        """
-        try:
-            from pgr_gestao.models import Empresa
-            contratada = Empresa.objects.filter(
-                filial=self.pgr.filial,
-                tipo_empresa__in=['contratada', 'prestadora'],
-                ativo=True
-            ).first()
-            return contratada
-        except Exception:
-            return None
+        self.empresa_pgr = self.dados.empresa_pgr
+        self.empresa_contratada = self.dados.empresa_contratada
 
     def _setup_custom_styles(self):
         """Configura estilos customizados para o documento"""
@@ -647,16 +618,12 @@ class PGRPDFGenerator:
             story.append(Spacer(1, 0.5 * cm))
 
         # RESPONSÁVEIS PELA ELABORAÇÃO DO PGR
-        responsavel_info_qs = self.pgr.responsavel_info.select_related(
-            'profissional'
-        ).all()
-
-        if responsavel_info_qs.exists():
+        if self.dados.responsaveis:
             story.append(Paragraph(
                 "RESPONSÁVEIS PELA ELABORAÇÃO DO PGR", self.styles['TituloSecao']
             ))
 
-            for resp_info in responsavel_info_qs:
+            for resp_info in self.dados.responsaveis:
                 prof = resp_info.profissional
                 if prof:
                     registro = ''
@@ -702,9 +669,8 @@ class PGRPDFGenerator:
             Paragraph('<b>REALIZADA</b>', self.styles['TabelaTitulo'])
         ]]
 
-        revisoes = self.pgr.revisoes.all().order_by('numero_revisao')
-        if revisoes.exists():
-            for revisao in revisoes:
+        if self.dados.revisoes:
+            for revisao in self.dados.revisoes:
                 dados_revisao.append([
                     Paragraph(
                         f"{revisao.numero_revisao:02d}",
@@ -793,31 +759,31 @@ class PGRPDFGenerator:
         nome_empresa = self._get_nome_empresa()
         story = []
 
-        titulo = get_titulo_secao(self.pgr, 'documento_base') or '2. DOCUMENTO BASE'
+        titulo = self.dados.titulo_secao('documento_base') or '2. DOCUMENTO BASE'
         story.append(Paragraph(titulo, self.styles['TituloSecao']))
         story.append(Paragraph(
             "PGR – PROGRAMA DE GERENCIAMENTO DE RISCOS",
             self.styles['SubtituloCapa']
         ))
 
-        texto = get_texto_secao(self.pgr, 'documento_base', nome_empresa)
+        texto = self.dados.texto_secao('documento_base', nome_empresa)
         if texto:
             story.extend(self._texto_para_paragrafos(texto))
 
         # METAS
-        texto_metas = get_texto_secao(self.pgr, 'documento_base_metas', nome_empresa)
+        texto_metas = self.dados.texto_secao('documento_base_metas', nome_empresa)
         if texto_metas:
-            titulo_metas = get_titulo_secao(self.pgr, 'documento_base_metas') or 'METAS'
+            titulo_metas = self.dados.titulo_secao('documento_base_metas') or 'METAS'
             story.append(Paragraph(titulo_metas, self.styles['TituloSecao']))
             story.extend(self._texto_para_paragrafos(texto_metas))
 
         # OBJETIVO GERAL
         texto_objetivo = (
             self.pgr.objetivo
-            or get_texto_secao(self.pgr, 'documento_base_objetivo', nome_empresa)
+            or self.dados.texto_secao('documento_base_objetivo', nome_empresa)
         )
         if texto_objetivo:
-            titulo_obj = get_titulo_secao(self.pgr, 'documento_base_objetivo') or 'OBJETIVO GERAL'
+            titulo_obj = self.dados.titulo_secao('documento_base_objetivo') or 'OBJETIVO GERAL'
             story.append(Paragraph(titulo_obj, self.styles['TituloSecao']))
             story.extend(self._texto_para_paragrafos(texto_objetivo))
 
@@ -833,10 +799,10 @@ class PGRPDFGenerator:
         nome_empresa = self._get_nome_empresa()
         story = []
 
-        titulo = get_titulo_secao(self.pgr, 'definicoes') or '3. DEFINIÇÕES'
+        titulo = self.dados.titulo_secao('definicoes') or '3. DEFINIÇÕES'
         story.append(Paragraph(titulo, self.styles['TituloSecao']))
 
-        texto = get_texto_secao(self.pgr, 'definicoes', nome_empresa)
+        texto = self.dados.texto_secao('definicoes', nome_empresa)
         if texto:
             blocos = texto.split('\n\n')
             for bloco in blocos:
@@ -888,11 +854,11 @@ class PGRPDFGenerator:
         ]
 
         for sub in sub_secoes:
-            texto = get_texto_secao(self.pgr, sub, nome_empresa)
+            texto = self.dados.texto_secao(sub, nome_empresa)
             if texto is None:
                 continue
             if texto:
-                titulo = get_titulo_secao(self.pgr, sub)
+                titulo = self.dados.titulo_secao(sub)
                 if titulo:
                     story.append(Paragraph(titulo, self.styles['TituloSecao']))
                 story.extend(self._texto_para_paragrafos(texto))
@@ -927,11 +893,11 @@ class PGRPDFGenerator:
         ]
 
         for sub in sub_secoes:
-            texto = get_texto_secao(self.pgr, sub, nome_empresa)
+            texto = self.dados.texto_secao(sub, nome_empresa)
             if texto is None:
                 continue
             if texto:
-                titulo = get_titulo_secao(self.pgr, sub)
+                titulo = self.dados.titulo_secao(sub)
                 if titulo:
                     story.append(Paragraph(
                         f"<b>{titulo}</b>", self.styles['Normal']
@@ -956,14 +922,14 @@ class PGRPDFGenerator:
         story.append(Paragraph("6. DIRETRIZES", self.styles['TituloSecao']))
 
         # Tenta buscar do banco primeiro a seção principal
-        texto_dir = get_texto_secao(self.pgr, 'diretrizes', nome_empresa)
+        texto_dir = self.dados.texto_secao('diretrizes', nome_empresa)
         if texto_dir:
             story.extend(self._texto_para_paragrafos(texto_dir))
 
         # Sub-seção: Estratégia (Direção, Colaboradores, Recursos)
-        texto_est = get_texto_secao(self.pgr, 'diretrizes_estrategia', nome_empresa)
+        texto_est = self.dados.texto_secao('diretrizes_estrategia', nome_empresa)
         if texto_est:
-            titulo_est = get_titulo_secao(self.pgr, 'diretrizes_estrategia') or 'ESTRATÉGIA'
+            titulo_est = self.dados.titulo_secao('diretrizes_estrategia') or 'ESTRATÉGIA'
             story.append(Paragraph(f"<b>{titulo_est}</b>", self.styles['Normal']))
             story.append(Spacer(1, 0.1 * cm))
 
@@ -1022,13 +988,13 @@ class PGRPDFGenerator:
         story = []
 
         titulo = (
-            get_titulo_secao(self.pgr, 'desenvolvimento')
+            self.dados.titulo_secao('desenvolvimento')
             or '7. DESENVOLVIMENTO DO PGR'
         )
         story.append(Paragraph(titulo, self.styles['TituloSecao']))
         story.append(Paragraph("<b>ETAPAS</b>", self.styles['Normal']))
 
-        texto = get_texto_secao(self.pgr, 'desenvolvimento', nome_empresa)
+        texto = self.dados.texto_secao('desenvolvimento', nome_empresa)
         if texto:
             story.extend(self._texto_para_paragrafos(texto))
 
@@ -1051,7 +1017,7 @@ class PGRPDFGenerator:
 
         texto_intro = (
             self.pgr.metodologia_avaliacao
-            or get_texto_secao(self.pgr, 'metodologia_avaliacao', nome_empresa)
+            or self.dados.texto_secao('metodologia_avaliacao', nome_empresa)
         )
         if texto_intro:
             story.extend(self._texto_para_paragrafos(texto_intro))
@@ -1067,11 +1033,11 @@ class PGRPDFGenerator:
         ]
 
         for agente in agentes:
-            texto = get_texto_secao(self.pgr, agente, nome_empresa)
+            texto = self.dados.texto_secao(agente, nome_empresa)
             if texto is None:
                 continue
             if texto:
-                titulo = get_titulo_secao(self.pgr, agente)
+                titulo = self.dados.titulo_secao(agente)
                 if titulo:
                     story.append(Paragraph(
                         f"<b>{titulo}</b>", self.styles['Normal']
@@ -1083,351 +1049,6 @@ class PGRPDFGenerator:
         return story
 
 
-    # =================================================================
-    # 9. INVENTÁRIO DE RISCOS
-    # =================================================================
-
-    def _criar_inventario_riscos(self):
-        """Cria o inventário de riscos conforme PDF modelo oficial (seção 16)"""
-        story = []
-        story.append(Paragraph(
-            "16. LEVANTAMENTO DOS RISCOS",
-            self.styles['TituloSecao']
-        ))
-        story.append(Paragraph(
-            "RISCOS AMBIENTAIS E OCUPACIONAIS", self.styles['SubtituloCapa']
-        ))
-        story.append(Spacer(1, 0.5 * cm))
-
-        grupos_ges = self.pgr.grupos_exposicao.filter(
-            ativo=True
-        ).order_by('codigo')
-
-        if not grupos_ges.exists():
-            story.append(Paragraph(
-                "Nenhum Grupo de Exposição Similar (GES) cadastrado.",
-                self.styles['Normal']
-            ))
-            story.append(PageBreak())
-            return story
-
-        for ges in grupos_ges:
-            local_nome = (
-                self.local_prestacao.razao_social
-                if self.local_prestacao else 'N/A'
-            )
-            dept_nome = (
-                ges.ambiente_trabalho.nome
-                if ges.ambiente_trabalho else 'N/A'
-            )
-
-            info_data = [
-                ['LOCAL:', local_nome],
-                ['DEPARTAMENTO:', dept_nome],
-            ]
-
-            if (ges.ambiente_trabalho
-                    and ges.ambiente_trabalho.caracteristicas):
-                info_data.append([
-                    'DESCRIÇÃO DO\nAMBIENTE DE TRABALHO:',
-                    ges.ambiente_trabalho.caracteristicas
-                ])
-
-            cargo_info = ges.cargo.nome if ges.cargo else 'N/A'
-            num_trab = ges.numero_trabalhadores or '0'
-            info_data.append([
-                'CARGO/FUNÇÃO\nANALISADA:',
-                f"{num_trab} – {cargo_info}"
-            ])
-            info_data.append([
-                'JORNADA DE TRABALHO:',
-                ges.jornada_trabalho or '44 horas semanais'
-            ])
-            info_data.append([
-                'HORÁRIO DE TRABALHO:',
-                ges.horario_trabalho or 'N/A'
-            ])
-            info_data.append([
-                'DESCRIÇÃO DAS\nATIVIDADES:',
-                ges.descricao_atividades or 'N/A'
-            ])
-
-            table_info = Table(info_data, colWidths=[4.5 * cm, 12 * cm])
-            table_info.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('BACKGROUND', (0, 0), (0, -1),
-                 colors.Color(0.93, 0.93, 0.93)),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ]))
-            story.append(table_info)
-            story.append(Spacer(1, 0.4 * cm))
-
-            story.append(Paragraph(
-                "<b>ANTECIPAÇÃO E RECONHECIMENTO DOS RISCOS E "
-                "AVALIAÇÃO DOS AGENTES</b>",
-                self.styles['Normal']
-            ))
-            story.append(Spacer(1, 0.2 * cm))
-
-            riscos = ges.riscos.select_related(
-                'tipo_risco'
-            ).order_by('tipo_risco__categoria', 'agente')
-
-            if riscos.exists():
-                header_row = [
-                    Paragraph('<b>RISCO</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>AGENTE</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>FONTE<br/>GERADORA</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>PERFIL DA<br/>EXPOSIÇÃO</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>MEIO DE<br/>PROPAGAÇÃO</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>POSSÍVEIS<br/>EFEITOS<br/>À SAÚDE</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>GRAVIDADE</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>EXPOSIÇÃO</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>SEVERIDADE</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>PROBABILIDADE</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>CLASSIFICAÇÃO<br/>DO RISCO</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>MÉTODO<br/>UTILIZADO</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>CONTROLE<br/>DO RISCO</b>', self.styles['TabelaTitulo']),
-                ]
-                dados_riscos = [header_row]
-
-                for risco in riscos:
-                    perfil_display = risco.get_perfil_exposicao_display()
-                    if ' - ' in perfil_display:
-                        perfil_display = perfil_display.split(' - ')[0]
-
-                    metodo = (
-                        risco.get_metodo_avaliacao_display()
-                        if hasattr(risco, 'get_metodo_avaliacao_display')
-                        else 'Qualitativo'
-                    )
-                    
-
-                    dados_riscos.append([
-                        Paragraph(
-                            risco.tipo_risco.get_categoria_display().upper(),
-                            self.styles['TabelaTexto']
-                        ),
-                        Paragraph(
-                            risco.agente or '-', self.styles['TabelaTexto']
-                        ),
-                        Paragraph(
-                            risco.fonte_geradora or '-',
-                            self.styles['TabelaTexto']
-                        ),
-                        Paragraph(
-                            perfil_display, self.styles['TabelaTexto']
-                        ),
-                        Paragraph(
-                            risco.meio_propagacao or '-',
-                            self.styles['TabelaTexto']
-                        ),
-                        Paragraph(
-                            risco.possiveis_efeitos_saude or '-',
-                            self.styles['TabelaTexto']
-                        ),
-                        Paragraph(
-                            str(risco.gravidade_g),
-                            self.styles['TabelaTextoCentro']
-                        ),
-                        Paragraph(
-                            str(risco.exposicao_e),
-                            self.styles['TabelaTextoCentro']
-                        ),
-                        Paragraph(
-                            str(risco.severidade_s),
-                            self.styles['TabelaTextoCentro']
-                        ),
-                        Paragraph(
-                            str(risco.probabilidade_p),
-                            self.styles['TabelaTextoCentro']
-                        ),
-                        Paragraph(
-                            risco.get_classificacao_risco_display(),
-                            self.styles['TabelaTexto']
-                        ),
-                        Paragraph(metodo, self.styles['TabelaTexto']),
-                        Paragraph(
-                            risco.medidas_controle_existentes or '-',
-                            self.styles['TabelaTexto']
-                        ),
-                    ])
-
-                col_widths = [
-                    1.1 * cm, 1.5 * cm, 1.5 * cm, 1.2 * cm, 1.1 * cm,
-                    1.8 * cm, 0.9 * cm, 0.9 * cm, 0.9 * cm, 0.9 * cm,
-                    1.3 * cm, 1.1 * cm, 2.4 * cm,
-                ]
-
-                table_riscos = Table(
-                    dados_riscos, colWidths=col_widths, repeatRows=1
-                )
-                table_riscos.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0),
-                     colors.HexColor('#003366')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                    ('FONTSIZE', (0, 0), (-1, -1), 6),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1),
-                     [colors.white, colors.Color(0.95, 0.95, 0.95)]),
-                    ('TOPPADDING', (0, 0), (-1, -1), 3),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                ]))
-                story.append(table_riscos)
-            else:
-                story.append(Paragraph(
-                    "<i>Nenhum risco identificado para este GES.</i>",
-                    self.styles['Normal']
-                ))
-
-            story.append(Spacer(1, 0.4 * cm))
-
-            # ═════════════════════════════════════════════════════
-            # AVALIAÇÕES QUANTITATIVAS (tabela formatada)
-            # ═════════════════════════════════════════════════════
-            avaliacoes = []
-            for risco in riscos:
-                for av in risco.avaliacoes_quantitativas.all():
-                    avaliacoes.append(av)
-
-            if avaliacoes:
-                story.append(Spacer(1, 0.3 * cm))
-                story.append(Paragraph(
-                    "<b>AVALIAÇÕES QUANTITATIVAS</b>",
-                    self.styles['Normal']
-                ))
-                story.append(Spacer(1, 0.2 * cm))
-
-                # ── Agrupar por tipo de avaliação ──
-                avaliacoes_por_tipo = {}
-                for av in avaliacoes:
-                    tipo = av.get_tipo_avaliacao_display()
-                    if tipo not in avaliacoes_por_tipo:
-                        avaliacoes_por_tipo[tipo] = []
-                    avaliacoes_por_tipo[tipo].append(av)
-
-                # ── Header da tabela ──
-                header_row = [
-                    Paragraph('<b>TIPO</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>RESULTADO</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>UNIDADE</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>DATA</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>CONFORMIDADE</b>', self.styles['TabelaTitulo']),
-                    Paragraph('<b>EQUIPAMENTO</b>', self.styles['TabelaTitulo']),
-                ]
-                dados_avaliacoes = [header_row]
-
-                for tipo_nome, lista_av in avaliacoes_por_tipo.items():
-                    for av in lista_av:
-                        conformidade_texto = 'Conforme' if av.conforme else 'Não Conforme'
-
-                        # Estilo condicional para conformidade
-                        if av.conforme:
-                            conf_style = ParagraphStyle(
-                                'ConfOk',
-                                parent=self.styles['TabelaTextoCentro'],
-                                textColor=colors.HexColor('#198754'),
-                                fontName='Helvetica-Bold',
-                            )
-                        else:
-                            conf_style = ParagraphStyle(
-                                'ConfNao',
-                                parent=self.styles['TabelaTextoCentro'],
-                                textColor=colors.HexColor('#dc3545'),
-                                fontName='Helvetica-Bold',
-                            )
-
-                        # Unidade legível
-                        unidade = av.unidade_medida or ''
-                        if hasattr(av, 'get_unidade_medida_display'):
-                            unidade = av.get_unidade_medida_display()
-
-                        dados_avaliacoes.append([
-                            Paragraph(
-                                f"<b>{tipo_nome}</b>",
-                                self.styles['TabelaTexto']
-                            ),
-                            Paragraph(
-                                f"{av.resultado_medido}",
-                                self.styles['TabelaTextoCentro']
-                            ),
-                            Paragraph(
-                                unidade,
-                                self.styles['TabelaTextoCentro']
-                            ),
-                            Paragraph(
-                                av.data_avaliacao.strftime('%d/%m/%Y'),
-                                self.styles['TabelaTextoCentro']
-                            ),
-                            Paragraph(conformidade_texto, conf_style),
-                            Paragraph(
-                                av.equipamento_utilizado or 'N/A',
-                                self.styles['TabelaTexto']
-                            ),
-                        ])
-
-                # ── Montar a tabela ──
-                col_widths_av = [
-                    2.2 * cm,   # Tipo
-                    2.0 * cm,   # Resultado
-                    1.8 * cm,   # Unidade
-                    2.0 * cm,   # Data
-                    2.2 * cm,   # Conformidade
-                    6.3 * cm,   # Equipamento
-                ]
-
-                table_avaliacoes = Table(
-                    dados_avaliacoes,
-                    colWidths=col_widths_av,
-                    repeatRows=1
-                )
-                table_avaliacoes.setStyle(TableStyle([
-                    # Header
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#003366')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                    ('FONTSIZE', (0, 0), (-1, -1), 7),
-                    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-
-                    # Grid
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-
-                    # Zebra
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1),
-                     [colors.white, colors.Color(0.95, 0.95, 0.95)]),
-
-                    # Padding
-                    ('TOPPADDING', (0, 0), (-1, -1), 4),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 4),
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-                ]))
-
-                # Destaque vermelho para "Não Conforme" (fundo da célula)
-                for row_idx, av in enumerate(avaliacoes, 1):
-                    if not av.conforme:
-                        table_avaliacoes.setStyle(TableStyle([
-                            ('BACKGROUND', (4, row_idx), (4, row_idx),
-                             colors.Color(1.0, 0.9, 0.9)),  # Rosa claro
-                        ]))
-
-                story.append(table_avaliacoes)
-                story.append(Spacer(1, 0.3 * cm))
-
-
-        return story
-
     # =================================================================
     # 10. PLANO DE AÇÃO (texto)
     # =================================================================
@@ -1437,17 +1058,17 @@ class PGRPDFGenerator:
         nome_empresa = self._get_nome_empresa()
         story = []
 
-        titulo = get_titulo_secao(self.pgr, 'plano_acao') or '10. PLANO DE AÇÃO'
+        titulo = self.dados.titulo_secao('plano_acao') or '10. PLANO DE AÇÃO'
         story.append(Paragraph(titulo, self.styles['TituloSecao']))
 
-        texto = get_texto_secao(self.pgr, 'plano_acao', nome_empresa)
+        texto = self.dados.texto_secao('plano_acao', nome_empresa)
         if texto:
             story.extend(self._texto_para_paragrafos(texto))
 
         # Documentação (sub-seção nova)
-        texto_doc = get_texto_secao(self.pgr, 'plano_acao_documentacao', nome_empresa)
+        texto_doc = self.dados.texto_secao('plano_acao_documentacao', nome_empresa)
         if texto_doc:
-            titulo_doc = get_titulo_secao(self.pgr, 'plano_acao_documentacao') or 'DOCUMENTAÇÃO'
+            titulo_doc = self.dados.titulo_secao('plano_acao_documentacao') or 'DOCUMENTAÇÃO'
             story.append(Paragraph(f"<b>{titulo_doc}</b>", self.styles['Normal']))
             story.append(Spacer(1, 0.1 * cm))
             story.extend(self._texto_para_paragrafos(texto_doc))
@@ -1481,11 +1102,11 @@ class PGRPDFGenerator:
         ]
 
         for sub in sub_secoes:
-            texto = get_texto_secao(self.pgr, sub, nome_empresa)
+            texto = self.dados.texto_secao(sub, nome_empresa)
             if texto is None:
                 continue
             if texto:
-                titulo = get_titulo_secao(self.pgr, sub)
+                titulo = self.dados.titulo_secao(sub)
                 if titulo:
                     story.append(Paragraph(
                         f"<b>{titulo}</b>", self.styles['Normal']
@@ -1518,8 +1139,8 @@ class PGRPDFGenerator:
         story.append(PageBreak())
 
         # ── Título da sub-seção ──
-        titulo_epi = get_titulo_secao(
-            self.pgr, 'medidas_recomendacao_epi'
+        titulo_epi = self.dados.titulo_secao(
+            'medidas_recomendacao_epi'
         ) or 'RECOMENDAÇÃO ESPECIAL (EPI)'
         story.append(Paragraph(
             f"<b>{titulo_epi}</b>", self.styles['Normal']
@@ -1809,9 +1430,9 @@ class PGRPDFGenerator:
             ),
         ]]
 
-        acoes = self.pgr.cronograma_acoes.all().order_by('numero_item')
+        acoes = self.dados.cronograma
 
-        if acoes.exists():
+        if acoes:
             for acao in acoes:
                 realizacao = (
                     acao.get_periodicidade_display()
@@ -1889,13 +1510,13 @@ class PGRPDFGenerator:
         story = []
 
         # Título
-        titulo = get_titulo_secao(self.pgr, 'divulgacao')
+        titulo = self.dados.titulo_secao('divulgacao')
         if not titulo:
             titulo = '13. DIVULGAÇÃO DO PROGRAMA'
         story.append(Paragraph(titulo, self.styles['TituloSecao']))
 
         # Texto do banco
-        texto = get_texto_secao(self.pgr, 'divulgacao', nome_empresa)
+        texto = self.dados.texto_secao('divulgacao', nome_empresa)
 
         # Fallback hardcoded
         if not texto or not texto.strip():
@@ -1933,13 +1554,13 @@ class PGRPDFGenerator:
         story = []
 
         # Título
-        titulo = get_titulo_secao(self.pgr, 'recomendacoes')
+        titulo = self.dados.titulo_secao('recomendacoes')
         if not titulo:
             titulo = '14. RECOMENDAÇÕES GERAIS'
         story.append(Paragraph(titulo, self.styles['TituloSecao']))
 
         # Texto do banco
-        texto = get_texto_secao(self.pgr, 'recomendacoes', nome_empresa)
+        texto = self.dados.texto_secao('recomendacoes', nome_empresa)
 
         # Fallback hardcoded
         if not texto or not texto.strip():
@@ -1979,12 +1600,12 @@ class PGRPDFGenerator:
         nome_empresa = self._get_nome_empresa()
         story = []
 
-        titulo = get_titulo_secao(self.pgr, 'legislacao')
+        titulo = self.dados.titulo_secao('legislacao')
         if not titulo:
             titulo = '15. LEGISLAÇÃO APLICÁVEL'
         story.append(Paragraph(titulo, self.styles['TituloSecao']))
 
-        texto = get_texto_secao(self.pgr, 'legislacao', nome_empresa)
+        texto = self.dados.texto_secao('legislacao', nome_empresa)
 
         if not texto or not texto.strip():
             texto = (
@@ -2021,11 +1642,9 @@ class PGRPDFGenerator:
         # Largura útil do frame
         largura_util = A4[0] - 3 * cm  # 1.5cm cada margem
 
-        grupos_ges = self.pgr.grupos_exposicao.filter(
-            ativo=True
-        ).order_by('codigo')
+        grupos_ges = self.dados.grupos_ges
 
-        if not grupos_ges.exists():
+        if not grupos_ges:
             story.append(Paragraph(
                 "16. LEVANTAMENTO DOS RISCOS",
                 self.styles['TituloSecao']
@@ -2174,11 +1793,9 @@ class PGRPDFGenerator:
             # TABELA DE RISCOS
             # ═══════════════════════════════════════════════
 
-            riscos = ges.riscos.select_related(
-                'tipo_risco'
-            ).order_by('tipo_risco__categoria', 'agente')
+            riscos = self.dados.riscos_do_ges(ges)
 
-            if riscos.exists():
+            if riscos:
                 # Estilos específicos para a tabela de riscos
                 style_th = ParagraphStyle(
                     'RiscoTH',
@@ -2236,7 +1853,8 @@ class PGRPDFGenerator:
 
                     # Agente com valor de medição se houver
                     agente_texto = risco.agente or '-'
-                    avaliacao_quant = risco.avaliacoes_quantitativas.first()
+                    avaliacoes_risco = risco.avaliacoes_quantitativas.all()
+                    avaliacao_quant = avaliacoes_risco[0] if avaliacoes_risco else None
                     if avaliacao_quant:
                         agente_texto = (
                             f"{risco.agente}<br/>"
@@ -2440,11 +2058,7 @@ class PGRPDFGenerator:
         cargos_treinamentos = OrderedDict()
         todas_nrs = OrderedDict()
 
-        grupos_ges = self.pgr.grupos_exposicao.filter(
-            ativo=True
-        ).select_related('cargo', 'funcao').order_by('codigo')
-
-        for ges in grupos_ges:
+        for ges in self.dados.grupos_ges:
             cargo_nome = None
             if ges.cargo:
                 cargo_nome = ges.cargo.nome
@@ -2477,12 +2091,8 @@ class PGRPDFGenerator:
                     )
 
             # Percorrer riscos do GES → treinamentos necessários
-            riscos = ges.riscos.prefetch_related(
-                'treinamentos_necessarios__tipo_curso'
-            ).all()
-
-            for risco in riscos:
-                for trein in risco.treinamentos_necessarios.select_related('tipo_curso').all():
+            for risco in self.dados.riscos_do_ges(ges):
+                for trein in risco.treinamentos_necessarios.all():
                     tipo_curso = trein.tipo_curso
                     if not tipo_curso:
                         continue
@@ -2718,12 +2328,8 @@ class PGRPDFGenerator:
         story.append(Paragraph("ASSINATURAS", self.styles['TituloSecao']))
         story.append(Spacer(1, 1 * cm))
 
-        responsavel_info_qs = self.pgr.responsavel_info.select_related(
-            'profissional'
-        ).all()
-
-        if responsavel_info_qs.exists():
-            for resp_info in responsavel_info_qs:
+        if self.dados.responsaveis:
+            for resp_info in self.dados.responsaveis:
                 prof = resp_info.profissional
                 if prof:
                     story.append(Spacer(1, 1.5 * cm))
@@ -2759,14 +2365,9 @@ class PGRPDFGenerator:
         Cria a seção de ANEXOS no final do PDF.
         Lista todos os anexos vinculados ao PGR com seus títulos.
         """
-        from pgr_gestao.models import AnexoPGR
-
-        anexos = AnexoPGR.objects.filter(
-            pgr_documento=self.pgr,
-            incluir_no_pdf=True
-        ).order_by('ordem', 'numero_romano')
+        anexos = self.dados.anexos
 
-        if not anexos.exists():
+        if not anexos:
             return []
 
         story = []
@@ -2808,8 +2409,13 @@ class PGRPDFGenerator:
     # GERAÇÃO DO PDF COMPLETO
     # =================================================================
 
-    def gerar_pdf(self):
-        """Gera o PDF completo do PGR"""
+    def gerar_pdf(self, progresso=None):
+        """
+        Gera o PDF completo do PGR.
+
+        `progresso(feitas, total, etapa)` é chamado antes de cada seção —
+        usado pela task assíncrona para atualizar o andamento do job.
+        """
         buffer = BytesIO()
         width, height = A4
 
@@ -2839,38 +2445,46 @@ class PGRPDFGenerator:
         )
         doc.addPageTemplates([template_capa, template_normal])
 
+        # (etapa exibida no progresso, método que monta a seção)
+        secoes = [
+            ('Capa', self._criar_capa),
+            # SEÇÕES 1-8 (textos)
+            ('Caracterização da empresa', self._criar_caracterizacao_empresa),
+            ('Controle de revisão', self._criar_controle_revisao),
+            ('Documento base', self._criar_documento_base),
+            ('Definições', self._criar_definicoes),
+            ('Estrutura do PGR', self._criar_estrutura_pgr),
+            ('Responsabilidades', self._criar_responsabilidades),
+            ('Diretrizes', self._criar_diretrizes),
+            ('Desenvolvimento', self._criar_desenvolvimento),
+            ('Metodologia', self._criar_metodologia),
+            # SEÇÃO 9 — Tabelas de Classificação (Tabelas 1-8 visuais)
+            ('Tabelas de classificação', self._criar_tabelas_classificacao),
+            # SEÇÃO 10-15 (textos + cronograma)
+            ('Plano de ação', self._criar_plano_acao_texto),
+            ('Medidas de proteção', self._criar_medidas_protecao),
+            ('Cronograma de ações', self._criar_cronograma_acoes),
+            ('Divulgação', self._criar_divulgacao),
+            ('Recomendações', self._criar_recomendacoes),
+            ('Legislação', self._criar_legislacao),
+            # SEÇÃO 16 — Levantamento dos Riscos (inventário por GES)
+            ('Inventário de riscos', self._criar_inventario_riscos),
+            # SEÇÃO 17 — Matriz de Treinamento
+            ('Matriz de treinamento', self._criar_matriz_treinamento),
+            # ASSINATURAS
+            ('Assinaturas', self._criar_pagina_assinaturas),
+            # ANEXOS
+            ('Anexos', self._criar_pagina_anexos),
+        ]
+
         story = []
+        for indice, (etapa, criar_secao) in enumerate(secoes):
+            if progresso:
+                progresso(indice, len(secoes), etapa)
+            story.extend(criar_secao())
 
-        # CAPA
-        story.extend(self._criar_capa())
-
-        # SEÇÕES 1-8 (textos)
-        story.extend(self._criar_caracterizacao_empresa())
-        story.extend(self._criar_controle_revisao())
-        story.extend(self._criar_documento_base())
-        story.extend(self._criar_definicoes())
-        story.extend(self._criar_estrutura_pgr())
-        story.extend(self._criar_responsabilidades())
-        story.extend(self._criar_diretrizes())
-        story.extend(self._criar_desenvolvimento())
-        story.extend(self._criar_metodologia())
-        # SEÇÃO 9 — Tabelas de Classificação (Tabelas 1-8 visuais)
-        story.extend(self._criar_tabelas_classificacao())
-        # SEÇÃO 10-15 (textos + cronograma)
-        story.extend(self._criar_plano_acao_texto())
-        story.extend(self._criar_medidas_protecao())
-        story.extend(self._criar_cronograma_acoes())
-        story.extend(self._criar_divulgacao())
-        story.extend(self._criar_recomendacoes())
-        story.extend(self._criar_legislacao())
-        # SEÇÃO 16 — Levantamento dos Riscos (inventário por GES)
-        story.extend(self._criar_inventario_riscos())
-        # SEÇÃO 17 — Matriz de Treinamento
-        story.extend(self._criar_matriz_treinamento())
-        # ASSINATURAS
-        story.extend(self._criar_pagina_assinaturas())
-        # ANEXOS
-        story.extend(self._criar_pagina_anexos())
+        if progresso:
+            progresso(len(secoes), len(secoes), 'Montando páginas')
 
         doc.build(story)
         buffer.seek(0)
@@ -3193,9 +2807,7 @@ class PGRPDFGenerator:
         # ─────────────────────────────────────────────
         # TEXTO INTRODUTÓRIO
         # ─────────────────────────────────────────────
-        texto_intro = get_texto_secao(
-            self.pgr, 'inventario_riscos_intro', nome_empresa
-        )
+        texto_intro = self.dados.texto_secao('inventario_riscos_intro', nome_empresa)
         if texto_intro:
             story.extend(self._texto_para_paragrafos(texto_intro))
             story.append(Spacer(1, 0.3 * cm))
@@ -3663,9 +3275,7 @@ class PGRPDFGenerator:
 
         # Exceções
         story.append(Spacer(1, 0.3 * cm))
-        texto_exc = get_texto_secao(
-            self.pgr, 'inventario_excecoes', nome_empresa
-        )
+        texto_exc = self.dados.texto_secao('inventario_excecoes', nome_empresa)
         if texto_exc:
             story.append(Paragraph(
                 "<b>EXCEÇÕES NA DEFINIÇÃO DA PERIODICIDADE DE MONITORAMENTOS</b>",
@@ -3680,21 +3290,20 @@ class PGRPDFGenerator:
 # FUNÇÃO AUXILIAR (FORA DA CLASSE — indentação nível 0!)
 # =============================================================================
 
-def gerar_pdf_pgr(pgr_documento):
+def gerar_pdf_pgr(pgr_documento, progresso=None):
     """
     Função auxiliar para gerar o PDF do PGR.
     Se houver anexos PDF marcados com incluir_no_pdf=True,
     eles são mesclados ao final do documento.
+
+    `progresso` é repassado a PGRPDFGenerator.gerar_pdf().
     """
     # 1) Gerar o PDF principal do PGR via ReportLab
     generator = PGRPDFGenerator(pgr_documento)
-    pdf_buffer = generator.gerar_pdf()
+    pdf_buffer = generator.gerar_pdf(progresso=progresso)
 
     # 2) Buscar anexos PDF marcados para inclusão
-    anexos_pdf = AnexoPGR.objects.filter(
-        pgr_documento=pgr_documento,
-        incluir_no_pdf=True,
-    ).order_by('ordem', 'numero_romano')
+    anexos_pdf = generator.dados.anexos
 
     # Filtrar apenas os que são PDF e existem no disco
     anexos_validos = []
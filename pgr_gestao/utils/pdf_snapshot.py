@@ -0,0 +1,149 @@
+"""
+Carga planejada dos dados do PDF do PGR.
+
+Antes, cada seção `_criar_*` do PGRPDFGenerator consultava seus próprios
+managers relacionados (riscos por GES, avaliações por risco, treinamentos
+por risco, duas queries por texto de seção...) — um PGR grande passava de
+centenas de queries, várias repetidas.
+
+`PGRSnapshot` busca o grafo inteiro do documento num número FIXO de
+queries (select_related/prefetch_related), independente da quantidade de
+GES, riscos, avaliações ou treinamentos. O gerador só lê da memória.
+"""
+from collections import defaultdict
+
+from django.db.models import Prefetch
+
+from pgr_gestao.models import (
+    AnexoPGR, Empresa, GESGrupoExposicao, PGRDocumento, PGRSecaoTexto,
+    PGRSecaoTextoPadrao, RiscoIdentificado, RiscoTreinamentoNecessario,
+)
+
+
+class PGRSnapshot:
+    """Dados do PGR em memória, carregados de uma vez para o PDF."""
+
+    def __init__(self, pgr_documento):
+        self.documento = (
+            PGRDocumento.objects
+            .select_related('empresa', 'local_prestacao', 'filial')
+            .get(pk=pgr_documento.pk)
+        )
+        self.empresa_pgr = self._carregar_empresa_pgr()
+        self.empresa_contratada = self._carregar_empresa_contratada()
+
+        self.responsaveis = list(
+            self.documento.responsavel_info.select_related('profissional')
+        )
+        self.revisoes = list(self.documento.revisoes.order_by('numero_revisao'))
+        self.cronograma = list(self.documento.cronograma_acoes.order_by('numero_item'))
+        self.anexos = list(
+            AnexoPGR.objects.filter(pgr_documento=self.documento, incluir_no_pdf=True)
+            .order_by('ordem', 'numero_romano')
+        )
+
+        self.secoes = {
+            s.secao: s
+            for s in PGRSecaoTexto.objects.filter(pgr_documento=self.documento)
+        }
+        self.textos_padrao = {
+            t.secao: t for t in PGRSecaoTextoPadrao.objects.filter(ativo=True)
+        }
+
+        self.grupos_ges = list(
+            GESGrupoExposicao.objects
+            .filter(pgr_documento=self.documento, ativo=True)
+            .select_related('cargo', 'funcao', 'ambiente_trabalho')
+            .order_by('codigo')
+        )
+        self._riscos_por_ges = self._carregar_riscos()
+
+    # =================================================================
+    # CARGA
+    # =================================================================
+
+    def _carregar_empresa_pgr(self):
+        """Empresa PGR vinculada ao Cliente, se existir."""
+        return (
+            Empresa.objects
+            .filter(cliente_id=self.documento.empresa_id, ativo=True)
+            .select_related('cliente')
+            .first()
+        )
+
+    def _carregar_empresa_contratada(self):
+        """
+        Empresa CONTRATADA (prestadora de serviços) da filial do documento.
+        No modelo oficial, é ela que aparece como 'EMPRESA' na capa.
+        """
+        return (
+            Empresa.objects
+            .filter(
+                filial_id=self.documento.filial_id,
+                tipo_empresa__in=['contratada', 'prestadora'],
+                ativo=True,
+            )
+            .select_related('cliente')
+            .first()
+        )
+
+    def _carregar_riscos(self):
+        """Riscos dos GES ativos, já com tipo, avaliações e treinamentos."""
+        riscos_por_ges = defaultdict(list)
+        if not self.grupos_ges:
+            return riscos_por_ges
+
+        riscos = (
+            RiscoIdentificado.objects
+            .filter(ges__in=[g.pk for g in self.grupos_ges])
+            .select_related('tipo_risco')
+            .prefetch_related(
+                'avaliacoes_quantitativas',
+                Prefetch(
+                    'treinamentos_necessarios',
+                    queryset=RiscoTreinamentoNecessario.objects.select_related('tipo_curso'),
+                ),
+            )
+            .order_by('tipo_risco__categoria', 'agente')
+        )
+        for risco in riscos:
+            riscos_por_ges[risco.ges_id].append(risco)
+        return riscos_por_ges
+
+    # =================================================================
+    # ACESSO
+    # =================================================================
+
+    def riscos_do_ges(self, ges):
+        """Riscos do GES, ordenados por categoria e agente."""
+        return self._riscos_por_ges.get(ges.pk, [])
+
+    def texto_secao(self, secao_key, nome_empresa=''):
+        """
+        Mesmo contrato de services.get_texto_secao(), sem ir ao banco:
+        texto do documento > texto padrão > ''; None se a seção foi
+        desativada no documento.
+        """
+        secao = self.secoes.get(secao_key)
+        if secao is not None:
+            if not secao.incluir_no_pdf:
+                return None
+            texto = secao.conteudo or ''
+        else:
+            padrao = self.textos_padrao.get(secao_key)
+            if padrao is None:
+                return ''
+            texto = padrao.conteudo_padrao or ''
+
+        if nome_empresa:
+            texto = texto.replace('{empresa}', nome_empresa)
+        return texto
+
+    def titulo_secao(self, secao_key):
+        """Mesmo contrato de services.get_titulo_secao()."""
+        secao = self.secoes.get(secao_key)
+        if secao is not None and secao.titulo_customizado:
+            return secao.titulo_customizado
+
+        padrao = self.textos_padrao.get(secao_key)
+        return padrao.titulo if padrao else ''
@@ -18,7 +18,7 @@ from django.contrib.auth.decorators import permission_required
 from django.contrib import messages
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db.models.functions import TruncMonth
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse
 from django.urls import reverse_lazy, reverse
 from django.utils import timezone
 from django.views.generic import (
@@ -45,7 +45,7 @@ from .models import (
     CronogramaAcaoPGR,
     RiscoEPIRecomendado, RiscoTreinamentoNecessario,
     Empresa, LocalPrestacaoServico, ProfissionalResponsavel,
-    AmbienteTrabalho, TipoRisco, AnexoPGR,
+    AmbienteTrabalho, TipoRisco, AnexoPGR, PDFGeradoPGR,
     STATUS_CHOICES, STATUS_PGR_CHOICES,
     CLASSIFICACAO_RISCO_CHOICES, TIPO_AVALIACAO_CHOICES,
 )
@@ -2017,23 +2017,104 @@ def load_locais_prestacao(request, empresa_id):
 # EXPORTAÇÕES (filtradas por filial com validação de acesso)
 # =============================================================================
 
+def _nome_arquivo_pdf(documento):
+    return f"PGR_{documento.codigo_documento}_{documento.empresa.razao_social.replace(' ', '_')}.pdf"
+
+
+def _resposta_arquivo_pdf(documento, job):
+    return FileResponse(
+        job.arquivo.open('rb'), content_type='application/pdf',
+        as_attachment=True, filename=_nome_arquivo_pdf(documento),
+    )
+
+
+def _status_pdf_json(documento, job):
+    return {
+        'job_id': job.pk,
+        'status': job.status,
+        'progresso': job.progresso,
+        'etapa': job.etapa,
+        'erro': job.erro,
+        'url': (
+            reverse('pgr_gestao:relatorio_completo_pdf_download', args=[documento.pk, job.pk])
+            if job.disponivel else None
+        ),
+    }
+
+
+def _quer_json(request):
+    return 'application/json' in request.headers.get('Accept', '')
+
+
 @funcionario_required
 @permission_required('pgr_gestao.view_pgrdocumento', raise_exception=True)
 def gerar_relatorio_completo_pdf(request, pk):
-    """Gera PDF — validado por filial."""
+    """
+    PDF completo do PGR — validado por filial.
+
+    Se o conteúdo do documento não mudou desde a última geração, devolve o
+    arquivo guardado na hora; senão enfileira a geração (Celery) e mostra a
+    tela de progresso. `?forcar=1` gera de novo mesmo sem alterações.
+    """
     documento = validar_acesso_documento(request, pk)
 
-    from .utils.pdf_generator import gerar_pdf_pgr
+    from .utils.pdf_cache import solicitar_pdf_pgr
 
-    try:
-        pdf_buffer = gerar_pdf_pgr(documento)
-        response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
-        filename = f"PGR_{documento.codigo_documento}_{documento.empresa.razao_social.replace(' ', '_')}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    job = solicitar_pdf_pgr(
+        documento, usuario=request.user,
+        forcar=request.GET.get('forcar') == '1',
+    )
+
+    if _quer_json(request):
+        return JsonResponse(_status_pdf_json(documento, job), status=200 if job.disponivel else 202)
+
+    if job.disponivel:
+        return _resposta_arquivo_pdf(documento, job)
+
+    return render(request, 'pgr_gestao/pdf_progresso.html', {
+        'documento': documento,
+        'job': job,
+    })
+
+
+@funcionario_required
+@permission_required('pgr_gestao.view_pgrdocumento', raise_exception=True)
+def status_relatorio_completo_pdf(request, pk, job_id):
+    """
+    Andamento da geração do PDF (polling).
+
+    HTMX recebe o fragmento de status; quando o job termina a resposta usa
+    o status 286, que encerra o polling. Demais clientes recebem JSON.
+    """
+    documento = validar_acesso_documento(request, pk)
+    job = get_object_or_404(PDFGeradoPGR, pk=job_id, pgr_documento=documento)
+    # Worker perdido: encerra para a tela parar de esperar
+    job.encerrar_se_travado()
+
+    if request.headers.get('HX-Request'):
+        response = render(request, 'pgr_gestao/partials/_pdf_status.html', {
+            'documento': documento,
+            'job': job,
+        })
+        if not job.em_andamento:
+            response.status_code = 286
         return response
-    except Exception as e:
-        messages.error(request, f'Erro ao gerar PDF: {str(e)}')
-        return redirect('pgr_gestao:documento_detail', pk=pk)
+
+    return JsonResponse(_status_pdf_json(documento, job))
+
+
+@funcionario_required
+@permission_required('pgr_gestao.view_pgrdocumento', raise_exception=True)
+def download_relatorio_completo_pdf(request, pk, job_id):
+    """Download do PDF já gerado (storage privado) — validado por filial."""
+    documento = validar_acesso_documento(request, pk)
+    job = get_object_or_404(PDFGeradoPGR, pk=job_id, pgr_documento=documento)
+
+    if not job.disponivel:
+        messages.warning(request, 'O PDF ainda não está pronto.')
+        return redirect('pgr_gestao:relatorio_completo_pdf', pk=pk)
+
+    return _resposta_arquivo_pdf(documento, job)
 
 
 @funcionario_required
@@ -69,6 +69,8 @@ class ChatManager {
         this.audioContext = null;
         this.audioElements = {};
         this.cache = { users: [], tasks: [], rooms: [], messages: {}, searchResults: {} };
+        // Cursor da última mensagem recebida por sala (sincronização incremental)
+        this.historyCursors = {};
         
         // Outros states
         this.uploadQueue = [];
@@ -414,6 +416,9 @@ class ChatManager {
             console.log('📦 Dados recebidos:', data);
             
             if (data.status === 'success') {
+                if (data.after) {
+                    this.historyCursors[roomId] = data.after;
+                }
                 if (data.messages && data.messages.length > 0) {
                     // Cache as mensagens
                     this.cache.messages[roomId] = data.messages;
@@ -439,6 +444,35 @@ class ChatManager {
         }
         
     }
+    async syncMissedMessages(roomId) {
+        const base = this.urls.get_chat_history
+            ? this.urls.get_chat_history.replace('00000000-0000-0000-0000-000000000000', roomId)
+            : `/chat/api/history/${roomId}/`;
+
+        try {
+            let hasMore = true;
+            while (hasMore && this.historyCursors[roomId]) {
+                const response = await fetch(`${base}?after=${encodeURIComponent(this.historyCursors[roomId])}`);
+                if (!response.ok) return;
+
+                const data = await response.json();
+                if (roomId === this.currentRoom) {
+                    (data.messages || []).forEach((message) => {
+                        if (!document.querySelector(`[data-message-id="${message.id}"]`)) {
+                            this.displayMessage(message);
+                        }
+                    });
+                }
+                if (data.after) {
+                    this.historyCursors[roomId] = data.after;
+                }
+                hasMore = data.has_more_after;
+            }
+        } catch (error) {
+            this.log.warn('Falha ao sincronizar mensagens perdidas:', error);
+        }
+    }
+
     renderMessages(messages) {
         const chatLog = document.getElementById('chat-log');
         if (!chatLog) return;
@@ -1035,6 +1069,10 @@ class ChatManager {
                 this.reconnectAttempts = 0; 
                 this.hideConnectionError();
                 this.updateConnectionStatus('online');
+                // Busca só o que chegou enquanto o socket esteve fora
+                if (this.historyCursors[room_id]) {
+                    this.syncMissedMessages(room_id);
+                }
                 if (this._pendingReadRoom) {
                     const roomId = this._pendingReadRoom;
                     this._pendingReadRoom = null;
@@ -1192,7 +1230,14 @@ class ChatManager {
                             }
                             break;
                             
-                        // Nova notificação (toast + badge automático)
+                        // Ajuste do badge por delta (+1 nova, -1 lida)
+                        case 'notification_count_delta':
+                            if (window.NotificacoesAPI) {
+                                window.NotificacoesAPI.aplicarDelta(data.delta, data.count);
+                            }
+                            break;
+
+                        // Nova notificação (toast; o badge vem no notification_count_delta)
                         case 'new_notification': {
                             const notif = data.notification || {};
                             this.log.info(`Nova notificação: ${notif.titulo}`);
@@ -1225,7 +1270,7 @@ class ChatManager {
                         // Notificação marcada como lida (sincroniza abas)
                         case 'notification_read':
                             this.log.info(`Notificação ${data.notification_id} lida`);
-                            // O badge já é atualizado pelo notification_count_update
+                            // O badge já é atualizado pelo notification_count_delta
                             if (window.NotificacoesAPI) {
                                 window.NotificacoesAPI.recarregarDropdown();  // 🆕 sincroniza lista entre abas
                             }
@@ -1478,6 +1523,10 @@ class ChatManager {
             is_own: data.user_id == this.currentUserId
         };
         
+        if (data.cursor && data.room_id) {
+            this.historyCursors[data.room_id] = data.cursor;
+        }
+
         // Exibe a mensagem na interface
         this.displayMessage(messageData);
         
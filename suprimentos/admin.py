@@ -232,6 +232,9 @@ class VerbaContratoAdmin(admin.ModelAdmin):
     ordering = ("-ano", "-mes")
     autocomplete_fields = ("contrato",)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_consumo()
+
     @admin.display(description="Verba Total")
     def verba_total_col(self, obj):
         return f"R$ {obj.verba_total:.2f}"
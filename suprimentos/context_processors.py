@@ -1,8 +1,11 @@
 # suprimentos/context_processors.py
 import logging
-from django.core.cache import cache
 from django.db.models import Q
 
+from core.cache import CacheNamespace
+from core.global_context import (
+    chave_usuario, contexto_global, obter_ou_calcular, versoes_escopos,
+)
 from .models import SolicitacaoCompra, Pedido
 from . import permissions as perms
 
@@ -15,9 +18,35 @@ STATUS_PENDENTES_COMPRADOR = [S.FAZER_COTACAO, S.EM_ENTREGA]
 STATUS_PENDENTES_APROVADOR = [S.COTACAO_ENVIADA, S.EM_APROVACAO]
 STATUS_ENCERRADOS = [S.FINALIZADO, S.CANCELADO]
 
-CACHE_TTL = 15  # segundos — evita recomputar em navegação rápida
+# Contadores são invalidados por suprimentos.signals (troca de versão do
+# escopo); o TTL só cobre mudanças de grupo/perfil do usuário.
+CACHE_TTL = 300  # segundos
+PERFIL_TTL = 300  # segundos
 
+ESCOPO_TODAS = "suprimentos:todas"
 
+cache_suprimentos = CacheNamespace("suprimentos", versao=1, timeout=CACHE_TTL)
+
+
+def escopo_filial(filial_id):
+    """Escopo versionado dos contadores de uma filial."""
+    return f"suprimentos:filial:{filial_id or 'sem'}"
+
+
+def _perfil(user):
+    """Grupos relevantes do usuário (3 EXISTS) — cacheado por usuário."""
+    return obter_ou_calcular(
+        chave_usuario("suprimentos_perfil", user.pk),
+        lambda: {
+            "is_gerencia": perms.is_gerencia(user),
+            "is_comprador": perms.is_comprador(user),
+            "is_aprovador": perms.is_aprovador(user),
+        },
+        timeout=PERFIL_TTL,
+    )
+
+
+@contexto_global
 def suprimentos_contadores(request):
     """
     Context processor ÚNICO do módulo Suprimentos.
@@ -28,16 +57,29 @@ def suprimentos_contadores(request):
     if not user.is_authenticated:
         return {}
 
-    # Cache por usuário para evitar recálculo em toda navegação
-    cache_key = f"suprimentos:contadores:{user.pk}"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
-
     try:
-        is_gerencia = perms.is_gerencia(user)
-        is_comprador = perms.is_comprador(user)
-        is_aprovador = perms.is_aprovador(user)
+        perfil = _perfil(user)
+        is_gerencia = perfil["is_gerencia"]
+        is_comprador = perfil["is_comprador"]
+        is_aprovador = perfil["is_aprovador"]
+        filial_ativa_id = getattr(user, "filial_ativa_id", None)
+
+        # Gerência (ou quem está sem filial ativa) enxerga todas as filiais →
+        # depende do escopo global; os demais só da própria filial
+        # (mudança em outra filial não invalida).
+        if user.is_superuser or is_gerencia or not filial_ativa_id:
+            escopo = ESCOPO_TODAS
+        else:
+            escopo = escopo_filial(filial_ativa_id)
+        (versao,) = versoes_escopos(escopo)
+
+        cache_key = cache_suprimentos.chave_filial(
+            filial_ativa_id, "contadores", user.pk, versao,
+        )
+        cached = cache_suprimentos.get(cache_key)
+        if cached is not None:
+            return cached
+
         filial_ativa = getattr(user, "filial_ativa", None)
 
         # ── Base queryset de solicitações "em aberto" ───────────────────
@@ -99,7 +141,7 @@ def suprimentos_contadores(request):
             "is_comprador_global": is_comprador,
         }
 
-        cache.set(cache_key, ctx, CACHE_TTL)
+        cache_suprimentos.set(cache_key, ctx)
         return ctx
 
     except Exception:
@@ -0,0 +1,50 @@
+# suprimentos/management/commands/recalcular_resumo_compras.py
+"""
+Reconstrói ResumoMensalCompra (base dos relatórios gerenciais).
+
+Os signals mantêm o resumo em dia; use este comando depois de cargas
+feitas sem signals (update()/bulk_create) ou de reclassificar materiais.
+
+    python manage.py recalcular_resumo_compras
+    python manage.py recalcular_resumo_compras --contrato 12 --contrato 15
+"""
+
+from django.core.management.base import BaseCommand
+
+from suprimentos.models import Pedido, ResumoMensalCompra
+
+
+class Command(BaseCommand):
+    help = "Recalcula o resumo mensal de compras por contrato"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--contrato', type=int, action='append', dest='contratos',
+            help='ID do contrato (repetível). Padrão: todos.',
+        )
+
+    def handle(self, *args, **options):
+        pedidos = Pedido.objects.all_filiais()
+        resumos = ResumoMensalCompra.objects.all()
+        if options['contratos']:
+            pedidos = pedidos.filter(contrato_id__in=options['contratos'])
+            resumos = resumos.filter(contrato_id__in=options['contratos'])
+
+        # Meses com pedidos contabilizados + meses já resumidos (podem ter zerado)
+        chaves = {
+            (contrato_id, ResumoMensalCompra.competencia_de(data_pedido))
+            for contrato_id, data_pedido in pedidos
+            .filter(status__in=ResumoMensalCompra.STATUS_PEDIDO)
+            .values_list('contrato_id', 'data_pedido')
+            .iterator()
+        }
+        chaves.update(resumos.values_list('contrato_id', 'competencia').distinct())
+
+        for n, (contrato_id, competencia) in enumerate(sorted(chaves), start=1):
+            ResumoMensalCompra.recalcular(contrato_id, competencia)
+            if n % 500 == 0:
+                self.stdout.write(f'   {n}/{len(chaves)} meses')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Resumo recalculado: {len(chaves)} (contrato, mês)'
+        ))
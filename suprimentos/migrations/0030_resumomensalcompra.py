@@ -0,0 +1,80 @@
+# Generated by Django 5.2.17 on 2026-10-18 00:20
+
+import datetime
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+STATUS_PEDIDO = ["APROVADO", "ENTREGUE", "RECEBIDO"]
+
+
+def preencher_resumo(apps, schema_editor):
+    """Resumo inicial de todo o histórico — depois os signals o mantêm."""
+    ItemPedido = apps.get_model("suprimentos", "ItemPedido")
+    ResumoMensalCompra = apps.get_model("suprimentos", "ResumoMensalCompra")
+
+    linhas = (
+        ItemPedido.objects
+        .filter(pedido__status__in=STATUS_PEDIDO)
+        .values(
+            "pedido__contrato_id",
+            "pedido__data_pedido__year",
+            "pedido__data_pedido__month",
+            "material__classificacao",
+        )
+        .annotate(
+            valor=Sum("valor_total"),
+            quantidade=Sum("quantidade"),
+            n_itens=Count("id"),
+            n_pedidos=Count("pedido", distinct=True),
+        )
+        .order_by()
+    )
+    ResumoMensalCompra.objects.bulk_create(
+        (
+            ResumoMensalCompra(
+                contrato_id=linha["pedido__contrato_id"],
+                competencia=datetime.date(
+                    linha["pedido__data_pedido__year"], linha["pedido__data_pedido__month"], 1,
+                ),
+                categoria=linha["material__classificacao"],
+                valor=linha["valor"] or Decimal("0.00"),
+                quantidade=linha["quantidade"] or 0,
+                n_itens=linha["n_itens"],
+                n_pedidos=linha["n_pedidos"],
+            )
+            for linha in linhas.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suprimentos', '0029_alter_pedido_tipo_obra_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoMensalCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.DateField(help_text='Primeiro dia do mês.', verbose_name='Competência')),
+                ('categoria', models.CharField(choices=[('CONSUMO', 'Consumo'), ('EPI', 'EPI'), ('FERRAMENTA', 'Ferramenta')], max_length=20, verbose_name='Categoria')),
+                ('valor', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Valor (R$)')),
+                ('quantidade', models.PositiveIntegerField(default=0, verbose_name='Unidades')),
+                ('n_itens', models.PositiveIntegerField(default=0, verbose_name='Itens')),
+                ('n_pedidos', models.PositiveIntegerField(default=0, verbose_name='Pedidos')),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('contrato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to='suprimentos.contrato', verbose_name='Contrato')),
+            ],
+            options={
+                'verbose_name': 'Resumo Mensal de Compras',
+                'verbose_name_plural': 'Resumos Mensais de Compras',
+                'constraints': [models.UniqueConstraint(fields=('contrato', 'competencia', 'categoria'), name='unique_resumo_contrato_competencia_categoria')],
+            },
+        ),
+        migrations.RunPython(preencher_resumo, migrations.RunPython.noop),
+    ]
@@ -5,7 +5,7 @@ Models do app Suprimentos.
 Inclui:
   - Modelos abstratos (TimestampedModel, BaseAnexo, BaseHistorico)
   - Choices reutilizáveis
-  - Parceiro, Material, Contrato, VerbaContrato
+  - Parceiro, Material, Contrato, VerbaContrato, ResumoMensalCompra
   - Pedido + Anexos + Histórico + Itens
   - SolicitacaoCompra + Anexos + Histórico
   - EstoqueConsumo
@@ -429,10 +429,64 @@ class Contrato(models.Model):
 # 3. VERBA MENSAL DO CONTRATO
 # ═════════════════════════════════════════════════════════════════════════════
 
+def _status_pc_que_consomem_verba():
+    """Status de PC cujos itens contam como compra contra a verba."""
+    return [
+        PedidoCompra.StatusPC.EMITIDO,
+        PedidoCompra.StatusPC.ENVIADO_FORNECEDOR,
+        PedidoCompra.StatusPC.ENTREGA_PARCIAL,
+        PedidoCompra.StatusPC.ENTREGUE,
+        PedidoCompra.StatusPC.RECEBIDO,
+    ]
+
+
+class VerbaContratoQuerySet(models.QuerySet):
+
+    def with_consumo(self):
+        """
+        Anota total_compra_epi/_consumo/_ferramenta — as properties
+        compra_*/saldo_* passam a ler a anotação em vez de disparar uma
+        agregação cada.
+
+        Subconsultas correlacionadas por (contrato, ano, mês): só os itens
+        do mês são lidos, e o COUNT da paginação as descarta.
+        """
+        from django.db.models import DecimalField, OuterRef, Subquery, Value
+        from django.db.models.functions import Coalesce
+
+        itens_do_mes = ItemPedidoCompra.objects.filter(
+            pedido_compra__solicitacao__contrato=OuterRef("contrato"),
+            pedido_compra__status__in=_status_pc_que_consomem_verba(),
+            pedido_compra__data_emissao__year=OuterRef("ano"),
+            pedido_compra__data_emissao__month=OuterRef("mes"),
+        ).order_by()
+
+        def soma(classificacao):
+            total = (
+                itens_do_mes.filter(material__classificacao=classificacao)
+                .values("pedido_compra__solicitacao__contrato")
+                .annotate(t=Sum("valor_total"))
+                .values("t")[:1]
+            )
+            return Coalesce(
+                Subquery(total), Value(Decimal("0.00")),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            )
+
+        return self.annotate(
+            total_compra_epi=soma(CategoriaMaterial.EPI),
+            total_compra_consumo=soma(CategoriaMaterial.CONSUMO),
+            total_compra_ferramenta=soma(CategoriaMaterial.FERRAMENTA),
+        )
+
+
 class VerbaContrato(models.Model):
     """
     Verbas mensais de um contrato. Permite histórico mês a mês
     e comparação Verba × Compra (indicadores).
+
+    Em listagens use VerbaContrato.objects.with_consumo(): sem a anotação
+    cada compra_*/saldo_* custa uma agregação por linha.
     """
 
     contrato = models.ForeignKey(
@@ -455,6 +509,8 @@ class VerbaContrato(models.Model):
         default=Decimal("0.00"),
     )
 
+    objects = VerbaContratoQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Verba Mensal")
         verbose_name_plural = _("Verbas Mensais")
@@ -470,22 +526,18 @@ class VerbaContrato(models.Model):
 
     def _soma_itens(self, classificacao):
         """Soma valor_total dos itens de PCs (emitidos/entregues/recebidos) no mês, para este contrato."""
+        anotado = getattr(self, f"total_compra_{classificacao.lower()}", None)
+        if anotado is not None:
+            return anotado
         total = ItemPedidoCompra.objects.filter(
-            pedido_compra__solicitacao__contrato=self.contrato,
-            pedido_compra__status__in=[
-                PedidoCompra.StatusPC.EMITIDO,
-                PedidoCompra.StatusPC.ENVIADO_FORNECEDOR,
-                PedidoCompra.StatusPC.ENTREGA_PARCIAL,
-                PedidoCompra.StatusPC.ENTREGUE,
-                PedidoCompra.StatusPC.RECEBIDO,
-            ],
+            pedido_compra__solicitacao__contrato=self.contrato_id,
+            pedido_compra__status__in=_status_pc_que_consomem_verba(),
             pedido_compra__data_emissao__year=self.ano,
             pedido_compra__data_emissao__month=self.mes,
             material__classificacao=classificacao,
         ).aggregate(t=Sum("valor_total"))["t"]
         return total or Decimal("0.00")
 
-
     @property
     def compra_epi(self):
         return self._soma_itens(CategoriaMaterial.EPI)
@@ -519,6 +571,106 @@ class VerbaContrato(models.Model):
         return self.verba_total - self.compra_total
 
 
+class ResumoMensalCompra(models.Model):
+    """
+    Gasto de pedidos de material efetivados por (contrato, mês, categoria)
+    — base materializada dos relatórios gerenciais (suprimentos.relatorios).
+
+    Mantido incrementalmente pelos signals de Pedido/ItemPedido: cada
+    mudança recalcula só o (contrato, mês) afetado. Reconstrução total:
+    `python manage.py recalcular_resumo_compras`.
+    """
+
+    # Pedidos cujos itens contam como gasto
+    STATUS_PEDIDO = ["APROVADO", "ENTREGUE", "RECEBIDO"]
+
+    contrato = models.ForeignKey(
+        Contrato, on_delete=models.CASCADE,
+        related_name="resumos_mensais", verbose_name=_("Contrato"),
+    )
+    competencia = models.DateField(_("Competência"), help_text=_("Primeiro dia do mês."))
+    categoria = models.CharField(_("Categoria"), max_length=20, choices=CategoriaMaterial.choices)
+
+    valor = models.DecimalField(
+        _("Valor (R$)"), max_digits=14, decimal_places=2, default=Decimal("0.00"),
+    )
+    quantidade = models.PositiveIntegerField(_("Unidades"), default=0)
+    n_itens = models.PositiveIntegerField(_("Itens"), default=0)
+    n_pedidos = models.PositiveIntegerField(_("Pedidos"), default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Resumo Mensal de Compras")
+        verbose_name_plural = _("Resumos Mensais de Compras")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["contrato", "competencia", "categoria"],
+                name="unique_resumo_contrato_competencia_categoria",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.contrato_id} — {self.competencia:%m/%Y} — {self.categoria}"
+
+    @staticmethod
+    def competencia_de(data_pedido):
+        """Mês (1º dia) de um data_pedido, no fuso local — o mesmo de __year/__month."""
+        local = timezone.localtime(data_pedido) if timezone.is_aware(data_pedido) else data_pedido
+        return local.date().replace(day=1)
+
+    @classmethod
+    def recalcular(cls, contrato_id, competencia):
+        """
+        Refaz as linhas de um (contrato, mês) a partir dos ItemPedido.
+
+        Trava a linha do contrato antes de ler os itens: recálculos
+        simultâneos do mesmo contrato (dois pedidos aprovados juntos) rodam
+        um depois do outro, em vez de apagarem e inserirem as mesmas linhas.
+        """
+        from django.db.models import Count, DecimalField, IntegerField, Value
+        from django.db.models.functions import Coalesce
+
+        linhas = (
+            ItemPedido.objects
+            .filter(
+                pedido__contrato_id=contrato_id,
+                pedido__status__in=cls.STATUS_PEDIDO,
+                pedido__data_pedido__year=competencia.year,
+                pedido__data_pedido__month=competencia.month,
+            )
+            .values("material__classificacao")
+            .annotate(
+                valor=Coalesce(
+                    Sum("valor_total"), Value(Decimal("0.00")),
+                    output_field=DecimalField(max_digits=14, decimal_places=2),
+                ),
+                quantidade=Coalesce(Sum("quantidade"), Value(0), output_field=IntegerField()),
+                n_itens=Count("id"),
+                n_pedidos=Count("pedido", distinct=True),
+            )
+            .order_by()
+        )
+        with transaction.atomic():
+            travado = list(
+                Contrato._base_manager.select_for_update()
+                .filter(pk=contrato_id).values_list("pk", flat=True)
+            )
+            if not travado:
+                return  # contrato apagado (o resumo vai junto, em cascata)
+            cls.objects.filter(contrato_id=contrato_id, competencia=competencia).delete()
+            cls.objects.bulk_create([
+                cls(
+                    contrato_id=contrato_id,
+                    competencia=competencia,
+                    categoria=linha["material__classificacao"],
+                    valor=linha["valor"],
+                    quantidade=linha["quantidade"],
+                    n_itens=linha["n_itens"],
+                    n_pedidos=linha["n_pedidos"],
+                )
+                for linha in linhas
+            ])
+
 
 # ═════════════════════════════════════════════════════════════════════════════
 # 4. PEDIDO DE MATERIAL
@@ -3,9 +3,13 @@
 Módulo de relatórios gerenciais do Suprimentos (REFATORADO).
 
 Estratégia de performance:
-  - Substitui loops aninhados (N+1) por agregações em lote com
-    values().annotate(), construindo "mapas" em memória.
-  - Reduz de centenas/milhares de queries para um número FIXO (~12).
+  - O gasto vem de ResumoMensalCompra (contrato × mês × categoria),
+    mantido incrementalmente pelos signals — nada de agregar ItemPedido
+    do histórico inteiro a cada relatório.
+  - CuboRelatorio lê gasto, verba e contratos UMA vez para o intervalo
+    todo; cada seção só fatia os "mapas" em memória. O consolidado custa
+    4 queries (cubo + top materiais), qualquer que seja o período.
+  - Filtros por intervalo de competência, não por OR de (ano, mês).
   - Suporta períodos que cruzam anos.
   - Tipagem Decimal consistente com .quantize() na saída.
 """
@@ -15,12 +19,14 @@ from collections import defaultdict
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import date
 
-from django.db.models import Sum, Count, DecimalField, IntegerField, Value
+from django.db.models import Sum, Count, DecimalField, F, IntegerField, Value
 from django.db.models.functions import Coalesce
 from decimal import Decimal
 from django.db.models import Sum
 
-from .models import Contrato, Pedido, VerbaContrato, ItemPedido, CategoriaMaterial
+from .models import (
+    Contrato, Pedido, VerbaContrato, ItemPedido, CategoriaMaterial, ResumoMensalCompra,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +39,7 @@ DEC = DecimalField(max_digits=18, decimal_places=2)
 INT = IntegerField()
 CENTAVO = Decimal("0.01")
 
-STATUS_COMPRA = ["APROVADO", "ENTREGUE", "RECEBIDO"]
+STATUS_COMPRA = ResumoMensalCompra.STATUS_PEDIDO
 
 # Ordem fixa de categorias (cod, label)
 CATEGORIAS = [
@@ -101,6 +107,17 @@ def _meses_periodo(ano_ini, mes_ini, ano_fim, mes_fim):
     return meses
 
 
+def _deslocar(ano, mes, n):
+    """(ano, mes) deslocado de n meses (n negativo volta no tempo)."""
+    total = ano * 12 + (mes - 1) + n
+    return total // 12, total % 12 + 1
+
+
+def _inicio_e_fim(ano_ini, mes_ini, ano_fim, mes_fim):
+    """[primeiro dia do mês inicial, primeiro dia do mês seguinte ao final)."""
+    return date(ano_ini, mes_ini, 1), date(*_deslocar(ano_fim, mes_fim, 1), 1)
+
+
 def _pct(parte, total) -> Decimal:
     parte, total = _D(parte), _D(total)
     if total == ZERO:
@@ -153,13 +170,7 @@ def _filtro_itens(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim):
     """
     from django.db.models import Q
 
-    di = date(ano_ini, mes_ini, 1)
-    # primeiro dia do mês seguinte ao fim
-    if mes_fim == 12:
-        df = date(ano_fim + 1, 1, 1)
-    else:
-        df = date(ano_fim, mes_fim + 1, 1)
-
+    di, df = _inicio_e_fim(ano_ini, mes_ini, ano_fim, mes_fim)
     return Q(
         pedido__contrato_id__in=contrato_ids,
         pedido__status__in=STATUS_COMPRA,
@@ -172,35 +183,20 @@ def _mapa_gasto(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim):
     """
     1 QUERY → mapa[(contrato_id, ano, mes, categoria)] = {'valor':.., 'qtd':..}
     """
+    di, df = _inicio_e_fim(ano_ini, mes_ini, ano_fim, mes_fim)
     qs = (
-        ItemPedido.objects
-        .filter(_filtro_itens(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim))
-        .values(
-            "pedido__contrato_id",
-            "pedido__data_pedido__year",
-            "pedido__data_pedido__month",
-            "material__classificacao",
-        )
-        .annotate(
-            valor=Coalesce(Sum("valor_total"), Value(ZERO), output_field=DEC),
-            qtd=Coalesce(Sum("quantidade"), Value(0), output_field=INT),
-            n_itens=Count("id"),
-            n_pedidos=Count("pedido", distinct=True),
-        )
+        ResumoMensalCompra.objects
+        .filter(contrato_id__in=contrato_ids, competencia__gte=di, competencia__lt=df)
+        .values_list("contrato_id", "competencia", "categoria",
+                     "valor", "quantidade", "n_itens", "n_pedidos")
     )
     mapa = {}
-    for r in qs:
-        chave = (
-            r["pedido__contrato_id"],
-            r["pedido__data_pedido__year"],
-            r["pedido__data_pedido__month"],
-            r["material__classificacao"],
-        )
-        mapa[chave] = {
-            "valor": _D(r["valor"]),
-            "qtd": int(r["qtd"] or 0),
-            "n_itens": r["n_itens"],
-            "n_pedidos": r["n_pedidos"],
+    for cid, competencia, cod, valor, qtd, n_itens, n_pedidos in qs:
+        mapa[(cid, competencia.year, competencia.month, cod)] = {
+            "valor": _D(valor),
+            "qtd": qtd,
+            "n_itens": n_itens,
+            "n_pedidos": n_pedidos,
         }
     return mapa
 
@@ -209,34 +205,61 @@ def _mapa_verba(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim):
     """
     1 QUERY → mapa[(contrato_id, ano, mes, categoria)] = Decimal(verba)
     """
-    from django.db.models import Q
-
-    # Filtro multi-ano por (ano, mes)
-    filtro = Q()
-    for a, m in _meses_periodo(ano_ini, mes_ini, ano_fim, mes_fim):
-        filtro |= Q(ano=a, mes=m)
-    if not filtro:
-        return {}
-
+    # ano*100+mes ordena como (ano, mes): um intervalo só, qualquer período
     qs = (
         VerbaContrato.objects
-        .filter(filtro, contrato_id__in=contrato_ids)
-        .values("contrato_id", "ano", "mes")
-        .annotate(
-            epi=Coalesce(Sum("verba_epi"), Value(ZERO), output_field=DEC),
-            consumo=Coalesce(Sum("verba_consumo"), Value(ZERO), output_field=DEC),
-            ferramenta=Coalesce(Sum("verba_ferramenta"), Value(ZERO), output_field=DEC),
+        .alias(periodo=F("ano") * 100 + F("mes"))
+        .filter(
+            contrato_id__in=contrato_ids,
+            ano__range=(ano_ini, ano_fim),
+            periodo__range=(ano_ini * 100 + mes_ini, ano_fim * 100 + mes_fim),
         )
+        .values_list("contrato_id", "ano", "mes",
+                     "verba_epi", "verba_consumo", "verba_ferramenta")
     )
     mapa = {}
-    for r in qs:
-        base = (r["contrato_id"], r["ano"], r["mes"])
-        mapa[(*base, CategoriaMaterial.EPI)] = _D(r["epi"])
-        mapa[(*base, CategoriaMaterial.CONSUMO)] = _D(r["consumo"])
-        mapa[(*base, CategoriaMaterial.FERRAMENTA)] = _D(r["ferramenta"])
+    for cid, ano, mes, epi, consumo, ferramenta in qs:
+        mapa[(cid, ano, mes, CategoriaMaterial.EPI)] = _D(epi)
+        mapa[(cid, ano, mes, CategoriaMaterial.CONSUMO)] = _D(consumo)
+        mapa[(cid, ano, mes, CategoriaMaterial.FERRAMENTA)] = _D(ferramenta)
     return mapa
 
 
+class CuboRelatorio:
+    """
+    Gasto e verba de um conjunto de contratos num intervalo de meses,
+    lidos uma única vez. As seções recebem o cubo e fatiam os mapas pelo
+    próprio período — o consolidado monta um cubo que cobre todas.
+    """
+
+    def __init__(self, contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim):
+        self.contrato_ids = contrato_ids
+        self.inicio = (ano_ini, mes_ini)
+        self.fim = (ano_fim, mes_fim)
+        self.gasto = _mapa_gasto(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+        self.verba = _mapa_verba(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+        self._contratos = None
+
+    @property
+    def contratos(self):
+        if self._contratos is None:
+            self._contratos = {
+                c.id: c for c in Contrato.objects.filter(id__in=self.contrato_ids)
+            }
+        return self._contratos
+
+    def cobre(self, ano_ini, mes_ini, ano_fim, mes_fim):
+        return self.inicio <= (ano_ini, mes_ini) and (ano_fim, mes_fim) <= self.fim
+
+
+def _cubo_para(cubo, contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim):
+    """O cubo recebido, se cobre o período; senão um novo só para ele."""
+    if (cubo is not None and cubo.contrato_ids == contrato_ids
+            and cubo.cobre(ano_ini, mes_ini, ano_fim, mes_fim)):
+        return cubo
+    return CuboRelatorio(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+
+
 def _g(mapa_gasto, cid, ano, mes, cod):
     """Acesso seguro ao gasto."""
     return mapa_gasto.get((cid, ano, mes, cod), {}).get("valor", ZERO)
@@ -251,7 +274,7 @@ def _v(mapa_verba, cid, ano, mes, cod):
 # 1. QUANTITATIVO
 # ═════════════════════════════════════════════════════════════
 
-def relatorio_quantitativo(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
+def relatorio_quantitativo(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None, cubo=None):
     contrato_ids = _normalizar_contratos(contrato_ids)
     ano_ini, mes_ini, ano_fim, mes_fim = _normalizar_periodo(
         ano, mes_ini, ano_fim, mes_fim
@@ -260,13 +283,15 @@ def relatorio_quantitativo(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
         return _quantitativo_vazio()
 
     meses = _meses_periodo(ano_ini, mes_ini, ano_fim, mes_fim)
-    mapa = _mapa_gasto(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+    cubo = _cubo_para(cubo, contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+    mapa = cubo.gasto
+    no_periodo = set(meses)
 
     # ── Resumo geral por categoria (agrega o mapa) ──
     acc = {cod: {"valor": ZERO, "qtd": 0, "n_itens": 0, "pedidos": set()}
            for cod in CODS}
     for (cid, a, m, cod), v in mapa.items():
-        if cod in acc:
+        if cod in acc and (a, m) in no_periodo:
             acc[cod]["valor"] += v["valor"]
             acc[cod]["qtd"] += v["qtd"]
             acc[cod]["n_itens"] += v["n_itens"]
@@ -319,7 +344,7 @@ def relatorio_quantitativo(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
     )
 
     # ── Por contrato ──
-    contratos = {c.id: c for c in Contrato.objects.filter(id__in=contrato_ids)}
+    contratos = cubo.contratos
     por_contrato = []
     for cid in contrato_ids:
         ct = contratos.get(cid)
@@ -406,7 +431,7 @@ def total_por_tipo(contrato, inicio, fim):
 # 2. QUALITATIVO (Verba × Gasto)
 # ═════════════════════════════════════════════════════════════
 
-def relatorio_qualitativo(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
+def relatorio_qualitativo(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None, cubo=None):
     contrato_ids = _normalizar_contratos(contrato_ids)
     ano_ini, mes_ini, ano_fim, mes_fim = _normalizar_periodo(
         ano, mes_ini, ano_fim, mes_fim
@@ -415,8 +440,8 @@ def relatorio_qualitativo(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
         return _qualitativo_vazio()
 
     meses = _meses_periodo(ano_ini, mes_ini, ano_fim, mes_fim)
-    mg = _mapa_gasto(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
-    mv = _mapa_verba(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+    cubo = _cubo_para(cubo, contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+    mg, mv = cubo.gasto, cubo.verba
 
     # ── Resumo por categoria (período inteiro) ──
     resumo_categorias = []
@@ -461,7 +486,7 @@ def relatorio_qualitativo(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
         evolucao_mensal.append(d)
 
     # ── Por contrato ──
-    contratos = {c.id: c for c in Contrato.objects.filter(id__in=contrato_ids)}
+    contratos = cubo.contratos
     por_contrato = []
     for cid in contrato_ids:
         ct = contratos.get(cid)
@@ -513,7 +538,7 @@ def _qualitativo_vazio():
 # 3. ALERTAS (Gastos acima da meta)
 # ═════════════════════════════════════════════════════════════
 
-def relatorio_alertas(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
+def relatorio_alertas(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None, cubo=None):
     contrato_ids = _normalizar_contratos(contrato_ids)
     ano_ini, mes_ini, ano_fim, mes_fim = _normalizar_periodo(
         ano, mes_ini, ano_fim, mes_fim
@@ -522,10 +547,9 @@ def relatorio_alertas(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
         return {"alertas": [], "total_alertas": 0, "total_excesso_geral": ZERO,
                 "resumo_excesso": [], "contratos_criticos": []}
 
-    meses = _meses_periodo(ano_ini, mes_ini, ano_fim, mes_fim)
-    mg = _mapa_gasto(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
-    mv = _mapa_verba(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
-    contratos = {c.id: c for c in Contrato.objects.filter(id__in=contrato_ids)}
+    meses = set(_meses_periodo(ano_ini, mes_ini, ano_fim, mes_fim))
+    cubo = _cubo_para(cubo, contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+    mg, mv, contratos = cubo.gasto, cubo.verba, cubo.contratos
 
     alertas = []
     excesso_por_cat = defaultdict(lambda: ZERO)
@@ -581,7 +605,7 @@ def relatorio_alertas(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
 # 4. ECONOMIAS
 # ═════════════════════════════════════════════════════════════
 
-def relatorio_economias(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
+def relatorio_economias(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None, cubo=None):
     contrato_ids = _normalizar_contratos(contrato_ids)
     ano_ini, mes_ini, ano_fim, mes_fim = _normalizar_periodo(
         ano, mes_ini, ano_fim, mes_fim
@@ -591,10 +615,9 @@ def relatorio_economias(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
                 "total_economia_geral": ZERO, "resumo_economia": [],
                 "ranking_contratos": []}
 
-    meses = _meses_periodo(ano_ini, mes_ini, ano_fim, mes_fim)
-    mg = _mapa_gasto(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
-    mv = _mapa_verba(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
-    contratos = {c.id: c for c in Contrato.objects.filter(id__in=contrato_ids)}
+    meses = set(_meses_periodo(ano_ini, mes_ini, ano_fim, mes_fim))
+    cubo = _cubo_para(cubo, contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+    mg, mv, contratos = cubo.gasto, cubo.verba, cubo.contratos
 
     economias = []
     economia_por_cat = defaultdict(lambda: ZERO)
@@ -646,7 +669,8 @@ def relatorio_economias(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
 # 5. ESTIMATIVAS / PROJEÇÕES
 # ═════════════════════════════════════════════════════════════
 
-def relatorio_estimativas(contrato_ids, ano, mes_atual, n_historico=6, n_proj=6):
+def relatorio_estimativas(contrato_ids, ano, mes_atual, n_historico=6, n_proj=6,
+                          cubo=None):
     contrato_ids = _normalizar_contratos(contrato_ids)
     if not (1 <= int(mes_atual) <= 12):
         raise ValueError(f"mes_atual inválido: {mes_atual}")
@@ -664,9 +688,11 @@ def relatorio_estimativas(contrato_ids, ano, mes_atual, n_historico=6, n_proj=6)
         meses_hist.append((a, m))
     meses_hist.reverse()
 
+    # Um cubo do primeiro mês de histórico ao último de projeção
     ano_ini, mes_ini = meses_hist[0]
-    ano_fim, mes_fim = meses_hist[-1]
-    mg = _mapa_gasto(contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+    ano_fim, mes_fim = _deslocar(ano, mes_atual, n_proj)
+    cubo = _cubo_para(cubo, contrato_ids, ano_ini, mes_ini, ano_fim, mes_fim)
+    mg = cubo.gasto
 
     # gasto total por (ano, mes, cod) somando contratos
     def gasto_mes(a, m, cod):
@@ -719,9 +745,7 @@ def relatorio_estimativas(contrato_ids, ano, mes_atual, n_historico=6, n_proj=6)
             m_proj, a_proj = 1, a_proj + 1
         meses_proj.append((a_proj, m_proj))
 
-    pa, pm = meses_proj[0]
-    pa_f, pm_f = meses_proj[-1]
-    mv_proj = _mapa_verba(contrato_ids, pa, pm, pa_f, pm_f)
+    mv_proj = cubo.verba
 
     projecao = []
     for (ap, mp) in meses_proj:
@@ -761,6 +785,14 @@ def gerar_relatorio_completo(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
     )
     hoje = date.today()
 
+    # Um cubo para todas as seções: período pedido ∪ janela das estimativas
+    # (6 meses antes e 6 depois do mês corrente)
+    cubo = _cubo_para(
+        None, contrato_ids,
+        *min((ano_ini, mes_ini), _deslocar(ano_ini, hoje.month, -6)),
+        *max((ano_fim, mes_fim), _deslocar(ano_ini, hoje.month, 6)),
+    )
+
     return {
         "parametros": {
             "ano": ano_ini, "ano_fim": ano_fim,
@@ -772,14 +804,14 @@ def gerar_relatorio_completo(contrato_ids, ano, mes_ini, mes_fim, ano_fim=None):
             "gerado_em": hoje,
         },
         "quantitativo": relatorio_quantitativo(
-            contrato_ids, ano_ini, mes_ini, mes_fim, ano_fim),
+            contrato_ids, ano_ini, mes_ini, mes_fim, ano_fim, cubo=cubo),
         "qualitativo": relatorio_qualitativo(
-            contrato_ids, ano_ini, mes_ini, mes_fim, ano_fim),
+            contrato_ids, ano_ini, mes_ini, mes_fim, ano_fim, cubo=cubo),
         "alertas": relatorio_alertas(
-            contrato_ids, ano_ini, mes_ini, mes_fim, ano_fim),
+            contrato_ids, ano_ini, mes_ini, mes_fim, ano_fim, cubo=cubo),
         "economias": relatorio_economias(
-            contrato_ids, ano_ini, mes_ini, mes_fim, ano_fim),
+            contrato_ids, ano_ini, mes_ini, mes_fim, ano_fim, cubo=cubo),
         "estimativas": relatorio_estimativas(
-            contrato_ids, ano_ini, hoje.month),
+            contrato_ids, ano_ini, hoje.month, cubo=cubo),
     }
 
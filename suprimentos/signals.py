@@ -4,13 +4,18 @@ from decimal import Decimal
 import logging
 
 from django.db.models import F
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from django.db import transaction
 
+from core.global_context import invalidar_escopo
 from suprimentos.services import gerar_solicitacoes_do_pedido
-from .models import ItemPedido, Pedido, EstoqueConsumo, CategoriaMaterial
+from .context_processors import ESCOPO_TODAS, escopo_filial
+from .models import (
+    ItemPedido, Pedido, EstoqueConsumo, CategoriaMaterial, SolicitacaoCompra,
+    ResumoMensalCompra,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -191,3 +196,95 @@ def _entrada_ferramenta(item, material, filial, pedido):
     logger.info(f"  ✅ FERRAMENTA: +{item.quantidade} '{ferramenta.nome}' (Ferramenta #{ferramenta.pk})")
 
 
+# ═══════════════════════════════════════════════════════════════════════════
+# CACHE DOS CONTADORES DO MENU (contexto global)
+# ═══════════════════════════════════════════════════════════════════════════
+
+@receiver(post_save, sender=SolicitacaoCompra)
+@receiver(post_delete, sender=SolicitacaoCompra)
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+def invalidar_contadores_suprimentos(sender, instance, **kwargs):
+    """
+    Troca a versão dos contadores da filial afetada e da visão global
+    (Gerência) — usuários de outras filiais mantêm o cache.
+    """
+    invalidar_escopo(ESCOPO_TODAS, escopo_filial(instance.filial_id))
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# RESUMO MENSAL DE COMPRAS (base dos relatórios)
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _agendar_resumo(contrato_id, data_pedido):
+    """
+    Enfileira o recálculo do (contrato, mês) após o commit — rollback não
+    o toca, e uma falha no recálculo não derruba o request que aprovou.
+    """
+    from .tasks import recalcular_resumo_mensal
+
+    competencia = ResumoMensalCompra.competencia_de(data_pedido).isoformat()
+
+    def _enfileirar():
+        try:
+            recalcular_resumo_mensal.delay(contrato_id, competencia)
+        except Exception:
+            # Sem broker: o comando recalcular_resumo_compras reconstrói
+            logger.warning(
+                f"Falha ao enfileirar o resumo do contrato {contrato_id} ({competencia})",
+                exc_info=True,
+            )
+
+    transaction.on_commit(_enfileirar)
+
+
+@receiver(pre_save, sender=Pedido)
+def pedido_guardar_estado_resumo(sender, instance, **kwargs):
+    """Guarda contrato/status do banco para o post_save comparar."""
+    instance._resumo_anterior = None
+    if instance.pk:
+        instance._resumo_anterior = (
+            Pedido.objects.all_filiais().filter(pk=instance.pk)
+            .values_list("contrato_id", "status")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Pedido)
+def pedido_atualizar_resumo(sender, instance, created, **kwargs):
+    """
+    Só mudanças que movem gasto entre (contrato, mês) recalculam: entrar
+    ou sair de STATUS_PEDIDO, ou trocar de contrato já contabilizado.
+    """
+    anterior = getattr(instance, "_resumo_anterior", None)
+    if created or anterior is None:
+        return
+    contrato_anterior, status_anterior = anterior
+    contava = status_anterior in ResumoMensalCompra.STATUS_PEDIDO
+    conta = instance.status in ResumoMensalCompra.STATUS_PEDIDO
+    if contava == conta and (not conta or contrato_anterior == instance.contrato_id):
+        return
+
+    if contava:
+        _agendar_resumo(contrato_anterior, instance.data_pedido)
+    if conta and (not contava or contrato_anterior != instance.contrato_id):
+        _agendar_resumo(instance.contrato_id, instance.data_pedido)
+
+
+@receiver(post_delete, sender=Pedido)
+def pedido_excluido_atualizar_resumo(sender, instance, **kwargs):
+    if instance.status in ResumoMensalCompra.STATUS_PEDIDO:
+        _agendar_resumo(instance.contrato_id, instance.data_pedido)
+
+
+@receiver(post_save, sender=ItemPedido)
+@receiver(post_delete, sender=ItemPedido)
+def item_pedido_atualizar_resumo(sender, instance, **kwargs):
+    """Itens editados num pedido já contabilizado (raro: em geral RASCUNHO)."""
+    pedido = (
+        Pedido.objects.all_filiais().filter(pk=instance.pedido_id)
+        .values("contrato_id", "status", "data_pedido")
+        .first()
+    )
+    if pedido and pedido["status"] in ResumoMensalCompra.STATUS_PEDIDO:
+        _agendar_resumo(pedido["contrato_id"], pedido["data_pedido"])
@@ -0,0 +1,23 @@
+# suprimentos/tasks.py
+"""
+Tasks Celery do app suprimentos.
+
+Disparada pelos signals de Pedido/ItemPedido:
+- recalcular_resumo_mensal: refaz um (contrato, mês) de ResumoMensalCompra
+"""
+
+import logging
+
+from celery import shared_task
+from django.utils.dateparse import parse_date
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='suprimentos.recalcular_resumo_mensal')
+def recalcular_resumo_mensal(contrato_id, competencia):
+    """Recalcula o resumo de um (contrato, mês); `competencia` em ISO (AAAA-MM-DD)."""
+    from .models import ResumoMensalCompra
+
+    ResumoMensalCompra.recalcular(contrato_id, parse_date(competencia))
+    logger.debug(f'[Resumo] Contrato {contrato_id} — {competencia} recalculado')
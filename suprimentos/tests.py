@@ -0,0 +1,208 @@
+# suprimentos/tests.py
+"""
+Testes do app suprimentos.
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from usuario.models import Filial
+
+from .models import (
+    CategoriaMaterial, Contrato, Cotacao, ItemPedido, ItemPedidoCompra, ItemSolicitacao,
+    Material, Parceiro, Pedido, PedidoCompra, ResumoMensalCompra, SolicitacaoCompra,
+    VerbaContrato,
+)
+from .relatorios import gerar_relatorio_completo, relatorio_qualitativo
+
+User = get_user_model()
+
+
+class VerbaContratoConsumoTest(TestCase):
+    """VerbaContrato.objects.with_consumo() × properties compra_*/saldo_*."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome="Filial Verba")
+        cls.user = User.objects.create_user(
+            username="comprador", email="comprador@example.com", password="x",
+        )
+        cls.fornecedor = Parceiro.objects.create(nome_fantasia="Fornecedor", eh_fornecedor=True)
+        cls.contrato = Contrato.objects.create(cm="CM-1", cliente="Cliente", filial=cls.filial)
+        cls.materiais = {
+            cat: Material.objects.create(descricao=f"Material {cat}", classificacao=cat)
+            for cat in CategoriaMaterial.values
+        }
+
+    def _comprar(self, classificacao, valor, emissao, status=PedidoCompra.StatusPC.EMITIDO):
+        pedido = Pedido.objects.create(
+            contrato=self.contrato, filial=self.filial, solicitante=self.user,
+        )
+        solicitacao = SolicitacaoCompra.objects.create(
+            pedido=pedido, contrato=self.contrato, descricao_material="Compra", solicitante=self.user,
+        )
+        material = self.materiais[classificacao]
+        item_sol = ItemSolicitacao.objects.create(
+            solicitacao=solicitacao, material=material, quantidade=Decimal("1"),
+        )
+        cotacao = Cotacao.objects.create(
+            item_solicitacao=item_sol, fornecedor=self.fornecedor,
+            valor_unitario=valor, criado_por=self.user,
+        )
+        pc = PedidoCompra.objects.create(
+            solicitacao=solicitacao, fornecedor=self.fornecedor, status=status,
+            data_emissao=emissao, criado_por=self.user,
+        )
+        ItemPedidoCompra.objects.create(
+            pedido_compra=pc, cotacao=cotacao, item_solicitacao=item_sol,
+            material=material, quantidade=Decimal("1"), valor_unitario=valor,
+        )
+
+    def test_anotacao_igual_as_properties(self):
+        verba = VerbaContrato.objects.create(
+            contrato=self.contrato, ano=2026, mes=3,
+            verba_epi=Decimal("1000.00"), verba_consumo=Decimal("500.00"),
+        )
+        self._comprar(CategoriaMaterial.EPI, Decimal("300.00"), date(2026, 3, 5))
+        self._comprar(CategoriaMaterial.EPI, Decimal("50.00"), date(2026, 3, 20))
+        self._comprar(CategoriaMaterial.CONSUMO, Decimal("80.00"), date(2026, 3, 10))
+        # Fora do mês e PC em rascunho não contam
+        self._comprar(CategoriaMaterial.EPI, Decimal("999.00"), date(2026, 4, 1))
+        self._comprar(
+            CategoriaMaterial.FERRAMENTA, Decimal("999.00"), date(2026, 3, 1),
+            status=PedidoCompra.StatusPC.RASCUNHO,
+        )
+
+        anotada = VerbaContrato.objects.with_consumo().get(pk=verba.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(anotada.compra_epi, Decimal("350.00"))
+            self.assertEqual(anotada.compra_consumo, Decimal("80.00"))
+            self.assertEqual(anotada.compra_ferramenta, Decimal("0.00"))
+            self.assertEqual(anotada.saldo_epi, Decimal("650.00"))
+            self.assertEqual(anotada.saldo_total, Decimal("1070.00"))
+
+        simples = VerbaContrato.objects.get(pk=verba.pk)
+        self.assertEqual(simples.compra_total, anotada.compra_total)
+        self.assertEqual(simples.saldo_total, anotada.saldo_total)
+
+    def test_listagem_custo_constante(self):
+        for mes in range(1, 13):
+            VerbaContrato.objects.create(contrato=self.contrato, ano=2025, mes=mes)
+            self._comprar(CategoriaMaterial.EPI, Decimal("10.00"), date(2025, mes, 1))
+
+        with CaptureQueriesContext(connection) as ctx:
+            verbas = list(VerbaContrato.objects.with_consumo())
+            totais = [(v.compra_total, v.saldo_total) for v in verbas]
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(totais, [(Decimal("10.00"), Decimal("-10.00"))] * 12)
+
+
+class ResumoMensalCompraTest(TestCase):
+    """Resumo mantido pelos signals de Pedido e relatórios lidos dele."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome="Filial Resumo")
+        cls.user = User.objects.create_user(
+            username="solicitante", email="solicitante@example.com", password="x",
+        )
+        cls.contrato = Contrato.objects.create(cm="CM-R", cliente="Cliente", filial=cls.filial)
+        cls.outro = Contrato.objects.create(cm="CM-S", cliente="Outro", filial=cls.filial)
+        cls.epi = Material.objects.create(descricao="Luva", classificacao=CategoriaMaterial.EPI)
+        cls.consumo = Material.objects.create(descricao="Cimento", classificacao=CategoriaMaterial.CONSUMO)
+
+    def _pedido(self, contrato, itens, status=Pedido.StatusChoices.ENTREGUE):
+        """Pedido montado em rascunho e depois efetivado, como na tela."""
+        pedido = Pedido.objects.create(contrato=contrato, filial=self.filial, solicitante=self.user)
+        for material, quantidade, valor in itens:
+            ItemPedido.objects.create(
+                pedido=pedido, material=material, quantidade=quantidade, valor_unitario=valor,
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.status = status
+            pedido.save()
+        return pedido
+
+    def _resumo(self, contrato):
+        return {
+            r.categoria: (r.valor, r.quantidade, r.n_pedidos)
+            for r in ResumoMensalCompra.objects.filter(contrato=contrato)
+        }
+
+    def test_status_efetivado_entra_e_cancelado_sai(self):
+        pedido = self._pedido(self.contrato, [(self.epi, 2, Decimal("10.00")), (self.consumo, 1, Decimal("5.00"))])
+        self._pedido(self.contrato, [(self.epi, 1, Decimal("4.00"))])
+        self._pedido(self.contrato, [(self.epi, 9, Decimal("9.00"))], status=Pedido.StatusChoices.PENDENTE)
+
+        self.assertEqual(self._resumo(self.contrato), {
+            CategoriaMaterial.EPI: (Decimal("24.00"), 3, 2),
+            CategoriaMaterial.CONSUMO: (Decimal("5.00"), 1, 1),
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.status = Pedido.StatusChoices.CANCELADO
+            pedido.save()
+        self.assertEqual(self._resumo(self.contrato), {
+            CategoriaMaterial.EPI: (Decimal("4.00"), 1, 1),
+        })
+
+    def test_troca_de_contrato_move_o_gasto(self):
+        pedido = self._pedido(self.contrato, [(self.epi, 1, Decimal("7.00"))])
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.contrato = self.outro
+            pedido.save()
+        self.assertEqual(self._resumo(self.contrato), {})
+        self.assertEqual(self._resumo(self.outro), {CategoriaMaterial.EPI: (Decimal("7.00"), 1, 1)})
+
+    def test_falha_ao_enfileirar_nao_derruba_a_aprovacao(self):
+        with patch("suprimentos.tasks.recalcular_resumo_mensal.delay", side_effect=ConnectionError):
+            pedido = self._pedido(self.contrato, [(self.epi, 1, Decimal("3.00"))])
+
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.status, Pedido.StatusChoices.ENTREGUE)
+        self.assertEqual(self._resumo(self.contrato), {})
+
+        # Recalcular de novo o mesmo mês não duplica as linhas
+        competencia = ResumoMensalCompra.competencia_de(pedido.data_pedido)
+        ResumoMensalCompra.recalcular(self.contrato.pk, competencia)
+        ResumoMensalCompra.recalcular(self.contrato.pk, competencia)
+        self.assertEqual(self._resumo(self.contrato), {CategoriaMaterial.EPI: (Decimal("3.00"), 1, 1)})
+
+    def test_comando_reconstroi(self):
+        self._pedido(self.contrato, [(self.epi, 3, Decimal("2.00"))])
+        ResumoMensalCompra.objects.all().delete()
+        call_command("recalcular_resumo_compras", stdout=StringIO())
+        self.assertEqual(self._resumo(self.contrato), {CategoriaMaterial.EPI: (Decimal("6.00"), 3, 1)})
+
+    def test_relatorio_completo_le_o_cubo_uma_vez(self):
+        hoje = timezone.localdate()
+        self._pedido(self.contrato, [(self.epi, 2, Decimal("50.00"))])
+        self._pedido(self.outro, [(self.consumo, 1, Decimal("30.00"))])
+        VerbaContrato.objects.create(
+            contrato=self.contrato, ano=hoje.year, mes=hoje.month, verba_epi=Decimal("80.00"),
+        )
+        ids = [self.contrato.pk, self.outro.pk]
+
+        # período de 3 anos: o custo não cresce com o número de meses
+        with CaptureQueriesContext(connection) as ctx:
+            relatorio = gerar_relatorio_completo(ids, hoje.year - 2, 1, hoje.month, hoje.year)
+        self.assertEqual(len(ctx.captured_queries), 4)
+
+        qualitativo = relatorio["qualitativo"]
+        self.assertEqual(qualitativo["total_gasto_geral"], Decimal("130.00"))
+        self.assertEqual(qualitativo["total_verba_geral"], Decimal("80.00"))
+        self.assertEqual(relatorio["alertas"]["total_alertas"], 1)
+        self.assertEqual(relatorio["alertas"]["alertas"][0]["excesso"], Decimal("20.00"))
+        self.assertEqual(relatorio["quantitativo"]["total_geral_valor"], Decimal("130.00"))
+
+        # Seção avulsa monta o próprio cubo e chega ao mesmo resultado
+        avulso = relatorio_qualitativo(ids, hoje.year - 2, 1, hoje.month, hoje.year)
+        self.assertEqual(avulso["evolucao_mensal"], qualitativo["evolucao_mensal"])
@@ -283,6 +283,7 @@ class PedidoDetailView(LoginRequiredMixin, DetailView):
         # ── Localiza a verba do contrato no mês/ano do pedido ──
         verba = (
             VerbaContrato.objects
+            .with_consumo()
             .filter(
                 contrato=pedido.contrato,
                 ano=pedido.data_pedido.year,
@@ -2534,6 +2535,7 @@ class VerbaContratoListView(LoginRequiredMixin,
         qs = (
             VerbaContrato.objects
             .select_related("contrato", "contrato__filial")
+            .with_consumo()
             .order_by("-ano", "-mes", "contrato__cm")
         )
         contrato_id = self.request.GET.get("contrato")
@@ -2558,6 +2560,9 @@ class VerbaContratoDetailView(LoginRequiredMixin, DetailView):
     template_name = "suprimentos/verba_detail.html"
     context_object_name = "verba"
 
+    def get_queryset(self):
+        return VerbaContrato.objects.select_related("contrato").with_consumo()
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         v = self.object
@@ -2602,6 +2607,7 @@ class VerbaContratoDetailView(LoginRequiredMixin, DetailView):
 
         anterior = (
             VerbaContrato.objects
+            .with_consumo()
             .filter(contrato=v.contrato, ano=ano_ant, mes=mes_ant)
             .first()
         )
@@ -112,7 +112,7 @@ class Command(BaseCommand):
             duracao = time.time() - inicio
 
             if isinstance(resultado, dict):
-                total = resultado.get('total_marcadas', resultado.get('total', 0))
+                total = resultado.get('atualizadas', 0)
                 self._print_sucesso(f'{total} tarefa(s) marcada(s) como atrasada(s)')
 
                 if verbose and resultado.get('tarefas'):
@@ -144,11 +144,11 @@ class Command(BaseCommand):
                 self._print_aviso('Modo dry-run: simulação ativa')
 
             inicio = time.time()
-            resultado = gerar_recorrencias_pendentes()
+            resultado = gerar_recorrencias_pendentes(distribuir=False)
             duracao = time.time() - inicio
 
             if isinstance(resultado, dict):
-                total = resultado.get('total_geradas', resultado.get('total', 0))
+                total = resultado.get('geradas', 0)
                 self._print_sucesso(f'{total} recorrência(s) gerada(s)')
 
                 if verbose and resultado.get('tarefas'):
@@ -187,7 +187,7 @@ class Command(BaseCommand):
             duracao = time.time() - inicio
 
             if isinstance(resultado, dict):
-                total = resultado.get('total_enviados', resultado.get('total', 0))
+                total = resultado.get('enviados', 0)
                 self._print_sucesso(f'{total} lembrete(s) enviado(s)')
 
                 if verbose and resultado.get('lembretes'):
@@ -51,6 +51,17 @@ class Tarefas(models.Model):
     MAX_RECORRENCIAS_POR_RAIZ = 500
     DIAS_AVISO_FIM_PADRAO = 30
 
+    # Intervalo entre ocorrências de cada frequência
+    DELTAS_FREQUENCIA = {
+        'diaria':     timedelta(days=1),
+        'semanal':    timedelta(weeks=1),
+        'quinzenal':  timedelta(weeks=2),
+        'mensal':     timedelta(days=30),
+        'trimestral': timedelta(days=90),
+        'semestral':  timedelta(days=180),
+        'anual':      timedelta(days=365),
+    }
+
     # ─── Identificação ────────────────────────────────────────
     titulo      = models.CharField('Título', max_length=200)
     descricao   = models.TextField('Descrição', blank=True)
@@ -280,16 +291,7 @@ class Tarefas(models.Model):
 
         base = base_prazo or self.prazo or timezone.now()
 
-        delta_map = {
-            'diaria':     timedelta(days=1),
-            'semanal':    timedelta(weeks=1),
-            'quinzenal':  timedelta(weeks=2),
-            'mensal':     timedelta(days=30),
-            'trimestral': timedelta(days=90),
-            'semestral':  timedelta(days=180),
-            'anual':      timedelta(days=365),
-        }
-        delta = delta_map.get(raiz.frequencia_recorrencia)
+        delta = self.DELTAS_FREQUENCIA.get(raiz.frequencia_recorrencia)
         return base + delta if delta else None
 
     def _ultima_ocorrencia_gerada(self):
@@ -357,19 +359,35 @@ class Tarefas(models.Model):
         ultima = self._ultima_ocorrencia_gerada()
         novo_prazo = self._calcular_proximo_prazo(base_prazo=ultima.prazo)
 
+        nova = raiz.montar_ocorrencia(novo_prazo)
+        nova.save()
+
+        # Copiar participantes
+        if raiz.participantes.exists():
+            nova.participantes.set(raiz.participantes.all())
+
+        return nova
+
+    def montar_ocorrencia(self, novo_prazo):
+        """
+        Monta (sem salvar) a ocorrência da raiz com prazo `novo_prazo`.
+        Usado também pelo fallback em lote, que grava com bulk_create.
+        """
+        raiz = self.tarefa_raiz
+
         # Calcular novo data_inicio mantendo a diferença original
         novo_inicio = None
         if raiz.data_inicio and raiz.prazo:
             diff = raiz.prazo - raiz.data_inicio
             novo_inicio = novo_prazo - diff
 
-        nova = Tarefas.objects.create(
+        return Tarefas(
             titulo=raiz.titulo,
             descricao=raiz.descricao,
             ata_reuniao=raiz.ata_reuniao,
-            usuario=raiz.usuario,
-            responsavel=raiz.responsavel,
-            filial=raiz.filial,
+            usuario_id=raiz.usuario_id,
+            responsavel_id=raiz.responsavel_id,
+            filial_id=raiz.filial_id,
             projeto=raiz.projeto,
             status='pendente',
             prioridade=raiz.prioridade,
@@ -384,12 +402,6 @@ class Tarefas(models.Model):
             tarefa_recorrencia_pai=raiz,
         )
 
-        # Copiar participantes
-        if raiz.participantes.exists():
-            nova.participantes.set(raiz.participantes.all())
-
-        return nova
-
     def encerrar_recorrencia(self, motivo=''):
         """Encerra a recorrência sem deletar tarefas."""
         raiz = self.tarefa_raiz
@@ -0,0 +1,228 @@
+# tarefas/recorrencia.py
+"""
+Planejador em lote do fallback de recorrências.
+
+O fallback antigo percorria cada tarefa-raiz ativa e fazia, por raiz, a
+consulta da última filha, a validação do model e um `create()` + `set()`
+de participantes — e parava em 50 por execução, então bases grandes
+ficavam dias atrasadas.
+
+Aqui uma única consulta anotada (subqueries da última filha e do total
+de filhas por raiz) devolve só as raízes vencidas; cada lote vira um
+`bulk_create` das ocorrências e outro dos participantes. O trabalho é
+dividido por filial para que cada worker do Celery processe uma.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, IntegerField, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Tarefas
+
+logger = logging.getLogger(__name__)
+
+
+def _tamanho_lote():
+    return getattr(settings, 'TAREFAS_RECORRENCIAS_POR_LOTE', 500)
+
+
+def raizes_vencidas(agora=None):
+    """
+    Tarefas-raiz que precisam da próxima ocorrência, anotadas com a
+    última filha (`ultima_filha_id`, `_status`, `_prazo`) e `total_filhas`.
+
+    Mesma regra do fallback por raiz: a última ocorrência já venceu e,
+    se for filha, está concluída ou cancelada. Raiz que nunca gerou filha
+    e já venceu gera a primeira.
+    """
+    if agora is None:
+        agora = timezone.now()
+
+    filhas = Tarefas.objects.filter(
+        tarefa_recorrencia_pai=OuterRef('pk'),
+    ).order_by('-prazo', '-data_criacao')
+
+    total_filhas = (
+        Tarefas.objects.filter(tarefa_recorrencia_pai=OuterRef('pk'))
+        .order_by()
+        .values('tarefa_recorrencia_pai')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+
+    return (
+        Tarefas.objects.filter(
+            recorrente=True,
+            recorrencia_encerrada=False,
+            tarefa_recorrencia_pai__isnull=True,
+        )
+        .exclude(status='cancelada')
+        .filter(frequencia_recorrencia__in=Tarefas.DELTAS_FREQUENCIA)
+        .annotate(
+            ultima_filha_id=Subquery(filhas.values('pk')[:1]),
+            ultima_filha_status=Subquery(filhas.values('status')[:1]),
+            ultima_filha_prazo=Subquery(filhas.values('prazo')[:1]),
+            total_filhas=Coalesce(
+                Subquery(total_filhas, output_field=IntegerField()), Value(0),
+            ),
+        )
+        .filter(
+            Q(ultima_filha_id__isnull=True)
+            | Q(ultima_filha_status__in=('concluida', 'cancelada'))
+        )
+        .filter(
+            # Sem filha vale o prazo da raiz; sem prazo nenhum, gera a partir de agora
+            Q(ultima_filha_id__isnull=True, prazo__isnull=True)
+            | Q(ultima_filha_id__isnull=True, prazo__lte=agora)
+            | Q(ultima_filha_id__isnull=False, ultima_filha_prazo__isnull=True)
+            | Q(ultima_filha_prazo__lte=agora)
+        )
+    )
+
+
+def filiais_com_recorrencias_vencidas(agora=None):
+    """IDs das filiais que têm ao menos uma raiz vencida."""
+    return list(
+        raizes_vencidas(agora)
+        .order_by()
+        .values_list('filial_id', flat=True)
+        .distinct()
+    )
+
+
+def _proximo_prazo(raiz, agora):
+    """Mesmo cálculo de `Tarefas._calcular_proximo_prazo`, sem consultar a última filha."""
+    base = raiz.ultima_filha_prazo if raiz.ultima_filha_id else raiz.prazo
+    return (base or agora) + Tarefas.DELTAS_FREQUENCIA[raiz.frequencia_recorrencia]
+
+
+def _ultrapassa_fim(raiz, prazo):
+    if raiz.total_filhas >= Tarefas.MAX_RECORRENCIAS_POR_RAIZ:
+        return True
+    return bool(raiz.data_fim_recorrencia and prazo.date() > raiz.data_fim_recorrencia)
+
+
+def _gravar_lote(raizes, agora):
+    """
+    Grava as ocorrências de um lote de raízes (já travadas pelo chamador).
+    Retorna (novas, ids das raízes encerradas).
+    """
+    novas, encerradas = [], []
+    for raiz in raizes:
+        prazo = _proximo_prazo(raiz, agora)
+        if _ultrapassa_fim(raiz, prazo):
+            encerradas.append(raiz.pk)
+        else:
+            novas.append(raiz.montar_ocorrencia(prazo))
+
+    if encerradas:
+        Tarefas.objects.filter(pk__in=encerradas).update(recorrencia_encerrada=True)
+    if not novas:
+        return [], encerradas
+
+    Tarefas.objects.bulk_create(novas, batch_size=_tamanho_lote())
+
+    raiz_ids = [nova.tarefa_recorrencia_pai_id for nova in novas]
+    if novas[0].pk is None:
+        # MySQL não devolve os ids do bulk_create: a raiz está travada,
+        # então a filha mais recente de cada uma é a que acabou de ser criada
+        ids = dict(
+            Tarefas.objects.filter(tarefa_recorrencia_pai_id__in=raiz_ids)
+            .values('tarefa_recorrencia_pai_id')
+            .annotate(ultima=Max('pk'))
+            .values_list('tarefa_recorrencia_pai_id', 'ultima')
+        )
+        for nova in novas:
+            nova.pk = ids[nova.tarefa_recorrencia_pai_id]
+
+    # Participantes da raiz copiados para a filha, numa consulta e um INSERT
+    Participante = Tarefas.participantes.through
+    participantes = {}
+    for raiz_id, usuario_id in Participante.objects.filter(
+        tarefas_id__in=raiz_ids,
+    ).values_list('tarefas_id', 'usuario_id'):
+        participantes.setdefault(raiz_id, []).append(usuario_id)
+
+    Participante.objects.bulk_create(
+        [
+            Participante(tarefas_id=nova.pk, usuario_id=usuario_id)
+            for nova in novas
+            for usuario_id in participantes.get(nova.tarefa_recorrencia_pai_id, ())
+        ],
+        batch_size=_tamanho_lote(),
+    )
+    return novas, encerradas
+
+
+def _notificar_novas(ids):
+    """Avisa os interessados de cada ocorrência gerada (fora da transação do lote)."""
+    from notifications.services import notificar_tarefa_recorrente_gerada
+
+    novas = (
+        Tarefas.objects.filter(pk__in=ids)
+        .select_related('usuario', 'responsavel', 'tarefa_recorrencia_pai')
+        .prefetch_related('participantes')
+    )
+    for nova in novas:
+        try:
+            notificar_tarefa_recorrente_gerada(
+                tarefa_nova=nova, tarefa_raiz=nova.tarefa_recorrencia_pai,
+            )
+        except Exception as e:
+            logger.error(
+                f'Erro ao notificar recorrência gerada #{nova.pk}: {e}',
+                exc_info=True
+            )
+
+
+def gerar_recorrencias_da_filial(filial_id, agora=None, tamanho_lote=None):
+    """
+    Gera a próxima ocorrência de todas as raízes vencidas da filial.
+
+    Percorre as raízes por pk em lotes de `tamanho_lote`; cada lote trava
+    suas raízes (SKIP LOCKED onde o banco suporta, para dois workers na
+    mesma filial não gerarem em dobro) e grava tudo numa transação. Cada
+    raiz ganha no máximo uma ocorrência por execução, como antes.
+    """
+    if agora is None:
+        agora = timezone.now()
+    tamanho_lote = tamanho_lote or _tamanho_lote()
+
+    raizes = raizes_vencidas(agora).filter(filial_id=filial_id).order_by('pk')
+    resultado = {'geradas': 0, 'encerradas': 0, 'erros': 0, 'lotes': 0}
+    ultimo_pk = 0
+
+    while True:
+        lote = []
+        try:
+            with transaction.atomic():
+                lote = list(
+                    raizes.filter(pk__gt=ultimo_pk)
+                    .select_for_update(skip_locked=True)[:tamanho_lote]
+                )
+                if not lote:
+                    break
+                ultimo_pk = lote[-1].pk
+                novas, encerradas = _gravar_lote(lote, agora)
+        except Exception as e:
+            if not lote:
+                raise
+            # O lote volta inteiro para a próxima execução
+            resultado['erros'] += len(lote)
+            logger.error(
+                f'[Fallback] Erro no lote de raízes da filial {filial_id} '
+                f'(até #{ultimo_pk}): {e}',
+                exc_info=True
+            )
+            continue
+
+        resultado['lotes'] += 1
+        resultado['geradas'] += len(novas)
+        resultado['encerradas'] += len(encerradas)
+        _notificar_novas([nova.pk for nova in novas])
+
+    return resultado
@@ -11,12 +11,17 @@ Tasks agendadas (Celery Beat):
 """
 
 import logging
+import time
+from contextlib import contextmanager
 from datetime import timedelta
 
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
+from core.importacao import em_lotes
+
 
 logger = logging.getLogger(__name__)
 
@@ -38,101 +43,115 @@ def _garantir_aware(dt):
     return dt
 
 
+def _tamanho_lote():
+    return getattr(settings, 'TAREFAS_ROTINAS_POR_LOTE', 500)
+
+
+@contextmanager
+def _medir(rotina):
+    """
+    Cronometra a rotina e publica as métricas no log ao final.
+
+    O dict devolvido é preenchido pela rotina (contagens de linhas) e
+    ganha `duracao_ms`; ele mesmo serve de retorno da task.
+    """
+    metricas = {}
+    inicio = time.perf_counter()
+    try:
+        yield metricas
+    finally:
+        metricas['duracao_ms'] = round((time.perf_counter() - inicio) * 1000)
+        logger.info(
+            f'[Métricas] {rotina}: {metricas}',
+            extra={'rotina': rotina, 'metricas': dict(metricas)},
+        )
+
+
+def _reivindicar(candidatas, campo, agora):
+    """
+    Marca `campo`=agora nas candidatas e devolve os pks marcados por ESTA
+    execução.
+
+    A marcação é a chave de idempotência das rotinas de aviso: cada lote
+    trava as linhas (SKIP LOCKED onde o banco suporta) e só atualiza as
+    que ainda estão vazias, então execuções sobrepostas do beat nunca
+    reivindicam — nem notificam — a mesma tarefa duas vezes.
+    """
+    from .models import Tarefas
+
+    reivindicadas = []
+    ultimo_pk = 0
+    while True:
+        with transaction.atomic():
+            pks = list(
+                candidatas.filter(pk__gt=ultimo_pk)
+                .order_by('pk')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:_tamanho_lote()]
+            )
+            if not pks:
+                return reivindicadas
+            ultimo_pk = pks[-1]
+            # Relê travado: só fica com as que seguem vazias (outra execução
+            # pode ter marcado alguma entre a seleção das candidatas e a trava)
+            livres = list(
+                Tarefas.objects.filter(pk__in=pks, **{f'{campo}__isnull': True})
+                .select_for_update()
+                .values_list('pk', flat=True)
+            )
+            Tarefas.objects.filter(pk__in=livres).update(**{campo: agora})
+        reivindicadas.extend(livres)
+
+
 # =============================================================================
 # TASK 1 — Fallback de geração de recorrências
 # =============================================================================
 
 @shared_task(name='tarefas.gerar_recorrencias_pendentes')
-def gerar_recorrencias_pendentes():
+def gerar_recorrencias_pendentes(distribuir=True):
     """
     FALLBACK diário: garante que recorrências sejam geradas mesmo se
     o signal de conclusão falhar ou se uma ocorrência ficar "esquecida".
 
-    Para cada tarefa-RAIZ ativa, verifica se a última ocorrência (ou ela mesma)
-    tem prazo no passado E não há próxima ocorrência criada → gera.
+    Uma consulta acha as filiais com tarefas-RAIZ vencidas (última
+    ocorrência com prazo no passado e concluída/cancelada, ou raiz vencida
+    que nunca gerou filha) e dispara `gerar_recorrencias_filial` para cada
+    uma — a vazão cresce com o número de workers.
+
+    Com `distribuir=False` processa as filiais aqui mesmo e soma os
+    resultados (usado pelo command de rotinas manuais).
 
     Limites de segurança:
-    - Máximo TAREFAS_MAX_RECORRENCIAS_POR_EXECUCAO por execução
+    - Uma ocorrência por raiz por execução
     - Respeita MAX_RECORRENCIAS_POR_RAIZ do model
     """
-    from .models import Tarefas
-    from .signals import gerar_recorrencia_se_aplicavel
-
-    limite_execucao = getattr(
-        settings, 'TAREFAS_MAX_RECORRENCIAS_POR_EXECUCAO', 50
-    )
-
-    raizes_ativas = Tarefas.objects.filter(
-        recorrente=True,
-        recorrencia_encerrada=False,
-        tarefa_recorrencia_pai__isnull=True,
-    ).exclude(
-        status__in=('cancelada',)
-    )
-
-    agora = timezone.now()
-    total_candidatas = raizes_ativas.count()
-
-    geradas = 0
-    erros = 0
-    encerradas = 0
-    verificadas = 0
-
-    for raiz in raizes_ativas.iterator():
-        if geradas >= limite_execucao:
-            logger.warning(
-                f'Limite de {limite_execucao} recorrências por execução atingido. '
-                f'Restantes serão processadas na próxima execução.'
-            )
-            break
-
-        verificadas += 1
+    from .recorrencia import filiais_com_recorrencias_vencidas
+
+    filiais = filiais_com_recorrencias_vencidas()
+
+    if distribuir:
+        for filial_id in filiais:
+            gerar_recorrencias_filial.delay(filial_id)
+        resultado = {'filiais_despachadas': len(filiais)}
+        logger.info(f'[Fallback Recorrências] Despachado: {resultado}')
+        return resultado
+
+    resultado = {'geradas': 0, 'encerradas': 0, 'erros': 0, 'lotes': 0}
+    for filial_id in filiais:
+        for chave, valor in gerar_recorrencias_filial(filial_id).items():
+            resultado[chave] += valor
+    resultado['total_filiais'] = len(filiais)
+    logger.info(f'[Fallback Recorrências] Concluído: {resultado}')
+    return resultado
 
-        try:
-            ultima = raiz.recorrencias_filhas.order_by('-prazo').first() or raiz
-
-            # Se a última ainda está no futuro, não precisa gerar agora
-            prazo_ultima = _garantir_aware(ultima.prazo)
-            if prazo_ultima and prazo_ultima > agora:
-                continue
-
-            # Regra de geração:
-            # - Com ocorrências filhas: só gera a próxima se a última estiver
-            #   concluída/cancelada.
-            # - Raiz que NUNCA gerou ocorrência e já está vencida: gera a
-            #   primeira (exceção para não travar a recorrência).
-            if ultima.pk != raiz.pk and ultima.status not in ('concluida', 'cancelada'):
-                continue
-
-            pode, motivo = ultima.pode_gerar_proxima()
-            if not pode:
-                if 'fim' in motivo.lower() or 'limite' in motivo.lower():
-                    encerradas += 1
-                continue
-
-            nova = gerar_recorrencia_se_aplicavel(ultima)
-            if nova:
-                geradas += 1
-                logger.info(
-                    f'[Fallback] Recorrência gerada: tarefa #{nova.pk} '
-                    f'(raiz #{raiz.pk}, prazo: {nova.prazo})'
-                )
 
-        except Exception as e:
-            erros += 1
-            logger.error(
-                f'[Fallback] Erro ao processar raiz #{raiz.pk}: {e}',
-                exc_info=True
-            )
+@shared_task(name='tarefas.gerar_recorrencias_filial')
+def gerar_recorrencias_filial(filial_id):
+    """Gera, em lotes com bulk_create, as recorrências vencidas de uma filial."""
+    from .recorrencia import gerar_recorrencias_da_filial
 
-    resultado = {
-        'geradas': geradas,
-        'encerradas': encerradas,
-        'erros': erros,
-        'total_raizes_verificadas': verificadas,
-        'total_raizes_candidatas': total_candidatas,
-    }
-    logger.info(f'[Fallback Recorrências] Concluído: {resultado}')
+    resultado = gerar_recorrencias_da_filial(filial_id)
+    logger.info(f'[Fallback Recorrências] Filial {filial_id}: {resultado}')
     return resultado
 
 
@@ -146,77 +165,60 @@ def enviar_lembretes_prazo():
     Envia lembretes para tarefas com prazo próximo, conforme campo `dias_lembrete`.
 
     Lógica:
-    - Para cada tarefa ativa com dias_lembrete > 0
-    - Calcula data alvo do lembrete = prazo - dias_lembrete dias
-    - Se hoje >= data_alvo E lembrete_enviado_em IS NULL → envia e marca
+    - Uma consulta por janela (cada valor distinto de dias_lembrete):
+      prazo <= agora + dias_lembrete e lembrete_enviado_em IS NULL
+    - Reivindica as tarefas em lote (ver `_reivindicar`)
+    - Agrupa por destinatário: cada pessoa recebe um lembrete ou um resumo
     """
     from .models import Tarefas
-    from notifications.services import notificar_lembrete_tarefa_prazo
+    from notifications.services import notificar_lembretes_prazo_em_lote
 
     agora = timezone.now()
 
-    candidatas = Tarefas.objects.filter(
-        dias_lembrete__gt=0,
-        prazo__isnull=False,
-        lembrete_enviado_em__isnull=True,
-    ).exclude(
-        status__in=('concluida', 'cancelada')
-    ).select_related('responsavel', 'usuario')
-
-    total_candidatas = candidatas.count()
-    enviados = 0
-    erros = 0
-
-    for tarefa in candidatas.iterator():
-        try:
-            prazo_aware = _garantir_aware(tarefa.prazo)
-            data_alvo_lembrete = prazo_aware - timedelta(days=tarefa.dias_lembrete)
-
-            # Ainda não chegou a hora de avisar
-            if agora < data_alvo_lembrete:
-                continue
+    with _medir('enviar_lembretes_prazo') as metricas:
+        pendentes = Tarefas.objects.filter(
+            dias_lembrete__gt=0,
+            prazo__isnull=False,
+            lembrete_enviado_em__isnull=True,
+        ).exclude(
+            status__in=('concluida', 'cancelada')
+        )
+
+        # Passou mais de 1 dia do prazo: outras rotinas cuidam; só marca
+        metricas['expiradas'] = pendentes.filter(
+            prazo__lt=agora - timedelta(days=1),
+        ).update(lembrete_enviado_em=agora)
+
+        janelas = sorted(
+            pendentes.order_by().values_list('dias_lembrete', flat=True).distinct()
+        )
+        pks = []
+        for dias in janelas:
+            pks += _reivindicar(
+                pendentes.filter(dias_lembrete=dias, prazo__lte=agora + timedelta(days=dias)),
+                'lembrete_enviado_em', agora,
+            )
 
-            # Passou mais de 1 dia do prazo: outras rotinas cuidam; marca e segue
-            if agora - prazo_aware > timedelta(days=1):
-                Tarefas.objects.filter(
-                    pk=tarefa.pk, lembrete_enviado_em__isnull=True
-                ).update(lembrete_enviado_em=agora)
-                continue
-
-            # Reivindica de forma atômica (evita envio duplicado em execuções concorrentes)
-            claimed = Tarefas.objects.filter(
-                pk=tarefa.pk, lembrete_enviado_em__isnull=True
-            ).update(lembrete_enviado_em=agora)
-
-            if not claimed:
-                continue  # outra execução já processou
-
-            try:
-                dias_antes = max(0, (prazo_aware - agora).days)
-                notificar_lembrete_tarefa_prazo(
-                    tarefa=tarefa,
-                    dias_antes=dias_antes,
-                )
-                enviados += 1
-            except Exception:
-                # Reverte a marcação para permitir nova tentativa na próxima execução
-                Tarefas.objects.filter(pk=tarefa.pk).update(lembrete_enviado_em=None)
-                raise
+        lembretes = []
+        for lote in em_lotes(pks, _tamanho_lote()):
+            for tarefa in (
+                Tarefas.objects.filter(pk__in=lote)
+                .select_related('responsavel', 'usuario')
+                .prefetch_related('participantes')
+            ):
+                dias_antes = max(0, (_garantir_aware(tarefa.prazo) - agora).days)
+                lembretes.append((tarefa, dias_antes))
 
-        except Exception as e:
-            erros += 1
-            logger.error(
-                f'[Lembretes] Erro ao processar tarefa #{tarefa.pk}: {e}',
-                exc_info=True
-            )
+        # Falhas isoladas por grupo de destinatários; a marcação não é
+        # revertida (os outros interessados da tarefa já podem ter sido avisados)
+        grupos, falhas = notificar_lembretes_prazo_em_lote(lembretes)
+        erros = len({tarefa.pk for itens in falhas for tarefa, _ in itens})
+        metricas.update(
+            janelas=len(janelas), enviados=len(lembretes) - erros, erros=erros,
+            grupos_notificados=grupos, grupos_com_erro=len(falhas),
+        )
 
-    resultado = {
-        'enviados': enviados,
-        'erros': erros,
-        'total_candidatas': total_candidatas,
-    }
-    logger.info(f'[Lembretes Prazo] Concluído: {resultado}')
-    return resultado
+    return metricas
 
 
 # =============================================================================
@@ -229,89 +231,68 @@ def avisar_recorrencias_proximas_fim():
     Verifica tarefas-RAIZ recorrentes cujo `data_fim_recorrencia` está próximo
     e ainda não foram avisadas.
 
-    Usa o campo `dias_aviso_fim_recorrencia` de cada tarefa (configurável).
+    Usa o campo `dias_aviso_fim_recorrencia` de cada tarefa (configurável):
+    uma consulta por valor distinto, reivindicação em lote e avisos
+    agrupados por destinatário.
     """
     from .models import Tarefas
-    from notifications.services import notificar_recorrencia_proxima_fim
+    from notifications.services import notificar_recorrencias_proximas_fim_em_lote
 
     agora = timezone.now()
     hoje = agora.date()
 
-    candidatas = Tarefas.objects.filter(
-        recorrente=True,
-        recorrencia_encerrada=False,
-        tarefa_recorrencia_pai__isnull=True,
-        data_fim_recorrencia__isnull=False,
-        aviso_fim_enviado_em__isnull=True,
-    ).select_related('usuario', 'responsavel')
-
-    total_candidatas = candidatas.count()
-    avisos_enviados = 0
-    erros = 0
-    detalhes = []
-
-    for raiz in candidatas.iterator():
-        try:
-            dias_restantes = (raiz.data_fim_recorrencia - hoje).days
-            # Corrigido: 0 é valor válido ("avisar no próprio dia"); o `or`
-            # anterior tratava 0 como ausência e caía no padrão.
-            limite_aviso = (
-                raiz.dias_aviso_fim_recorrencia
-                if raiz.dias_aviso_fim_recorrencia is not None
-                else Tarefas.DIAS_AVISO_FIM_PADRAO
+    with _medir('avisar_recorrencias_proximas_fim') as metricas:
+        candidatas = Tarefas.objects.filter(
+            recorrente=True,
+            recorrencia_encerrada=False,
+            tarefa_recorrencia_pai__isnull=True,
+            data_fim_recorrencia__isnull=False,
+            aviso_fim_enviado_em__isnull=True,
+        )
+
+        # Data fim já passou: encerra a recorrência e não avisa
+        metricas['encerradas'] = candidatas.filter(
+            data_fim_recorrencia__lt=hoje,
+        ).update(recorrencia_encerrada=True, aviso_fim_enviado_em=agora)
+
+        # 0 é valor válido ("avisar no próprio dia")
+        janelas = sorted(
+            candidatas.order_by()
+            .values_list('dias_aviso_fim_recorrencia', flat=True)
+            .distinct()
+        )
+        pks = []
+        for dias in janelas:
+            pks += _reivindicar(
+                candidatas.filter(
+                    dias_aviso_fim_recorrencia=dias,
+                    data_fim_recorrencia__lte=hoje + timedelta(days=dias),
+                ),
+                'aviso_fim_enviado_em', agora,
             )
 
-            if dias_restantes > limite_aviso:
-                continue
-
-            # Data fim já passou: encerra a recorrência e não avisa
-            if dias_restantes < 0:
-                Tarefas.objects.filter(pk=raiz.pk).update(
-                    recorrencia_encerrada=True,
-                    aviso_fim_enviado_em=agora,
-                )
-                continue
-
-            # Reivindica de forma atômica (evita aviso duplicado em concorrência)
-            claimed = Tarefas.objects.filter(
-                pk=raiz.pk, aviso_fim_enviado_em__isnull=True
-            ).update(aviso_fim_enviado_em=agora)
-
-            if not claimed:
-                continue
-
-            try:
-                notificar_recorrencia_proxima_fim(
-                    tarefa_raiz=raiz,
-                    dias_restantes=dias_restantes,
-                )
-                avisos_enviados += 1
-                detalhes.append({
-                    'tarefa_id': raiz.pk,
-                    'titulo': raiz.titulo,
-                    'dias_restantes': dias_restantes,
-                })
-            except Exception:
-                Tarefas.objects.filter(pk=raiz.pk).update(aviso_fim_enviado_em=None)
-                raise
-
-        except Exception as e:
-            erros += 1
-            logger.error(
-                f'[Aviso Fim Recorrência] Erro ao processar raiz #{raiz.pk}: {e}',
-                exc_info=True
-            )
-
-    resultado = {
-        'avisos_enviados': avisos_enviados,
-        'total_avisados': avisos_enviados,    # alias p/ command
-        'total': avisos_enviados,             # alias genérico
-        'erros': erros,
-        'total_candidatas': total_candidatas,
-        'avisos': detalhes,                   # p/ --verbose
-    }
-    logger.info(f'[Aviso Fim Recorrência] Concluído: {resultado}')
-    return resultado
+        avisos = []
+        for lote in em_lotes(pks, _tamanho_lote()):
+            for raiz in Tarefas.objects.filter(pk__in=lote).select_related('usuario', 'responsavel'):
+                avisos.append((raiz, (raiz.data_fim_recorrencia - hoje).days))
+
+        grupos, falhas = notificar_recorrencias_proximas_fim_em_lote(avisos)
+        erros = len({raiz.pk for itens in falhas for raiz, _ in itens})
+        metricas.update(
+            janelas=len(janelas), avisos_enviados=len(avisos) - erros, erros=erros,
+            grupos_notificados=grupos, grupos_com_erro=len(falhas),
+        )
+
+    # Fora das métricas publicadas no log: só o --verbose do command usa
+    metricas['avisos'] = [
+        {
+            'tarefa_id': raiz.pk,
+            'titulo': raiz.titulo,
+            'dias_restantes': dias_restantes,
+        }
+        for raiz, dias_restantes in avisos
+    ]
+    return metricas
 
 
 # ─── Alias público (compatibilidade com command/agendadores externos) ──────
@@ -346,19 +327,59 @@ def marcar_tarefas_atrasadas():
     - Status atual: pendente, andamento ou pausada
     - Não concluída/cancelada
 
-    Usa update() em massa (sem disparar signals — atualização técnica).
+    Por lote: trava as linhas (SKIP LOCKED), um UPDATE para todas e o
+    histórico (legado e v2) em bulk_create — o update() não dispara os
+    signals que registrariam a mudança.
     """
-    qs = _marcar_atrasadas_logica()
+    from .models import HistoricoStatus, HistoricoTarefa, Tarefas
 
-    # update() já retorna o nº de linhas afetadas — evita count() extra e race condition
-    atualizadas = qs.update(status='atrasada')
+    status_display = dict(Tarefas.STATUS_CHOICES)
+    novo_display = status_display['atrasada']
+    qs = _marcar_atrasadas_logica()
 
-    if atualizadas == 0:
-        logger.info('[Tarefas Atrasadas] Nenhuma tarefa para atualizar.')
-    else:
-        logger.info(f'[Tarefas Atrasadas] {atualizadas} tarefa(s) marcadas como atrasadas.')
+    with _medir('marcar_tarefas_atrasadas') as metricas:
+        metricas.update(atualizadas=0, lotes=0)
+        while True:
+            with transaction.atomic():
+                linhas = list(
+                    qs.order_by('pk')
+                    .select_for_update(skip_locked=True)
+                    .values_list('pk', 'status', 'filial_id')[:_tamanho_lote()]
+                )
+                if not linhas:
+                    break
 
-    return {'atualizadas': atualizadas}
+                Tarefas.objects.filter(
+                    pk__in=[pk for pk, _, _ in linhas],
+                ).update(status='atrasada')
+
+                HistoricoStatus.objects.bulk_create([
+                    HistoricoStatus(
+                        tarefa_id=pk, status_anterior=status,
+                        novo_status='atrasada', filial_id=filial_id,
+                    )
+                    for pk, status, filial_id in linhas
+                ])
+                HistoricoTarefa.objects.bulk_create([
+                    HistoricoTarefa(
+                        tarefa_id=pk,
+                        tipo_alteracao='status',
+                        campo_alterado='status',
+                        valor_anterior=status_display.get(status, status),
+                        valor_novo=novo_display,
+                        descricao=(
+                            f'Status: {status_display.get(status, status)} → {novo_display} '
+                            f'(prazo vencido)'
+                        ),
+                        filial_id=filial_id,
+                    )
+                    for pk, status, filial_id in linhas
+                ])
+
+            metricas['atualizadas'] += len(linhas)
+            metricas['lotes'] += 1
+
+    return metricas
 
 
 # =============================================================================
@@ -1,3 +1,257 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+
+from notifications.models import Notificacao
+from usuario.models import Filial
+
+from .models import HistoricoStatus, HistoricoTarefa, Tarefas
+from .recorrencia import gerar_recorrencias_da_filial, raizes_vencidas
+from .tasks import (
+    avisar_recorrencias_proximas_fim,
+    enviar_lembretes_prazo,
+    gerar_recorrencias_pendentes,
+    marcar_tarefas_atrasadas,
+)
+
+User = get_user_model()
+
+# URLconf só com o app (a raiz importa apps que exigem as libs do WeasyPrint)
+urlpatterns = [path('tarefas/', include('tarefas.urls'))]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class FallbackRecorrenciasTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial Recorrência')
+        cls.outra_filial = Filial.objects.create(nome='Outra Filial')
+        cls.criador = User.objects.create_user(
+            username='criador', email='criador@example.com', password='x',
+            filial_ativa=cls.filial,
+        )
+        cls.participante = User.objects.create_user(
+            username='participante', email='participante@example.com', password='x',
+            filial_ativa=cls.filial,
+        )
+
+    def _raiz(self, prazo, filial=None, **campos):
+        raiz = Tarefas.objects.create(
+            titulo='Relatório semanal', usuario=self.criador, responsavel=self.criador,
+            filial=filial or self.filial, prazo=prazo, recorrente=True,
+            frequencia_recorrencia='semanal', **campos,
+        )
+        raiz.participantes.add(self.participante)
+        return raiz
+
+    def _filha(self, raiz, prazo, status):
+        return Tarefas.objects.create(
+            titulo=raiz.titulo, usuario=self.criador, filial=raiz.filial,
+            prazo=prazo, status=status, tarefa_recorrencia_pai=raiz,
+        )
+
+    def test_seleciona_somente_raizes_vencidas(self):
+        agora = timezone.now()
+        sem_filha = self._raiz(agora - timedelta(days=1))
+        self._raiz(agora + timedelta(days=1))                       # ainda no prazo
+        concluida = self._raiz(agora - timedelta(days=20))
+        self._filha(concluida, agora - timedelta(days=13), 'concluida')
+        self._filha(concluida, agora - timedelta(days=6), 'concluida')
+        pendente = self._raiz(agora - timedelta(days=20))
+        self._filha(pendente, agora - timedelta(days=6), 'pendente')  # última em aberto
+
+        vencidas = {r.pk: r for r in raizes_vencidas(agora)}
+
+        self.assertEqual(set(vencidas), {sem_filha.pk, concluida.pk})
+        self.assertEqual(vencidas[concluida.pk].total_filhas, 2)
+
+    def test_gera_proxima_ocorrencia_com_participantes(self):
+        agora = timezone.now()
+        raiz = self._raiz(agora - timedelta(days=10))
+        ultima = self._filha(raiz, agora - timedelta(days=3), 'concluida')
+
+        resultado = gerar_recorrencias_da_filial(self.filial.pk, agora=agora)
+
+        self.assertEqual(resultado['geradas'], 1)
+        nova = raiz.recorrencias_filhas.order_by('-prazo').first()
+        self.assertEqual(nova.prazo, ultima.prazo + timedelta(weeks=1))
+        self.assertEqual((nova.status, nova.recorrente), ('pendente', False))
+        self.assertEqual(list(nova.participantes.all()), [self.participante])
+        self.assertTrue(
+            Notificacao.objects.filter(usuario=self.participante, url_destino__contains=f'/{nova.pk}/').exists()
+        )
+
+        # A nova ocorrência está em aberto: nada a gerar na próxima execução
+        self.assertEqual(gerar_recorrencias_da_filial(self.filial.pk, agora=agora)['geradas'], 0)
+
+    def test_encerra_ao_passar_da_data_fim(self):
+        agora = timezone.now()
+        raiz = self._raiz(agora - timedelta(days=1), data_fim_recorrencia=date.today())
+
+        resultado = gerar_recorrencias_da_filial(self.filial.pk, agora=agora)
+
+        self.assertEqual((resultado['geradas'], resultado['encerradas']), (0, 1))
+        raiz.refresh_from_db()
+        self.assertTrue(raiz.recorrencia_encerrada)
+        self.assertFalse(raiz.recorrencias_filhas.exists())
+
+    def test_queries_por_lote_nao_dependem_das_raizes(self):
+        agora = timezone.now()
+
+        def queries(total):
+            Tarefas.objects.all().delete()
+            for _ in range(total):
+                self._raiz(agora - timedelta(days=1))
+            # Notificar é por ocorrência (sino + e-mail); aqui só interessa a geração
+            with patch('tarefas.recorrencia._notificar_novas'), \
+                    CaptureQueriesContext(connection) as ctx:
+                resultado = gerar_recorrencias_da_filial(self.filial.pk, agora=agora)
+            self.assertEqual(resultado['geradas'], total)
+            return len([q for q in ctx.captured_queries if not q['sql'].startswith('INSERT')])
+
+        self.assertEqual(queries(2), queries(20))
+
+    def test_task_distribui_por_filial(self):
+        agora = timezone.now()
+        self._raiz(agora - timedelta(days=1))
+        self._raiz(agora - timedelta(days=1), filial=self.outra_filial)
+
+        # CELERY_TASK_ALWAYS_EAGER: os workers por filial rodam na hora
+        self.assertEqual(gerar_recorrencias_pendentes(), {'filiais_despachadas': 2})
+        self.assertEqual(Tarefas.objects.filter(tarefa_recorrencia_pai__isnull=False).count(), 2)
+
+        self.assertEqual(gerar_recorrencias_pendentes(distribuir=False)['geradas'], 0)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class RotinasAgendadasTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial Rotinas')
+        cls.criador = User.objects.create_user(
+            username='criador', email='criador@example.com', password='x',
+            filial_ativa=cls.filial,
+        )
+        cls.responsavel = User.objects.create_user(
+            username='responsavel', email='responsavel@example.com', password='x',
+            filial_ativa=cls.filial,
+        )
+
+    def _tarefa(self, **campos):
+        campos.setdefault('responsavel', self.criador)
+        return Tarefas.objects.create(
+            titulo=campos.pop('titulo', 'Tarefa'), usuario=self.criador,
+            filial=self.filial, **campos,
+        )
+
+    def test_marca_atrasadas_em_lote_com_historico(self):
+        agora = timezone.now()
+        pendente = self._tarefa(prazo=agora - timedelta(hours=1))
+        andamento = self._tarefa(prazo=agora - timedelta(days=2), status='andamento')
+        self._tarefa(prazo=agora - timedelta(days=2), status='concluida')
+        self._tarefa(prazo=agora + timedelta(days=1))
+
+        with self.settings(TAREFAS_ROTINAS_POR_LOTE=1):
+            resultado = marcar_tarefas_atrasadas()
+
+        self.assertEqual((resultado['atualizadas'], resultado['lotes']), (2, 2))
+        self.assertIn('duracao_ms', resultado)
+        self.assertEqual(
+            set(Tarefas.objects.filter(status='atrasada').values_list('pk', flat=True)),
+            {pendente.pk, andamento.pk},
+        )
+        self.assertEqual(
+            HistoricoStatus.objects.get(tarefa=andamento).status_anterior, 'andamento',
+        )
+        self.assertEqual(
+            HistoricoTarefa.objects.get(tarefa=pendente, tipo_alteracao='status').valor_novo,
+            'Atrasada',
+        )
+
+        self.assertEqual(marcar_tarefas_atrasadas()['atualizadas'], 0)
+
+    def test_lembretes_agrupados_por_destinatario(self):
+        agora = timezone.now()
+        # Duas janelas (3 e 5 dias); o criador está nas duas, o responsável só na primeira
+        self._tarefa(
+            titulo='Auditoria', prazo=agora + timedelta(days=2, hours=1),
+            dias_lembrete=3, responsavel=self.responsavel,
+        )
+        self._tarefa(titulo='Inventário', prazo=agora + timedelta(days=4, hours=1), dias_lembrete=5)
+        self._tarefa(titulo='Fora da janela', prazo=agora + timedelta(days=10), dias_lembrete=5)
+        vencida = self._tarefa(titulo='Vencida', prazo=agora - timedelta(days=3), dias_lembrete=1)
+
+        resultado = enviar_lembretes_prazo()
+
+        self.assertEqual(
+            (resultado['janelas'], resultado['enviados'], resultado['expiradas']), (2, 2, 1),
+        )
+        lembretes = Notificacao.objects.filter(tipo='tarefa_lembrete')
+        self.assertEqual(
+            list(lembretes.filter(usuario=self.criador).values_list('titulo', flat=True)),
+            ['⏰ 2 tarefas com prazo próximo'],
+        )
+        self.assertEqual(
+            list(lembretes.filter(usuario=self.responsavel).values_list('titulo', flat=True)),
+            ['⏰ Atenção: Auditoria vence em 2 dias'],
+        )
+        vencida.refresh_from_db()
+        self.assertIsNotNone(vencida.lembrete_enviado_em)
+
+        # Execução seguinte (ou sobreposta) não reenvia
+        self.assertEqual(enviar_lembretes_prazo()['enviados'], 0)
+        self.assertEqual(lembretes.count(), 2)
+
+    def test_falha_de_um_grupo_nao_interrompe_os_demais(self):
+        agora = timezone.now()
+        self._tarefa(
+            titulo='Auditoria', prazo=agora + timedelta(days=2, hours=1),
+            dias_lembrete=3, responsavel=self.responsavel,
+        )
+        self._tarefa(titulo='Inventário', prazo=agora + timedelta(days=4, hours=1), dias_lembrete=5)
+
+        # O resumo do criador falha; o lembrete do responsável sai mesmo assim
+        with patch('notifications.services._enviar_resumo', side_effect=DatabaseError('falhou')):
+            resultado = enviar_lembretes_prazo()
+
+        self.assertEqual(
+            (resultado['grupos_notificados'], resultado['grupos_com_erro'], resultado['erros']), (1, 1, 2),
+        )
+        self.assertEqual(
+            list(Notificacao.objects.filter(tipo='tarefa_lembrete').values_list('usuario', flat=True)),
+            [self.responsavel.pk],
+        )
+
+    def test_avisos_fim_recorrencia_agrupados(self):
+        hoje = timezone.now().date()
+        for titulo in ('Ronda', 'Checklist'):
+            self._tarefa(
+                titulo=titulo, recorrente=True, frequencia_recorrencia='semanal',
+                data_fim_recorrencia=hoje + timedelta(days=5),
+            )
+        expirada = self._tarefa(
+            recorrente=True, frequencia_recorrencia='semanal',
+            data_fim_recorrencia=hoje - timedelta(days=1),
+        )
+
+        resultado = avisar_recorrencias_proximas_fim()
+
+        self.assertEqual((resultado['avisos_enviados'], resultado['encerradas']), (2, 1))
+        self.assertEqual(
+            list(
+                Notificacao.objects.filter(usuario=self.criador, titulo__contains='recorrências')
+                .values_list('titulo', flat=True)
+            ),
+            ['⏰ 2 recorrências perto do fim'],
+        )
+        expirada.refresh_from_db()
+        self.assertTrue(expirada.recorrencia_encerrada)
+        self.assertEqual(avisar_recorrencias_proximas_fim()['avisos_enviados'], 0)
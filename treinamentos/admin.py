@@ -8,6 +8,7 @@ from django.db.models import Count, Sum
 from .models import (
     # Models originais
     TipoCurso, Treinamento, Participante, GabaritoCertificado, Assinatura,
+    CertificadoEmitido, LoteCertificados,
     # Models EAD
     CursoEAD, ModuloEAD, AulaEAD, PlanoEstudo, PlanoEstudoCurso,
     MatriculaEAD, ProgressoAulaEAD, AvaliacaoEAD, QuestaoEAD,
@@ -57,8 +58,27 @@ class ParticipanteAdmin(admin.ModelAdmin):
 
 @admin.register(GabaritoCertificado)
 class GabaritoCertificadoAdmin(admin.ModelAdmin):
-    list_display = ("nome", "ativo")
+    list_display = ("nome", "ativo", "revisao")
     list_filter = ("ativo",)
+    readonly_fields = ("revisao",)
+
+
+@admin.register(CertificadoEmitido)
+class CertificadoEmitidoAdmin(admin.ModelAdmin):
+    list_display = ("participante", "hash_conteudo", "tamanho_bytes", "lote", "gerado_em")
+    search_fields = ("participante__funcionario__first_name", "participante__treinamento__nome", "hash_conteudo")
+    readonly_fields = ("participante", "hash_conteudo", "arquivo", "tamanho_bytes", "lote", "gerado_em")
+
+
+@admin.register(LoteCertificados)
+class LoteCertificadosAdmin(admin.ModelAdmin):
+    list_display = ("treinamento", "formato", "status", "progresso", "total", "renderizados",
+                    "solicitado_por", "criado_em", "concluido_em")
+    list_filter = ("status", "formato", "criado_em")
+    search_fields = ("treinamento__nome", "task_id")
+    readonly_fields = ("treinamento", "formato", "status", "progresso", "total", "renderizados",
+                       "arquivo", "tamanho_bytes", "erro", "task_id", "base_url", "solicitado_por",
+                       "criado_em", "iniciado_em", "concluido_em")
 
 
 @admin.register(Assinatura)
@@ -159,20 +179,13 @@ class CursoEADAdmin(admin.ModelAdmin):
         }),
     )
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(
-            _total_modulos=Count("modulos_ead", distinct=True),
-            _total_aulas=Count("modulos_ead__aulas_ead", distinct=True),
-        )
-
-    @admin.display(description="Módulos", ordering="_total_modulos")
+    @admin.display(description="Módulos", ordering="total_modulos")
     def qtd_modulos(self, obj):
-        return obj._total_modulos
+        return obj.total_modulos
 
-    @admin.display(description="Aulas", ordering="_total_aulas")
+    @admin.display(description="Aulas", ordering="total_aulas")
     def qtd_aulas(self, obj):
-        return obj._total_aulas
+        return obj.total_aulas
 
 
 # --------------- ModuloEAD ---------------
@@ -196,13 +209,9 @@ class ModuloEADAdmin(admin.ModelAdmin):
     autocomplete_fields = ("curso",)
     inlines = [AulaEADInline]
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(_total_aulas=Count("aulas_ead"))
-
-    @admin.display(description="Aulas", ordering="_total_aulas")
+    @admin.display(description="Aulas", ordering="total_aulas")
     def qtd_aulas(self, obj):
-        return obj._total_aulas
+        return obj.total_aulas
 
 
 # --------------- AulaEAD ---------------
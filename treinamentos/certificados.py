@@ -0,0 +1,383 @@
+"""
+Emissão dos certificados de treinamentos presenciais.
+
+Cada certificado é renderizado (WeasyPrint) no máximo uma vez por
+conteúdo: o PDF fica guardado em CertificadoEmitido contra o hash de
+`hash_certificado()` — dados do participante, do treinamento e a
+revisão do gabarito. Download individual, página pública de verificação
+e lotes servem o arquivo guardado enquanto o hash não mudar.
+
+Para um treinamento inteiro, `solicitar_lote()` enfileira a task Celery
+`treinamentos.emitir_certificados`: um único RenderizadorCertificados
+(gabarito, template, CSS e fontes carregados uma vez) emite os que
+faltam e junta tudo num PDF único ou num ZIP.
+"""
+import hashlib
+import io
+import logging
+import os
+import zipfile
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from num2words import num2words
+
+from core.jobs import encerrar_travados, enfileirar_apos_commit
+
+from .models import CertificadoEmitido, GabaritoCertificado, LoteCertificados, Participante, Treinamento
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando o layout do certificado mudar — invalida os PDFs guardados
+GERADOR_VERSAO = 1
+
+TEMPLATE_CERTIFICADO = 'treinamentos/certificado_template.html'
+
+
+class CertificadoIndisponivel(Exception):
+    """Certificado não pode ser emitido (sem gabarito ativo, sem WeasyPrint...)."""
+
+
+# =============================================================================
+# HASH DO CONTEÚDO
+# =============================================================================
+
+def _documento(funcionario):
+    return getattr(funcionario, 'cpf', getattr(funcionario, 'rg', 'Não informado'))
+
+
+def _linha(obj, excluir=()):
+    if obj is None:
+        return None
+    return tuple(
+        getattr(obj, f.attname)
+        for f in obj._meta.concrete_fields
+        if f.name not in excluir
+    )
+
+
+def hash_certificado(participante, gabarito):
+    """
+    SHA-256 do que aparece no certificado do participante.
+
+    Lê apenas os objetos já carregados (use `participantes_aptos()` ou o
+    mesmo select_related): nenhuma query por participante.
+    """
+    treinamento = participante.treinamento
+    funcionario = participante.funcionario
+    assinatura = getattr(participante, 'assinatura', None)
+    assinatura_responsavel = getattr(treinamento, 'assinatura_responsavel', None)
+
+    partes = [
+        f'certificado:v{GERADOR_VERSAO}',
+        (gabarito.pk, gabarito.revisao),
+        # certificado_emitido muda justamente ao emitir
+        _linha(participante, excluir={'certificado_emitido'}),
+        (funcionario.get_full_name(), _documento(funcionario)),
+        _linha(treinamento, excluir={'data_atualizacao'}),
+        _linha(treinamento.tipo_curso, excluir={'data_atualizacao'}),
+        assinatura and (assinatura.pk, assinatura.data_assinatura),
+        assinatura_responsavel and (assinatura_responsavel.pk, assinatura_responsavel.data_assinatura),
+    ]
+    h = hashlib.sha256()
+    for parte in partes:
+        h.update(repr(parte).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+
+# =============================================================================
+# RENDERIZAÇÃO
+# =============================================================================
+
+class RenderizadorCertificados:
+    """
+    Renderiza certificados com o gabarito ativo.
+
+    Gabarito, template, folha de estilo e a configuração de fontes do
+    WeasyPrint são carregados uma vez por instância — num lote, o custo
+    fixo não se repete a cada participante.
+
+    `base_url` é a raiz do site (ex.: "https://sistema.exemplo.com/"),
+    usada no QR Code de verificação e nos recursos relativos do HTML.
+    """
+
+    def __init__(self, base_url, gabarito=None):
+        self.base_url = base_url
+        self.gabarito = gabarito or GabaritoCertificado.objects.filter(ativo=True).first()
+        if not self.gabarito:
+            raise CertificadoIndisponivel("Nenhum Gabarito de Certificado ativo foi encontrado.")
+        self._template = None
+        self._weasyprint = None
+        self._extenso = {}
+
+    # ── recursos carregados uma vez ──────────────────────────────────────────
+    def _carregar_weasyprint(self):
+        if self._weasyprint is None:
+            try:
+                from weasyprint import CSS, HTML
+                from weasyprint.text.fonts import FontConfiguration
+            except (ImportError, OSError) as e:
+                raise CertificadoIndisponivel(f"WeasyPrint indisponível: {e}") from e
+
+            fontes = FontConfiguration()
+            css_path = os.path.join(settings.STATIC_ROOT or '', 'css', 'certificado.css')
+            estilos = [CSS(css_path, font_config=fontes)] if os.path.exists(css_path) else []
+            self._weasyprint = (HTML, estilos, fontes)
+        return self._weasyprint
+
+    @property
+    def template(self):
+        if self._template is None:
+            self._template = get_template(TEMPLATE_CERTIFICADO)
+        return self._template
+
+    def carga_horaria_extenso(self, horas):
+        if horas not in self._extenso:
+            try:
+                self._extenso[horas] = num2words(horas, lang='pt_BR')
+            except Exception:
+                self._extenso[horas] = str(horas)
+        return self._extenso[horas]
+
+    # ── por participante ─────────────────────────────────────────────────────
+    def qrcode_svg(self, participante):
+        """QR Code (SVG) com a URL pública de verificação do certificado."""
+        url_validacao = self.base_url.rstrip('/') + reverse(
+            'treinamentos:verificar_certificado',
+            kwargs={'protocolo': participante.protocolo_validacao},
+        )
+        img = qrcode.make(url_validacao, image_factory=qrcode.image.svg.SvgPathImage, border=1)
+        buffer = io.BytesIO()
+        img.save(buffer)
+        return buffer.getvalue().decode('utf-8')
+
+    def contexto(self, participante):
+        treinamento = participante.treinamento
+        gabarito = self.gabarito
+
+        data_inicio = treinamento.data_inicio.strftime('%d/%m/%Y')
+        data_fim = treinamento.data_fim.strftime('%d/%m/%Y') if treinamento.data_fim else data_inicio
+
+        # Contexto para a FRENTE
+        contexto_frente = {
+            'participante_nome': participante.funcionario.get_full_name(),
+            'participante_documento': _documento(participante.funcionario),
+            'empresa_nome': gabarito.empresa_nome,
+            'nome_curso': treinamento.tipo_curso.nome,
+            'conteudo_programatico': treinamento.tipo_curso.descricao_no_certificado or "",
+            'referencia_normativa': treinamento.tipo_curso.referencia_normativa or "",
+            'data_inicio': data_inicio,
+            'data_fim': data_fim,
+            'carga_horaria': treinamento.duracao,
+            'carga_horaria_extenso': self.carga_horaria_extenso(treinamento.duracao),
+            'local': treinamento.local,
+        }
+
+        # Contexto para o VERSO (grade: quebras de linha viram <br>)
+        grade_formatada = (treinamento.tipo_curso.grade_curricular or "").replace('\n', '<br>')
+        contexto_verso = {
+            'grade_curricular': mark_safe(grade_formatada),
+            'protocolo': str(participante.protocolo_validacao),
+            'qr_code_svg': mark_safe(self.qrcode_svg(participante)),
+        }
+
+        return {
+            'gabarito': gabarito,
+            'contexto_frente': contexto_frente,
+            'contexto_verso': contexto_verso,
+            'texto_frente': gabarito.renderizar_texto(contexto_frente),
+            'texto_verso': gabarito.renderizar_verso({**contexto_frente, **contexto_verso}),
+            'participante': participante,
+            'treinamento': treinamento,
+            'assinatura_participante': getattr(participante, 'assinatura', None),
+            'assinatura_responsavel': getattr(treinamento, 'assinatura_responsavel', None),
+            'data_emissao': timezone.now(),
+        }
+
+    def renderizar(self, participante):
+        """PDF (bytes) do certificado do participante, frente e verso."""
+        HTML, estilos, fontes = self._carregar_weasyprint()
+        html_string = self.template.render(self.contexto(participante))
+        return HTML(string=html_string, base_url=self.base_url).write_pdf(
+            stylesheets=estilos, font_config=fontes,
+        )
+
+
+# =============================================================================
+# CERTIFICADOS GUARDADOS
+# =============================================================================
+
+def participantes_aptos(treinamento):
+    """
+    Participantes com direito a certificado: presença confirmada e
+    assinatura coletada. Já traz tudo que o hash e o template leem.
+    """
+    return (
+        Participante.objects
+        .filter(treinamento=treinamento, presente=True, assinatura__data_assinatura__isnull=False)
+        .select_related(
+            'funcionario', 'assinatura',
+            'treinamento__tipo_curso', 'treinamento__assinatura_responsavel',
+        )
+        .order_by('funcionario__first_name', 'funcionario__last_name', 'pk')
+    )
+
+
+def certificado_pronto(participante, hash_conteudo):
+    """CertificadoEmitido deste conteúdo, se já existir."""
+    return (
+        CertificadoEmitido.objects
+        .filter(participante=participante, hash_conteudo=hash_conteudo)
+        .exclude(arquivo='')
+        .first()
+    )
+
+
+def guardar_certificado(participante, hash_conteudo, conteudo, lote=None):
+    """
+    Guarda o PDF renderizado, descarta versões anteriores do certificado
+    do participante e o marca como emitido.
+    """
+    certificado = CertificadoEmitido(
+        participante=participante, hash_conteudo=hash_conteudo,
+        tamanho_bytes=len(conteudo), lote=lote,
+    )
+    certificado.arquivo.save(f"{hash_conteudo}.pdf", ContentFile(conteudo), save=False)
+    try:
+        with transaction.atomic():
+            certificado.save()
+    except IntegrityError:
+        # Outra request/worker guardou o mesmo conteúdo primeiro
+        certificado.arquivo.delete(save=False)
+        return certificado_pronto(participante, hash_conteudo)
+
+    antigos = CertificadoEmitido.objects.filter(participante=participante).exclude(pk=certificado.pk)
+    for antigo in antigos:
+        antigo.delete()
+
+    if not participante.certificado_emitido:
+        participante.certificado_emitido = True
+        Participante.objects.filter(pk=participante.pk).update(certificado_emitido=True)
+    return certificado
+
+
+def emitir_certificado(participante, renderizador, guardados=None, lote=None):
+    """
+    Retorna (CertificadoEmitido, renderizado_agora). Renderiza apenas se
+    não houver PDF guardado para o conteúdo atual; `guardados` é um dict
+    {(participante_id, hash): CertificadoEmitido} pré-carregado pelo lote.
+    """
+    hash_conteudo = hash_certificado(participante, renderizador.gabarito)
+    if guardados is not None:
+        pronto = guardados.get((participante.pk, hash_conteudo))
+    else:
+        pronto = certificado_pronto(participante, hash_conteudo)
+    if pronto:
+        return pronto, False
+
+    conteudo = renderizador.renderizar(participante)
+    return guardar_certificado(participante, hash_conteudo, conteudo, lote=lote), True
+
+
+def ultimo_certificado(participante):
+    """PDF mais recente guardado para o participante (verificação pública)."""
+    return (
+        CertificadoEmitido.objects
+        .filter(participante=participante)
+        .exclude(arquivo='')
+        .order_by('-gerado_em', '-pk')
+        .first()
+    )
+
+
+# =============================================================================
+# LOTES
+# =============================================================================
+
+def nome_arquivo_certificado(participante):
+    return f"certificado_{participante.funcionario.username}.pdf"
+
+
+def montar_arquivo_lote(formato, certificados):
+    """
+    Junta os PDFs de `certificados` [(participante, CertificadoEmitido)]
+    num PDF único ou num ZIP. Retorna bytes.
+    """
+    saida = io.BytesIO()
+    if formato == LoteCertificados.FORMATO_ZIP:
+        with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for participante, certificado in certificados:
+                with certificado.arquivo.open('rb') as f:
+                    zf.writestr(nome_arquivo_certificado(participante), f.read())
+    else:
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        for _, certificado in certificados:
+            with certificado.arquivo.open('rb') as f:
+                writer.append(io.BytesIO(f.read()))
+        writer.write(saida)
+    return saida.getvalue()
+
+
+def solicitar_lote(treinamento, base_url, formato=LoteCertificados.FORMATO_PDF, usuario=None, forcar=False):
+    """
+    Retorna o lote de certificados do treinamento no formato pedido.
+
+    - já na fila/gerando → o mesmo lote (cliques repetidos não duplicam);
+    - senão → cria o lote e enfileira a task após o commit.
+
+    Lotes travados (worker perdido) são encerrados antes da busca. Com
+    `forcar`, os lotes ainda ativos são encerrados como substituídos e um
+    novo lote é criado.
+    """
+    from .tasks import emitir_certificados_task
+
+    with transaction.atomic():
+        # Trava o treinamento para serializar solicitações simultâneas
+        Treinamento.objects.all_filiais().select_for_update().filter(pk=treinamento.pk).exists()
+
+        ativos = LoteCertificados.objects.filter(
+            treinamento=treinamento, formato=formato, status__in=LoteCertificados.STATUS_ATIVOS,
+        )
+        encerrar_travados(ativos)
+        if forcar:
+            ativos.update(
+                status=LoteCertificados.STATUS_ERRO,
+                erro='Substituído por uma nova solicitação.',
+                concluido_em=timezone.now(),
+            )
+
+        ativo = ativos.first()
+        if ativo:
+            return ativo
+
+        lote = LoteCertificados.objects.create(
+            treinamento=treinamento,
+            formato=formato,
+            base_url=base_url,
+            solicitado_por=usuario if getattr(usuario, 'is_authenticated', False) else None,
+        )
+        enfileirar_apos_commit(lote, emitir_certificados_task)
+
+    return lote
+
+
+def limpar_lotes_antigos(lote):
+    """Remove os lotes encerrados do mesmo treinamento e formato, exceto `lote`."""
+    antigos = (
+        LoteCertificados.objects
+        .filter(treinamento_id=lote.treinamento_id, formato=lote.formato)
+        .exclude(pk=lote.pk)
+        .exclude(status__in=LoteCertificados.STATUS_ATIVOS)
+    )
+    for antigo in antigos:
+        antigo.delete()
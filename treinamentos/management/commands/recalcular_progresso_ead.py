@@ -0,0 +1,52 @@
+# treinamentos/management/commands/recalcular_progresso_ead.py
+"""
+Reconta o progresso das matrículas EAD (aulas concluídas, percentual e
+carga horária cumprida) e as estatísticas dos cursos (módulos, aulas,
+matriculados, duração).
+
+O dia a dia é incremental (treinamentos.progresso_ead); use este comando
+depois de tornar aulas obrigatórias/opcionais ou ativar/desativar aulas
+de cursos com matrículas em andamento.
+
+    python manage.py recalcular_progresso_ead
+    python manage.py recalcular_progresso_ead --curso 3 --curso 7
+"""
+
+from django.core.management.base import BaseCommand
+
+from treinamentos.models import CursoEAD, MatriculaEAD
+from treinamentos.progresso_ead import invalidar_total_aulas
+
+
+class Command(BaseCommand):
+    help = "Reconta o progresso das matrículas EAD"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--curso', type=int, action='append', dest='cursos',
+            help='ID do curso EAD (repetível). Padrão: todos.',
+        )
+
+    def handle(self, *args, **options):
+        matriculas = MatriculaEAD.objects.all_filiais().select_related('curso')
+        if options['cursos']:
+            matriculas = matriculas.filter(curso_id__in=options['cursos'])
+
+        cursos = set()
+        total = 0
+        for matricula in matriculas.iterator():
+            if matricula.curso_id not in cursos:
+                invalidar_total_aulas(matricula.curso_id)
+                cursos.add(matricula.curso_id)
+            matricula.recalcular_progresso()
+            total += 1
+            if total % 500 == 0:
+                self.stdout.write(f'   {total} matrículas')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Progresso recalculado: {total} matrícula(s)'))
+
+        ids_cursos = CursoEAD.objects.all_filiais().values_list('pk', flat=True)
+        if options['cursos']:
+            ids_cursos = ids_cursos.filter(pk__in=options['cursos'])
+        CursoEAD.recalcular_estatisticas(list(ids_cursos))
+        self.stdout.write(self.style.SUCCESS('✅ Estatísticas dos cursos recalculadas'))
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.17 on 2026-10-18 00:25
+
+import django.core.validators
+import django.db.models.deletion
+import documentos.storage
+import treinamentos.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treinamentos', '0009_alter_participante_protocolo_validacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gabaritocertificado',
+            name='revisao',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Revisão'),
+        ),
+        migrations.CreateModel(
+            name='LoteCertificados',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('formato', models.CharField(choices=[('pdf', 'PDF único'), ('zip', 'ZIP (um PDF por participante)')], default='pdf', max_length=3, verbose_name='Formato')),
+                ('status', models.CharField(choices=[('pendente', 'Na fila'), ('processando', 'Gerando'), ('concluido', 'Concluído'), ('erro', 'Erro')], db_index=True, default='pendente', max_length=15, verbose_name='Status')),
+                ('progresso', models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(100)], verbose_name='Progresso (%)')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Certificados no Lote')),
+                ('renderizados', models.PositiveIntegerField(default=0, help_text='Os demais vieram de certificados já guardados.', verbose_name='Renderizados Agora')),
+                ('arquivo', models.FileField(blank=True, storage=documentos.storage.PrivateMediaStorage(), upload_to=treinamentos.models._lote_certificados_upload_path, verbose_name='Arquivo do Lote')),
+                ('tamanho_bytes', models.PositiveIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('task_id', models.CharField(blank=True, max_length=255, verbose_name='ID da Task')),
+                ('base_url', models.CharField(max_length=255, verbose_name='URL Base')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Solicitado em')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lotes_certificados_solicitados', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+                ('treinamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lotes_certificados', to='treinamentos.treinamento', verbose_name='Treinamento')),
+            ],
+            options={
+                'verbose_name': 'Lote de Certificados',
+                'verbose_name_plural': 'Lotes de Certificados',
+                'db_table': 'treinamento_lote_certificados',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CertificadoEmitido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash_conteudo', models.CharField(max_length=64, verbose_name='Hash do Conteúdo')),
+                ('arquivo', models.FileField(storage=documentos.storage.PrivateMediaStorage(), upload_to=treinamentos.models._certificado_upload_path, verbose_name='Arquivo PDF')),
+                ('tamanho_bytes', models.PositiveIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('gerado_em', models.DateTimeField(auto_now_add=True, verbose_name='Gerado em')),
+                ('participante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='certificados_pdf', to='treinamentos.participante', verbose_name='Participante')),
+                ('lote', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='certificados', to='treinamentos.lotecertificados', verbose_name='Lote')),
+            ],
+            options={
+                'verbose_name': 'Certificado Emitido',
+                'verbose_name_plural': 'Certificados Emitidos',
+                'db_table': 'treinamento_certificado_emitido',
+                'ordering': ['-gerado_em'],
+                'constraints': [models.UniqueConstraint(fields=('participante', 'hash_conteudo'), name='certificado_unico_por_conteudo')],
+            },
+        ),
+    ]
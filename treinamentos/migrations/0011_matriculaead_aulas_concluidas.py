@@ -0,0 +1,41 @@
+# Generated by Django 5.2.17 on 2026-10-18 00:34
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def preencher_aulas_concluidas(apps, schema_editor):
+    """Contagem inicial — depois ProgressoAulaEAD.marcar_concluida a incrementa."""
+    MatriculaEAD = apps.get_model("treinamentos", "MatriculaEAD")
+
+    contagens = (
+        MatriculaEAD.objects
+        .annotate(n=Count(
+            "progressos_ead",
+            filter=Q(
+                progressos_ead__concluida=True,
+                progressos_ead__aula__obrigatoria=True,
+                progressos_ead__aula__ativo=True,
+            ),
+        ))
+        .filter(n__gt=0)
+        .values_list("pk", "n")
+    )
+    for pk, n in contagens.iterator():
+        MatriculaEAD.objects.filter(pk=pk).update(aulas_concluidas=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treinamentos', '0010_gabaritocertificado_revisao_lotecertificados_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matriculaead',
+            name='aulas_concluidas',
+            field=models.PositiveIntegerField(default=0, verbose_name='Aulas Obrigatórias Concluídas'),
+        ),
+        migrations.RunPython(preencher_aulas_concluidas, migrations.RunPython.noop),
+    ]
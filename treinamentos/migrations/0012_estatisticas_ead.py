@@ -0,0 +1,72 @@
+# Generated by Django 5.2.17 on 2026-10-18 00:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def _subtotal(subquery, agregado):
+    return Coalesce(Subquery(subquery.annotate(valor=agregado).values("valor")[:1]), 0)
+
+
+def preencher_estatisticas(apps, schema_editor):
+    """Contagem inicial — depois os signals chamam CursoEAD.recalcular_estatisticas."""
+    CursoEAD = apps.get_model("treinamentos", "CursoEAD")
+    ModuloEAD = apps.get_model("treinamentos", "ModuloEAD")
+    AulaEAD = apps.get_model("treinamentos", "AulaEAD")
+    MatriculaEAD = apps.get_model("treinamentos", "MatriculaEAD")
+
+    aulas = AulaEAD.objects.filter(modulo=OuterRef("pk")).order_by().values("modulo")
+    ModuloEAD.objects.update(
+        total_aulas=_subtotal(aulas, Count("pk")),
+        duracao_total_min=_subtotal(aulas, Sum("duracao_estimada_min")),
+    )
+    modulos = ModuloEAD.objects.filter(curso=OuterRef("pk")).order_by().values("curso")
+    matriculas = MatriculaEAD.objects.filter(curso=OuterRef("pk")).order_by().values("curso")
+    CursoEAD.objects.update(
+        total_modulos=_subtotal(modulos, Count("pk")),
+        total_aulas=_subtotal(modulos, Sum("total_aulas")),
+        duracao_total_min=_subtotal(modulos, Sum("duracao_total_min")),
+        total_matriculados=_subtotal(matriculas, Count("pk")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treinamentos', '0011_matriculaead_aulas_concluidas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cursoead',
+            name='duracao_total_min',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Duração Total (minutos)'),
+        ),
+        migrations.AddField(
+            model_name='cursoead',
+            name='total_aulas',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Aulas'),
+        ),
+        migrations.AddField(
+            model_name='cursoead',
+            name='total_matriculados',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Matriculados'),
+        ),
+        migrations.AddField(
+            model_name='cursoead',
+            name='total_modulos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Módulos'),
+        ),
+        migrations.AddField(
+            model_name='moduloead',
+            name='duracao_total_min',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Duração Total (minutos)'),
+        ),
+        migrations.AddField(
+            model_name='moduloead',
+            name='total_aulas',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Aulas'),
+        ),
+        migrations.RunPython(preencher_estatisticas, migrations.RunPython.noop),
+    ]
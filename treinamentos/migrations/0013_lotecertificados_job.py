@@ -0,0 +1,23 @@
+# Generated by Django 5.2.17 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treinamentos', '0012_estatisticas_ead'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lotecertificados',
+            name='criado_em',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Criado em'),
+        ),
+        migrations.AlterField(
+            model_name='lotecertificados',
+            name='status',
+            field=models.CharField(choices=[('pendente', 'Na fila'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], db_index=True, default='pendente', max_length=15, verbose_name='Status'),
+        ),
+    ]
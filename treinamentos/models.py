@@ -6,18 +6,24 @@ from decimal import Decimal
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.html import mark_safe
 from django.utils.translation import gettext_lazy as _
 
+from core.jobs import JobAssincrono
 from core.managers import FilialManager
 from core.upload import UploadPath, delete_old_file, safe_delete_file
 from core.validators import SecureFileValidator
+from documentos.storage import PrivateMediaStorage
 from usuario.models import Filial
 from datetime import timedelta
 
+# PDFs de certificado emitidos ficam fora do storage público
+private_storage = PrivateMediaStorage()
+
 
 # =============================================================================
 # TIPO DE CURSO
@@ -230,6 +236,8 @@ class GabaritoCertificado(models.Model):
         ),
     )
     ativo = models.BooleanField("Ativo", default=True)
+    # Entra no hash dos certificados emitidos: editar o gabarito os invalida
+    revisao = models.PositiveIntegerField("Revisão", default=1, editable=False)
 
     class Meta:
         verbose_name        = "Gabarito de Certificado"
@@ -241,6 +249,10 @@ class GabaritoCertificado(models.Model):
     # ── Gerenciamento de arquivo ──────────────────────────────────────────────
     def save(self, *args, **kwargs):
         delete_old_file(self, 'imagem_fundo')
+        if self.pk:
+            self.revisao = (self.revisao or 0) + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'revisao'}
         super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
@@ -292,6 +304,105 @@ class Assinatura(models.Model):
         return "Desconhecido"
 
 
+# =============================================================================
+# CERTIFICADOS PRESENCIAIS — EMISSÃO EM LOTE + ARQUIVO GUARDADO
+# =============================================================================
+def _certificado_upload_path(instance, filename):
+    return f"certificados/{instance.participante.treinamento_id}/{instance.participante_id}/{instance.hash_conteudo}.pdf"
+
+
+def _lote_certificados_upload_path(instance, filename):
+    return f"certificados/{instance.treinamento_id}/lotes/{instance.pk}.{instance.formato}"
+
+
+class LoteCertificados(JobAssincrono):
+    """
+    Job de emissão de todos os certificados de um Treinamento (Celery) e
+    o arquivo do lote — um PDF mesclado ou um ZIP com um PDF por pessoa.
+    Cada certificado também fica guardado em CertificadoEmitido.
+    """
+
+    FORMATO_PDF = 'pdf'
+    FORMATO_ZIP = 'zip'
+    FORMATO_CHOICES = [
+        (FORMATO_PDF, 'PDF único'),
+        (FORMATO_ZIP, 'ZIP (um PDF por participante)'),
+    ]
+
+    treinamento   = models.ForeignKey(Treinamento, on_delete=models.CASCADE, related_name='lotes_certificados', verbose_name='Treinamento')
+    formato       = models.CharField('Formato', max_length=3, choices=FORMATO_CHOICES, default=FORMATO_PDF)
+    progresso     = models.PositiveSmallIntegerField('Progresso (%)', default=0, validators=[MaxValueValidator(100)])
+    total         = models.PositiveIntegerField('Certificados no Lote', default=0)
+    renderizados  = models.PositiveIntegerField('Renderizados Agora', default=0, help_text='Os demais vieram de certificados já guardados.')
+    arquivo       = models.FileField('Arquivo do Lote', upload_to=_lote_certificados_upload_path, storage=private_storage, blank=True)
+    tamanho_bytes = models.PositiveIntegerField('Tamanho (bytes)', default=0)
+    erro          = models.TextField('Erro', blank=True)
+    # URL do site na solicitação — o QR Code é montado fora da request
+    base_url      = models.CharField('URL Base', max_length=255)
+
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='lotes_certificados_solicitados',
+        verbose_name='Solicitado por',
+    )
+
+    class Meta:
+        db_table            = 'treinamento_lote_certificados'
+        verbose_name        = 'Lote de Certificados'
+        verbose_name_plural = 'Lotes de Certificados'
+        ordering            = ['-criado_em']
+
+    def __str__(self):
+        return f"Lote {self.pk} — {self.treinamento_id} ({self.get_status_display()})"
+
+    @property
+    def disponivel(self):
+        return self.status == self.STATUS_CONCLUIDO and bool(self.arquivo)
+
+    def delete(self, *args, **kwargs):
+        safe_delete_file(self, 'arquivo')
+        super().delete(*args, **kwargs)
+
+
+class CertificadoEmitido(models.Model):
+    """
+    PDF do certificado de um participante, guardado contra o hash do
+    participante, do treinamento e da revisão do gabarito
+    (treinamentos.certificados.hash_certificado). Enquanto o hash não
+    mudar, download e verificação servem este arquivo.
+    """
+
+    participante  = models.ForeignKey(Participante, on_delete=models.CASCADE, related_name='certificados_pdf', verbose_name='Participante')
+    hash_conteudo = models.CharField('Hash do Conteúdo', max_length=64)
+    arquivo       = models.FileField('Arquivo PDF', upload_to=_certificado_upload_path, storage=private_storage)
+    tamanho_bytes = models.PositiveIntegerField('Tamanho (bytes)', default=0)
+    lote          = models.ForeignKey(LoteCertificados, on_delete=models.SET_NULL, null=True, blank=True, related_name='certificados', verbose_name='Lote')
+    gerado_em     = models.DateTimeField('Gerado em', auto_now_add=True)
+
+    class Meta:
+        db_table            = 'treinamento_certificado_emitido'
+        verbose_name        = 'Certificado Emitido'
+        verbose_name_plural = 'Certificados Emitidos'
+        ordering            = ['-gerado_em']
+        constraints = [
+            models.UniqueConstraint(fields=['participante', 'hash_conteudo'], name='certificado_unico_por_conteudo'),
+        ]
+
+    def __str__(self):
+        return f"Certificado {self.participante_id} [{self.hash_conteudo[:8]}]"
+
+    def delete(self, *args, **kwargs):
+        safe_delete_file(self, 'arquivo')
+        super().delete(*args, **kwargs)
+
+
+def _subtotal(subquery, agregado):
+    """Agregado de uma subquery correlacionada (agrupada pela FK), 0 se vazia."""
+    return Coalesce(
+        models.Subquery(subquery.annotate(valor=agregado).values("valor")[:1]), 0,
+    )
+
+
 # =============================================================================
 # CURSO EAD
 # =============================================================================
@@ -339,6 +450,12 @@ class CursoEAD(models.Model):
     filial                      = models.ForeignKey(Filial, on_delete=models.PROTECT, related_name="cursos_ead", verbose_name="Filial")
     criado_por                  = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="cursos_ead_criados", verbose_name="Criado por")
 
+    # Estatísticas desnormalizadas — CursoEAD.recalcular_estatisticas (signals)
+    total_modulos               = models.PositiveIntegerField("Módulos", default=0, editable=False)
+    total_aulas                 = models.PositiveIntegerField("Aulas", default=0, editable=False)
+    total_matriculados          = models.PositiveIntegerField("Matriculados", default=0, editable=False)
+    duracao_total_min           = models.PositiveIntegerField("Duração Total (minutos)", default=0, editable=False)
+
     objects = FilialManager()
 
     class Meta:
@@ -365,24 +482,31 @@ class CursoEAD(models.Model):
         safe_delete_file(self, 'imagem_capa')
         super().delete(*args, **kwargs)
 
-    @property
-    def total_modulos(self):
-        return self.modulos_ead.count()
-
-    @property
-    def total_aulas(self):
-        return AulaEAD.objects.filter(modulo__curso=self).count()
-
-    @property
-    def total_matriculados(self):
-        return self.matriculas_ead.count()
-
     @property
     def carga_horaria_calculada(self):
-        total_min = AulaEAD.objects.filter(modulo__curso=self).aggregate(
-            total=models.Sum("duracao_estimada_min")
-        )["total"] or 0
-        return round(total_min / 60, 1)
+        return round(self.duracao_total_min / 60, 1)
+
+    @classmethod
+    def recalcular_estatisticas(cls, curso_ids):
+        """
+        Reconta as colunas de estatística dos cursos e dos seus módulos
+        (duas UPDATEs, qualquer que seja o tamanho dos cursos).
+        """
+        aulas = AulaEAD.objects.filter(modulo=models.OuterRef("pk")).order_by().values("modulo")
+        ModuloEAD.objects.filter(curso_id__in=curso_ids).update(
+            total_aulas=_subtotal(aulas, models.Count("pk")),
+            duracao_total_min=_subtotal(aulas, models.Sum("duracao_estimada_min")),
+        )
+        modulos = ModuloEAD.objects.filter(curso=models.OuterRef("pk")).order_by().values("curso")
+        matriculas = MatriculaEAD.objects.all_filiais().filter(
+            curso=models.OuterRef("pk"),
+        ).order_by().values("curso")
+        cls.objects.all_filiais().filter(pk__in=curso_ids).update(
+            total_modulos=_subtotal(modulos, models.Count("pk")),
+            total_aulas=_subtotal(modulos, models.Sum("total_aulas")),
+            duracao_total_min=_subtotal(modulos, models.Sum("duracao_total_min")),
+            total_matriculados=_subtotal(matriculas, models.Count("pk")),
+        )
 
     @property
     def esta_publicado(self):
@@ -399,6 +523,10 @@ class ModuloEAD(models.Model):
     ordem    = models.PositiveIntegerField("Ordem", default=0)
     ativo    = models.BooleanField("Ativo", default=True)
 
+    # Estatísticas desnormalizadas — CursoEAD.recalcular_estatisticas (signals)
+    total_aulas       = models.PositiveIntegerField("Aulas", default=0, editable=False)
+    duracao_total_min = models.PositiveIntegerField("Duração Total (minutos)", default=0, editable=False)
+
     class Meta:
         verbose_name        = "Módulo EAD"
         verbose_name_plural = "Módulos EAD"
@@ -408,13 +536,6 @@ class ModuloEAD(models.Model):
     def __str__(self):
         return f"{self.ordem}. {self.titulo}"
 
-    @property
-    def total_aulas(self):
-        return self.aulas_ead.count()
-
-    @property
-    def duracao_total_min(self):
-        return self.aulas_ead.aggregate(total=models.Sum("duracao_estimada_min"))["total"] or 0
 
 
 # =============================================================================
@@ -579,6 +700,7 @@ class MatriculaEAD(models.Model):
     plano_estudo             = models.ForeignKey(PlanoEstudo, on_delete=models.SET_NULL, null=True, blank=True, related_name="matriculas_ead", verbose_name="Plano de Estudo (origem)")
     status                   = models.CharField("Status", max_length=20, choices=Status.choices, default=Status.EM_ANDAMENTO, db_index=True)
     progresso_percentual     = models.DecimalField("Progresso (%)", max_digits=5, decimal_places=2, default=Decimal("0.00"))
+    aulas_concluidas         = models.PositiveIntegerField("Aulas Obrigatórias Concluídas", default=0)
     carga_horaria_cumprida_segundos = models.PositiveIntegerField("Carga Horária Cumprida (segundos)", default=0)
     nota_final               = models.DecimalField("Nota Final", max_digits=4, decimal_places=1, null=True, blank=True)
     tentativas_avaliacao     = models.PositiveIntegerField("Tentativas Realizadas", default=0)
@@ -649,17 +771,69 @@ class MatriculaEAD(models.Model):
             and self.nota_final >= self.curso.nota_minima
         )
 
+    @staticmethod
+    def calcular_percentual(concluidas, total_obrigatorias):
+        if total_obrigatorias == 0:
+            return Decimal("100.00")
+        return Decimal(str(round(min(concluidas / total_obrigatorias, 1) * 100, 2)))
+
+    def registrar_aula_concluida(self, aula):
+        """
+        Soma uma aula concluída ao progresso, sem recontar as demais.
+        Chamado uma única vez por aula (ProgressoAulaEAD.marcar_concluida).
+        """
+        from .progresso_ead import total_aulas_obrigatorias
+
+        if not (aula.obrigatoria and aula.ativo):
+            return
+        total = total_aulas_obrigatorias(self.curso_id)
+        with transaction.atomic():
+            concluidas = (
+                MatriculaEAD.objects.all_filiais().select_for_update()
+                .values_list("aulas_concluidas", flat=True).get(pk=self.pk)
+            ) + 1
+            self.aulas_concluidas = concluidas
+            self.progresso_percentual = self.calcular_percentual(concluidas, total)
+            MatriculaEAD.objects.all_filiais().filter(pk=self.pk).update(
+                aulas_concluidas=concluidas, progresso_percentual=self.progresso_percentual,
+            )
+
     def recalcular_progresso(self):
+        """Recontagem completa (reconciliação) — o dia a dia é incremental."""
         total_obrigatorias = AulaEAD.objects.filter(modulo__curso=self.curso, obrigatoria=True, ativo=True).count()
-        if total_obrigatorias == 0:
-            self.progresso_percentual = Decimal("100.00")
-        else:
-            concluidas = self.progressos_ead.filter(concluida=True, aula__obrigatoria=True).count()
-            self.progresso_percentual = Decimal(str(round((concluidas / total_obrigatorias) * 100, 2)))
+        self.aulas_concluidas = self.progressos_ead.filter(
+            concluida=True, aula__obrigatoria=True, aula__ativo=True,
+        ).count()
+        self.progresso_percentual = self.calcular_percentual(self.aulas_concluidas, total_obrigatorias)
 
         total_seg = self.progressos_ead.aggregate(total=models.Sum("tempo_gasto_segundos"))["total"] or 0
         self.carga_horaria_cumprida_segundos = total_seg
-        self.save(update_fields=["progresso_percentual", "carga_horaria_cumprida_segundos"])
+        self.save(update_fields=["aulas_concluidas", "progresso_percentual", "carga_horaria_cumprida_segundos"])
+
+    @classmethod
+    def recalcular_progresso_cursos(cls, curso_ids):
+        """
+        Reconta aulas concluídas e percentual das matrículas dos cursos —
+        aula obrigatória criada, apagada, desativada ou tornada opcional
+        (signals). Uma UPDATE para as contagens e uma por contagem distinta
+        de cada curso para o percentual.
+        """
+        matriculas = cls.objects.all_filiais().filter(curso_id__in=curso_ids)
+        concluidas = ProgressoAulaEAD.objects.filter(
+            matricula=models.OuterRef("pk"), concluida=True, aula__obrigatoria=True, aula__ativo=True,
+        ).order_by().values("matricula")
+        matriculas.update(aulas_concluidas=_subtotal(concluidas, models.Count("pk")))
+
+        totais = dict(
+            AulaEAD.objects.filter(modulo__curso_id__in=curso_ids, obrigatoria=True, ativo=True)
+            .order_by().values("modulo__curso_id").annotate(total=models.Count("pk"))
+            .values_list("modulo__curso_id", "total")
+        )
+        contagens = matriculas.order_by().values_list("curso_id", "aulas_concluidas").distinct()
+        for curso_id, aulas_concluidas in list(contagens):
+            matriculas.filter(curso_id=curso_id, aulas_concluidas=aulas_concluidas).update(
+                progresso_percentual=cls.calcular_percentual(aulas_concluidas, totais.get(curso_id, 0)),
+            )
 
 
 # =============================================================================
@@ -694,12 +868,18 @@ class ProgressoAulaEAD(models.Model):
         return f"{h}h {m}min" if h > 0 else f"{m}min"
 
     def marcar_concluida(self):
-        if not self.concluida:
-            self.concluida = True
-            self.percentual_assistido = Decimal("100.00")
-            self.concluido_em = timezone.now()
-            self.save(update_fields=["concluida", "percentual_assistido", "concluido_em"])
-            self.matricula.recalcular_progresso()
+        if self.concluida:
+            return
+        agora = timezone.now()
+        # Condicional: dois cliques simultâneos contam a aula uma vez só
+        marcou = ProgressoAulaEAD.objects.filter(pk=self.pk, concluida=False).update(
+            concluida=True, percentual_assistido=Decimal("100.00"), concluido_em=agora,
+        )
+        self.concluida = True
+        self.percentual_assistido = Decimal("100.00")
+        self.concluido_em = agora
+        if marcou:
+            self.matricula.registrar_aula_concluida(self.aula)
 
 
 # =============================================================================
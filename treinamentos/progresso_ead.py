@@ -0,0 +1,344 @@
+# treinamentos/progresso_ead.py
+"""
+Progresso das aulas EAD enviado pelo player (heartbeats).
+
+O player manda a posição do vídeo a cada poucos segundos. Em vez de um
+get_or_create + save() por heartbeat, o estado mais recente de cada
+(matrícula, aula) fica num hash no Redis (EAD_PROGRESSO_BUFFER_URL) — um
+heartbeat novo sobrescreve o anterior — e vai para o banco em lote:
+
+    heartbeat ──► hash no Redis ──► worker: bulk_update/bulk_create
+                                    (agendado pelo 1º heartbeat + beat)
+
+A gravação é imediata ao concluir a aula e no fim da sessão (o player
+manda o último heartbeat com `final`). Sem Redis configurado (dev/testes)
+ou fora do ar, cada heartbeat grava direto.
+
+A carga horária da matrícula (soma dos tempos das aulas) é ajustada pela
+diferença de cada lote; o percentual do curso soma uma aula por conclusão
+(MatriculaEAD.registrar_aula_concluida) — nada é recontado, a não ser
+quando uma aula obrigatória entra, sai ou deixa de contar (signals de
+AulaEAD → MatriculaEAD.recalcular_progresso_cursos).
+"""
+
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.cache import CacheNamespace
+
+logger = logging.getLogger(__name__)
+
+cache_progresso = CacheNamespace('treinamentos_progresso', versao=1, timeout=300)
+
+# Usuário sem matrícula na aula também é cacheado (por menos tempo)
+SEM_MATRICULA = 0
+TIMEOUT_SEM_MATRICULA = 30
+
+TAMANHO_LOTE = 500
+ATRASO_DESCARGA_SEGUNDOS = 30
+
+CAMPOS_INTEIROS = ('video_posicao_segundos', 'video_duracao_total', 'tempo_gasto_segundos')
+CAMPOS = CAMPOS_INTEIROS + ('percentual_assistido',)
+
+
+class HeartbeatInvalido(ValueError):
+    """Heartbeat fora do formato esperado."""
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# HEARTBEAT → ESTADO
+# ═════════════════════════════════════════════════════════════════════════════
+
+def estado_do_payload(dados):
+    """Campos de progresso presentes no heartbeat, validados (dict serializável)."""
+    estado = {}
+    try:
+        for campo in CAMPOS_INTEIROS:
+            if campo in dados:
+                estado[campo] = max(0, int(dados[campo]))
+        if 'percentual_assistido' in dados:
+            percentual = Decimal(str(dados['percentual_assistido']))
+            estado['percentual_assistido'] = str(min(max(percentual, Decimal('0')), Decimal('100')).quantize(Decimal('0.01')))
+    except (TypeError, ValueError, InvalidOperation) as e:
+        raise HeartbeatInvalido(str(e)) from e
+    estado['visto_em'] = timezone.now().isoformat()
+    return estado
+
+
+def resolver_matricula(usuario, aula_id):
+    """
+    ID da matrícula do usuário no curso da aula (ou None), com cache —
+    o heartbeat não consulta aula nem matrícula no banco.
+    """
+    from .models import MatriculaEAD
+
+    chave = cache_progresso.chave_usuario(usuario, 'aula', aula_id)
+    matricula_id = cache_progresso.get(chave)
+    if matricula_id is None:
+        matricula_id = (
+            MatriculaEAD.objects
+            .filter(funcionario__usuario=usuario, curso__modulos_ead__aulas_ead=aula_id)
+            .values_list('pk', flat=True)
+            .first()
+        ) or SEM_MATRICULA
+        cache_progresso.set(chave, matricula_id, None if matricula_id else TIMEOUT_SEM_MATRICULA)
+    return matricula_id or None
+
+
+def total_aulas_obrigatorias(curso_id):
+    """Aulas obrigatórias ativas do curso (cache invalidado pelos signals de AulaEAD)."""
+    from .models import AulaEAD
+
+    return cache_progresso.get_or_set(
+        cache_progresso.chave('obrigatorias', curso_id),
+        lambda: AulaEAD.objects.filter(modulo__curso_id=curso_id, obrigatoria=True, ativo=True).count(),
+        None,
+    )
+
+
+def invalidar_total_aulas(curso_id):
+    cache_progresso.delete(cache_progresso.chave('obrigatorias', curso_id))
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# BUFFER
+# ═════════════════════════════════════════════════════════════════════════════
+
+def _campo(matricula_id, aula_id):
+    return f'{matricula_id}:{aula_id}'
+
+
+def _par(campo):
+    matricula_id, aula_id = campo.split(':')
+    return int(matricula_id), int(aula_id)
+
+
+class BufferProgresso:
+    """Hash no Redis: campo "<matrícula>:<aula>" → último estado (JSON)."""
+
+    CHAVE = 'treinamentos:ead:progresso'
+
+    def __init__(self, url):
+        self.url = url
+        self._cliente = None
+
+    @property
+    def cliente(self):
+        if self._cliente is None:
+            import redis
+            self._cliente = redis.from_url(
+                self.url, socket_connect_timeout=2, socket_timeout=2,
+            )
+        return self._cliente
+
+    def guardar(self, campo, estado):
+        """
+        Sobrescreve o estado do campo. Retorna (novo, tamanho): se o campo
+        não estava pendente e quantos campos há no hash.
+        """
+        with self.cliente.pipeline(transaction=True) as pipe:
+            pipe.hset(self.CHAVE, campo, json.dumps(estado))
+            pipe.hlen(self.CHAVE)
+            novo, tamanho = pipe.execute()
+        return bool(novo), tamanho
+
+    def ler(self, campo):
+        valor = self.cliente.hget(self.CHAVE, campo)
+        return json.loads(valor) if valor else None
+
+    def retirar(self, campos=None):
+        """Tira do hash os `campos` (padrão: todos), atomicamente. {campo: estado}."""
+        with self.cliente.pipeline(transaction=True) as pipe:
+            if campos is None:
+                pipe.hgetall(self.CHAVE)
+                pipe.delete(self.CHAVE)
+                itens, _ = pipe.execute()
+                itens = itens.items()
+            else:
+                pipe.hmget(self.CHAVE, campos)
+                pipe.hdel(self.CHAVE, *campos)
+                valores, _ = pipe.execute()
+                itens = zip(campos, valores)
+        return {
+            (c.decode() if isinstance(c, bytes) else c): json.loads(v)
+            for c, v in itens if v
+        }
+
+    def devolver(self, estados):
+        """Recoloca estados cuja gravação falhou, sem sobrescrever heartbeats mais novos."""
+        if estados:
+            with self.cliente.pipeline(transaction=False) as pipe:
+                for campo, estado in estados.items():
+                    pipe.hsetnx(self.CHAVE, campo, json.dumps(estado))
+                pipe.execute()
+
+    def tamanho(self):
+        return self.cliente.hlen(self.CHAVE)
+
+
+_buffers = {}
+
+
+def obter_buffer():
+    """Buffer configurado em EAD_PROGRESSO_BUFFER_URL, ou None."""
+    url = getattr(settings, 'EAD_PROGRESSO_BUFFER_URL', '')
+    if not url:
+        return None
+    if url not in _buffers:
+        _buffers[url] = BufferProgresso(url)
+    return _buffers[url]
+
+
+def registrar_heartbeat(matricula_id, aula_id, estado, final=False):
+    """
+    Entrega o estado do player. Retorna o caminho usado: 'buffer' ou
+    'direto' (fim de sessão, sem buffer ou buffer fora do ar).
+    """
+    from .tasks import descarregar_progresso_ead
+
+    campo = _campo(matricula_id, aula_id)
+    buffer = obter_buffer()
+    if buffer is not None:
+        try:
+            if final:
+                # Grava agora junto com o pendente (o estado recebido prevalece)
+                estado = {**buffer.retirar([campo]).get(campo, {}), **estado}
+            else:
+                novo, tamanho = buffer.guardar(campo, estado)
+        except Exception:
+            logger.warning('Buffer de progresso EAD indisponível; gravando direto', exc_info=True)
+        else:
+            if not final:
+                try:
+                    if tamanho >= TAMANHO_LOTE:
+                        descarregar_progresso_ead.delay()
+                    elif novo and tamanho == 1:
+                        # Buffer estava vazio: a descarga agendada leva o que chegar até lá
+                        descarregar_progresso_ead.apply_async(countdown=ATRASO_DESCARGA_SEGUNDOS)
+                except Exception:
+                    # A descarga periódica do beat recolhe o que ficou
+                    logger.warning('Falha ao agendar descarga do progresso EAD', exc_info=True)
+                return 'buffer'
+
+    gravar_progressos({campo: estado})
+    return 'direto'
+
+
+def descarregar(matricula_id, aula_id):
+    """Grava agora o estado pendente de uma (matrícula, aula), se houver."""
+    buffer = obter_buffer()
+    if buffer is None:
+        return 0
+    try:
+        estados = buffer.retirar([_campo(matricula_id, aula_id)])
+    except Exception:
+        logger.warning('Buffer de progresso EAD indisponível', exc_info=True)
+        return 0
+    return gravar_progressos(estados)
+
+
+def estado_pendente(matricula_id, aula_id):
+    """Último heartbeat ainda não gravado (para a tela não voltar no tempo)."""
+    buffer = obter_buffer()
+    if buffer is None:
+        return None
+    try:
+        return buffer.ler(_campo(matricula_id, aula_id))
+    except Exception:
+        logger.warning('Buffer de progresso EAD indisponível', exc_info=True)
+        return None
+
+
+def aplicar_estado(progresso, estado):
+    """Copia um estado (heartbeat) para a instância, sem salvar."""
+    for campo in CAMPOS_INTEIROS:
+        if campo in estado:
+            setattr(progresso, campo, estado[campo])
+    if 'percentual_assistido' in estado and not progresso.concluida:
+        progresso.percentual_assistido = Decimal(estado['percentual_assistido'])
+
+
+# ═════════════════════════════════════════════════════════════════════════════
+# GRAVAÇÃO EM LOTE
+# ═════════════════════════════════════════════════════════════════════════════
+
+def gravar_progressos(estados):
+    """
+    Grava {"<matrícula>:<aula>": estado} em lote: um bulk_update para os
+    ProgressoAulaEAD existentes, um bulk_create para os novos e um UPDATE
+    da carga horária das matrículas afetadas. Retorna quantos gravou.
+    """
+    from .models import AulaEAD, MatriculaEAD, ProgressoAulaEAD
+
+    if not estados:
+        return 0
+    pares = {_par(campo): estado for campo, estado in estados.items()}
+    matriculas = {m for m, _ in pares}
+    aulas = {a for _, a in pares}
+
+    with transaction.atomic():
+        existentes = {
+            (p.matricula_id, p.aula_id): p
+            for p in ProgressoAulaEAD.objects
+            .filter(matricula_id__in=matriculas, aula_id__in=aulas)
+            .select_for_update()
+        }
+        # O filtro por IN cruza matrículas × aulas: fica só com os pares do lote
+        existentes = {par: p for par, p in existentes.items() if par in pares}
+
+        novos_pares = [par for par in pares if par not in existentes]
+        if novos_pares:
+            # Matrícula/aula apagada enquanto o heartbeat esperava: descarta
+            matriculas_ok = set(
+                MatriculaEAD.objects.all_filiais()
+                .filter(pk__in={m for m, _ in novos_pares}).values_list('pk', flat=True)
+            )
+            aulas_ok = set(AulaEAD.objects.filter(pk__in={a for _, a in novos_pares}).values_list('pk', flat=True))
+            descartados = [p for p in novos_pares if p[0] not in matriculas_ok or p[1] not in aulas_ok]
+            if descartados:
+                logger.warning('Progresso EAD: %s heartbeat(s) de matrícula/aula inexistente descartado(s)', len(descartados))
+            novos_pares = [p for p in novos_pares if p not in descartados]
+
+        delta_tempo = {}
+        atualizar, criar = [], []
+        for par in list(existentes) + novos_pares:
+            estado = pares[par]
+            visto_em = parse_datetime(estado['visto_em']) if estado.get('visto_em') else timezone.now()
+            progresso = existentes.get(par)
+            if progresso is None:
+                progresso = ProgressoAulaEAD(matricula_id=par[0], aula_id=par[1], iniciado_em=visto_em)
+                criar.append(progresso)
+            else:
+                atualizar.append(progresso)
+            tempo_antes = progresso.tempo_gasto_segundos
+            aplicar_estado(progresso, estado)
+            progresso.ultimo_acesso = visto_em
+            if progresso.tempo_gasto_segundos != tempo_antes:
+                delta_tempo[par[0]] = delta_tempo.get(par[0], 0) + progresso.tempo_gasto_segundos - tempo_antes
+
+        if atualizar:
+            ProgressoAulaEAD.objects.bulk_update(atualizar, [*CAMPOS, 'ultimo_acesso'], batch_size=TAMANHO_LOTE)
+        if criar:
+            ProgressoAulaEAD.objects.bulk_create(criar, batch_size=TAMANHO_LOTE)
+
+        # Carga horária = soma dos tempos das aulas: aplica só a diferença
+        if delta_tempo:
+            MatriculaEAD.objects.all_filiais().filter(pk__in=delta_tempo).update(
+                carga_horaria_cumprida_segundos=Greatest(
+                    F('carga_horaria_cumprida_segundos') + Case(
+                        *[When(pk=pk, then=Value(delta)) for pk, delta in delta_tempo.items()],
+                        default=Value(0), output_field=IntegerField(),
+                    ),
+                    Value(0),
+                ),
+            )
+
+    return len(atualizar) + len(criar)
@@ -144,3 +144,99 @@ def emitir_certificado_ead_ao_aprovar(sender, instance, **kwargs):
         print(f"❌ Erro ao emitir certificado EAD: {e}")
         import traceback
         traceback.print_exc()
+
+
+# =============================================================================
+# SIGNAL: Catálogo e progresso EAD (estatísticas desnormalizadas, total de
+# aulas obrigatórias e percentual incremental das matrículas)
+# =============================================================================
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_save
+from .models import AulaEAD, CursoEAD, ModuloEAD
+from .progresso_ead import invalidar_total_aulas
+
+
+def _agendar_estatisticas(*curso_ids):
+    """Reconta após o commit — rollback não mexe nas colunas."""
+    curso_ids = {c for c in curso_ids if c}
+    if curso_ids:
+        transaction.on_commit(lambda: CursoEAD.recalcular_estatisticas(curso_ids))
+
+
+def _agendar_progresso(*curso_ids):
+    """Reconta as matrículas após o commit (MatriculaEAD.recalcular_progresso_cursos)."""
+    curso_ids = {c for c in curso_ids if c}
+    if curso_ids:
+        transaction.on_commit(lambda: MatriculaEAD.recalcular_progresso_cursos(curso_ids))
+
+
+def _conta_no_progresso(aula):
+    return aula.obrigatoria and aula.ativo
+
+
+@receiver(pre_save, sender=AulaEAD)
+def aula_guardar_estado_anterior(sender, instance, **kwargs):
+    """Curso de origem (aula trocada de módulo) e se a aula contava no progresso."""
+    instance._curso_anterior, instance._contava_anterior = None, False
+    if instance.pk:
+        anterior = (
+            AulaEAD.objects.filter(pk=instance.pk)
+            .values_list("modulo__curso_id", "obrigatoria", "ativo").first()
+        )
+        if anterior:
+            instance._curso_anterior, obrigatoria, ativo = anterior
+            instance._contava_anterior = obrigatoria and ativo
+
+
+@receiver(pre_save, sender=ModuloEAD)
+def modulo_guardar_curso_anterior(sender, instance, **kwargs):
+    instance._curso_anterior = None
+    if instance.pk:
+        instance._curso_anterior = (
+            ModuloEAD.objects.filter(pk=instance.pk).values_list("curso_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=AulaEAD)
+@receiver(post_delete, sender=AulaEAD)
+def aula_alterada(sender, instance, signal, **kwargs):
+    """
+    Aula criada, alterada ou apagada, no curso atual e no de origem:
+    limpa o total cacheado de aulas obrigatórias, reconta as estatísticas
+    e — como `aulas_concluidas` só é somado — reconta as matrículas se a
+    aula passou a contar ou deixou de contar no progresso.
+    """
+    try:
+        curso_id = instance.modulo.curso_id
+    except ModuloEAD.DoesNotExist:
+        return  # módulo apagado em cascata junto com o curso
+
+    if signal is post_delete:
+        antes, depois = (curso_id, _conta_no_progresso(instance)), (curso_id, False)
+    else:
+        antes = (getattr(instance, "_curso_anterior", None), getattr(instance, "_contava_anterior", False))
+        depois = (curso_id, _conta_no_progresso(instance))
+
+    cursos = {c for c in (antes[0], depois[0]) if c}
+    for curso in cursos:
+        invalidar_total_aulas(curso)
+    _agendar_estatisticas(*cursos)
+    if antes != depois:
+        _agendar_progresso(*(curso for curso, conta in (antes, depois) if conta))
+
+
+@receiver(post_save, sender=ModuloEAD)
+@receiver(post_delete, sender=ModuloEAD)
+def modulo_atualizar_estatisticas(sender, instance, **kwargs):
+    _agendar_estatisticas(instance.curso_id, getattr(instance, "_curso_anterior", None))
+
+
+@receiver(post_save, sender=MatriculaEAD)
+def matricula_atualizar_estatisticas(sender, instance, created, **kwargs):
+    if created:
+        _agendar_estatisticas(instance.curso_id)
+
+
+@receiver(post_delete, sender=MatriculaEAD)
+def matricula_removida_atualizar_estatisticas(sender, instance, **kwargs):
+    _agendar_estatisticas(instance.curso_id)
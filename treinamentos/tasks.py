@@ -0,0 +1,102 @@
+# treinamentos/tasks.py
+import logging
+
+from celery import shared_task
+from django.core.files.base import ContentFile
+
+from core.jobs import assumir, concluir, marcar_erro
+
+from .models import CertificadoEmitido, LoteCertificados
+
+logger = logging.getLogger(__name__)
+
+# Fatia do progresso reservada para emitir os certificados; o resto é
+# juntar o PDF único / ZIP.
+PROGRESSO_EMISSAO = 90
+
+
+@shared_task(name="treinamentos.emitir_certificados")
+def emitir_certificados_task(lote_id):
+    """Emite os certificados de um LoteCertificados e guarda o arquivo do lote."""
+    from .certificados import (
+        RenderizadorCertificados, emitir_certificado, limpar_lotes_antigos,
+        montar_arquivo_lote, participantes_aptos,
+    )
+
+    if not assumir(LoteCertificados, lote_id):
+        logger.info(f"[Certificados] Lote {lote_id} inexistente ou já assumido.")
+        return None
+
+    lote = LoteCertificados.objects.select_related('treinamento').get(pk=lote_id)
+    treinamento = lote.treinamento
+
+    try:
+        renderizador = RenderizadorCertificados(lote.base_url)
+        participantes = list(participantes_aptos(treinamento))
+        if not participantes:
+            raise ValueError("Nenhum participante com presença e assinatura confirmadas.")
+
+        # Uma query para todos os PDFs já guardados do treinamento
+        guardados = {
+            (c.participante_id, c.hash_conteudo): c
+            for c in CertificadoEmitido.objects.filter(participante__treinamento=treinamento).exclude(arquivo='')
+        }
+        LoteCertificados.objects.filter(pk=lote_id).update(total=len(participantes))
+
+        certificados, renderizados = [], 0
+        for n, participante in enumerate(participantes, start=1):
+            certificado, novo = emitir_certificado(participante, renderizador, guardados, lote=lote)
+            certificados.append((participante, certificado))
+            renderizados += novo
+            LoteCertificados.objects.filter(pk=lote_id).update(
+                progresso=int(n * PROGRESSO_EMISSAO / len(participantes)),
+                renderizados=renderizados,
+            )
+
+        conteudo = montar_arquivo_lote(lote.formato, certificados)
+        lote.arquivo.save(f"{lote.pk}.{lote.formato}", ContentFile(conteudo), save=False)
+        lote.total = len(participantes)
+        lote.renderizados = renderizados
+        lote.tamanho_bytes = len(conteudo)
+        lote.progresso = 100
+    except Exception as e:
+        logger.exception(f"[Certificados] Erro ao emitir lote {lote_id} do treinamento {treinamento.pk}")
+        marcar_erro(lote, e, status=LoteCertificados.STATUS_PROCESSANDO)
+        return None
+
+    if not concluir(lote, ['arquivo', 'total', 'renderizados', 'tamanho_bytes', 'progresso']):
+        # Encerrado (travado ou substituído) enquanto emitia: descarta o arquivo
+        logger.warning(f"[Certificados] Lote {lote_id} encerrado antes de concluir; descartando o arquivo.")
+        lote.arquivo.delete(save=False)
+        return None
+
+    limpar_lotes_antigos(lote)
+    logger.info(
+        f"[Certificados] Treinamento {treinamento.pk}: {lote.total} certificados, "
+        f"{lote.renderizados} renderizados agora (lote {lote_id})."
+    )
+    return lote.pk
+
+
+@shared_task(name="treinamentos.descarregar_progresso_ead")
+def descarregar_progresso_ead():
+    """Grava em lote os heartbeats do player EAD acumulados no buffer."""
+    from .progresso_ead import gravar_progressos, obter_buffer
+
+    buffer = obter_buffer()
+    if buffer is None:
+        return 0
+
+    estados = buffer.retirar()
+    if not estados:
+        return 0
+    try:
+        total = gravar_progressos(estados)
+    except Exception:
+        # Devolve o lote; a próxima descarga tenta de novo
+        buffer.devolver(estados)
+        logger.exception(f"[EAD] Falha ao gravar {len(estados)} progresso(s) do buffer")
+        return 0
+
+    logger.info(f"[EAD] {total} progresso(s) de aula gravado(s) do buffer")
+    return total
@@ -1,3 +1,522 @@
-from django.test import TestCase
+# treinamentos/tests.py
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+from pypdf import PdfReader, PdfWriter
+
+from departamento_pessoal.models import Cargo, Departamento, Funcionario
+from usuario.models import Filial
+
+from . import progresso_ead
+from .certificados import RenderizadorCertificados, hash_certificado, participantes_aptos, solicitar_lote
+from .models import (
+    Assinatura, AulaEAD, CertificadoEmitido, CursoEAD, GabaritoCertificado, LoteCertificados,
+    MatriculaEAD, ModuloEAD, Participante, ProgressoAulaEAD, TipoCurso, Treinamento,
+)
+from .tasks import descarregar_progresso_ead, emitir_certificados_task
+
+User = get_user_model()
+
+urlpatterns = [
+    path('treinamentos/', include('treinamentos.urls')),
+    # namespaces usados pelo base.html e pelos context processors
+    path('', include('core.urls')),
+    path('chat/', include('chat.urls')),
+    path('contas/', include('usuario.urls', namespace='usuario')),
+    path('notifications/', include('notifications.urls', namespace='notifications')),
+]
+
+
+def _pdf_de_uma_pagina():
+    writer = PdfWriter()
+    writer.add_blank_page(width=842, height=595)
+    saida = io.BytesIO()
+    writer.write(saida)
+    return saida.getvalue()
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class CertificadosTestBase(TestCase):
+    """Treinamento finalizado com dois participantes aptos e um sem assinatura."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial Treinamentos')
+        cls.usuario = User.objects.create_superuser(
+            username='gestor', email='gestor@example.com', password='x', filial_ativa=cls.filial,
+        )
+        cls.tipo = TipoCurso.objects.create(nome='NR-35', modalidade='P', area='SEG', filial=cls.filial)
+        inicio = timezone.now() - timedelta(days=2)
+        cls.treinamento = Treinamento.objects.create(
+            nome='NR-35 Turma 1', tipo_curso=cls.tipo, data_inicio=inicio, data_fim=inicio,
+            data_vencimento=inicio.date() + timedelta(days=365), duracao=8, descricao='Trabalho em altura',
+            palestrante='Instrutor', status='F', local='Sede', participantes_previstos=3,
+            assinaturas_solicitadas=True,
+            filial=cls.filial,
+        )
+        Assinatura.objects.create(treinamento_responsavel=cls.treinamento, data_assinatura=timezone.now())
+        cls.gabarito = GabaritoCertificado.objects.create(
+            nome='Padrão', empresa_nome='Empresa',
+            texto_principal='Certificamos que {participante_nome} concluiu {nome_curso}.',
+        )
+
+        cls.participantes = []
+        for n, assinado in enumerate([True, True, False]):
+            funcionario = User.objects.create_user(
+                username=f'aluno{n}', email=f'aluno{n}@example.com', password='x',
+                first_name=f'Aluno{n}', last_name='Silva',
+            )
+            participante = Participante.objects.create(
+                treinamento=cls.treinamento, funcionario=funcionario, nome=funcionario.get_full_name(),
+                presente=True,
+            )
+            Assinatura.objects.create(
+                participante=participante, data_assinatura=timezone.now() if assinado else None,
+            )
+            cls.participantes.append(participante)
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        for model in (CertificadoEmitido, LoteCertificados):
+            campo = model._meta.get_field('arquivo')
+            storage = patch.object(campo, 'storage', FileSystemStorage(location=self.media))
+            storage.start()
+            self.addCleanup(storage.stop)
+
+        renderizar = patch.object(
+            RenderizadorCertificados, 'renderizar', autospec=True,
+            side_effect=lambda renderizador, participante: _pdf_de_uma_pagina(),
+        )
+        self.renderizar = renderizar.start()
+        self.addCleanup(renderizar.stop)
+
+    def _emitir_lote(self, formato=LoteCertificados.FORMATO_PDF):
+        with self.captureOnCommitCallbacks(execute=True):
+            lote = solicitar_lote(self.treinamento, 'https://sistema.exemplo.com/', formato, self.usuario)
+        lote.refresh_from_db()
+        return lote
+
+
+class HashCertificadoTest(CertificadosTestBase):
+
+    def _hash(self):
+        participante = participantes_aptos(self.treinamento).first()
+        return hash_certificado(participante, GabaritoCertificado.objects.get(pk=self.gabarito.pk))
+
+    def test_hash_estavel_e_muda_com_revisao_do_gabarito(self):
+        antes = self._hash()
+        self.assertEqual(antes, self._hash())
+
+        gabarito = GabaritoCertificado.objects.get(pk=self.gabarito.pk)
+        gabarito.texto_principal = 'Novo texto {participante_nome}'
+        gabarito.save()
+        self.assertEqual(gabarito.revisao, 2)
+        self.assertNotEqual(antes, self._hash())
+
+    def test_contexto_preenche_textos_e_qrcode(self):
+        participante = participantes_aptos(self.treinamento).first()
+        contexto = RenderizadorCertificados('https://sistema.exemplo.com/').contexto(participante)
+
+        self.assertEqual(contexto['texto_frente'], 'Certificamos que Aluno0 Silva concluiu NR-35.')
+        self.assertIn(str(participante.protocolo_validacao), contexto['texto_verso'])
+        self.assertIn('<svg', contexto['contexto_verso']['qr_code_svg'])
+
+
+class LoteCertificadosTest(CertificadosTestBase):
+
+    def test_lote_pdf_renderiza_aptos_uma_vez(self):
+        lote = self._emitir_lote()
+
+        self.assertTrue(lote.disponivel)
+        self.assertEqual((lote.total, lote.renderizados, lote.progresso), (2, 2, 100))
+        with lote.arquivo.open('rb') as f:
+            self.assertEqual(len(PdfReader(f).pages), 2)
+        self.assertEqual(CertificadoEmitido.objects.count(), 2)
+        self.assertEqual(
+            set(Participante.objects.filter(certificado_emitido=True).values_list('pk', flat=True)),
+            {self.participantes[0].pk, self.participantes[1].pk},
+        )
+
+        # ZIP na sequência reaproveita os PDFs guardados
+        zip_lote = self._emitir_lote(LoteCertificados.FORMATO_ZIP)
+        self.assertEqual((zip_lote.total, zip_lote.renderizados), (2, 0))
+        with zip_lote.arquivo.open('rb') as f:
+            self.assertEqual(
+                sorted(zipfile.ZipFile(f).namelist()),
+                ['certificado_aluno0.pdf', 'certificado_aluno1.pdf'],
+            )
+        self.assertEqual(self.renderizar.call_count, 2)
+
+    def test_gabarito_alterado_renderiza_de_novo_e_descarta_antigos(self):
+        self._emitir_lote()
+        self.gabarito.save()
+
+        lote = self._emitir_lote()
+        self.assertEqual(lote.renderizados, 2)
+        self.assertEqual(CertificadoEmitido.objects.count(), 2)
+        self.assertEqual(LoteCertificados.objects.count(), 1)
+
+    def test_cliques_repetidos_reaproveitam_lote_na_fila(self):
+        primeiro = solicitar_lote(self.treinamento, 'https://sistema.exemplo.com/')
+        segundo = solicitar_lote(self.treinamento, 'https://sistema.exemplo.com/')
+        self.assertEqual(primeiro.pk, segundo.pk)
+
+    def test_lote_travado_nao_bloqueia_nova_emissao(self):
+        travado = solicitar_lote(self.treinamento, 'https://sistema.exemplo.com/')
+        LoteCertificados.objects.filter(pk=travado.pk).update(
+            status=LoteCertificados.STATUS_PROCESSANDO,
+            iniciado_em=timezone.now() - LoteCertificados.TEMPO_LIMITE - timedelta(minutes=1),
+        )
+
+        lote = self._emitir_lote()
+
+        self.assertNotEqual(lote.pk, travado.pk)
+        self.assertTrue(lote.disponivel)
+        self.assertFalse(LoteCertificados.objects.filter(pk=travado.pk, status__in=LoteCertificados.STATUS_ATIVOS).exists())
+
+    def test_forcar_substitui_lote_ativo(self):
+        antigo = solicitar_lote(self.treinamento, 'https://sistema.exemplo.com/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            novo = solicitar_lote(self.treinamento, 'https://sistema.exemplo.com/', forcar=True)
+
+        self.assertNotEqual(novo.pk, antigo.pk)
+        novo.refresh_from_db()
+        self.assertTrue(novo.disponivel)
+
+        # A task do lote substituído não roda nem sobrescreve o novo
+        self.assertIsNone(emitir_certificados_task(antigo.pk))
+        self.assertEqual(LoteCertificados.objects.get().pk, novo.pk)
+
+    def test_worker_atrasado_descarta_lote_substituido(self):
+        lote = LoteCertificados.objects.create(treinamento=self.treinamento, base_url='https://x/')
+
+        def substituido_no_meio(renderizador, participante):
+            LoteCertificados.objects.filter(pk=lote.pk).update(status=LoteCertificados.STATUS_ERRO)
+            return _pdf_de_uma_pagina()
+
+        self.renderizar.side_effect = substituido_no_meio
+        self.assertIsNone(emitir_certificados_task(lote.pk))
+
+        lote.refresh_from_db()
+        self.assertEqual(lote.status, LoteCertificados.STATUS_ERRO)
+        self.assertFalse(lote.arquivo)
+
+    def test_sem_gabarito_ativo_registra_erro(self):
+        GabaritoCertificado.objects.update(ativo=False)
+        lote = LoteCertificados.objects.create(treinamento=self.treinamento, base_url='https://x/')
+
+        emitir_certificados_task(lote.pk)
+
+        lote.refresh_from_db()
+        self.assertEqual(lote.status, LoteCertificados.STATUS_ERRO)
+        self.assertIn('Gabarito', lote.erro)
+
+
+class CertificadoViewsTest(CertificadosTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.usuario)
+
+    def test_download_individual_guarda_e_reaproveita(self):
+        url = reverse('treinamentos:gerar_certificado_participante', args=[self.participantes[0].pk])
+        for _ in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(self.renderizar.call_count, 1)
+
+    def test_verificacao_publica_serve_pdf_guardado(self):
+        self.client.logout()
+        participante = self.participantes[0]
+        url = reverse('treinamentos:verificar_certificado_pdf', args=[participante.protocolo_validacao])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self._emitir_lote()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(self.renderizar.call_count, 2)
+
+    def test_emitir_e_acompanhar_lote(self):
+        url = reverse('treinamentos:lote_certificados_emitir', args=[self.treinamento.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'formato': 'zip'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 202)
+        lote_id = response.json()['lote_id']
+
+        status = self.client.get(
+            reverse('treinamentos:lote_certificados_status', args=[self.treinamento.pk, lote_id]),
+        ).json()
+        self.assertEqual(status['status'], LoteCertificados.STATUS_CONCLUIDO)
+        download = self.client.get(status['url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download['Content-Type'], 'application/zip')
+
+
+class BufferFalso:
+    """Mesma interface do BufferProgresso (hash no Redis), em memória."""
+
+    def __init__(self):
+        self.hash = {}
+
+    def guardar(self, campo, estado):
+        novo = campo not in self.hash
+        self.hash[campo] = estado
+        return novo, len(self.hash)
+
+    def ler(self, campo):
+        return self.hash.get(campo)
+
+    def retirar(self, campos=None):
+        campos = list(self.hash) if campos is None else campos
+        return {c: self.hash.pop(c) for c in campos if c in self.hash}
+
+    def devolver(self, estados):
+        for campo, estado in estados.items():
+            self.hash.setdefault(campo, estado)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class ProgressoEADTest(TestCase):
+    """Heartbeats do player agrupados no buffer e progresso incremental."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial EAD')
+        cls.usuario = User.objects.create_user(
+            username='aluno', email='aluno@example.com', password='x', filial_ativa=cls.filial,
+        )
+        funcionario = Funcionario.objects.create(
+            usuario=cls.usuario, filial=cls.filial, nome_completo='Aluno EAD', matricula='EAD-1',
+            cargo=Cargo.objects.create(nome='Operador'), departamento=Departamento.objects.create(nome='Obras'),
+            data_admissao=date(2024, 1, 1),
+        )
+        tipo = TipoCurso.objects.create(nome='NR-10 EAD', modalidade='O', area='SEG', filial=cls.filial)
+        curso = CursoEAD.objects.create(
+            titulo='NR-10 Online', slug='nr-10-online', descricao='Curso', tipo_curso=tipo,
+            carga_horaria_total=Decimal('1.0'), filial=cls.filial,
+        )
+        modulo = ModuloEAD.objects.create(curso=curso, titulo='Módulo 1', ordem=1)
+        cls.aula1, cls.aula2 = (
+            AulaEAD.objects.create(modulo=modulo, titulo=f'Aula {n}', ordem=n) for n in (1, 2)
+        )
+        cls.opcional = AulaEAD.objects.create(modulo=modulo, titulo='Extra', ordem=3, obrigatoria=False)
+        cls.matricula = MatriculaEAD.objects.create(funcionario=funcionario, curso=curso, filial=cls.filial)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.buffer = BufferFalso()
+        obter = patch.object(progresso_ead, 'obter_buffer', return_value=self.buffer)
+        obter.start()
+        self.addCleanup(obter.stop)
+        agendar = patch('treinamentos.tasks.descarregar_progresso_ead.apply_async')
+        self.agendar = agendar.start()
+        self.addCleanup(agendar.stop)
+
+    def _heartbeat(self, aula, **dados):
+        return self.client.post(
+            reverse('treinamentos:ead_salvar_progresso', args=[aula.pk]),
+            dados, content_type='application/json',
+        )
+
+    def _concluir(self, aula):
+        return self.client.post(reverse('treinamentos:ead_concluir_aula', args=[aula.pk])).json()
+
+    def test_heartbeats_agrupados_ate_a_descarga(self):
+        self._heartbeat(self.aula1, video_posicao_segundos=10, tempo_gasto_segundos=10)
+        for segundos in (20, 30, 40):
+            # matrícula já cacheada: nenhuma consulta às tabelas do EAD
+            with CaptureQueriesContext(connection) as ctx:
+                resposta = self._heartbeat(self.aula1, video_posicao_segundos=segundos, tempo_gasto_segundos=segundos)
+            self.assertEqual(resposta.status_code, 200)
+            self.assertFalse([q for q in ctx.captured_queries if 'treinamentos_' in q['sql']])
+        self._heartbeat(self.aula2, tempo_gasto_segundos=5)
+
+        self.assertFalse(ProgressoAulaEAD.objects.exists())
+        self.agendar.assert_called_once()
+
+        self.assertEqual(descarregar_progresso_ead(), 2)
+        progresso = ProgressoAulaEAD.objects.get(aula=self.aula1)
+        self.assertEqual((progresso.video_posicao_segundos, progresso.tempo_gasto_segundos), (40, 40))
+
+        # Segunda rodada: a carga horária soma só a diferença
+        self._heartbeat(self.aula1, video_posicao_segundos=70, tempo_gasto_segundos=70)
+        descarregar_progresso_ead()
+        self.matricula.refresh_from_db()
+        self.assertEqual(self.matricula.carga_horaria_cumprida_segundos, 75)
+
+    def test_fim_de_sessao_grava_na_hora(self):
+        self._heartbeat(self.aula1, video_posicao_segundos=10, video_duracao_total=600)
+        self._heartbeat(self.aula1, video_posicao_segundos=90, tempo_gasto_segundos=90, final='1')
+
+        progresso = ProgressoAulaEAD.objects.get(aula=self.aula1)
+        self.assertEqual(
+            (progresso.video_posicao_segundos, progresso.video_duracao_total, progresso.tempo_gasto_segundos),
+            (90, 600, 90),
+        )
+        self.assertEqual(self.buffer.hash, {})
+
+    def test_concluir_grava_pendente_e_soma_sem_recontar(self):
+        self._heartbeat(self.aula1, video_posicao_segundos=300, tempo_gasto_segundos=300)
+
+        self.assertEqual(self._concluir(self.aula1)['progresso_curso'], 50.0)
+        progresso = ProgressoAulaEAD.objects.get(aula=self.aula1)
+        self.assertTrue(progresso.concluida)
+        self.assertEqual(progresso.tempo_gasto_segundos, 300)
+
+        self.assertEqual(self._concluir(self.aula1)['progresso_curso'], 50.0)  # repetido não conta
+        self.assertEqual(self._concluir(self.opcional)['progresso_curso'], 50.0)
+        self.assertEqual(self._concluir(self.aula2)['progresso_curso'], 100.0)
+
+        self.matricula.refresh_from_db()
+        incremental = (
+            self.matricula.aulas_concluidas, self.matricula.progresso_percentual,
+            self.matricula.carga_horaria_cumprida_segundos,
+        )
+        self.matricula.recalcular_progresso()
+        self.assertEqual(incremental, (2, Decimal('100.00'), 300))
+        self.assertEqual(incremental, (
+            self.matricula.aulas_concluidas, self.matricula.progresso_percentual,
+            self.matricula.carga_horaria_cumprida_segundos,
+        ))
+
+    def test_aula_que_deixa_de_contar_reconta_matriculas(self):
+        self._concluir(self.aula1)
+        self._concluir(self.aula2)
+
+        def progresso(alterar):
+            with self.captureOnCommitCallbacks(execute=True):
+                alterar()
+            self.matricula.refresh_from_db()
+            atual = (self.matricula.aulas_concluidas, self.matricula.progresso_percentual)
+            self.matricula.recalcular_progresso()
+            self.assertEqual(atual, (self.matricula.aulas_concluidas, self.matricula.progresso_percentual))
+            return atual
+
+        self.opcional.obrigatoria = True
+        self.assertEqual(progresso(self.opcional.save), (2, Decimal('66.67')))
+        self.aula2.ativo = False
+        self.assertEqual(progresso(self.aula2.save), (1, Decimal('50.00')))
+        self.assertEqual(progresso(self.aula1.delete), (0, Decimal('0.00')))
+
+    def test_sem_matricula_e_dados_invalidos(self):
+        self.client.force_login(User.objects.create_user(username='outro', email='outro@example.com', password='x'))
+        self.assertEqual(self._heartbeat(self.aula1, tempo_gasto_segundos=1).status_code, 404)
+
+        self.client.force_login(self.usuario)
+        self.assertEqual(self._heartbeat(self.aula1, tempo_gasto_segundos='abc').status_code, 400)
+
+    @patch.object(progresso_ead, 'obter_buffer', return_value=None)
+    def test_sem_buffer_grava_direto(self, _):
+        self._heartbeat(self.aula1, video_posicao_segundos=15, tempo_gasto_segundos=15)
+        self.assertEqual(ProgressoAulaEAD.objects.get(aula=self.aula1).video_posicao_segundos, 15)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class EstatisticasCursoEADTest(TestCase):
+    """Colunas de estatística mantidas pelos signals e catálogo sem N+1."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filial = Filial.objects.create(nome='Filial Catálogo')
+        cls.usuario = User.objects.create_user(
+            username='catalogo', email='catalogo@example.com', password='x', filial_ativa=cls.filial,
+        )
+        cls.tipo = TipoCurso.objects.create(nome='NR-35 EAD', modalidade='O', area='SEG', filial=cls.filial)
+        cls.cargo = Cargo.objects.create(nome='Montador')
+        cls.departamento = Departamento.objects.create(nome='Campo')
+
+    def _curso(self, slug, modulos=1, aulas=2):
+        with self.captureOnCommitCallbacks(execute=True):
+            curso = CursoEAD.objects.create(
+                titulo=slug, slug=slug, descricao='Curso', tipo_curso=self.tipo,
+                carga_horaria_total=Decimal('1.0'), filial=self.filial, status=CursoEAD.Status.PUBLICADO,
+            )
+            for m in range(1, modulos + 1):
+                modulo = ModuloEAD.objects.create(curso=curso, titulo=f'Módulo {m}', ordem=m)
+                for a in range(1, aulas + 1):
+                    AulaEAD.objects.create(modulo=modulo, titulo=f'Aula {a}', ordem=a, duracao_estimada_min=15)
+        curso.refresh_from_db()
+        return curso
+
+    def _matricular(self, curso, n):
+        funcionario = Funcionario.objects.create(
+            filial=self.filial, nome_completo=f'Aluno {n}', matricula=f'CAT-{n}',
+            cargo=self.cargo, departamento=self.departamento, data_admissao=date(2024, 1, 1),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return MatriculaEAD.objects.create(funcionario=funcionario, curso=curso, filial=self.filial)
+
+    def _estatisticas(self, curso):
+        curso.refresh_from_db()
+        return curso.total_modulos, curso.total_aulas, curso.total_matriculados, curso.duracao_total_min
+
+    def test_signals_mantem_as_colunas(self):
+        curso = self._curso('nr-35-online', modulos=2, aulas=3)
+        outro = self._curso('nr-33-online', modulos=1, aulas=1)
+        self.assertEqual(self._estatisticas(curso), (2, 6, 0, 90))
+        self.assertEqual(curso.carga_horaria_calculada, 1.5)
+        modulo = curso.modulos_ead.get(ordem=1)
+        self.assertEqual((modulo.total_aulas, modulo.duracao_total_min), (3, 45))
+
+        matricula = self._matricular(curso, 1)
+        self._matricular(curso, 2)
+        self.assertEqual(self._estatisticas(curso)[2], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            matricula.delete()
+        self.assertEqual(self._estatisticas(curso)[2], 1)
+
+        # Aula trocada de curso reconta origem e destino
+        aula = modulo.aulas_ead.get(ordem=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            aula.modulo = outro.modulos_ead.get()
+            aula.ordem = 9
+            aula.duracao_estimada_min = 30
+            aula.save()
+        self.assertEqual(self._estatisticas(curso), (2, 5, 1, 75))
+        self.assertEqual(self._estatisticas(outro), (1, 2, 0, 45))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            modulo.delete()
+        self.assertEqual(self._estatisticas(curso), (1, 3, 1, 45))
+
+        # Reconciliação chega ao mesmo valor
+        CursoEAD.objects.filter(pk=curso.pk).update(total_aulas=0, duracao_total_min=0)
+        CursoEAD.recalcular_estatisticas([curso.pk])
+        self.assertEqual(self._estatisticas(curso), (1, 3, 1, 45))
+
+    def test_catalogo_com_consultas_constantes(self):
+        self.client.force_login(self.usuario)
+        url = reverse('treinamentos:ead_catalogo')
+
+        def consultas():
+            with CaptureQueriesContext(connection) as ctx:
+                resposta = self.client.get(url)
+            self.assertEqual(resposta.status_code, 200)
+            return len(ctx.captured_queries), resposta
+
+        self._curso('curso-1')
+        consultas()  # aquece caches de sessão/context processors
+        poucos, _ = consultas()
+        for n in range(2, 8):
+            self._matricular(self._curso(f'curso-{n}', modulos=2), n)
+        muitos, resposta = consultas()
+
+        self.assertEqual(poucos, muitos)
+        self.assertContains(resposta, '4 aulas', count=6)
@@ -28,6 +28,11 @@ urlpatterns = [
     path('assinatura/<str:token>/', views.PaginaAssinaturaView.as_view(), name='pagina_assinatura'),
     # 3. URL para o admin/gestor gerar o PDF de um participante
     path('participante/<int:pk>/gerar-certificado/', views.GerarCertificadoPDFView.as_view(), name='gerar_certificado_participante' ),
+    path('verificar/<uuid:protocolo>/pdf/', views.VerificarCertificadoPDFView.as_view(), name='verificar_certificado_pdf'),
+    # 4. Certificados de todo o treinamento (Celery): PDF único ou ZIP
+    path('<int:pk>/certificados/emitir/', views.EmitirCertificadosLoteView.as_view(), name='lote_certificados_emitir'),
+    path('<int:pk>/certificados/lote/<int:lote_id>/status/', views.StatusLoteCertificadosView.as_view(), name='lote_certificados_status'),
+    path('<int:pk>/certificados/lote/<int:lote_id>/download/', views.DownloadLoteCertificadosView.as_view(), name='lote_certificados_download'),
     # =================================================================
     # EAD — Catálogo e Área do Aluno
     # =================================================================
@@ -4,7 +4,7 @@ from django.conf import settings
 from django.contrib import messages
 from django.db.models import Sum, Count, F, Q, FloatField
 from django.forms import inlineformset_factory
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views import View
 from django.views.generic import (CreateView, DeleteView, DetailView, ListView, UpdateView, TemplateView)
 from django.shortcuts import get_object_or_404, redirect, render
@@ -12,7 +12,6 @@ from django.db.models.functions import Coalesce, ExtractMonth
 from django.db.models.fields import FloatField
 from decimal import Decimal
 import os
-import io
 import json
 import traceback
 from datetime import datetime, timedelta
@@ -29,46 +28,26 @@ from core.mixins import TecnicoScopeMixin
 from core.mixins import ViewFilialScopedMixin
 from .models import CursoEAD, MatriculaEAD, CertificadoEAD
 from django.utils import timezone
-from django.template.loader import render_to_string, get_template
+from django.template.loader import render_to_string
 from django.views.generic import View # Garanta que 'View' está importado
-from django.http import HttpResponse, Http404, HttpResponseRedirect, JsonResponse
-from .models import GabaritoCertificado, Assinatura, Participante, Treinamento, TipoCurso
-from num2words import num2words # Biblioteca para converter números em extenso
-import qrcode
-import qrcode.image.svg
-from base64 import b64encode
-from django.core.cache import cache
-
-
-try:
-    from weasyprint import HTML, CSS
-    WEASYPRINT_DISPONIVEL = True
-except ImportError:
-    WEASYPRINT_DISPONIVEL = False
-    print("AVISO: WeasyPrint não instalado. Geração de PDF falhará.")
-    # TODO: Adicione aqui a importação do xhtml2pdf como fallback se desejar
+from django.http import FileResponse, HttpResponse, Http404, HttpResponseRedirect, JsonResponse
+from .models import Assinatura, Participante, Treinamento, TipoCurso
+from core.ratelimit import RateLimitMixin
+from treinamentos import progresso_ead
+from .certificados import (
+    CertificadoIndisponivel, RenderizadorCertificados, emitir_certificado,
+    nome_arquivo_certificado, solicitar_lote, ultimo_certificado,
+)
+from .models import LoteCertificados
 
 
 
 
-class _RateLimitPublicMixin:
+class _RateLimitPublicMixin(RateLimitMixin):
     """Rate-limit por IP para endpoints públicos (anti-scraping)."""
-    RATE_LIMIT_KEY_PREFIX = "ratelimit:cert"
-    RATE_LIMIT_MAX = 30          # 30 requests
-    RATE_LIMIT_WINDOW = 60       # por minuto
-    
-    def dispatch(self, request, *args, **kwargs):
-        ip = (
-            request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")[0].strip()
-            or request.META.get("REMOTE_ADDR", "unknown")
-        )
-        key = f"{self.RATE_LIMIT_KEY_PREFIX}:{ip}"
-        count = cache.get(key, 0)
-        if count >= self.RATE_LIMIT_MAX:
-            logger.warning("Rate-limit cert validation: IP=%s", ip)
-            return HttpResponse("Rate-limit excedido", status=429)
-        cache.set(key, count + 1, timeout=self.RATE_LIMIT_WINDOW)
-        return super().dispatch(request, *args, **kwargs)
+    rate_limit_escopo = "treinamentos_certificado"
+    rate_limit_max = 30          # 30 requests
+    rate_limit_janela = 60       # por minuto
 
 
 # ==========================================================================
@@ -214,6 +193,7 @@ class DetalheTreinamentoView(LoginRequiredMixin, TecnicoScopeMixin, DetailView):
         context = super().get_context_data(**kwargs)
         # Otimiza a consulta para buscar funcionários junto com os participantes
         context['participantes'] = self.object.participantes.select_related('funcionario')
+        context['lote_certificados'] = self.object.lotes_certificados.first()
         return context
 
 class ExcluirTreinamentoView(LoginRequiredMixin, PermissionRequiredMixin, SuccessMessageMixin, DeleteView):
@@ -622,6 +602,7 @@ class VerificarCertificadoView(_RateLimitPublicMixin, View):
                 'participante': participante,
                 'treinamento': participante.treinamento,
                 'data_emissao': participante.data_registro, # Ou a data de conclusão do curso
+                'certificado': ultimo_certificado(participante),
             }
             
         except Participante.DoesNotExist:
@@ -709,121 +690,56 @@ class PaginaAssinaturaView(LoginRequiredMixin, View):
         messages.success(request, "✅ Assinatura registrada com sucesso!")
         return redirect('core:index') # Redireciona para home
 
-def mark_safe(value):
-    raise NotImplementedError
+def _participante_certificado_qs():
+    return Participante.objects.select_related(
+        'funcionario',
+        'treinamento__tipo_curso',
+        'treinamento__responsavel',
+        'assinatura', # OnetoOne (participante)
+        'treinamento__assinatura_responsavel' # OnetoOne (treinamento)
+    )
 
-def reverse(participante):
-    raise NotImplementedError
 
+def _resposta_certificado(certificado, participante, as_attachment=False):
+    return FileResponse(
+        certificado.arquivo.open('rb'), content_type='application/pdf',
+        as_attachment=as_attachment, filename=nome_arquivo_certificado(participante),
+    )
 
-class GerarCertificadoPDFView(LoginRequiredMixin, TecnicoScopeMixin, View):
+
+class VerificarCertificadoPDFView(_RateLimitPublicMixin, View):
     """
-    Gera o certificado em PDF (Frente e Verso) para um participante.
+    PDF PÚBLICO do certificado emitido, pelo protocolo do QR Code.
+    Serve apenas o arquivo guardado — nunca renderiza nesta URL.
     """
-    # O técnico só pode ver o detalhe se o lookup for verdadeiro
-    # Corrigido para apontar para o treinamento via 'participante'
-    tecnico_scope_lookup = 'treinamento__participantes__funcionario'
 
-    def get_qrcode_svg(self, participante):
-        """
-Gera o QR Code para a URL de validação e retorna como uma string SVG.
-"""
-        # Monta a URL completa de verificação
-        url_validacao = self.request.build_absolute_uri(
-            reverse('treinamentos:verificar_certificado', 
-                    kwargs={'protocolo': participante.protocolo_validacao})
+    def get(self, request, *args, **kwargs):
+        participante = get_object_or_404(
+            Participante.objects.select_related('funcionario'),
+            protocolo_validacao=self.kwargs.get('protocolo'),
         )
-        
-        # Gera o QR Code em memória
-        factory = qrcode.image.svg.SvgPathImage
-        img = qrcode.make(url_validacao, image_factory=factory, border=1)
-        
-        # Converte o SVG para uma string
-        buffer = io.BytesIO()
-        img.save(buffer)
-        svg_string = buffer.getvalue().decode('utf-8')
-        return svg_string
-
-    def get_context_data(self, participante):
-        treinamento = participante.treinamento
-        gabarito = GabaritoCertificado.objects.filter(ativo=True).first()
-        
-        if not gabarito:
-            raise Exception("Nenhum Gabarito de Certificado ativo foi encontrado.")
-            
-        documento = getattr(participante.funcionario, 'cpf', 
-                        getattr(participante.funcionario, 'rg', 'Não informado'))
-
-        data_inicio = treinamento.data_inicio.strftime('%d/%m/%Y')
-        data_fim = treinamento.data_fim.strftime('%d/%m/%Y') if treinamento.data_fim else data_inicio
+        certificado = ultimo_certificado(participante)
+        if not certificado:
+            raise Http404("Certificado ainda não emitido.")
+        return _resposta_certificado(certificado, participante)
 
-        try:
-            carga_horaria_extenso = num2words(treinamento.duracao, lang='pt_BR')
-        except Exception:
-            carga_horaria_extenso = str(treinamento.duracao)
-
-        # Contexto para a FRENTE
-        context_frente = {
-            'participante_nome': participante.funcionario.get_full_name(),
-            'participante_documento': documento,
-            'empresa_nome': gabarito.empresa_nome,
-            'nome_curso': treinamento.tipo_curso.nome,
-            'conteudo_programatico': treinamento.tipo_curso.descricao_no_certificado or "",
-            'referencia_normativa': treinamento.tipo_curso.referencia_normativa or "",
-            'data_inicio': data_inicio,
-            'data_fim': data_fim,
-            'carga_horaria': treinamento.duracao,
-            'carga_horaria_extenso': carga_horaria_extenso,
-            'local': treinamento.local,
-        }
-        
-        # Contexto para o VERSO
-        qr_code_svg = self.get_qrcode_svg(participante)
-        
-        # Formata a grade curricular (troca quebras de linha por <br>)
-        grade_formatada = (treinamento.tipo_curso.grade_curricular or "").replace('\n', '<br>')
-        
-        context_verso = {
-            'grade_curricular': mark_safe(grade_formatada),
-            'protocolo': str(participante.protocolo_validacao),
-            'qr_code_svg': mark_safe(qr_code_svg), # Passa o SVG do QR Code
-        }
 
-        # Assinaturas (passamos o OBJETO para o template)
-        assinatura_participante = getattr(participante, 'assinatura', None)
-        assinatura_responsavel = getattr(treinamento, 'assinatura_responsavel', None)
+class GerarCertificadoPDFView(LoginRequiredMixin, TecnicoScopeMixin, View):
+    """
+    Certificado em PDF (Frente e Verso) de um participante.
 
-        return {
-            'gabarito': gabarito,
-            'contexto_frente': context_frente,
-            'contexto_verso': context_verso,
-            'participante': participante,
-            'treinamento': treinamento,
-            'assinatura_participante': assinatura_participante,
-            'assinatura_responsavel': assinatura_responsavel,
-            'data_emissao': timezone.now()
-        }
+    Se já existe PDF guardado para o conteúdo atual (ver
+    treinamentos.certificados), serve o arquivo; senão renderiza uma vez
+    e guarda.
+    """
+    # O técnico só pode ver o detalhe se o lookup for verdadeiro
+    # Corrigido para apontar para o treinamento via 'participante'
+    tecnico_scope_lookup = 'treinamento__participantes__funcionario'
 
     def get(self, request, *args, **kwargs):
-        if not WEASYPRINT_DISPONIVEL:
-            messages.error(request, "A biblioteca 'WeasyPrint' não foi encontrada. Geração de PDF está desabilitada.")
-            return redirect(request.META.get('HTTP_REFERER', 'treinamentos:treinamento_list'))
-
         try:
             # Aplica o filtro de escopo do Técnico
-            base_qs = Participante.objects.select_related(
-                'funcionario',
-                'treinamento__tipo_curso',
-                'treinamento__responsavel',
-                'assinatura', # OnetoOne (participante)
-                'treinamento__assinatura_responsavel' # OnetoOne (treinamento)
-            )
-            
-            # O get_queryset do TecnicoScopeMixin espera ser chamado por uma ListView
-            # Vamos adaptar para usá-lo manualmente aqui
-            if hasattr(self, 'scope_tecnico_queryset'):
-                 base_qs = self.scope_tecnico_queryset(base_qs)
-
+            base_qs = self.scope_tecnico_queryset(_participante_certificado_qs())
             participante = get_object_or_404(base_qs, pk=self.kwargs.get('pk'))
         
         except Http404:
@@ -854,41 +770,131 @@ Gera o QR Code para a URL de validação e retorna como uma string SVG.
              return redirect('treinamentos:detalhe_treinamento', pk=participante.treinamento.pk)
 
 
-        # --- Geração do PDF ---
+        # --- PDF guardado ou gerado agora ---
         try:
-            context_data = self.get_context_data(participante)
-            
-            # Renderiza o HTML do certificado
-            template = get_template('treinamentos/certificado_template.html')
-            html_string = template.render(context_data)
+            renderizador = RenderizadorCertificados(base_url=request.build_absolute_uri('/'))
+            certificado, _ = emitir_certificado(participante, renderizador)
+            return _resposta_certificado(certificado, participante)
 
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = f'inline; filename="certificado_{participante.funcionario.username}.pdf"'
-            
-            # Crie um arquivo CSS para estilizar seu PDF
-            css_path = os.path.join(settings.STATIC_ROOT, 'css', 'certificado.css')
-            css_files = []
-            if os.path.exists(css_path):
-                 css_files.append(CSS(css_path))
-            
-            HTML(string=html_string, base_url=request.build_absolute_uri()).write_pdf(
-                response,
-                stylesheets=css_files
-            )
-            
-            # Marca o certificado como emitido
-            if not participante.certificado_emitido:
-                 participante.certificado_emitido = True
-                 participante.save(update_fields=['certificado_emitido'])
+        except CertificadoIndisponivel as e:
+            messages.error(request, f"Geração de PDF indisponível: {e}")
+            return redirect('treinamentos:detalhe_treinamento', pk=participante.treinamento.pk)
 
-            return response
-            
         except Exception as e:
-            print(f"ERRO CRÍTICO AO GERAR PDF: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Erro ao gerar certificado do participante %s", participante.pk)
             messages.error(request, f"Ocorreu um erro inesperado ao gerar o PDF: {e}")
             return redirect('treinamentos:detalhe_treinamento', pk=participante.treinamento.pk)
-        
+
+
+# =============================================================================
+# CERTIFICADOS EM LOTE (Celery)
+# =============================================================================
+
+class _LoteCertificadosMixin(LoginRequiredMixin, PermissionRequiredMixin, TecnicoScopeMixin):
+    permission_required = 'treinamentos.emitir_certificado'
+    tecnico_scope_lookup = 'participantes__funcionario'
+
+    def get_treinamento(self):
+        return get_object_or_404(
+            self.scope_tecnico_queryset(Treinamento.objects.all()), pk=self.kwargs['pk'],
+        )
+
+    def get_lote(self, treinamento):
+        return get_object_or_404(LoteCertificados, pk=self.kwargs['lote_id'], treinamento=treinamento)
+
+    @staticmethod
+    def status_json(lote):
+        return {
+            'lote_id': lote.pk,
+            'status': lote.status,
+            'progresso': lote.progresso,
+            'total': lote.total,
+            'renderizados': lote.renderizados,
+            'erro': lote.erro,
+            'url': (
+                reverse('treinamentos:lote_certificados_download', args=[lote.treinamento_id, lote.pk])
+                if lote.disponivel else None
+            ),
+        }
+
+
+class EmitirCertificadosLoteView(_LoteCertificadosMixin, View):
+    """
+    Enfileira a emissão de todos os certificados do treinamento
+    (PDF único ou ZIP). Certificados já guardados não são renderizados
+    de novo.
+    """
+
+    def post(self, request, *args, **kwargs):
+        treinamento = self.get_treinamento()
+        formato = request.POST.get('formato', LoteCertificados.FORMATO_PDF)
+        if formato not in dict(LoteCertificados.FORMATO_CHOICES):
+            formato = LoteCertificados.FORMATO_PDF
+
+        if treinamento.status != 'F':
+            messages.error(request, "Este treinamento ainda não foi finalizado.")
+            return redirect('treinamentos:detalhe_treinamento', pk=treinamento.pk)
+
+        assinatura_responsavel = getattr(treinamento, 'assinatura_responsavel', None)
+        if not assinatura_responsavel or not assinatura_responsavel.esta_assinada:
+            messages.error(request, "O instrutor responsável ainda não assinou o certificado.")
+            return redirect('treinamentos:detalhe_treinamento', pk=treinamento.pk)
+
+        lote = solicitar_lote(
+            treinamento, base_url=request.build_absolute_uri('/'),
+            formato=formato, usuario=request.user,
+            forcar=request.POST.get('forcar') == '1',
+        )
+
+        if 'application/json' in request.headers.get('Accept', ''):
+            return JsonResponse(self.status_json(lote), status=202)
+
+        messages.info(request, "Emissão dos certificados iniciada. Acompanhe o andamento nesta página.")
+        return redirect('treinamentos:detalhe_treinamento', pk=treinamento.pk)
+
+
+class StatusLoteCertificadosView(_LoteCertificadosMixin, View):
+    """
+    Andamento do lote (polling). HTMX recebe o fragmento de status e o
+    status 286 encerra o polling; demais clientes recebem JSON.
+    """
+
+    def get(self, request, *args, **kwargs):
+        treinamento = self.get_treinamento()
+        lote = self.get_lote(treinamento)
+        # Worker perdido: encerra para a tela parar de esperar
+        lote.encerrar_se_travado()
+
+        if request.headers.get('HX-Request'):
+            response = render(request, 'treinamentos/partials/_lote_certificados_status.html', {
+                'treinamento': treinamento,
+                'lote': lote,
+            })
+            if not lote.em_andamento:
+                response.status_code = 286
+            return response
+
+        return JsonResponse(self.status_json(lote))
+
+
+class DownloadLoteCertificadosView(_LoteCertificadosMixin, View):
+    """Download do PDF único / ZIP do lote (storage privado)."""
+
+    def get(self, request, *args, **kwargs):
+        treinamento = self.get_treinamento()
+        lote = self.get_lote(treinamento)
+
+        if not lote.disponivel:
+            messages.warning(request, "Os certificados ainda não estão prontos.")
+            return redirect('treinamentos:detalhe_treinamento', pk=treinamento.pk)
+
+        content_type = 'application/zip' if lote.formato == LoteCertificados.FORMATO_ZIP else 'application/pdf'
+        return FileResponse(
+            lote.arquivo.open('rb'), content_type=content_type, as_attachment=True,
+            filename=f"certificados_treinamento_{treinamento.pk}.{lote.formato}",
+        )
+
+
 # =============================================================================
 # =============================================================================
 #
@@ -923,11 +929,7 @@ class EADCatalogoView(LoginRequiredMixin, ListView):
         qs = CursoEAD.objects.filter(
             status=CursoEAD.Status.PUBLICADO,
             filial=self.request.user.filial_ativa,
-        ).select_related("tipo_curso").annotate(
-            total_modulos_count=Count("modulos_ead", distinct=True),
-            total_aulas_count=Count("modulos_ead__aulas_ead", distinct=True),
-            total_matriculados_count=Count("matriculas_ead", distinct=True),
-        )
+        ).select_related("tipo_curso")  # totais são colunas (CursoEAD.recalcular_estatisticas)
 
         # Filtro por busca
         q = self.request.GET.get("q")
@@ -1144,6 +1146,10 @@ class EADAulaPlayerView(LoginRequiredMixin, DetailView):
                 aula=aula,
                 defaults={"iniciado_em": timezone.now()},
             )
+            # O player retoma do último heartbeat, mesmo se ainda não gravado
+            pendente = progresso_ead.estado_pendente(matricula.pk, aula.pk)
+            if pendente:
+                progresso_ead.aplicar_estado(progresso, pendente)
             ctx["progresso"] = progresso
         except (MatriculaEAD.DoesNotExist, Exception):
             ctx["matricula"] = None
@@ -1185,41 +1191,31 @@ class EADAulaPlayerView(LoginRequiredMixin, DetailView):
 
 @method_decorator(require_POST, name="dispatch")
 class EADSalvarProgressoView(LoginRequiredMixin, View):
-    """Salva progresso parcial da aula (posição do vídeo, tempo gasto)."""
+    """
+    Heartbeat do player (posição do vídeo, tempo gasto). Vai para o buffer
+    de treinamentos.progresso_ead e é gravado em lote; `final` (fim da
+    sessão, enviado no pagehide) grava na hora.
+    """
 
     def post(self, request, pk):
-        aula = get_object_or_404(AulaEAD, pk=pk)
-
-        try:
-            funcionario = request.user.funcionario
-            matricula = MatriculaEAD.objects.get(
-                funcionario=funcionario, curso=aula.modulo.curso,
-            )
-        except Exception:
+        matricula_id = progresso_ead.resolver_matricula(request.user, pk)
+        if not matricula_id:
             return JsonResponse({"error": "Matrícula não encontrada"}, status=404)
 
-        progresso, _ = ProgressoAulaEAD.objects.get_or_create(
-            matricula=matricula, aula=aula,
-            defaults={"iniciado_em": timezone.now()},
-        )
-
-        # Atualiza dados enviados via POST/JSON
+        # Dados enviados via POST/JSON (sendBeacon manda form-data)
         try:
             data = json.loads(request.body)
         except (json.JSONDecodeError, ValueError):
             data = request.POST
 
-        if "video_posicao_segundos" in data:
-            progresso.video_posicao_segundos = int(data["video_posicao_segundos"])
-        if "video_duracao_total" in data:
-            progresso.video_duracao_total = int(data["video_duracao_total"])
-        if "tempo_gasto_segundos" in data:
-            progresso.tempo_gasto_segundos = int(data["tempo_gasto_segundos"])
-        if "percentual_assistido" in data:
-            progresso.percentual_assistido = Decimal(str(data["percentual_assistido"]))
+        try:
+            estado = progresso_ead.estado_do_payload(data)
+        except progresso_ead.HeartbeatInvalido:
+            return JsonResponse({"error": "Dados de progresso inválidos"}, status=400)
 
-        progresso.save()
-        return JsonResponse({"ok": True, "percentual": float(progresso.percentual_assistido)})
+        final = str(data.get("final", "")).lower() in ("1", "true")
+        progresso_ead.registrar_heartbeat(matricula_id, pk, estado, final=final)
+        return JsonResponse({"ok": True, "percentual": float(estado.get("percentual_assistido", 0))})
 
 
 # =============================================================================
@@ -1241,10 +1237,13 @@ class EADConcluirAulaView(LoginRequiredMixin, View):
         except Exception:
             return JsonResponse({"error": "Matrícula não encontrada"}, status=404)
 
+        # Heartbeats ainda no buffer entram antes da conclusão
+        progresso_ead.descarregar(matricula.pk, aula.pk)
         progresso, _ = ProgressoAulaEAD.objects.get_or_create(
             matricula=matricula, aula=aula,
             defaults={"iniciado_em": timezone.now()},
         )
+        progresso.matricula, progresso.aula = matricula, aula
 
         progresso.marcar_concluida()
 
@@ -1,21 +1,30 @@
-
 # usuario/context_processors.py
 
+from core.global_context import chave_usuario, contexto_global, obter_ou_calcular
 from notifications.context_processors import MAX_DROPDOWN
 from notifications.models import Notificacao
 
 
+def chave_filiais_permitidas(user_id):
+    """Chave do cache — invalidada por usuario.signals."""
+    return chave_usuario('filiais_permitidas', user_id)
+
+
+@contexto_global
 def usuario_filial_context(request):
     """
     Injeta informações da filial ativa e das filiais permitidas em todos os templates.
     """
     if request.user.is_authenticated:
-        filial_ativa = getattr(request.user, 'filial_ativa', None)
-        filiais_permitidas = request.user.filiais_permitidas.all()
-        
+        user = request.user
+        filial_ativa = getattr(user, 'filial_ativa', None)
+        filiais_permitidas = obter_ou_calcular(
+            chave_filiais_permitidas(user.pk),
+            lambda: list(user.filiais_permitidas.all()),
+        )
+
         return {
             'filial_ativa_global': filial_ativa,
             'filiais_permitidas_global': filiais_permitidas,
         }
     return {}
-
@@ -0,0 +1,35 @@
+# usuario/signals.py
+
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.context_processors import CHAVE_FILIAIS
+from core.global_context import invalidar
+from .context_processors import chave_filiais_permitidas
+from .models import Filial, Usuario
+
+
+@receiver(post_save, sender=Filial)
+@receiver(pre_delete, sender=Filial)
+def invalidar_cache_filiais(sender, instance, **kwargs):
+    """Lista global de filiais + filiais permitidas de quem tem acesso a ela."""
+    # pre_delete: no post_delete o M2M já foi apagado e não há quem invalidar
+    usuarios = instance.usuarios_permitidos.values_list('pk', flat=True)
+    invalidar(CHAVE_FILIAIS, *(chave_filiais_permitidas(uid) for uid in usuarios))
+
+
+@receiver(m2m_changed, sender=Usuario.filiais_permitidas.through)
+def invalidar_cache_filiais_permitidas(sender, instance, action, reverse, pk_set, **kwargs):
+    """Acesso de usuário a filial mudou (pelos dois lados da relação)."""
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+
+    if not reverse:
+        # instance é o Usuario
+        invalidar(chave_filiais_permitidas(instance.pk))
+    elif action == 'pre_clear':
+        # instance é a Filial — no clear o pk_set vem vazio, captura antes
+        usuarios = instance.usuarios_permitidos.values_list('pk', flat=True)
+        invalidar(*(chave_filiais_permitidas(uid) for uid in usuarios))
+    else:
+        invalidar(*(chave_filiais_permitidas(uid) for uid in (pk_set or ())))